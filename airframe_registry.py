@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Airframe Profile Registry
+Single source of truth for the airframes the web apps offer, their launch
+settings and their measured resource cost
+"""
+
+import os
+import json
+import glob
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airframes.json")
+DEFAULT_CACHE_DIR = os.environ.get('SITL_CACHE_DIR', os.path.expanduser("~/.cache/cloudsim"))
+
+# Expected (cpu, memory) of the lite simulation profile relative to the default one, until measured
+LITE_COST_RATIO = (0.6, 0.85)
+
+
+class AirframeProfile:
+    """Launch settings and resource cost of one airframe"""
+    
+    def __init__(self, name, config):
+        self.name = name
+        self.label = config.get('label', name)
+        self.autostart = config.get('autostart')
+        self.env = {key: str(value) for key, value in config.get('env', {}).items()}
+        self.sensors = dict(config.get('sensors', {}))
+        self.physics = dict(config.get('physics', {}))
+        self.limits = dict(config.get('limits', {}))  # cgroup overrides: cpu_weight, cpu_max_cores, memory_max_mb
+        # Simulator backend (sim_backends): "gz", or "sih" for PX4's built-in sihsim_* airframes
+        self.backend = config.get('backend', 'sih' if name.startswith('sihsim_') else 'gz')
+        
+        cost = config.get('cost', {})
+        self.configured_cpu = float(cost.get('cpu_cores', 1.0))
+        self.configured_memory_mb = float(cost.get('memory_mb', 500))
+        
+        # Measured cost, refreshed from live instance metrics
+        self.measured_cpu = None
+        self.measured_memory_mb = None
+        self.samples = 0
+        
+        # Measured separately for the lite simulation profile, to compare against the default
+        self.lite_cost_ratio = (float(cost.get('lite_cpu_ratio', LITE_COST_RATIO[0])),
+                                float(cost.get('lite_memory_ratio', LITE_COST_RATIO[1])))
+        self.measured_lite_cpu = None
+        self.measured_lite_memory_mb = None
+        self.lite_samples = 0
+        
+        # None means the PX4 tree could not be checked
+        self.available = None
+    
+    def cost(self, sim_profile="default"):
+        """Best known (cpu_cores, memory_mb) for one vehicle of this airframe"""
+        cpu = self.measured_cpu if self.measured_cpu is not None else self.configured_cpu
+        memory = self.measured_memory_mb if self.measured_memory_mb is not None else self.configured_memory_mb
+        if sim_profile == "lite":
+            cpu = self.measured_lite_cpu if self.lite_samples else cpu * self.lite_cost_ratio[0]
+            memory = self.measured_lite_memory_mb if self.lite_samples else memory * self.lite_cost_ratio[1]
+        return cpu, memory
+    
+    def lite_cost(self):
+        """Lite profile cost next to the default profile's"""
+        cpu, memory = self.cost()
+        lite_cpu, lite_memory = self.cost("lite")
+        return {
+            "cpu_cores": round(lite_cpu, 2),
+            "memory_mb": round(lite_memory, 1),
+            "cpu_vs_default": round(lite_cpu / cpu, 2) if cpu else None,
+            "memory_vs_default": round(lite_memory / memory, 2) if memory else None,
+            "measured": self.lite_samples > 0,
+            "samples": self.lite_samples
+        }
+    
+    def to_dict(self):
+        """Profile as a JSON-friendly dict"""
+        cpu, memory = self.cost()
+        return {
+            "name": self.name,
+            "label": self.label,
+            "autostart": self.autostart,
+            "backend": self.backend,
+            "available": self.available,
+            "env": self.env,
+            "sensors": self.sensors,
+            "physics": self.physics,
+            "limits": self.limits,
+            "cost": {
+                "cpu_cores": round(cpu, 2),
+                "memory_mb": round(memory, 1),
+                "configured_cpu_cores": self.configured_cpu,
+                "configured_memory_mb": self.configured_memory_mb,
+                "measured": self.samples > 0,
+                "samples": self.samples,
+                "lite": self.lite_cost()
+            }
+        }
+
+
+class AirframeRegistry:
+    """Loads airframe profiles from a config file and checks them against the PX4 tree"""
+    
+    def __init__(self, config_path=DEFAULT_CONFIG, px4_path=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.config_path = config_path
+        self.px4_path = px4_path or os.path.expanduser("~/PX4-Autopilot")
+        self.cache_dir = cache_dir
+        self.targets_cache = os.path.join(cache_dir, "px4_targets.json")
+        self.costs_file = os.path.join(cache_dir, "airframe_costs.json")
+        self.smoothing = 0.2  # EWMA weight of a new cost sample
+        self.save_interval = 60
+        self.last_save = 0
+        self.lock = threading.Lock()
+        self.profiles = {}
+        self.default = None
+        self.config_mtime = None
+        self.load()
+    
+    def airframes_dir(self):
+        """Directory of PX4's SITL airframe startup files"""
+        return os.path.join(self.px4_path, "ROMFS", "px4fmu_common", "init.d-posix", "airframes")
+    
+    def discover_px4_targets(self):
+        """Map of airframe name -> SYS_AUTOSTART id in the PX4 tree, cached by mtime"""
+        airframes_dir = self.airframes_dir()
+        try:
+            mtime = os.stat(airframes_dir).st_mtime
+        except OSError:
+            logger.warning(f"PX4 airframes not found at {airframes_dir}, skipping target check")
+            return None
+        
+        try:
+            with open(self.targets_cache) as f:
+                cached = json.load(f)
+            if cached.get('path') == airframes_dir and cached.get('mtime') == mtime:
+                return cached['targets']
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        targets = {}
+        for path in glob.glob(os.path.join(airframes_dir, "*_*")):
+            prefix, _, name = os.path.basename(path).partition('_')
+            if prefix.isdigit():
+                targets[name] = int(prefix)
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.targets_cache, 'w') as f:
+                json.dump({"path": airframes_dir, "mtime": mtime, "targets": targets}, f)
+        except OSError as e:
+            logger.warning(f"Could not cache PX4 targets: {e}")
+        
+        logger.info(f"Discovered {len(targets)} PX4 SITL airframes in {airframes_dir}")
+        return targets
+    
+    def load(self):
+        """(Re)load profiles from the config file and cross-check them"""
+        config_mtime = os.stat(self.config_path).st_mtime
+        with open(self.config_path) as f:
+            config = json.load(f)
+        
+        profiles = {name: AirframeProfile(name, entry)
+                    for name, entry in config.get('airframes', {}).items()}
+        
+        targets = self.discover_px4_targets()
+        if targets is not None:
+            for profile in profiles.values():
+                profile.available = profile.name in targets
+                if profile.available:
+                    profile.autostart = targets[profile.name]
+                else:
+                    logger.warning(f"Airframe {profile.name} is not available in the PX4 tree")
+        
+        self.load_costs(profiles)
+        
+        with self.lock:
+            self.profiles = profiles
+            self.default = config.get('default') or next(iter(profiles), None)
+            self.config_mtime = config_mtime
+        
+        logger.info(f"Loaded {len(profiles)} airframe profiles from {self.config_path}")
+    
+    def load_costs(self, profiles):
+        """Restore measured costs saved by a previous run"""
+        try:
+            with open(self.costs_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        
+        for name, entry in saved.items():
+            profile = profiles.get(name)
+            if profile:
+                profile.measured_cpu = entry.get('cpu_cores')
+                profile.measured_memory_mb = entry.get('memory_mb')
+                profile.samples = entry.get('samples', 0)
+                lite = entry.get('lite') or {}
+                profile.measured_lite_cpu = lite.get('cpu_cores')
+                profile.measured_lite_memory_mb = lite.get('memory_mb')
+                profile.lite_samples = lite.get('samples', 0)
+    
+    def save_costs(self):
+        """Persist measured costs so they survive a restart"""
+        with self.lock:
+            saved = {profile.name: {
+                "cpu_cores": profile.measured_cpu,
+                "memory_mb": profile.measured_memory_mb,
+                "samples": profile.samples,
+                "lite": {
+                    "cpu_cores": profile.measured_lite_cpu,
+                    "memory_mb": profile.measured_lite_memory_mb,
+                    "samples": profile.lite_samples
+                }
+            } for profile in self.profiles.values() if profile.samples or profile.lite_samples}
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.costs_file, 'w') as f:
+                json.dump(saved, f, indent=2)
+            self.last_save = time.monotonic()
+        except OSError as e:
+            logger.warning(f"Could not save airframe costs: {e}")
+    
+    def refresh(self):
+        """Reload the config file if it changed on disk"""
+        try:
+            if os.stat(self.config_path).st_mtime != self.config_mtime:
+                logger.info(f"Airframe config {self.config_path} changed, reloading")
+                self.load()
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not reload airframe config: {e}")
+    
+    def get(self, name):
+        """Profile for an airframe, or None if it is unknown"""
+        return self.profiles.get(name)
+    
+    def is_valid(self, name):
+        """True if the airframe can be launched on this host"""
+        profile = self.profiles.get(name)
+        return profile is not None and profile.available is not False
+    
+    def names(self):
+        """Names of all launchable airframes"""
+        return [name for name in self.profiles if self.is_valid(name)]
+    
+    def list_profiles(self):
+        """All profiles as dicts, for the API and dashboard dropdown"""
+        return [profile.to_dict() for profile in self.profiles.values()]
+    
+    def cost(self, name, sim_profile="default"):
+        """(cpu_cores, memory_mb) estimate for an airframe"""
+        profile = self.profiles.get(name)
+        if profile is None:
+            return 1.0, 500.0
+        return profile.cost(sim_profile)
+    
+    def record_usage(self, name, cpu_cores, memory_mb, sim_profile="default"):
+        """Blend a live measurement into an airframe's cost model (default and lite profiles kept apart)"""
+        profile = self.profiles.get(name)
+        if profile is None:
+            return
+        
+        with self.lock:
+            a = self.smoothing
+            if sim_profile == "lite":
+                if profile.lite_samples == 0:
+                    profile.measured_lite_cpu = cpu_cores
+                    profile.measured_lite_memory_mb = memory_mb
+                else:
+                    profile.measured_lite_cpu = (1 - a) * profile.measured_lite_cpu + a * cpu_cores
+                    profile.measured_lite_memory_mb = (1 - a) * profile.measured_lite_memory_mb + a * memory_mb
+                profile.lite_samples += 1
+            else:
+                if profile.samples == 0:
+                    profile.measured_cpu = cpu_cores
+                    profile.measured_memory_mb = memory_mb
+                else:
+                    profile.measured_cpu = (1 - a) * profile.measured_cpu + a * cpu_cores
+                    profile.measured_memory_mb = (1 - a) * profile.measured_memory_mb + a * memory_mb
+                profile.samples += 1
+        
+        if time.monotonic() - self.last_save > self.save_interval:
+            self.save_costs()
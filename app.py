@@ -7,12 +7,14 @@ from flask import Flask, render_template, jsonify, request
 import logging
 import requests
 from sitl_manager import SITLManager
+from airframe_registry import AirframeRegistry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 sitl = SITLManager()
+airframes = AirframeRegistry()
 
 
 def get_public_ip():
@@ -38,6 +40,13 @@ def api_status():
     return jsonify(status)
 
 
+@app.route('/api/airframes')
+def api_airframes():
+    """Airframe profiles for the dropdown"""
+    airframes.refresh()
+    return jsonify({"default": airframes.default, "airframes": airframes.list_profiles()})
+
+
 @app.route('/api/start', methods=['POST'])
 def api_start():
     """Start SITL"""
@@ -47,16 +56,11 @@ def api_start():
         
         # Get airframe from request data
         data = request.get_json() or {}
-        airframe = data.get('airframe', 'gz_x500')
+        airframe = data.get('airframe', airframes.default)
         
         # Validate airframe
-        valid_airframes = [
-            'gz_x500', 'gz_standard_vtol', 'gz_rc_cessna', 'gz_advanced_plane',
-            'gz_quadtailsitter', 'gz_tiltrotor', 'gz_rover_differential',
-            'gz_rover_ackermann', 'gz_rover_mecanum'
-        ]
-        
-        if airframe not in valid_airframes:
+        airframes.refresh()
+        if not airframes.is_valid(airframe):
             return jsonify({"success": False, "error": f"Invalid airframe: {airframe}"}), 400
         
         success = sitl.start(airframe)
@@ -4,16 +4,97 @@ Multi-Instance Flask Web GUI for PX4 SITL
 Supports multiple SITL instances with different airframes and ports
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, send_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
 import logging
+import os
 import requests
-from multi_sitl_manager import MultiSITLManager
+from multi_sitl_manager import MultiSITLManager, MAVLINK_RATE_PROFILES, DEFAULT_RATE_PROFILE, MAX_SPEED_FACTOR
+from mavlink_ws_gateway import MAVLinkWebSocketGateway
+from sitl_daemon import SITLControlClient
+from cgroup_limits import LIMIT_KEYS
+from idempotency import IdempotencyConflict
+from request_profiler import RequestProfiler
+from fair_share import QUOTA_KEYS
+from lite_world import SIM_PROFILES
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-multi_sitl = MultiSITLManager()
+
+# Behind Apache/lighttpd, SITL_X_SENDFILE=1 hands flight log downloads to the front-end server
+app.config['USE_X_SENDFILE'] = os.environ.get('SITL_X_SENDFILE') == '1'
+
+# Request timing and sampled profiles; off unless SITL_PROFILING=1 or switched on via /api/admin/profiling
+profiler = RequestProfiler(
+    enabled=os.environ.get('SITL_PROFILING') == '1',
+    sample_rate=float(os.environ.get('SITL_PROFILE_SAMPLE_RATE', 0)),
+    slow_ms=float(os.environ.get('SITL_SLOW_REQUEST_MS', 1000))
+)
+profiler.init_app(app)
+
+# SITL_CONTROL_SOCKET points at a running sitl_daemon.py, which then owns the SITL
+# processes and lets the app run with several workers; without it the app manages them itself
+if os.environ.get('SITL_CONTROL_SOCKET'):
+    multi_sitl = SITLControlClient(os.environ['SITL_CONTROL_SOCKET'])
+else:
+    # SITL_WORLD_SHARING=1 runs one Gazebo server per world and spawns vehicles into it
+    multi_sitl = MultiSITLManager(
+        world_sharing=os.environ.get('SITL_WORLD_SHARING') == '1',
+        default_world=os.environ.get('SITL_DEFAULT_WORLD', 'default'),
+        auto_restart=os.environ.get('SITL_AUTO_RESTART') == '1',
+        router_shards=int(os.environ.get('SITL_ROUTER_SHARDS', 0)) or None,
+        resource_warmup=os.environ.get('SITL_GZ_RESOURCE_WARMUP', '1') != '0'
+    )
+
+# Manager calls are timed as phases of the request that made them
+multi_sitl = profiler.wrap(multi_sitl)
+
+# MAVLink over WebSocket for GCS users who can't reach the raw TCP ports
+ws_gateway = MAVLinkWebSocketGateway(
+    latency_budget_ms=float(os.environ.get('SITL_WS_LATENCY_MS', 20))
+)
+sock = Sock(app) if Sock else None
+
+# Longest a create may wait in the fair-share queue; stays under the usual 60 s proxy/RPC timeouts
+MAX_QUEUE_TIMEOUT = 50
+
+# Scenario runs only read missions from, and write reports to, these directories
+SCENARIO_DIR = os.environ.get('SITL_SCENARIO_DIR', 'missions')
+SCENARIO_REPORT_DIR = os.environ.get('SITL_SCENARIO_REPORT_DIR', 'scenario_reports')
+
+
+def idempotency_conflict(error):
+    """True for a reused Idempotency-Key, whether raised in-process or by the control daemon"""
+    return isinstance(error, IdempotencyConflict) or getattr(error, 'error_type', None) == 'IdempotencyConflict'
+
+
+def request_user():
+    """User making the request: an API token (Authorization: Bearer, when tokens are configured) or X-SITL-User"""
+    auth = request.headers.get('Authorization', '')
+    token = auth[len('Bearer '):] if auth.startswith('Bearer ') else None
+    return multi_sitl.identify_user(token, request.headers.get('X-SITL-User'))
+
+
+def queue_timeout(data):
+    """Seconds a create may wait for capacity, from the request or SITL_QUEUE_TIMEOUT"""
+    timeout = float(data.get('queue_timeout', os.environ.get('SITL_QUEUE_TIMEOUT', 0)))
+    return max(0.0, min(timeout, MAX_QUEUE_TIMEOUT))
+
+
+def confined_path(base, path):
+    """`path` resolved inside `base`, or None if it is absolute or leads out of it"""
+    if not isinstance(path, str) or os.path.isabs(path):
+        return None
+    base = os.path.realpath(base)
+    resolved = os.path.realpath(os.path.join(base, path))
+    return resolved if resolved == base or resolved.startswith(base + os.sep) else None
 
 
 def get_public_ip():
@@ -49,32 +130,68 @@ def api_create_instance():
     try:
         # Get airframe from request data
         data = request.get_json() or {}
-        airframe = data.get('airframe', 'gz_x500')
+        airframe = data.get('airframe', multi_sitl.default_airframe())
         
         # Validate airframe
-        valid_airframes = [
-            'gz_x500', 'gz_standard_vtol', 'gz_rc_cessna', 'gz_advanced_plane',
-            'gz_quadtailsitter', 'gz_tiltrotor', 'gz_rover_differential',
-            'gz_rover_ackermann', 'gz_rover_mecanum'
-        ]
-        
-        if airframe not in valid_airframes:
+        if not multi_sitl.is_valid_airframe(airframe):
             return jsonify({"success": False, "error": f"Invalid airframe: {airframe}"}), 400
         
-        # Create instance
-        instance_id = multi_sitl.create_instance(airframe)
+        rate_profile = data.get('rate_profile', DEFAULT_RATE_PROFILE)
+        if rate_profile not in MAVLINK_RATE_PROFILES:
+            return jsonify({"success": False, "error": f"Unknown rate profile: {rate_profile}"}), 400
+        
+        speed_factor = float(data.get('speed_factor', 1.0))
+        if not 0 < speed_factor <= MAX_SPEED_FACTOR:
+            return jsonify({"success": False, "error": f"Speed factor must be between 0 and {MAX_SPEED_FACTOR}"}), 400
+        
+        limits = data.get('limits') or {}
+        if not isinstance(limits, dict) or set(limits) - set(LIMIT_KEYS):
+            return jsonify({"success": False, "error": f"limits may only set {', '.join(LIMIT_KEYS)}"}), 400
+        
+        sim_profile = data.get('sim_profile', 'default')
+        if sim_profile not in SIM_PROFILES:
+            return jsonify({"success": False, "error": f"sim_profile must be one of {', '.join(SIM_PROFILES)}"}), 400
+        
+        # A retry with the same Idempotency-Key gets the instance created the first time
+        idempotency_key = request.headers.get('Idempotency-Key')
+        user = request_user()
+        wait = queue_timeout(data)
+        
+        # Per-user quota, then admission control against the airframe cost model;
+        # with a queue_timeout the create waits its fair turn for capacity instead
+        reason = multi_sitl.check_quota(airframe, user=user, idempotency_key=idempotency_key, sim_profile=sim_profile)
+        if reason:
+            return jsonify({"success": False, "error": reason}), 429
+        reason = multi_sitl.check_admission(airframe, idempotency_key=idempotency_key, user=user,
+                                            sim_profile=sim_profile)
+        if reason and not wait:
+            return jsonify({"success": False, "error": reason}), 503
+        
+        # Create instance (world only matters in world-sharing mode)
+        instance_id = multi_sitl.create_instance(airframe, world=data.get('world'), rate_profile=rate_profile,
+                                                 speed_factor=speed_factor, limits=limits,
+                                                 idempotency_key=idempotency_key, user=user, queue_timeout=wait,
+                                                 sim_profile=sim_profile)
         
         if instance_id:
             return jsonify({
                 "success": True,
                 "message": f"SITL instance created with {airframe}",
                 "instance_id": instance_id,
-                "airframe": airframe
+                "airframe": airframe,
+                "owner": user,
+                "rate_profile": rate_profile,
+                "speed_factor": speed_factor,
+                "sim_profile": sim_profile
             })
+        elif wait and multi_sitl.check_admission(airframe, user=user, sim_profile=sim_profile):
+            return jsonify({"success": False, "error": f"No capacity became free within {wait:.0f} s"}), 503
         else:
             return jsonify({"success": False, "error": "Failed to create instance"}), 500
             
     except Exception as e:
+        if idempotency_conflict(e):
+            return jsonify({"success": False, "error": str(e)}), 422
         logger.error(f"Error creating instance: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -123,6 +240,47 @@ def api_stop_instance(instance_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/instances/<instance_id>/pause', methods=['POST'])
+def api_pause_instance(instance_id):
+    """Freeze a running instance (PX4 and its simulator) without losing its state"""
+    try:
+        instance_status = multi_sitl.get_instance_status(instance_id)
+        if instance_status is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        if instance_status.get("world"):
+            return jsonify({"success": False, "error": f"Instance {instance_id} shares Gazebo world "
+                                                       f"'{instance_status['world']}' and cannot be paused"}), 409
+        
+        if not multi_sitl.pause_instance(instance_id):
+            return jsonify({"success": False, "error": f"Instance {instance_id} is not running"}), 409
+        
+        return jsonify({"success": True, "instance_id": instance_id,
+                        "pause": multi_sitl.get_instance_status(instance_id)["pause"]})
+        
+    except Exception as e:
+        logger.error(f"Error pausing instance {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/resume', methods=['POST'])
+def api_resume_instance(instance_id):
+    """Let a paused instance run again"""
+    try:
+        instance_status = multi_sitl.get_instance_status(instance_id)
+        if instance_status is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        if not multi_sitl.resume_instance(instance_id):
+            return jsonify({"success": False, "error": f"Instance {instance_id} is not paused"}), 409
+        
+        return jsonify({"success": True, "instance_id": instance_id,
+                        "pause": multi_sitl.get_instance_status(instance_id)["pause"]})
+        
+    except Exception as e:
+        logger.error(f"Error resuming instance {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route('/api/instances/<instance_id>')
 def api_get_instance(instance_id):
     """Get a specific SITL instance status"""
@@ -160,6 +318,245 @@ def api_remove_instance(instance_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/instances/<instance_id>/rate-profile', methods=['PUT'])
+def api_set_rate_profile(instance_id):
+    """Switch an instance's MAVLink stream-rate profile at runtime"""
+    try:
+        data = request.get_json() or {}
+        rate_profile = data.get('rate_profile')
+        
+        if rate_profile not in MAVLINK_RATE_PROFILES:
+            return jsonify({"success": False, "error": f"Unknown rate profile: {rate_profile}"}), 400
+        
+        if multi_sitl.get_instance_status(instance_id) is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        success = multi_sitl.set_rate_profile(instance_id, rate_profile)
+        
+        if success:
+            return jsonify({
+                "success": True,
+                "message": f"Rate profile of {instance_id} set to {rate_profile}",
+                "instance_id": instance_id,
+                "rate_profile": rate_profile
+            })
+        else:
+            return jsonify({"success": False, "error": f"Failed to apply rate profile to {instance_id}"}), 500
+            
+    except Exception as e:
+        logger.error(f"Error setting rate profile for {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/reset', methods=['POST'])
+def api_reset_instance(instance_id):
+    """Reset a vehicle's pose, estimator and commander state without restarting processes"""
+    try:
+        if multi_sitl.get_instance_status(instance_id) is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        timings = multi_sitl.reset_instance(instance_id)
+        if timings is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} is not running"}), 409
+        
+        return jsonify({
+            "success": True,
+            "message": f"SITL instance {instance_id} reset in {timings['total_ms']} ms",
+            "instance_id": instance_id,
+            "timings": timings
+        })
+        
+    except Exception as e:
+        logger.error(f"Error resetting instance {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/params/snapshot', methods=['POST'])
+def api_snapshot_params(instance_id):
+    """Store the full parameter set of a running instance"""
+    try:
+        instance_status = multi_sitl.get_instance_status(instance_id)
+        if instance_status is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        summary = multi_sitl.snapshot_params(instance_id)
+        if summary is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} is not running"}), 409
+        
+        return jsonify({"success": True, "instance_id": instance_id, "snapshot": summary})
+        
+    except Exception as e:
+        logger.error(f"Error taking parameter snapshot of {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/params/restore', methods=['POST'])
+def api_restore_params(instance_id):
+    """Reset a running instance's parameters to its snapshot"""
+    try:
+        instance_status = multi_sitl.get_instance_status(instance_id)
+        if instance_status is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        if not multi_sitl.has_param_snapshot(instance_id):
+            return jsonify({"success": False, "error": f"No parameter snapshot for {instance_id}"}), 409
+        
+        result = multi_sitl.restore_params(instance_id)
+        if result is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} is not running"}), 409
+        
+        return jsonify({"success": not result["failed"], "instance_id": instance_id, "restore": result})
+        
+    except Exception as e:
+        logger.error(f"Error restoring parameters of {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/bandwidth')
+def api_get_bandwidth(instance_id):
+    """Measured GCS bandwidth for an instance and each connected client"""
+    try:
+        report = multi_sitl.get_bandwidth(instance_id)
+        
+        if report is not None:
+            return jsonify(report)
+        else:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+            
+    except Exception as e:
+        logger.error(f"Error getting bandwidth for {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/logs/ulog')
+def api_list_ulogs(instance_id):
+    """PX4 flight logs (ULog) written by an instance"""
+    try:
+        listing = multi_sitl.list_ulogs(instance_id)
+        
+        if listing is not None:
+            return jsonify(listing)
+        else:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+            
+    except Exception as e:
+        logger.error(f"Error listing flight logs of {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/logs/ulog/<path:name>')
+def api_download_ulog(instance_id, name):
+    """Download one flight log; supports Range requests for resuming and partial reads"""
+    try:
+        path = multi_sitl.ulog_path(instance_id, name)
+        if path is None:
+            return jsonify({"success": False, "error": f"No flight log {name} for {instance_id}"}), 404
+        
+        # Streamed from disk (sendfile where the server supports it), never read into memory
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f"{instance_id}_{name.replace('/', '_')}", conditional=True, max_age=0)
+        
+    except RequestedRangeNotSatisfiable:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading flight log {name} of {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/websocket')
+def api_get_websocket_sessions(instance_id):
+    """Active MAVLink WebSocket sessions of an instance"""
+    try:
+        if multi_sitl.get_instance_status(instance_id) is None:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+        
+        return jsonify({
+            "instance_id": instance_id,
+            "enabled": sock is not None,
+            "sessions": ws_gateway.get_sessions(instance_id)
+        })
+    except Exception as e:
+        logger.error(f"Error getting WebSocket sessions for {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+if sock:
+    @sock.route('/ws/instances/<instance_id>/mavlink')
+    def ws_instance_mavlink(ws, instance_id):
+        """Bidirectional MAVLink over WebSocket (binary messages carry whole frames)"""
+        instance_status = multi_sitl.get_instance_status(instance_id)
+        # An idle-suspended vehicle wakes up for the client instead of turning it away
+        if instance_status and instance_status['status'] == 'paused' and instance_status['pause']['reason'] == 'idle':
+            logger.info(f"WebSocket client for idle instance {instance_id}, resuming")
+            if multi_sitl.resume_instance(instance_id):
+                instance_status = multi_sitl.get_instance_status(instance_id)
+        if instance_status is None or instance_status['status'] != 'running':
+            ws.close(reason=1008, message=f"Instance {instance_id} is not running")
+            return
+        
+        ws_gateway.serve(
+            ws,
+            instance_id,
+            instance_status['tcp_port'],
+            client_address=request.remote_addr,
+            latency_budget_ms=request.args.get('latency_ms', type=float)
+        )
+else:
+    logger.warning("flask-sock not installed, MAVLink WebSocket gateway disabled")
+
+
+@app.route('/api/scenarios', methods=['POST'])
+def api_run_scenarios():
+    """Fly a directory of missions in the background, reusing the caller's running vehicles"""
+    try:
+        data = request.get_json() or {}
+        directory = confined_path(SCENARIO_DIR, data.get('directory', '.'))
+        if directory is None:
+            return jsonify({"success": False, "error": f"directory must be relative to {SCENARIO_DIR}"}), 400
+        if not os.path.isdir(directory):
+            return jsonify({"success": False, "error": f"Not a directory: {data.get('directory')}"}), 400
+        report_dir = None
+        if data.get('report_dir') is not None:
+            report_dir = confined_path(SCENARIO_REPORT_DIR, data['report_dir'])
+            if report_dir is None:
+                return jsonify({"success": False,
+                                "error": f"report_dir must be relative to {SCENARIO_REPORT_DIR}"}), 400
+        
+        airframe = data.get('airframe', multi_sitl.default_airframe())
+        if not multi_sitl.is_valid_airframe(airframe):
+            return jsonify({"success": False, "error": f"Invalid airframe: {airframe}"}), 400
+        
+        run = multi_sitl.start_scenario_run(
+            directory,
+            airframe=airframe,
+            instances=int(data.get('instances', 1)),
+            speed_factor=float(data.get('speed_factor', 1.0)),
+            report_dir=report_dir,
+            user=request_user()
+        )
+        
+        return jsonify({"success": True, "run_id": run["run_id"], "report_dir": run["report_dir"]})
+        
+    except Exception as e:
+        logger.error(f"Error starting scenario run: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/scenarios/<run_id>')
+def api_get_scenario_run(run_id):
+    """Progress of a scenario run, or its summary once finished"""
+    status = multi_sitl.get_scenario_run(run_id)
+    if status is None:
+        return jsonify({"success": False, "error": f"Scenario run {run_id} not found"}), 404
+    return jsonify(status)
+
+
+@app.route('/api/rate-profiles')
+def api_get_rate_profiles():
+    """Available MAVLink stream-rate profiles"""
+    return jsonify({"default": DEFAULT_RATE_PROFILE, "rate_profiles": MAVLINK_RATE_PROFILES})
+
+
 @app.route('/api/instances/stop-all', methods=['POST'])
 def api_stop_all_instances():
     """Stop all SITL instances"""
@@ -174,6 +571,194 @@ def api_stop_all_instances():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/api/airframes')
+def api_get_airframes():
+    """Airframe profiles for the dashboard dropdown"""
+    try:
+        return jsonify(multi_sitl.get_airframes())
+    except Exception as e:
+        logger.error(f"Error getting airframes: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/routers', methods=['PUT'])
+def api_set_router_shards():
+    """Change the number of MAVLink router shards"""
+    try:
+        data = request.get_json() or {}
+        shards = data.get('shards')
+        
+        if not isinstance(shards, int) or shards < 1:
+            return jsonify({"success": False, "error": "shards must be a positive integer"}), 400
+        
+        moved = multi_sitl.set_router_shards(shards)
+        return jsonify({"success": True, "shards": shards, "instances_moved": moved})
+        
+    except Exception as e:
+        logger.error(f"Error resizing router shards: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/gcs')
+def api_get_gcs_mux():
+    """Single-port GCS mux: public port, vehicles by system id, clients and their subscriptions"""
+    try:
+        status = multi_sitl.get_gcs_mux()
+        return jsonify({"enabled": status is not None, "mux": status})
+    except Exception as e:
+        logger.error(f"Error getting GCS mux status: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/instances/<instance_id>/gcs-clients')
+def api_get_gcs_clients(instance_id):
+    """GCS clients of an instance with their throughput, drops and round-trip latency
+    (mux clients only with SITL_GCS_MUX_PORT; their totals are per connection, "vehicle" per instance)"""
+    try:
+        clients = multi_sitl.get_gcs_clients(instance_id)
+        
+        if clients is not None:
+            return jsonify(clients)
+        else:
+            return jsonify({"success": False, "error": f"Instance {instance_id} not found"}), 404
+            
+    except Exception as e:
+        logger.error(f"Error getting GCS clients for {instance_id}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/gcs/subscriptions/<client_host>', methods=['PUT'])
+def api_set_gcs_subscription(client_host):
+    """Limit the GCS connections from an address to some vehicles ({"systems": [1, "instance_3"]}, null = all)"""
+    try:
+        data = request.get_json() or {}
+        systems = data.get('systems')
+        if systems is not None and not isinstance(systems, list):
+            return jsonify({"success": False, "error": "systems must be a list or null"}), 400
+        
+        systems = multi_sitl.set_gcs_subscription(client_host, systems)
+        return jsonify({"success": True, "client": client_host, "systems": systems if systems is not None else "all"})
+        
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error setting GCS subscription of {client_host}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/users')
+def api_get_users():
+    """Per-user instances, CPU and memory in use against quota, and queued creates"""
+    try:
+        return jsonify({"users": multi_sitl.get_user_usage(), "you": request_user()})
+    except Exception as e:
+        logger.error(f"Error getting user usage: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/users/<user>/quota', methods=['PUT'])
+def api_set_user_quota(user):
+    """Change a user's quota and fair-share weight ("default" changes everyone's default)"""
+    denied = admin_denied(required=True)
+    if denied:
+        return denied
+    try:
+        data = request.get_json() or {}
+        if set(data) - set(QUOTA_KEYS):
+            return jsonify({"success": False, "error": f"Quota settings are {', '.join(QUOTA_KEYS)}"}), 400
+        
+        quota = multi_sitl.set_user_quota(None if user == "default" else user, **data)
+        return jsonify({"success": True, "user": user, "quota": quota})
+        
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error setting quota of {user}: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/metrics')
+def api_metrics():
+    """Resource metrics, host capacity and the airframe cost model"""
+    try:
+        return jsonify(multi_sitl.get_metrics())
+    except Exception as e:
+        logger.error(f"Error getting metrics: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/memory')
+def api_memory():
+    """Per-vehicle memory report for dedicated vs shared-world instances"""
+    try:
+        return jsonify(multi_sitl.get_memory_summary())
+    except Exception as e:
+        logger.error(f"Error getting memory report: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def admin_denied(required=False):
+    """Error response unless the request carries SITL_ADMIN_TOKEN (when one is configured;
+    with required, also when none is)"""
+    token = os.environ.get('SITL_ADMIN_TOKEN')
+    if required and not token:
+        return jsonify({"success": False, "error": "Set SITL_ADMIN_TOKEN to allow this"}), 403
+    if token and request.headers.get('X-Admin-Token') != token:
+        return jsonify({"success": False, "error": "Admin token required"}), 403
+    return None
+
+
+@app.route('/api/admin/profiling')
+def api_profiling_status():
+    """Profiling settings, per-endpoint timings and the captured profiles"""
+    denied = admin_denied(required=True)
+    if denied:
+        return denied
+    return jsonify(profiler.get_status())
+
+
+@app.route('/api/admin/profiling', methods=['PUT'])
+def api_configure_profiling():
+    """Switch request timing/profiling on or off and tune sampling at runtime"""
+    denied = admin_denied(required=True)
+    if denied:
+        return denied
+    try:
+        data = request.get_json() or {}
+        settings = profiler.configure(
+            enabled=data.get('enabled'),
+            sample_rate=data.get('sample_rate'),
+            slow_ms=data.get('slow_ms')
+        )
+        return jsonify(dict(settings, success=True))
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
+@app.route('/api/admin/profiling/slow')
+def api_slow_requests():
+    """Recent slow requests with the manager phases they spent their time in"""
+    denied = admin_denied(required=True)
+    if denied:
+        return denied
+    return jsonify({"slow_ms": profiler.slow_ms, "requests": profiler.get_slow_requests()})
+
+
+@app.route('/api/admin/profiling/profiles.folded')
+@app.route('/api/admin/profiling/profiles/<int:profile_id>.folded')
+def api_download_profile(profile_id=None):
+    """Collapsed stacks of one profile (or all merged), for flamegraph.pl / speedscope"""
+    denied = admin_denied(required=True)
+    if denied:
+        return denied
+    folded = profiler.folded(profile_id)
+    if folded is None:
+        return jsonify({"success": False, "error": f"Profile {profile_id} not found"}), 404
+    name = f"profile-{profile_id}.folded" if profile_id else "profiles.folded"
+    return Response(folded, mimetype='text/plain',
+                    headers={"Content-Disposition": f"attachment; filename={name}"})
+
+
 # Legacy endpoints for backward compatibility
 @app.route('/api/status')
 def api_status():
@@ -204,42 +789,41 @@ def api_start():
     try:
         # Get airframe from request data
         data = request.get_json() or {}
-        airframe = data.get('airframe', 'gz_x500')
+        airframe = data.get('airframe', multi_sitl.default_airframe())
         
         # Validate airframe
-        valid_airframes = [
-            'gz_x500', 'gz_standard_vtol', 'gz_rc_cessna', 'gz_advanced_plane',
-            'gz_quadtailsitter', 'gz_tiltrotor', 'gz_rover_differential',
-            'gz_rover_ackermann', 'gz_rover_mecanum'
-        ]
-        
-        if airframe not in valid_airframes:
+        if not multi_sitl.is_valid_airframe(airframe):
             return jsonify({"success": False, "error": f"Invalid airframe: {airframe}"}), 400
         
-        # Create and start instance
-        instance_id = multi_sitl.create_instance(airframe)
+        idempotency_key = request.headers.get('Idempotency-Key')
+        user = request_user()
+        reason = multi_sitl.check_quota(airframe, user=user, idempotency_key=idempotency_key)
+        if reason:
+            return jsonify({"success": False, "error": reason}), 429
+        reason = multi_sitl.check_admission(airframe, idempotency_key=idempotency_key, user=user)
+        if reason:
+            return jsonify({"success": False, "error": reason}), 503
+        
+        # Create and start instance (removed again if it fails to start); retries with the
+        # same Idempotency-Key attach to this launch instead of creating another instance
+        instance_id = multi_sitl.launch_instance(airframe, idempotency_key=idempotency_key, user=user)
         
         if instance_id:
-            success = multi_sitl.start_instance(instance_id)
-            
-            if success:
-                instance_status = multi_sitl.get_instance_status(instance_id)
-                return jsonify({
-                    "success": True,
-                    "message": f"SITL started successfully with {airframe}",
-                    "public_ip": get_public_ip(),
-                    "tcp_port": instance_status['tcp_port'],
-                    "airframe": airframe,
-                    "instance_id": instance_id
-                })
-            else:
-                # Clean up failed instance
-                multi_sitl.remove_instance(instance_id)
-                return jsonify({"success": False, "error": "Failed to start"}), 500
+            instance_status = multi_sitl.get_instance_status(instance_id)
+            return jsonify({
+                "success": True,
+                "message": f"SITL started successfully with {airframe}",
+                "public_ip": get_public_ip(),
+                "tcp_port": instance_status['tcp_port'],
+                "airframe": airframe,
+                "instance_id": instance_id
+            })
         else:
-            return jsonify({"success": False, "error": "Failed to create instance"}), 500
+            return jsonify({"success": False, "error": "Failed to start"}), 500
             
     except Exception as e:
+        if idempotency_conflict(e):
+            return jsonify({"success": False, "error": str(e)}), 422
         logger.error(f"Error starting SITL: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+GCS Bandwidth Monitor
+Measures bytes/s per instance and per connected GCS client from the kernel's
+TCP socket counters (`ss -ti`), without sitting in the data path
+"""
+
+import re
+import time
+import logging
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+COUNTER_PATTERNS = {
+    "bytes_sent": re.compile(r'\bbytes_sent:(\d+)'),
+    "bytes_received": re.compile(r'\bbytes_received:(\d+)'),
+    "rtt_ms": re.compile(r'\brtt:([\d.]+)/')
+}
+
+
+def parse_ss_output(output):
+    """Parse `ss -tinH` output into {peer: {bytes_sent, bytes_received, rtt_ms}}"""
+    connections = {}
+    peer = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            # Socket line: Recv-Q Send-Q Local:Port Peer:Port
+            fields = line.split()
+            peer = fields[-1] if len(fields) >= 4 else None
+            if peer:
+                connections[peer] = {"bytes_sent": 0, "bytes_received": 0, "rtt_ms": None}
+        elif peer:
+            for key, pattern in COUNTER_PATTERNS.items():
+                match = pattern.search(line)
+                if match:
+                    value = float(match.group(1)) if key == "rtt_ms" else int(match.group(1))
+                    connections[peer][key] = value
+    return connections
+
+
+def read_port_connections(port):
+    """Established TCP connections on a local server port, with their byte counters"""
+    try:
+        result = subprocess.run(
+            ['ss', '-tinH', 'state', 'established', f'( sport = :{port} )'],
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.debug(f"Could not run ss for port {port}: {e}")
+        return {}
+    
+    if result.returncode != 0:
+        return {}
+    return parse_ss_output(result.stdout)
+
+
+class BandwidthMonitor:
+    """Turns socket byte counters into per-client and per-instance rates and totals"""
+    
+    def __init__(self, reader=read_port_connections):
+        self.reader = reader
+        self.lock = threading.Lock()
+        self.ports = {}  # port -> {"clients": {peer: state}, "totals": {...}, "sampled_at": t}
+    
+    def sample(self, port, exclude=()):
+        """Take a new reading for a GCS port and return its bandwidth report"""
+        connections = {peer: counters for peer, counters in self.reader(port).items()
+                       if peer not in exclude}
+        now = time.monotonic()
+        
+        with self.lock:
+            entry = self.ports.setdefault(port, {
+                "clients": {},
+                "totals": {"tx_bytes": 0, "rx_bytes": 0},
+                "sampled_at": None
+            })
+            previous_clients = entry["clients"]
+            clients = {}
+            
+            for peer, counters in connections.items():
+                previous = previous_clients.get(peer)
+                state = {
+                    "bytes_sent": counters["bytes_sent"],
+                    "bytes_received": counters["bytes_received"],
+                    "rtt_ms": counters["rtt_ms"],
+                    "connected_since": previous["connected_since"] if previous else time.time(),
+                    "tx_bytes_per_s": 0.0,
+                    "rx_bytes_per_s": 0.0
+                }
+                
+                # A new connection has all of its bytes counted; a known one only the delta
+                tx_delta = counters["bytes_sent"] - (previous["bytes_sent"] if previous else 0)
+                rx_delta = counters["bytes_received"] - (previous["bytes_received"] if previous else 0)
+                tx_delta = max(tx_delta, 0)
+                rx_delta = max(rx_delta, 0)
+                entry["totals"]["tx_bytes"] += tx_delta
+                entry["totals"]["rx_bytes"] += rx_delta
+                
+                if previous and entry["sampled_at"] and now > entry["sampled_at"]:
+                    elapsed = now - entry["sampled_at"]
+                    state["tx_bytes_per_s"] = round(tx_delta / elapsed, 1)
+                    state["rx_bytes_per_s"] = round(rx_delta / elapsed, 1)
+                
+                clients[peer] = state
+            
+            entry["clients"] = clients
+            entry["sampled_at"] = now
+            return self.report(port)
+    
+    def report(self, port):
+        """Latest bandwidth report for a port (without sampling)"""
+        entry = self.ports.get(port)
+        if entry is None:
+            return {"clients": {}, "tx_bytes_per_s": 0.0, "rx_bytes_per_s": 0.0,
+                    "total_tx_bytes": 0, "total_rx_bytes": 0}
+        
+        clients = {peer: {
+            "tx_bytes_per_s": state["tx_bytes_per_s"],
+            "rx_bytes_per_s": state["rx_bytes_per_s"],
+            "tx_bytes": state["bytes_sent"],
+            "rx_bytes": state["bytes_received"],
+            "rtt_ms": state["rtt_ms"],
+            "connected_since": state["connected_since"]
+        } for peer, state in entry["clients"].items()}
+        
+        return {
+            "clients": clients,
+            "tx_bytes_per_s": round(sum(c["tx_bytes_per_s"] for c in clients.values()), 1),
+            "rx_bytes_per_s": round(sum(c["rx_bytes_per_s"] for c in clients.values()), 1),
+            "total_tx_bytes": entry["totals"]["tx_bytes"],
+            "total_rx_bytes": entry["totals"]["rx_bytes"]
+        }
+    
+    def forget(self, port):
+        """Drop all state for a port"""
+        with self.lock:
+            self.ports.pop(port, None)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark for tlog_decoder
+Writes a synthetic telemetry log (HEARTBEAT, ATTITUDE and GLOBAL_POSITION_INT
+at typical relative rates) and extracts the same columns twice: once by
+parsing the log message by message, the way a streaming parser does, and once
+with TlogDecoder's index and batch extraction.
+
+    python bench_tlog_decoder.py                 # 1 GB log in /tmp
+    python bench_tlog_decoder.py --size-mb 100 --keep
+"""
+
+import os
+import math
+import time
+import struct
+import argparse
+
+from mavlink_frames import encode_frame, frame_header, padded_payload, HEADER_LEN_V1, HEADER_LEN_V2, STX_V2, \
+    CHECKSUM_LEN, SIGNATURE_LEN, INCOMPAT_FLAG_SIGNED
+from tlog_decoder import TlogDecoder, TLOG_TIMESTAMP, MESSAGE_LAYOUTS, COLUMN_SCALES, np
+
+HEARTBEAT_FORMAT = struct.Struct('<IBBBBB')
+ATTITUDE_FORMAT = struct.Struct(MESSAGE_LAYOUTS[30][1])
+GLOBAL_POSITION_INT_FORMAT = struct.Struct(MESSAGE_LAYOUTS[33][1])
+BLOCK_RECORDS = 3000
+RECORD_INTERVAL_US = 4000  # one record every 4 ms
+
+
+def synthetic_block():
+    """One block of log records (timestamps zeroed) and the offsets of each record within it"""
+    frames = []
+    for index in range(BLOCK_RECORDS):
+        time_ms = index * RECORD_INTERVAL_US // 1000
+        angle = index / BLOCK_RECORDS * 2 * math.pi
+        if index % 30 == 0:
+            frames.append(encode_frame(0, HEARTBEAT_FORMAT.pack(0, 2, 12, 81, 4, 3), seq=index, sysid=1, compid=1))
+        elif index % 3 == 0:
+            payload = GLOBAL_POSITION_INT_FORMAT.pack(time_ms, int((47.397742 + 0.001 * math.sin(angle)) * 1e7),
+                                                      int((8.545594 + 0.001 * math.cos(angle)) * 1e7),
+                                                      int(488000 + 20000 * math.sin(angle)), 20000, 500, -300, 0,
+                                                      int(math.degrees(angle) * 100) % 36000)
+            frames.append(encode_frame(33, payload, seq=index, sysid=1, compid=1))
+        else:
+            payload = ATTITUDE_FORMAT.pack(time_ms, 0.1 * math.sin(angle), 0.05 * math.cos(angle),
+                                           angle - math.pi, 0.01, 0.02, 0.03)
+            frames.append(encode_frame(30, payload, seq=index, sysid=1, compid=1))
+    
+    block = bytearray()
+    offsets = []
+    for frame in frames:
+        offsets.append(len(block))
+        block += bytes(TLOG_TIMESTAMP.size) + frame
+    return block, offsets
+
+
+def write_synthetic_tlog(path, size_bytes, start_us=1700000000000000):
+    """Write a log of about size_bytes with steadily increasing timestamps; returns the record count"""
+    block, offsets = synthetic_block()
+    records = 0
+    written = 0
+    with open(path, 'wb') as f:
+        while written < size_bytes:
+            for offset in offsets:
+                TLOG_TIMESTAMP.pack_into(block, offset, start_us + records * RECORD_INTERVAL_US)
+                records += 1
+            f.write(block)
+            written += len(block)
+    return records
+
+
+def parse_per_message(path, msgid, fields):
+    """Baseline: read and decode the log one record at a time"""
+    _, layout, names = MESSAGE_LAYOUTS[msgid]
+    payload_format = struct.Struct(layout)
+    columns = {"time": []}
+    columns.update((field, []) for field in fields)
+    
+    with open(path, 'rb') as f:
+        while True:
+            stamp = f.read(TLOG_TIMESTAMP.size)
+            header = f.read(3)
+            if len(header) < 3:
+                break
+            header_len = HEADER_LEN_V2 if header[0] == STX_V2 else HEADER_LEN_V1
+            rest = header_len + header[1] + CHECKSUM_LEN - 3
+            if header[0] == STX_V2 and header[2] & INCOMPAT_FLAG_SIGNED:
+                rest += SIGNATURE_LEN
+            frame = header + f.read(rest)
+            if frame_header(frame)[3] != msgid:
+                continue
+            
+            message = dict(zip(names, payload_format.unpack(padded_payload(frame, payload_format.size))))
+            columns["time"].append(TLOG_TIMESTAMP.unpack(stamp)[0] / 1e6)
+            for field in fields:
+                scale = COLUMN_SCALES.get(field)
+                columns[field].append(message[field] * scale if scale else message[field])
+    return columns
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<32} {elapsed:8.2f} s")
+    return result, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batch tlog decoding against per-message parsing")
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--path", default="/tmp/bench-synthetic.tlog")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic log afterwards")
+    args = parser.parse_args()
+    
+    print(f"Writing {args.size_mb} MB synthetic log to {args.path}")
+    records, _ = timed("generate", lambda: write_synthetic_tlog(args.path, args.size_mb * 1024 * 1024))
+    print(f"  {records} records, NumPy {'available' if np is not None else 'not installed (struct fallback)'}")
+    
+    wanted = [(33, ["lat", "lon", "alt"]), (30, ["roll", "pitch", "yaw"])]
+    try:
+        print("Per-message parsing:")
+        baseline_total = 0
+        baseline = {}
+        for msgid, fields in wanted:
+            baseline[msgid], elapsed = timed(MESSAGE_LAYOUTS[msgid][0],
+                                             lambda: parse_per_message(args.path, msgid, fields))
+            baseline_total += elapsed
+        
+        print("Indexed batch extraction:")
+        with TlogDecoder(args.path) as decoder:
+            _, batch_total = timed("index", decoder.build_index)
+            for msgid, fields in wanted:
+                columns, elapsed = timed(MESSAGE_LAYOUTS[msgid][0], lambda: decoder.columns(msgid, fields))
+                batch_total += elapsed
+                assert len(columns["time"]) == len(baseline[msgid]["time"])
+                assert list(columns[fields[0]][:1000]) == baseline[msgid][fields[0]][:1000]
+        
+        print(f"Total: per-message {baseline_total:.2f} s, batch {batch_total:.2f} s "
+              f"({baseline_total / batch_total:.1f}x)")
+    finally:
+        if not args.keep:
+            os.remove(args.path)
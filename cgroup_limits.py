@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+cgroup v2 Isolation for SITL Instances
+Gives every instance its own cgroup with a CPU weight, an optional CPU quota and
+a memory limit, so one heavy vehicle can't starve the others. PX4 (and, in
+dedicated mode, the Gazebo it launches) joins the group before exec, so the
+whole process tree is covered. Throttling, memory pressure and OOM kills are
+read back from the group's interface files for the instance metrics.
+
+Needs a writable cgroup v2 hierarchy with the cpu and memory controllers: run
+as root on a unified host, or under systemd with Delegate=yes and
+SITL_CGROUP_ROOT pointing into the delegated subtree. Without one, instances
+run unconfined as before.
+
+cgroup v2 only lets a group hand controllers to its children while it holds no
+processes itself. Under Delegate=yes the service's own group is the parent of
+the root, so the daemon first moves out of it into <root>/manager.
+"""
+
+import os
+import time
+import signal
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CGROUP_ROOT = "/sys/fs/cgroup/cloudsim"
+CONTROLLERS = ("cpu", "memory")
+CPU_PERIOD_US = 100000
+LIMIT_KEYS = ("cpu_weight", "cpu_max_cores", "memory_max_mb")
+MANAGER_GROUP = "manager"  # leaf under the root the daemon's own processes move into
+
+
+def read_flat(path):
+    """Parse a 'key value' per line cgroup file into a dict of ints"""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    values[parts[0]] = int(parts[1])
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def read_pressure(path):
+    """avg10 of the 'some' line of a PSI file (% of time stalled), None if unavailable"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("some"):
+                    fields = dict(field.split("=") for field in line.split()[1:])
+                    return float(fields["avg10"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+class InstanceCgroup:
+    """The cgroup of one instance"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.limits = {}
+    
+    def write(self, name, value):
+        """Write one interface file"""
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write(str(value))
+    
+    def apply(self, limits):
+        """Set CPU weight, CPU quota (cores) and memory limit; None removes a limit"""
+        self.limits = dict(limits)
+        if limits.get("cpu_weight"):
+            self.write("cpu.weight", int(limits["cpu_weight"]))
+        cores = limits.get("cpu_max_cores")
+        self.write("cpu.max", f"{int(cores * CPU_PERIOD_US)} {CPU_PERIOD_US}" if cores else f"max {CPU_PERIOD_US}")
+        memory_mb = limits.get("memory_max_mb")
+        if memory_mb:
+            # Reclaim (and report pressure) before the hard limit is hit
+            self.write("memory.high", int(memory_mb * 0.9 * 1024 * 1024))
+            self.write("memory.max", int(memory_mb * 1024 * 1024))
+        else:
+            self.write("memory.high", "max")
+            self.write("memory.max", "max")
+        # On OOM, kill the whole vehicle rather than leave PX4 without its simulator
+        self.write("memory.oom.group", 1)
+    
+    def add_self(self):
+        """Move the calling process into this group (run in the child before exec)"""
+        self.write("cgroup.procs", os.getpid())
+    
+    def freeze(self, frozen=True):
+        """Freeze or thaw every process in the group; False if the freezer isn't available"""
+        if not os.path.exists(os.path.join(self.path, "cgroup.freeze")):
+            return False
+        try:
+            self.write("cgroup.freeze", 1 if frozen else 0)
+            return True
+        except OSError:
+            return False
+    
+    def pids(self):
+        """Processes currently in the group"""
+        try:
+            with open(os.path.join(self.path, "cgroup.procs")) as f:
+                return [int(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return []
+    
+    def oom_kills(self):
+        """Number of processes the OOM killer has killed in this group"""
+        return read_flat(os.path.join(self.path, "memory.events")).get("oom_kill", 0)
+    
+    def kill(self):
+        """Kill every process in the group, including ones that left the process group"""
+        if os.path.exists(os.path.join(self.path, "cgroup.kill")):
+            try:
+                self.write("cgroup.kill", 1)
+                return
+            except OSError:
+                pass
+        for pid in self.pids():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+    
+    def stats(self):
+        """CPU throttling, memory use and pressure, and OOM events"""
+        cpu = read_flat(os.path.join(self.path, "cpu.stat"))
+        memory = read_flat(os.path.join(self.path, "memory.events"))
+        current = None
+        try:
+            with open(os.path.join(self.path, "memory.current")) as f:
+                current = int(f.read())
+        except (OSError, ValueError):
+            pass
+        
+        periods = cpu.get("nr_periods", 0)
+        return {
+            "limits": self.limits,
+            "cpu_periods": periods,
+            "cpu_throttled_periods": cpu.get("nr_throttled", 0),
+            "cpu_throttled_ratio": round(cpu.get("nr_throttled", 0) / periods, 3) if periods else 0.0,
+            "cpu_throttled_s": round(cpu.get("throttled_usec", 0) / 1e6, 1),
+            "cpu_pressure": read_pressure(os.path.join(self.path, "cpu.pressure")),
+            "memory_current_mb": round(current / (1024 * 1024), 1) if current is not None else None,
+            "memory_pressure": read_pressure(os.path.join(self.path, "memory.pressure")),
+            "memory_high_events": memory.get("high", 0),
+            "memory_max_events": memory.get("max", 0),
+            "oom_kills": memory.get("oom_kill", 0)
+        }
+
+
+class CgroupManager:
+    """Creates and removes per-instance cgroups under one parent group"""
+    
+    def __init__(self, root=DEFAULT_CGROUP_ROOT):
+        self.root = root
+        self.enabled = None  # decided on first use
+    
+    def available(self):
+        """Set up the parent group once; False if cgroup v2 isn't usable here"""
+        if self.enabled is not None:
+            return self.enabled
+        
+        parent = os.path.dirname(self.root)
+        try:
+            with open(os.path.join(parent, "cgroup.controllers")) as f:
+                missing = set(CONTROLLERS) - set(f.read().split())
+            if missing:
+                raise OSError(f"controllers not available: {', '.join(sorted(missing))}")
+            
+            # A group with processes can't enable controllers for its children (EBUSY), so the
+            # daemon leaves the parent first; the host's root cgroup is exempt and left alone
+            os.makedirs(self.root, exist_ok=True)
+            if not os.path.ismount(parent):
+                self.move_processes(parent, os.path.join(self.root, MANAGER_GROUP))
+            
+            # Controllers must be enabled on every level down to the instance groups
+            enable = " ".join(f"+{name}" for name in CONTROLLERS)
+            with open(os.path.join(parent, "cgroup.subtree_control"), 'w') as f:
+                f.write(enable)
+            with open(os.path.join(self.root, "cgroup.subtree_control"), 'w') as f:
+                f.write(enable)
+            
+            self.enabled = True
+            logger.info(f"✅ cgroup v2 isolation enabled under {self.root}")
+        except OSError as e:
+            self.enabled = False
+            logger.warning(f"⚠️ cgroup v2 isolation unavailable ({e}); instances run without limits")
+        return self.enabled
+    
+    def move_processes(self, source, target):
+        """Move every process of one group into another (created if needed); returns the moved pids"""
+        pids = InstanceCgroup(source).pids()
+        if not pids:
+            return []
+        os.makedirs(target, exist_ok=True)
+        for pid in pids:
+            with open(os.path.join(target, "cgroup.procs"), 'w') as f:
+                f.write(str(pid))
+        logger.info(f"Moved {len(pids)} process(es) from {source} to {target}")
+        return pids
+    
+    def create(self, instance_id, limits):
+        """Create (or reuse) an instance's group with the given limits; None if unavailable"""
+        if not self.available():
+            return None
+        
+        group = InstanceCgroup(os.path.join(self.root, instance_id))
+        try:
+            os.makedirs(group.path, exist_ok=True)
+            group.apply(limits)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not set up cgroup for {instance_id}: {e}")
+            return None
+        return group
+    
+    def remove(self, group, timeout=2.0):
+        """Kill anything left in a group and delete it"""
+        if group is None:
+            return
+        group.kill()
+        deadline = time.monotonic() + timeout
+        while group.pids() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        try:
+            os.rmdir(group.path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove cgroup {group.path}: {e}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Per-User Quotas and Fair-Share Queueing
+Several teams share one host. Each user gets an instance and CPU quota, and
+when the host is full, creates wait in a queue that is served by weighted fair
+share: the next slot goes to the waiting user whose reserved CPU, divided by
+their weight, is lowest (oldest request first within a user). A user who
+already holds most of the host therefore can't starve a newcomer just by
+asking more often.
+
+Quotas come from a JSON file:
+
+    {
+        "default": {"max_instances": 2, "max_cpu": 4},
+        "users": {
+            "perception": {"max_instances": 6, "max_cpu": 12, "weight": 2, "token": "..."},
+            "ci": {"max_instances": 4, "weight": 0.5}
+        }
+    }
+"""
+
+import json
+import time
+import logging
+import itertools
+
+logger = logging.getLogger(__name__)
+
+ANONYMOUS_USER = "anonymous"
+QUOTA_KEYS = ("max_instances", "max_cpu", "weight")
+DEFAULT_QUOTA = {"max_instances": None, "max_cpu": None, "weight": 1.0}
+
+
+class QuotaPolicy:
+    """Per-user quotas, fair-share weights and API tokens"""
+    
+    def __init__(self, default=None, users=None):
+        self.default = dict(DEFAULT_QUOTA)
+        self.users = {}
+        self.tokens = {}  # token -> user
+        self.set_quota(None, **(default or {}))
+        for user, settings in (users or {}).items():
+            settings = dict(settings)
+            token = settings.pop("token", None)
+            if token:
+                self.tokens[token] = user
+            self.set_quota(user, **settings)
+    
+    @classmethod
+    def load(cls, path):
+        """Policy from a quota file"""
+        with open(path) as f:
+            data = json.load(f)
+        policy = cls(data.get("default"), data.get("users"))
+        logger.info(f"Loaded quotas for {len(policy.users)} users from {path}")
+        return policy
+    
+    def set_quota(self, user, **settings):
+        """Change a user's quota (user None changes the default)"""
+        for key, value in settings.items():
+            if key not in QUOTA_KEYS:
+                raise ValueError(f"Unknown quota setting: {key}")
+            if value is not None and (float(value) < 0 or (key == "weight" and float(value) == 0)):
+                raise ValueError(f"Quota setting {key} must be positive")
+        if user is None:
+            self.default.update(settings)
+        else:
+            self.users.setdefault(user, {}).update(settings)
+    
+    def quota(self, user):
+        """Effective quota of a user"""
+        return dict(self.default, **self.users.get(user, {}))
+    
+    def identify(self, token=None, claimed_user=None):
+        """The user behind a request: by API token when tokens are configured, else the claimed name"""
+        if self.tokens:
+            return self.tokens.get(token, ANONYMOUS_USER)
+        return claimed_user or ANONYMOUS_USER
+
+
+class QueueTicket:
+    """A create waiting for capacity"""
+    
+    def __init__(self, seq, user, airframe):
+        self.seq = seq
+        self.user = user
+        self.airframe = airframe
+        self.enqueued_at = time.monotonic()
+
+
+class FairShareQueue:
+    """Creates waiting for capacity, served by weighted fair share (caller holds the manager lock)"""
+    
+    def __init__(self):
+        self.tickets = []
+        self.counter = itertools.count(1)
+        self.served = 0
+        self.abandoned = 0
+        self.total_wait = 0.0
+    
+    def enqueue(self, user, airframe):
+        """Join the queue"""
+        ticket = QueueTicket(next(self.counter), user, airframe)
+        self.tickets.append(ticket)
+        return ticket
+    
+    def leave(self, ticket, served):
+        """Leave the queue, either admitted or given up (timed out, or over quota by now)"""
+        if ticket in self.tickets:
+            self.tickets.remove(ticket)
+        if served:
+            self.served += 1
+            self.total_wait += time.monotonic() - ticket.enqueued_at
+        else:
+            self.abandoned += 1
+    
+    def next_ticket(self, usage, policy):
+        """The ticket to serve next: lowest reserved CPU per unit of weight, then oldest"""
+        if not self.tickets:
+            return None
+        return min(self.tickets, key=lambda ticket: (
+            usage.get(ticket.user, 0.0) / float(policy.quota(ticket.user)["weight"]), ticket.seq))
+    
+    def is_next(self, ticket, usage, policy):
+        """True if this ticket may take the next free slot (no ticket: only when nobody is waiting)"""
+        return self.next_ticket(usage, policy) is ticket
+    
+    def waiting(self):
+        """Number of queued creates per user"""
+        counts = {}
+        for ticket in self.tickets:
+            counts[ticket.user] = counts.get(ticket.user, 0) + 1
+        return counts
+    
+    def get_stats(self):
+        """Queue counters for the metrics endpoint"""
+        return {
+            "waiting": len(self.tickets),
+            "served": self.served,
+            "abandoned": self.abandoned,
+            "avg_wait_s": round(self.total_wait / self.served, 2) if self.served else 0.0
+        }
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Single-Port GCS Multiplexer
+Serves every vehicle on one public TCP port instead of one port per instance,
+so the firewall only needs a single opening. Each instance boots with its own
+MAV_SYS_ID, and the mux tells vehicles apart by that system id.
+
+Each client has a subscription, a set of system ids (default: all vehicles).
+It only receives telemetry from those vehicles. Its targeted messages
+(COMMAND_LONG, PARAM_SET, mission items, ...) go to the addressed vehicle only,
+and broadcasts such as its heartbeat go to every vehicle it subscribed to. A
+vehicle link is only opened while at least one client wants that vehicle.
+
+Subscriptions are set in one of two ways:
+  - per client address through the API, before or while QGroundControl is
+    connected (PUT /api/gcs/subscriptions/<ip>)
+  - in-band by scripts, with a text line before any MAVLink:
+    "SUB 1,3,instance_4\\n" (system ids or instance ids, "SUB all" for everything)
+
+Every client is tracked from connect to disconnect: frames and bytes in both
+directions with per-second rates, telemetry dropped while it lagged, and its
+round-trip time measured with MAVLink TIMESYNC. These cover the whole
+connection; frames, bytes and drops are also counted per vehicle. The mux answers for two kinds
+of exchange: its own probes (sent from MUX_SYSTEM_ID and not forwarded to any
+vehicle) and the vehicles' timesync requests the client replies to.
+"""
+
+import time
+import struct
+import socket
+import logging
+import selectors
+import threading
+from collections import deque
+
+from mavlink_frames import (FrameSplitter, encode_frame, frame_header, frame_msgid, frame_target_system,
+                            padded_payload, ESSENTIAL_MSG_IDS)
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_PREFIX = b"SUB "
+MAX_SUBSCRIBE_LINE = 1024
+
+TIMESYNC_MSG_ID = 111
+TIMESYNC_FORMAT = struct.Struct('<qqBB')  # tc1, ts1, target_system, target_component
+MUX_SYSTEM_ID = 255  # source of the mux's own TIMESYNC probes
+MUX_COMPONENT_ID = 191
+TIMESYNC_TIMEOUT = 10.0  # seconds before an unanswered timesync counts as lost
+RTT_SAMPLES = 30  # round-trip times averaged per client
+
+
+class MuxClient:
+    """One GCS connection to the mux"""
+    
+    def __init__(self, sock, address, systems=None):
+        self.sock = sock
+        self.address = address  # "ip:port"
+        self.host = address.rsplit(":", 1)[0]
+        self.systems = systems  # set of system ids, None = every vehicle
+        self.splitter = FrameSplitter()
+        self.handshake = bytearray()  # bytes received while a SUB line may still be coming, None once done
+        self.outbox = bytearray()
+        self.writing = False  # registered for EVENT_WRITE while the outbox doesn't drain
+        self.connected_at = time.time()
+        self.gcs_sysid = None  # learned from the client's first frame
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.dropped = 0
+        self.traffic = {}  # sysid -> frames/bytes/drops exchanged with that vehicle
+        self.rates = {"tx_frames_per_s": 0.0, "rx_frames_per_s": 0.0, "tx_bytes_per_s": 0.0,
+                      "rx_bytes_per_s": 0.0, "dropped_per_s": 0.0}
+        self.rate_sample = (time.monotonic(), self.counters())
+        self.timesync_pending = {}  # ts1 -> (monotonic send time, our own probe)
+        self.timesync_lost = 0
+        self.rtt_ms = deque(maxlen=RTT_SAMPLES)
+        self.rtt_min_ms = None
+        self.rtt_max_ms = None
+    
+    def wants(self, sysid):
+        """True if this client subscribed to the vehicle"""
+        return self.systems is None or sysid in self.systems
+    
+    def vehicle_traffic(self, sysid):
+        """Counters of what this client exchanged with one vehicle"""
+        if sysid not in self.traffic:
+            self.traffic[sysid] = {"frames_to_vehicle": 0, "frames_to_client": 0, "rx_bytes": 0, "tx_bytes": 0,
+                                   "dropped": 0}
+        return self.traffic[sysid]
+    
+    def counters(self):
+        """Running totals the rates are derived from"""
+        return self.frames_out, self.frames_in, self.bytes_out, self.bytes_in, self.dropped
+    
+    def update_rates(self, now):
+        """Per-second rates since the previous update"""
+        last_time, last_counters = self.rate_sample
+        elapsed = now - last_time
+        if elapsed <= 0:
+            return
+        counters = self.counters()
+        for key, current, previous in zip(("tx_frames_per_s", "rx_frames_per_s", "tx_bytes_per_s",
+                                           "rx_bytes_per_s", "dropped_per_s"), counters, last_counters):
+            self.rates[key] = round((current - previous) / elapsed, 1)
+        self.rate_sample = (now, counters)
+    
+    def expect_timesync(self, ts1, probe):
+        """Remember a TIMESYNC request sent to the client, to time its answer"""
+        self.timesync_pending[ts1] = (time.monotonic(), probe)
+    
+    def answer_timesync(self, ts1):
+        """Record the round trip of an answered request; returns whether it was our probe (None = unknown)"""
+        entry = self.timesync_pending.pop(ts1, None)
+        if entry is None:
+            return None
+        rtt = (time.monotonic() - entry[0]) * 1000
+        self.rtt_ms.append(rtt)
+        self.rtt_min_ms = rtt if self.rtt_min_ms is None else min(self.rtt_min_ms, rtt)
+        self.rtt_max_ms = rtt if self.rtt_max_ms is None else max(self.rtt_max_ms, rtt)
+        return entry[1]
+    
+    def expire_timesync(self, now):
+        """Count requests unanswered for TIMESYNC_TIMEOUT as lost"""
+        expired = [ts1 for ts1, (sent, _) in self.timesync_pending.items() if now - sent > TIMESYNC_TIMEOUT]
+        for ts1 in expired:
+            del self.timesync_pending[ts1]
+        self.timesync_lost += len(expired)
+    
+    def get_latency(self):
+        """Round-trip time summary in milliseconds, None before the first answer"""
+        if not self.rtt_ms:
+            return None
+        return {
+            "last": round(self.rtt_ms[-1], 2),
+            "avg": round(sum(self.rtt_ms) / len(self.rtt_ms), 2),
+            "min": round(self.rtt_min_ms, 2),
+            "max": round(self.rtt_max_ms, 2),
+            "samples": len(self.rtt_ms)
+        }
+    
+    def get_status(self, sysid=None):
+        """Client details for the API; counters and rates are for the whole connection, and with a
+        sysid "vehicle" holds the traffic with that vehicle alone"""
+        status = dict({
+            "client": self.address,
+            "gcs_system_id": self.gcs_sysid,
+            "systems": sorted(self.systems) if self.systems is not None else "all",
+            "connected_at": self.connected_at,
+            "connected_for_s": round(time.time() - self.connected_at, 1),
+            "frames_to_vehicles": self.frames_in,
+            "frames_to_client": self.frames_out,
+            "tx_bytes": self.bytes_out,
+            "rx_bytes": self.bytes_in,
+            "dropped": self.dropped,
+            "backlog_bytes": len(self.outbox),
+            "rtt_ms": self.get_latency(),
+            "timesync_lost": self.timesync_lost
+        }, **self.rates)
+        if sysid is not None:
+            status["vehicle"] = dict(self.vehicle_traffic(sysid))
+        return status
+
+
+class VehicleLink:
+    """The mux's connection to one vehicle's GCS port"""
+    
+    def __init__(self, sysid, sock):
+        self.sysid = sysid
+        self.sock = sock
+        self.splitter = FrameSplitter()
+        self.outbox = bytearray()  # client frames the vehicle hasn't taken yet
+        self.writing = False  # registered for EVENT_WRITE while the outbox doesn't drain
+
+
+class GcsMux:
+    """One selector thread bridging GCS clients on a single port to every vehicle's TCP port"""
+    
+    def __init__(self, port, host="0.0.0.0", reconnect_interval=2.0, max_backlog=256 * 1024,
+                 timesync_interval=2.0, stats_interval=1.0):
+        self.port = port
+        self.host = host
+        self.reconnect_interval = reconnect_interval
+        self.max_backlog = max_backlog  # bytes queued for a slow client (or vehicle) before dropping
+        self.timesync_interval = timesync_interval  # seconds between RTT probes per client, 0 = off
+        self.stats_interval = stats_interval
+        self.next_probe = 0
+        self.next_stats = 0
+        self.probe_seq = 0
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.listener = None
+        self.vehicles = {}  # sysid -> (instance_id, tcp_port)
+        self.links = {}  # sysid -> VehicleLink
+        self.next_attempt = {}  # sysid -> monotonic time of next connect attempt
+        self.clients = {}  # socket -> MuxClient
+        self.host_subscriptions = {}  # client ip -> set of system ids
+        self.sysid_mismatch = set()  # vehicles already warned about sending under another system id
+        self.unrouted = 0
+    
+    def start(self):
+        """Listen on the public port and run the selector loop in a daemon thread"""
+        try:
+            self.listener = socket.create_server((self.host, self.port))
+            self.listener.setblocking(False)
+        except OSError as e:
+            logger.error(f"❌ GCS mux could not listen on {self.host}:{self.port}: {e}")
+            return False
+        self.port = self.listener.getsockname()[1]
+        self.selector.register(self.listener, selectors.EVENT_READ, "listener")
+        threading.Thread(target=self.run, daemon=True).start()
+        logger.info(f"✅ GCS mux listening on TCP {self.port}")
+        return True
+    
+    def add_vehicle(self, sysid, instance_id, tcp_port):
+        """Make a vehicle reachable through the mux"""
+        with self.lock:
+            self.vehicles[sysid] = (instance_id, tcp_port)
+            self.next_attempt[sysid] = 0
+    
+    def remove_vehicle(self, sysid):
+        """Drop a vehicle and its link"""
+        with self.lock:
+            self.vehicles.pop(sysid, None)
+            self.next_attempt.pop(sysid, None)
+            self.sysid_mismatch.discard(sysid)
+            self.close_link(sysid)
+    
+    def resolve_systems(self, systems):
+        """Set of system ids from system ids and/or instance ids (None or "all" = every vehicle)"""
+        if systems is None or systems == "all":
+            return None
+        if isinstance(systems, (str, int)):
+            systems = [systems]
+        instance_sysids = {instance_id: sysid for sysid, (instance_id, _) in self.vehicles.items()}
+        resolved = set()
+        for system in systems:
+            if isinstance(system, str) and system.strip() in instance_sysids:
+                resolved.add(instance_sysids[system.strip()])
+                continue
+            try:
+                sysid = int(system)
+            except (TypeError, ValueError):
+                raise ValueError(f"Unknown vehicle: {system}")
+            if not 1 <= sysid <= 255:
+                raise ValueError(f"System id out of range: {sysid}")
+            resolved.add(sysid)
+        return resolved
+    
+    def set_subscription(self, client_host, systems):
+        """Subscribe every connection from an address (current and future) to some vehicles"""
+        with self.lock:
+            resolved = self.resolve_systems(systems)
+            if resolved is None:
+                self.host_subscriptions.pop(client_host, None)
+            else:
+                self.host_subscriptions[client_host] = resolved
+            for client in self.clients.values():
+                if client.host == client_host:
+                    client.systems = resolved
+        logger.info(f"GCS mux subscription for {client_host}: "
+                    f"{sorted(resolved) if resolved is not None else 'all vehicles'}")
+        return resolved
+    
+    def wanted(self):
+        """System ids at least one connected client is subscribed to (caller holds the lock)"""
+        if any(client.systems is None for client in self.clients.values()):
+            return set(self.vehicles)
+        wanted = set()
+        for client in self.clients.values():
+            wanted |= client.systems
+        return wanted & set(self.vehicles)
+    
+    def sync_links(self):
+        """Open links to wanted vehicles and close the ones nobody wants any more"""
+        now = time.monotonic()
+        with self.lock:
+            wanted = self.wanted()
+            for sysid in list(self.links):
+                if sysid not in wanted:
+                    self.close_link(sysid)
+            for sysid in wanted:
+                if sysid in self.links or now < self.next_attempt.get(sysid, 0):
+                    continue
+                self.next_attempt[sysid] = now + self.reconnect_interval
+                try:
+                    sock = socket.create_connection(('127.0.0.1', self.vehicles[sysid][1]), timeout=0.5)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    sock.setblocking(False)
+                except OSError:
+                    continue
+                self.links[sysid] = VehicleLink(sysid, sock)
+                self.selector.register(sock, selectors.EVENT_READ, self.links[sysid])
+    
+    def close_link(self, sysid):
+        """Close a vehicle link (caller holds the lock)"""
+        link = self.links.pop(sysid, None)
+        if link:
+            try:
+                self.selector.unregister(link.sock)
+            except (KeyError, ValueError):
+                pass
+            link.sock.close()
+    
+    def run(self):
+        """Selector loop"""
+        while True:
+            try:
+                self.sync_links()
+                self.maintain()
+                for key, events in self.selector.select(timeout=0.5):
+                    with self.lock:
+                        if key.data == "listener":
+                            self.accept()
+                        elif isinstance(key.data, MuxClient):
+                            if events & selectors.EVENT_WRITE:
+                                self.flush(key.data)
+                            if events & selectors.EVENT_READ:
+                                self.read_client(key.data)
+                        else:
+                            if events & selectors.EVENT_WRITE:
+                                self.flush_link(key.data)
+                            if events & selectors.EVENT_READ:
+                                self.read_vehicle(key.data)
+            except Exception as e:
+                logger.warning(f"⚠️ GCS mux loop error: {e}")
+                time.sleep(0.5)
+    
+    def maintain(self):
+        """Refresh client rates, expire unanswered timesyncs and send the periodic RTT probes"""
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_stats:
+                self.next_stats = now + self.stats_interval
+                for client in self.clients.values():
+                    client.update_rates(now)
+                    client.expire_timesync(now)
+            if self.timesync_interval and now >= self.next_probe:
+                self.next_probe = now + self.timesync_interval
+                for client in list(self.clients.values()):
+                    self.probe(client)
+    
+    def probe(self, client):
+        """Send a client a TIMESYNC request from the mux itself (caller holds the lock)"""
+        ts1 = time.time_ns()
+        while ts1 in client.timesync_pending:
+            ts1 += 1
+        client.expect_timesync(ts1, True)
+        self.probe_seq += 1
+        self.queue(client, encode_frame(TIMESYNC_MSG_ID, TIMESYNC_FORMAT.pack(0, ts1, client.gcs_sysid or 0, 0),
+                                        seq=self.probe_seq, sysid=MUX_SYSTEM_ID, compid=MUX_COMPONENT_ID))
+    
+    def accept(self):
+        """Accept a new GCS client"""
+        try:
+            sock, peer = self.listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = MuxClient(sock, f"{peer[0]}:{peer[1]}", self.host_subscriptions.get(peer[0]))
+        self.clients[sock] = client
+        self.selector.register(sock, selectors.EVENT_READ, client)
+        logger.info(f"GCS client {client.address} connected to the mux")
+    
+    def close_client(self, client, reason):
+        """Disconnect a client"""
+        self.clients.pop(client.sock, None)
+        try:
+            self.selector.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+        logger.info(f"GCS client {client.address} disconnected from the mux: {reason}")
+    
+    def read_handshake(self, client, data):
+        """Apply an optional SUB line sent before any MAVLink; returns the bytes after it (None = need more)"""
+        client.handshake += data
+        pending = bytes(client.handshake)
+        if pending.startswith(SUBSCRIBE_PREFIX):
+            end = pending.find(b"\n")
+            if end == -1:
+                if len(pending) <= MAX_SUBSCRIBE_LINE:
+                    return None
+                end = len(pending)
+            line = pending[len(SUBSCRIBE_PREFIX):end].decode('ascii', 'replace').strip()
+            try:
+                client.systems = self.resolve_systems(
+                    None if line.lower() == "all" else [part for part in line.split(",") if part.strip()])
+                logger.info(f"GCS client {client.address} subscribed to "
+                            f"{sorted(client.systems) if client.systems is not None else 'all vehicles'}")
+            except ValueError as e:
+                logger.warning(f"⚠️ Ignoring subscription from {client.address}: {e}")
+            pending = pending[end + 1:]
+        elif SUBSCRIBE_PREFIX.startswith(pending):
+            return None
+        client.handshake = None
+        return pending
+    
+    def read_client(self, client):
+        """Client -> vehicles: targeted messages to their vehicle, the rest to every subscribed vehicle"""
+        try:
+            data = client.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.close_client(client, "connection closed")
+            return
+        if client.handshake is not None:
+            data = self.read_handshake(client, data)
+            if not data:
+                return
+        
+        for frame in client.splitter.feed(data):
+            client.frames_in += 1
+            client.bytes_in += len(frame)
+            if client.gcs_sysid is None:
+                client.gcs_sysid = frame_header(frame)[1]
+            if frame_msgid(frame) == TIMESYNC_MSG_ID:
+                tc1, ts1 = TIMESYNC_FORMAT.unpack(padded_payload(frame, TIMESYNC_FORMAT.size))[:2]
+                # Answers to the mux's own probes stop here
+                if tc1 and client.answer_timesync(ts1):
+                    continue
+            target = frame_target_system(frame)
+            if target:
+                destinations = [target] if target in self.links and client.wants(target) else []
+            else:
+                destinations = [sysid for sysid in self.links if client.wants(sysid)]
+            if not destinations:
+                self.unrouted += 1
+            for sysid in destinations:
+                traffic = client.vehicle_traffic(sysid)
+                traffic["frames_to_vehicle"] += 1
+                traffic["rx_bytes"] += len(frame)
+                self.queue_link(self.links[sysid], frame)
+    
+    def queue_link(self, link, frame):
+        """Queue a client frame for a vehicle; a vehicle that stops reading loses its link"""
+        if len(link.outbox) + len(frame) > self.max_backlog:
+            logger.warning(f"⚠️ GCS mux dropped vehicle {link.sysid}: it stopped reading, backlog overflowed")
+            self.close_link(link.sysid)
+            return
+        link.outbox += frame
+        if len(link.outbox) == len(frame):
+            self.flush_link(link)
+    
+    def flush_link(self, link):
+        """Write as much of a vehicle's backlog as the socket takes"""
+        if self.links.get(link.sysid) is not link:
+            return
+        try:
+            sent = link.sock.send(link.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            logger.warning(f"⚠️ GCS mux lost vehicle {link.sysid}: {e}")
+            self.close_link(link.sysid)
+            return
+        del link.outbox[:sent]
+        if link.writing != bool(link.outbox):
+            link.writing = bool(link.outbox)
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if link.writing else 0)
+            self.selector.modify(link.sock, events, link)
+    
+    def read_vehicle(self, link):
+        """Vehicle -> clients: telemetry to the clients subscribed to this vehicle"""
+        sysid = link.sysid
+        if self.links.get(sysid) is not link:
+            return
+        try:
+            data = link.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.close_link(sysid)
+            return
+        
+        clients = [client for client in self.clients.values() if client.wants(sysid)]
+        for frame in link.splitter.feed(data):
+            if frame_header(frame)[1] != sysid and sysid not in self.sysid_mismatch:
+                self.sysid_mismatch.add(sysid)
+                logger.warning(f"⚠️ Vehicle {self.vehicles[sysid][0]} sends as system {frame_header(frame)[1]}, "
+                               f"expected {sysid} (MAV_SYS_ID not applied?)")
+            if frame_msgid(frame) == TIMESYNC_MSG_ID:
+                tc1, ts1 = TIMESYNC_FORMAT.unpack(padded_payload(frame, TIMESYNC_FORMAT.size))[:2]
+                if tc1 == 0:
+                    for client in clients:
+                        client.expect_timesync(ts1, False)
+            for client in clients:
+                self.queue(client, frame, sysid)
+    
+    def queue(self, client, frame, sysid=None):
+        """Queue a frame for a client (from vehicle sysid, None for the mux's own), dropping telemetry
+        while it is too far behind"""
+        traffic = client.vehicle_traffic(sysid) if sysid is not None else None
+        if len(client.outbox) + len(frame) > self.max_backlog:
+            if frame_msgid(frame) not in ESSENTIAL_MSG_IDS:
+                client.dropped += 1
+                if traffic:
+                    traffic["dropped"] += 1
+                return
+            if len(client.outbox) + len(frame) > 2 * self.max_backlog:
+                self.close_client(client, "client too slow, backlog overflowed")
+                return
+        
+        if not client.outbox:
+            client.outbox += frame
+            self.flush(client)
+        else:
+            client.outbox += frame
+        client.frames_out += 1
+        client.bytes_out += len(frame)
+        if traffic:
+            traffic["frames_to_client"] += 1
+            traffic["tx_bytes"] += len(frame)
+    
+    def flush(self, client):
+        """Write as much of a client's backlog as the socket takes"""
+        if client.sock not in self.clients:
+            return
+        try:
+            sent = client.sock.send(client.outbox)
+        except BlockingIOError:
+            sent = 0
+        except OSError as e:
+            self.close_client(client, f"send failed: {e}")
+            return
+        del client.outbox[:sent]
+        if client.writing != bool(client.outbox):
+            client.writing = bool(client.outbox)
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.writing else 0)
+            self.selector.modify(client.sock, events, client)
+    
+    def get_clients(self, sysid):
+        """Details of the connected clients subscribed to a vehicle, with their traffic with it"""
+        with self.lock:
+            return [client.get_status(sysid) for client in self.clients.values() if client.wants(sysid)]
+    
+    def local_addresses(self):
+        """Local "ip:port" of the vehicle links, to tell them apart from GCS clients on a vehicle's port"""
+        addresses = set()
+        with self.lock:
+            for link in self.links.values():
+                try:
+                    host, port = link.sock.getsockname()[:2]
+                    addresses.add(f"{host}:{port}")
+                except OSError:
+                    pass
+        return addresses
+    
+    def get_status(self):
+        """Listening port, vehicles and connected clients"""
+        with self.lock:
+            return {
+                "port": self.port,
+                "vehicles": {sysid: {"instance_id": instance_id, "linked": sysid in self.links}
+                             for sysid, (instance_id, _) in sorted(self.vehicles.items())},
+                "clients": [client.get_status() for client in self.clients.values()],
+                "subscriptions": {host: sorted(systems) for host, systems in self.host_subscriptions.items()},
+                "unrouted_frames": self.unrouted
+            }
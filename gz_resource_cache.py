@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Gazebo Resource Cache
+One local directory every Gazebo server and PX4 instance resolves models and
+worlds from. A cold Gazebo start otherwise searches several resource paths and,
+on a fresh host, downloads Fuel models referenced by the worlds, which makes
+the first boot slow and unpredictable.
+
+A warm-up pass at service start walks every model and world the configured
+airframes use, following model:// and Fuel URIs from their SDF files:
+  - PX4 tree (and GZ_SIM_RESOURCE_PATH) models and worlds are linked into
+    <cache>/models and <cache>/worlds
+  - Fuel models are downloaded once into <cache>/fuel (GZ_FUEL_CACHE_PATH), so
+    later starts never need the network
+The result is indexed in <cache>/index.json. GZ_SIM_RESOURCE_PATH then lists
+the cache first and the PX4 directories after it, for anything not indexed.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+import subprocess
+from urllib.parse import urlparse, unquote
+
+logger = logging.getLogger(__name__)
+
+URI_PATTERN = re.compile(r'<uri>\s*([^<]+?)\s*</uri>')
+FUEL_TIMEOUT = 300  # seconds per Fuel download
+RESOURCE_WARMUP_WAIT = 120  # longest a Gazebo start waits for the warm-up
+
+
+def sdf_references(sdf_file):
+    """(model names, Fuel URLs) referenced by an SDF file's <uri> elements"""
+    models, fuel = set(), set()
+    try:
+        with open(sdf_file, errors='replace') as f:
+            text = f.read()
+    except OSError:
+        return models, fuel
+    
+    for uri in URI_PATTERN.findall(text):
+        if uri.startswith("model://"):
+            models.add(uri[len("model://"):].split("/")[0])
+        elif uri.startswith(("http://", "https://")) and "/models/" in uri:
+            fuel.add(uri)
+    return models, fuel
+
+
+class GzResourceCache:
+    """Shared local directory of the Gazebo models and worlds the airframes use"""
+    
+    def __init__(self, cache_dir, px4_path):
+        self.cache_dir = cache_dir
+        self.px4_path = px4_path
+        self.models_dir = os.path.join(cache_dir, "models")
+        self.worlds_dir = os.path.join(cache_dir, "worlds")
+        self.fuel_dir = os.path.join(cache_dir, "fuel")
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.index = None
+        self.warmed = threading.Event()
+        self.warmed.set()  # nothing to wait for until a warm-up is started
+        self.lock = threading.Lock()
+    
+    def source_dirs(self, kind):
+        """Directories a model or world ("models"/"worlds") is looked up in, PX4 tree first"""
+        dirs = [os.path.join(self.px4_path, "Tools", "simulation", "gz", kind)]
+        for path in os.environ.get('GZ_SIM_RESOURCE_PATH', '').split(os.pathsep):
+            if path and os.path.realpath(path) != os.path.realpath(self.cache_dir) and path not in dirs:
+                dirs.append(path)
+        return dirs
+    
+    def find_model(self, name):
+        """Source directory of a model, or None"""
+        for directory in self.source_dirs("models"):
+            path = os.path.join(directory, name)
+            if os.path.isdir(path) and not path.startswith(self.models_dir):
+                return path
+        return None
+    
+    def find_world(self, name):
+        """Source SDF file of a world, or None"""
+        for directory in self.source_dirs("worlds"):
+            path = os.path.join(directory, f"{name}.sdf")
+            if os.path.isfile(path) and not path.startswith(self.worlds_dir):
+                return path
+        return None
+    
+    def fuel_path(self, url):
+        """Where Gazebo keeps a Fuel model in its cache: <host>/<owner>/models/<name>"""
+        parsed = urlparse(url)
+        parts = [unquote(part) for part in parsed.path.split("/") if part]
+        if "models" not in parts[:-1]:
+            return None
+        position = parts.index("models")
+        if position == 0:
+            return None
+        owner, name = parts[position - 1], parts[position + 1]
+        return os.path.join(self.fuel_dir, parsed.hostname or "", owner.lower(), "models", name.lower())
+    
+    def fetch_fuel(self, url):
+        """Download a Fuel model into the cache unless it is already there; True if it is cached"""
+        path = self.fuel_path(url)
+        if path and os.path.isdir(path) and os.listdir(path):
+            return True
+        
+        env = os.environ.copy()
+        env['GZ_FUEL_CACHE_PATH'] = self.fuel_dir
+        try:
+            result = subprocess.run(['gz', 'fuel', 'download', '-u', url], env=env,
+                                    capture_output=True, text=True, timeout=FUEL_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"⚠️ Could not download Fuel model {url}: {e}")
+            return False
+        if result.returncode != 0:
+            logger.warning(f"⚠️ Could not download Fuel model {url}: {result.stderr.strip()[-200:]}")
+            return False
+        return True
+    
+    def link(self, source, target):
+        """Point a cache entry at its source, replacing a stale link"""
+        if os.path.islink(target) and os.readlink(target) == source:
+            return
+        temp = f"{target}.tmp"
+        if os.path.lexists(temp):
+            os.remove(temp)
+        os.symlink(source, temp)
+        os.replace(temp, target)
+    
+    def warm_up(self, models, worlds):
+        """Resolve, link and index the given models and worlds and everything they reference;
+        returns the index"""
+        started = time.monotonic()
+        index = {"models": {}, "worlds": {}, "fuel": {}, "missing": []}
+        
+        with self.lock:
+            try:
+                for directory in (self.models_dir, self.worlds_dir, self.fuel_dir):
+                    os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                logger.error(f"❌ Gazebo resource cache unavailable at {self.cache_dir}: {e}")
+                self.warmed.set()
+                return None
+            
+            pending_models = list(models)
+            fuel_urls = set()
+            
+            for world in sorted(set(worlds)):
+                source = self.find_world(world)
+                if source is None:
+                    index["missing"].append(f"world {world}")
+                    continue
+                self.link(source, os.path.join(self.worlds_dir, f"{world}.sdf"))
+                index["worlds"][world] = source
+                referenced_models, referenced_fuel = sdf_references(source)
+                pending_models.extend(referenced_models)
+                fuel_urls |= referenced_fuel
+            
+            while pending_models:
+                model = pending_models.pop()
+                if model in index["models"] or f"model {model}" in index["missing"]:
+                    continue
+                source = self.find_model(model)
+                if source is None:
+                    index["missing"].append(f"model {model}")
+                    continue
+                self.link(source, os.path.join(self.models_dir, model))
+                index["models"][model] = source
+                for sdf_file in sorted(os.listdir(source)):
+                    if sdf_file.endswith(".sdf"):
+                        referenced_models, referenced_fuel = sdf_references(os.path.join(source, sdf_file))
+                        pending_models.extend(referenced_models)
+                        fuel_urls |= referenced_fuel
+            
+            for url in sorted(fuel_urls):
+                index["fuel"][url] = self.fetch_fuel(url)
+                if not index["fuel"][url]:
+                    index["missing"].append(f"fuel {url}")
+            
+            index["warmed_at"] = time.time()
+            index["duration_s"] = round(time.monotonic() - started, 2)
+            try:
+                temp_file = f"{self.index_file}.tmp"
+                with open(temp_file, 'w') as f:
+                    json.dump(index, f, indent=2)
+                os.replace(temp_file, self.index_file)
+            except OSError as e:
+                logger.warning(f"⚠️ Could not write the Gazebo resource index: {e}")
+            self.index = index
+        
+        self.warmed.set()
+        if index["missing"]:
+            logger.warning(f"⚠️ Gazebo resources not found: {', '.join(index['missing'])}")
+        logger.info(f"✅ Gazebo resource cache warmed in {index['duration_s']}s: {len(index['models'])} models, "
+                    f"{len(index['worlds'])} worlds, {sum(index['fuel'].values())} Fuel models")
+        return index
+    
+    def start_warm_up(self, models, worlds):
+        """Run the warm-up pass in a daemon thread"""
+        self.warmed.clear()
+        threading.Thread(target=self.warm_up, args=(models, worlds), name="gz-resource-warmup",
+                         daemon=True).start()
+    
+    def wait(self, timeout=None):
+        """Block until a running warm-up finished; False on timeout"""
+        return self.warmed.wait(timeout)
+    
+    def apply(self, env):
+        """Resolve resources from the cache first: GZ_SIM_RESOURCE_PATH and GZ_FUEL_CACHE_PATH"""
+        if self.index is None:
+            return env
+        paths = [self.models_dir, self.worlds_dir]
+        paths += [path for path in env.get('GZ_SIM_RESOURCE_PATH', '').split(os.pathsep) if path and path not in paths]
+        env['GZ_SIM_RESOURCE_PATH'] = os.pathsep.join(paths)
+        env['GZ_FUEL_CACHE_PATH'] = self.fuel_dir
+        return env
+    
+    def get_status(self):
+        """Cache directory and what the last warm-up found"""
+        index = self.index or {}
+        return {
+            "cache_dir": self.cache_dir,
+            "warmed": self.index is not None,
+            "warmed_at": index.get("warmed_at"),
+            "duration_s": index.get("duration_s"),
+            "models": len(index.get("models", {})),
+            "worlds": len(index.get("worlds", {})),
+            "fuel_models": sum(index.get("fuel", {}).values()),
+            "missing": index.get("missing", [])
+        }
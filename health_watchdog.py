@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Health Watchdog for SITL Instances
+Watches PX4/Gazebo process liveness and MAVLink heartbeat freshness, keeps
+instance status honest (running / degraded / failed) and optionally restarts
+failed instances with exponential backoff and a crash-loop limit
+"""
+
+import time
+import socket
+import logging
+import selectors
+import threading
+from collections import deque
+from datetime import datetime
+
+from mavlink_frames import FrameSplitter, frame_header
+from process_stats import group_pids
+
+logger = logging.getLogger(__name__)
+
+MSG_ID_HEARTBEAT = 0
+AUTOPILOT_COMPONENT_ID = 1
+
+
+class HeartbeatMonitor:
+    """One selector thread that listens for autopilot heartbeats on every instance's GCS port"""
+    
+    def __init__(self, reconnect_interval=2.0):
+        self.reconnect_interval = reconnect_interval
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.targets = {}  # instance_id -> tcp_port
+        self.connections = {}  # instance_id -> (socket, FrameSplitter)
+        self.next_attempt = {}  # instance_id -> monotonic time of next connect attempt
+        self.last_heartbeat = {}  # instance_id -> monotonic time
+        self.running = False
+    
+    def watch(self, instance_id, tcp_port):
+        """Start listening for an instance's heartbeats"""
+        with self.lock:
+            self.targets[instance_id] = tcp_port
+            self.next_attempt[instance_id] = 0
+            self.last_heartbeat.pop(instance_id, None)
+        if not self.running:
+            self.running = True
+            threading.Thread(target=self.run, daemon=True).start()
+    
+    def unwatch(self, instance_id):
+        """Stop listening for an instance"""
+        with self.lock:
+            self.targets.pop(instance_id, None)
+            self.next_attempt.pop(instance_id, None)
+            self.last_heartbeat.pop(instance_id, None)
+            self.disconnect(instance_id)
+    
+    def heartbeat_age(self, instance_id):
+        """Seconds since the last heartbeat, or None if none was seen yet"""
+        last = self.last_heartbeat.get(instance_id)
+        return None if last is None else time.monotonic() - last
+    
+    def local_addresses(self):
+        """Local "ip:port" of each monitor connection, to tell them apart from real GCS clients"""
+        addresses = set()
+        with self.lock:
+            for sock, _ in self.connections.values():
+                try:
+                    host, port = sock.getsockname()[:2]
+                    addresses.add(f"{host}:{port}")
+                except OSError:
+                    pass
+        return addresses
+    
+    def disconnect(self, instance_id):
+        """Close an instance's connection (caller holds the lock)"""
+        entry = self.connections.pop(instance_id, None)
+        if entry:
+            try:
+                self.selector.unregister(entry[0])
+            except (KeyError, ValueError):
+                pass
+            entry[0].close()
+    
+    def connect_pending(self):
+        """(Re)connect to instances that have no connection yet"""
+        now = time.monotonic()
+        with self.lock:
+            for instance_id, tcp_port in self.targets.items():
+                if instance_id in self.connections or now < self.next_attempt.get(instance_id, 0):
+                    continue
+                self.next_attempt[instance_id] = now + self.reconnect_interval
+                try:
+                    sock = socket.create_connection(('127.0.0.1', tcp_port), timeout=0.5)
+                    sock.setblocking(False)
+                except OSError:
+                    continue
+                self.connections[instance_id] = (sock, FrameSplitter())
+                self.selector.register(sock, selectors.EVENT_READ, instance_id)
+    
+    def run(self):
+        """Selector loop"""
+        while True:
+            self.connect_pending()
+            if not self.connections:
+                time.sleep(0.5)
+                continue
+            
+            for key, _ in self.selector.select(timeout=0.5):
+                instance_id = key.data
+                with self.lock:
+                    entry = self.connections.get(instance_id)
+                    if entry is None:
+                        continue
+                    try:
+                        data = entry[0].recv(65536)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        data = b''
+                    if not data:
+                        self.disconnect(instance_id)
+                        continue
+                    for frame in entry[1].feed(data):
+                        _, _, compid, msgid = frame_header(frame)
+                        if msgid == MSG_ID_HEARTBEAT and compid == AUTOPILOT_COMPONENT_ID:
+                            self.last_heartbeat[instance_id] = time.monotonic()
+
+
+class HealthWatchdog:
+    """Background supervisor that marks instances degraded/failed and restarts them"""
+    
+    def __init__(self, manager, interval=2.0, auto_restart=False, heartbeat_timeout=5.0,
+                 boot_grace=60.0, degraded_timeout=30.0, backoff_base=2.0, backoff_max=60.0,
+                 max_restarts=5, crash_loop_window=300.0):
+        self.manager = manager
+        self.interval = interval
+        self.auto_restart = auto_restart
+        self.heartbeat_timeout = heartbeat_timeout
+        self.boot_grace = boot_grace  # no heartbeat is expected this soon after start
+        self.degraded_timeout = degraded_timeout  # degraded this long counts as failed
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_restarts = max_restarts
+        self.crash_loop_window = crash_loop_window
+        self.heartbeats = HeartbeatMonitor()
+        self.degraded_since = {}  # instance_id -> monotonic time
+        self.pending_restarts = {}  # instance_id -> monotonic time the restart is due
+        self.restart_history = {}  # instance_id -> deque of restart times
+    
+    def start(self):
+        """Run the watchdog in a daemon thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        logger.info(f"Health watchdog started (auto restart: {self.auto_restart})")
+    
+    def run(self):
+        """Watchdog loop"""
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.warning(f"Health check failed: {e}")
+    
+    def instance_started(self, instance):
+        """Begin watching an instance that just started"""
+        self.degraded_since.pop(instance.instance_id, None)
+        self.heartbeats.watch(instance.instance_id, instance.tcp_port)
+    
+    def instance_stopped(self, instance_id):
+        """Stop watching an instance that was stopped on purpose"""
+        self.heartbeats.unwatch(instance_id)
+        self.degraded_since.pop(instance_id, None)
+        self.pending_restarts.pop(instance_id, None)
+    
+    def instance_paused(self, instance_id):
+        """A paused instance sends no heartbeats; don't hold that against it"""
+        self.degraded_since.pop(instance_id, None)
+    
+    def instance_resumed(self, instance):
+        """Give a resumed instance a fresh heartbeat deadline"""
+        self.degraded_since.pop(instance.instance_id, None)
+        self.heartbeats.last_heartbeat[instance.instance_id] = time.monotonic()
+    
+    def instance_removed(self, instance_id):
+        """Forget everything about a removed instance"""
+        self.instance_stopped(instance_id)
+        self.restart_history.pop(instance_id, None)
+    
+    def gazebo_alive(self, instance):
+        """True if the instance's Gazebo (dedicated or shared) is still running, or it has none (SIH)"""
+        if not instance.backend.uses_gazebo:
+            return True
+        if instance.world:
+            entry = self.manager.world_manager.worlds.get(instance.world)
+            return entry is not None and entry["process"].poll() is None
+        
+        # Dedicated Gazebo runs inside the PX4 process group; give it time to appear
+        uptime = (datetime.now() - instance.start_time).total_seconds() if instance.start_time else 0
+        if uptime < self.boot_grace:
+            return True
+        for pid in group_pids(instance.px4_process.pid):
+            try:
+                with open(f"/proc/{pid}/cmdline", 'rb') as f:
+                    cmdline = f.read().replace(b'\0', b' ')
+            except OSError:
+                continue
+            if b'gz sim' in cmdline or b'gz-sim' in cmdline or b'gzserver' in cmdline:
+                return True
+        return False
+    
+    def check_all(self):
+        """One pass over every instance"""
+        now = time.monotonic()
+        
+        for instance_id, due in list(self.pending_restarts.items()):
+            if now >= due:
+                self.pending_restarts.pop(instance_id)
+                threading.Thread(target=self.restart, args=(instance_id,), daemon=True).start()
+        
+        for instance_id, instance in list(self.manager.instances.items()):
+            if instance.status in ("running", "degraded"):
+                self.check_instance(instance, now)
+            elif instance.status == "paused" and (instance.px4_process is None or
+                                                   instance.px4_process.poll() is not None):
+                # Frozen processes can still be killed (e.g. by the OOM killer)
+                instance.thaw()
+                self.mark_failed(instance, instance.exit_reason())
+        
+        # A dead router shard only cuts off its own vehicles; bring it back
+        self.manager.router_manager.restart_dead_shards()
+    
+    def check_instance(self, instance, now):
+        """Update one instance's status from process liveness and heartbeat age"""
+        instance_id = instance.instance_id
+        
+        if instance.px4_process is None or instance.px4_process.poll() is not None:
+            self.mark_failed(instance, instance.exit_reason())
+            return
+        
+        if not self.gazebo_alive(instance):
+            self.mark_failed(instance, "Gazebo exited")
+            return
+        
+        age = self.heartbeats.heartbeat_age(instance_id)
+        uptime = (datetime.now() - instance.start_time).total_seconds() if instance.start_time else 0
+        stale = (age is None and uptime > self.boot_grace) or (age is not None and age > self.heartbeat_timeout)
+        
+        if not stale:
+            if instance.status == "degraded":
+                logger.info(f"✅ Instance {instance_id} heartbeat recovered")
+                instance.status = "running"
+            self.degraded_since.pop(instance_id, None)
+            return
+        
+        since = self.degraded_since.setdefault(instance_id, now)
+        if instance.status != "degraded":
+            reason = "no heartbeat received" if age is None else f"no heartbeat for {age:.0f}s"
+            logger.warning(f"⚠️ Instance {instance_id} degraded: {reason}")
+            instance.status = "degraded"
+            instance.last_failure_reason = reason
+            instance.last_failure_time = datetime.now()
+        elif now - since > self.degraded_timeout:
+            self.mark_failed(instance, f"no heartbeat for {self.degraded_timeout:.0f}s")
+    
+    def mark_failed(self, instance, reason):
+        """Mark an instance failed and schedule a restart if allowed"""
+        instance_id = instance.instance_id
+        logger.error(f"❌ Instance {instance_id} failed: {reason}")
+        
+        instance.status = "failed"
+        instance.last_failure_reason = reason
+        instance.last_failure_time = datetime.now()
+        self.heartbeats.unwatch(instance_id)
+        self.degraded_since.pop(instance_id, None)
+        
+        if not self.auto_restart:
+            return
+        
+        history = self.restart_history.setdefault(instance_id, deque())
+        now = time.monotonic()
+        while history and now - history[0] > self.crash_loop_window:
+            history.popleft()
+        
+        if len(history) >= self.max_restarts:
+            instance.crash_loop = True
+            logger.error(f"❌ Instance {instance_id} is crash-looping "
+                         f"({len(history)} restarts in {self.crash_loop_window:.0f}s), giving up")
+            return
+        
+        delay = min(self.backoff_base * (2 ** len(history)), self.backoff_max)
+        self.pending_restarts[instance_id] = now + delay
+        logger.info(f"Restarting instance {instance_id} in {delay:.0f}s")
+    
+    def restart(self, instance_id):
+        """Restart a failed instance (runs in its own thread)"""
+        instance = self.manager.instances.get(instance_id)
+        if instance is None or instance.status != "failed":
+            return
+        
+        self.restart_history.setdefault(instance_id, deque()).append(time.monotonic())
+        instance.restart_count += 1
+        
+        if self.manager.restart_instance(instance_id):
+            logger.info(f"✅ Instance {instance_id} restarted (restart #{instance.restart_count})")
+        else:
+            # start() already cleaned up; treat it like another crash
+            self.mark_failed(instance, "restart failed")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Idempotent, Coalesced Lifecycle Operations
+Booting an instance takes a full PX4/Gazebo start-up, so a double click or a
+retrying client must not run it twice. Identical operations that overlap run
+once and every caller gets the same result; results of requests carrying an
+Idempotency-Key are remembered so a retry replays them instead of creating
+another instance.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused for a different request"""
+    pass
+
+
+class Operation:
+    """One in-flight operation that identical requests attach to"""
+    
+    def __init__(self, key, fingerprint=None):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.attached = 0
+
+
+class OperationCoalescer:
+    """Runs identical operations once and shares the result; remembers Idempotency-Key results"""
+    
+    def __init__(self, key_ttl=24 * 3600, max_keys=10000):
+        self.lock = threading.Lock()
+        self.inflight = {}  # operation key -> Operation
+        self.results = OrderedDict()  # idempotency key -> (fingerprint, result, finished_at)
+        self.key_ttl = key_ttl
+        self.max_keys = max_keys
+        self.coalesced = 0
+        self.replayed = 0
+    
+    def run(self, key, fn, fingerprint=None):
+        """Run fn() unless the same operation is already running, in which case wait for its result"""
+        with self.lock:
+            operation = self.inflight.get(key)
+            owner = operation is None
+            if owner:
+                operation = Operation(key, fingerprint)
+                self.inflight[key] = operation
+            elif operation.fingerprint != fingerprint:
+                raise IdempotencyConflict(f"Idempotency-Key {key[1]} is in use by a different request")
+            else:
+                operation.attached += 1
+                self.coalesced += 1
+        
+        if not owner:
+            logger.info(f"Attaching to in-flight {key[0]} of {key[1]}")
+            operation.done.wait()
+        else:
+            try:
+                operation.result = fn()
+            except Exception as e:
+                operation.error = e
+            finally:
+                with self.lock:
+                    self.inflight.pop(key, None)
+                operation.done.set()
+        
+        if operation.error is not None:
+            raise operation.error
+        return operation.result
+    
+    def expire(self):
+        """Forget keys past their TTL (caller holds the lock)"""
+        cutoff = time.time() - self.key_ttl
+        while self.results and next(iter(self.results.values()))[2] < cutoff:
+            self.results.popitem(last=False)
+    
+    def in_progress(self, key):
+        """True if the operation is currently running"""
+        with self.lock:
+            return key in self.inflight
+    
+    def known(self, idempotency_key):
+        """True if a request with this key finished successfully or is still running"""
+        with self.lock:
+            self.expire()
+            return idempotency_key in self.results or ("request", idempotency_key) in self.inflight
+    
+    def forget(self, result):
+        """Drop remembered keys whose result was `result` (e.g. an instance since removed), so their
+        retries run again as new requests"""
+        with self.lock:
+            stale = [key for key, entry in self.results.items() if entry[1] == result]
+            for key in stale:
+                del self.results[key]
+        return len(stale)
+    
+    def run_idempotent(self, idempotency_key, fingerprint, fn):
+        """run() keyed by a client's Idempotency-Key; a repeat within the TTL replays the first success"""
+        def attempt():
+            with self.lock:
+                self.expire()
+                entry = self.results.get(idempotency_key)
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    raise IdempotencyConflict(f"Idempotency-Key {idempotency_key} was used for a different request")
+                self.replayed += 1
+                logger.info(f"Replaying result of Idempotency-Key {idempotency_key}")
+                return entry[1]
+            
+            result = fn()
+            
+            # Stored before the operation leaves the in-flight table, so no retry can slip in between.
+            # Failures aren't remembered, so the client can simply retry them.
+            if result:
+                with self.lock:
+                    self.results[idempotency_key] = (fingerprint, result, time.time())
+                    while len(self.results) > self.max_keys:
+                        self.results.popitem(last=False)
+            return result
+        
+        return self.run(("request", idempotency_key), attempt, fingerprint)
+    
+    def get_stats(self):
+        """Counters for the metrics endpoint"""
+        with self.lock:
+            return {
+                "in_flight": [f"{kind} {target}" for kind, target in self.inflight],
+                "coalesced": self.coalesced,
+                "replayed": self.replayed,
+                "remembered_keys": len(self.results)
+            }
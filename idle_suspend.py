@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Idle Auto-Suspend for SITL Instances
+Pauses instances that no GCS client has talked to for a while and resumes them
+as soon as a client connects again. The MAVLink router keeps running while an
+instance is paused, so a client can still connect; that connection is what
+wakes the vehicle. Lockstep simulation keeps sim time frozen in between, so
+the vehicle continues exactly where it stopped. Vehicles in a shared Gazebo
+world are never paused: the world keeps running for the other vehicles, so the
+model would keep simulating without its controller.
+
+Traffic means bytes received from GCS clients (a connected QGroundControl
+sends a heartbeat every second); telemetry the vehicle sends doesn't count.
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class IdleSuspender:
+    """Background policy that pauses idle instances and wakes them on a client connection"""
+    
+    def __init__(self, manager, idle_timeout=600.0, sample_interval=15.0, wake_interval=1.0):
+        self.manager = manager
+        self.idle_timeout = idle_timeout  # seconds without GCS traffic before pausing
+        self.sample_interval = sample_interval  # how often running instances are checked for traffic
+        self.wake_interval = wake_interval  # how often paused instances are checked for new clients
+        self.last_activity = {}  # instance_id -> monotonic time of the last GCS traffic
+        self.last_rx = {}  # instance_id -> (received byte total, set of client peers)
+        self.next_sample = 0.0
+        self.suspended = 0
+        self.woken = 0
+    
+    def start(self):
+        """Run the policy in a daemon thread"""
+        threading.Thread(target=self.run, daemon=True).start()
+        logger.info(f"Idle auto-suspend started (after {self.idle_timeout:.0f}s without GCS traffic)")
+    
+    def run(self):
+        """Policy loop"""
+        while True:
+            time.sleep(self.wake_interval)
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.warning(f"Idle check failed: {e}")
+    
+    def clients(self, instance_id):
+        """(received bytes total, connected client peers) of an instance's GCS port"""
+        report = self.manager.get_bandwidth(instance_id) or {}
+        return report.get("total_rx_bytes", 0), set(report.get("clients", {}))
+    
+    def check_all(self):
+        """Wake paused instances with a client; every sample_interval, pause idle running ones"""
+        now = time.monotonic()
+        sample = now >= self.next_sample
+        if sample:
+            self.next_sample = now + self.sample_interval
+        
+        for instance_id, instance in list(self.manager.instances.items()):
+            if instance.status == "paused":
+                if instance.pause_reason == "idle" and self.client_arrived(instance_id):
+                    logger.info(f"GCS client active on idle instance {instance_id}, resuming")
+                    if self.manager.resume_instance(instance_id):
+                        self.woken += 1
+            elif instance.status == "running" and sample and not instance.world:
+                self.check_instance(instance_id, now)
+            elif instance.status not in ("running", "degraded"):
+                self.forget(instance_id)
+    
+    def client_arrived(self, instance_id):
+        """True if a client connected or sent something since the instance was paused"""
+        rx_bytes, peers = self.clients(instance_id)
+        previous = self.last_rx.get(instance_id)
+        # A client that stayed connected without talking doesn't wake the vehicle again
+        return previous is None or rx_bytes > previous[0] or bool(peers - previous[1])
+    
+    def check_instance(self, instance_id, now):
+        """Record traffic on a running instance, pausing it once idle for too long"""
+        rx_bytes, peers = self.clients(instance_id)
+        previous = self.last_rx.get(instance_id)
+        self.last_rx[instance_id] = (rx_bytes, peers)
+        
+        if previous is None:
+            self.last_activity.setdefault(instance_id, now)
+            return
+        if rx_bytes > previous[0] or peers - previous[1]:
+            self.last_activity[instance_id] = now
+            return
+        
+        idle_for = now - self.last_activity.get(instance_id, now)
+        if idle_for >= self.idle_timeout:
+            logger.info(f"Instance {instance_id} idle for {idle_for:.0f}s, pausing")
+            if self.manager.pause_instance(instance_id, reason="idle"):
+                self.suspended += 1
+    
+    def activity(self, instance_id, now):
+        """Treat the instance as just used"""
+        self.last_activity[instance_id] = now
+        self.last_rx.pop(instance_id, None)
+    
+    def forget(self, instance_id):
+        """Drop state for an instance that isn't running"""
+        self.last_activity.pop(instance_id, None)
+        self.last_rx.pop(instance_id, None)
+    
+    def get_stats(self):
+        """Policy settings and counters"""
+        return {
+            "idle_timeout_s": self.idle_timeout,
+            "suspended": self.suspended,
+            "woken": self.woken
+        }
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Lite Gazebo Worlds
+Reduced copies of PX4's Gazebo worlds for high-density headless runs. A lite
+world drops the systems that only matter for rendering or a GUI:
+  - Sensors renders camera, depth camera and GPU lidar sensors on an
+    ogre2 scene every step. IMU, air pressure, magnetometer and NavSat have
+    their own systems and keep working.
+  - SceneBroadcaster publishes the scene graph for GUI clients, and headless
+    runs have none.
+The physics step can also be coarsened for airframes where that is safe (slow
+ground vehicles); the update rate follows so the real time factor is kept.
+
+The copy keeps the world's name, so PX4 finds its topics unchanged. PX4 is
+pointed at it with PX4_GZ_WORLDS instead. Copies are cached per source world
+and physics step, and rebuilt when the source changes.
+"""
+
+import os
+import logging
+import threading
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+SIM_PROFILES = ("default", "lite")
+
+# World systems that only serve rendering sensors or a GUI
+RENDERING_SYSTEMS = ("gz::sim::systems::Sensors", "gz::sim::systems::SceneBroadcaster")
+RENDERING_SYSTEM_FILES = ("sensors-system", "scene-broadcaster-system")
+
+
+def is_rendering_system(plugin):
+    """True if a world <plugin> is one of the systems a lite world drops"""
+    name = plugin.get("name", "")
+    filename = plugin.get("filename", "")
+    return name in RENDERING_SYSTEMS or any(part in filename for part in RENDERING_SYSTEM_FILES)
+
+
+class LiteWorldBuilder:
+    """Writes and caches lite variants of Gazebo world files"""
+    
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+    
+    def variant_dir(self, max_step_size=None):
+        """Directory holding the lite worlds for one physics step (PX4_GZ_WORLDS)"""
+        name = f"step-{max_step_size:g}" if max_step_size else "step-default"
+        return os.path.join(self.cache_dir, name)
+    
+    def build(self, world_file, max_step_size=None):
+        """Write (or reuse) the lite copy of a world; returns the directory to use as PX4_GZ_WORLDS"""
+        output_dir = self.variant_dir(max_step_size)
+        output_file = os.path.join(output_dir, os.path.basename(world_file))
+        
+        with self.lock:
+            try:
+                if os.stat(output_file).st_mtime >= os.stat(world_file).st_mtime:
+                    return output_dir
+            except OSError:
+                pass
+            
+            tree = ET.parse(world_file)
+            world = tree.getroot().find("world")
+            if world is None:
+                raise ValueError(f"No <world> in {world_file}")
+            
+            dropped = [plugin.get("name") or plugin.get("filename") for plugin in world.findall("plugin")
+                       if is_rendering_system(plugin)]
+            for plugin in world.findall("plugin"):
+                if is_rendering_system(plugin):
+                    world.remove(plugin)
+            gui = world.find("gui")
+            if gui is not None:
+                world.remove(gui)
+            
+            if max_step_size:
+                for physics in world.findall("physics"):
+                    step = physics.find("max_step_size")
+                    if step is None:
+                        step = ET.SubElement(physics, "max_step_size")
+                    step.text = f"{max_step_size:g}"
+                    rate = physics.find("real_time_update_rate")
+                    if rate is not None:
+                        rate.text = f"{1.0 / max_step_size:g}"
+            
+            os.makedirs(output_dir, exist_ok=True)
+            temp_file = f"{output_file}.tmp"
+            tree.write(temp_file, xml_declaration=True, encoding="utf-8")
+            os.replace(temp_file, output_file)
+        
+        logger.info(f"Wrote lite world {output_file} (dropped {', '.join(dropped) or 'nothing'}"
+                    f"{f', physics step {max_step_size:g} s' if max_step_size else ''})")
+        return output_dir
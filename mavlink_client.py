@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Minimal MAVLink Client
+A short-lived GCS-side connection to an instance's MAVLink TCP port that sends
+encoded messages and hands back the autopilot's frames. Protocol helpers
+(parameters, missions, commands) build on it.
+"""
+
+import time
+import socket
+import struct
+import logging
+
+from mavlink_frames import FrameSplitter, frame_header, padded_payload, encode_frame
+
+logger = logging.getLogger(__name__)
+
+MSG_ID_COMMAND_LONG = 76
+MSG_ID_COMMAND_ACK = 77
+MSG_ID_SERIAL_CONTROL = 126
+
+AUTOPILOT_COMPONENT_ID = 1
+
+COMMAND_LONG_FORMAT = struct.Struct('<7fHBBB')  # params 1-7, command, target system/component, confirmation
+COMMAND_ACK_FORMAT = struct.Struct('<HB')  # command, result
+MAV_RESULT_ACCEPTED = 0
+MAV_RESULT_IN_PROGRESS = 5
+
+# NSH over MAVLink, as used by PX4's Tools/mavlink_shell.py
+SERIAL_CONTROL_FORMAT = struct.Struct('<IHBBB70sBB')  # baudrate, timeout, device, flags, count, data, target
+SERIAL_CONTROL_DEV_SHELL = 10
+SERIAL_CONTROL_FLAG_RESPOND = 2
+SERIAL_CONTROL_FLAG_EXCLUSIVE = 4
+SHELL_PROMPT = b'nsh> '
+
+# Missions and the flight state they are checked against
+MSG_ID_HEARTBEAT = 0
+MSG_ID_GLOBAL_POSITION_INT = 33
+MSG_ID_MISSION_REQUEST = 40
+MSG_ID_MISSION_COUNT = 44
+MSG_ID_MISSION_CLEAR_ALL = 45
+MSG_ID_MISSION_ITEM_REACHED = 46
+MSG_ID_MISSION_ACK = 47
+MSG_ID_MISSION_REQUEST_INT = 51
+MSG_ID_MISSION_ITEM_INT = 73
+MSG_ID_EXTENDED_SYS_STATE = 245
+MSG_ID_STATUSTEXT = 253
+
+HEARTBEAT_FORMAT = struct.Struct('<IBBBBB')  # custom_mode, type, autopilot, base_mode, system_status, version
+GLOBAL_POSITION_INT_FORMAT = struct.Struct('<IiiiihhhH')  # time, lat, lon, alt, relative_alt, vx, vy, vz, hdg
+MISSION_REQUEST_FORMAT = struct.Struct('<HBB')  # seq, target system/component (also MISSION_REQUEST_INT)
+MISSION_COUNT_FORMAT = struct.Struct('<HBBB')  # count, target system/component, mission_type
+MISSION_ITEM_REACHED_FORMAT = struct.Struct('<H')
+MISSION_ACK_FORMAT = struct.Struct('<BBB')  # target system/component, result
+MISSION_ITEM_INT_FORMAT = struct.Struct('<4fiifHHBBBBBB')
+EXTENDED_SYS_STATE_FORMAT = struct.Struct('<BB')  # vtol_state, landed_state
+STATUSTEXT_FORMAT = struct.Struct('<B50s')
+
+MAV_CMD_COMPONENT_ARM_DISARM = 400
+MAV_CMD_MISSION_START = 300
+MAV_MODE_FLAG_SAFETY_ARMED = 0x80
+MAV_LANDED_STATE_ON_GROUND = 1
+MAV_MISSION_ACCEPTED = 0
+MAV_FRAME_MISSION = 2
+
+
+class MAVLinkClient:
+    """GCS-side MAVLink connection that only listens to the autopilot component"""
+    
+    def __init__(self, tcp_port, host='127.0.0.1', sysid=255, compid=190, timeout=10.0):
+        self.address = (host, tcp_port)
+        self.sysid = sysid
+        self.compid = compid
+        self.timeout = timeout
+        self.sock = None
+        self.splitter = FrameSplitter()
+        self.seq = 0
+        self.target_system = None
+    
+    def __enter__(self):
+        self.sock = socket.create_connection(self.address, timeout=5)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self
+    
+    def __exit__(self, *exc):
+        self.sock.close()
+    
+    def send(self, msgid, payload):
+        """Send one message from our GCS identity"""
+        self.sock.sendall(encode_frame(msgid, payload, self.seq, self.sysid, self.compid))
+        self.seq = (self.seq + 1) & 0xFF
+    
+    def send_many(self, messages):
+        """Send several messages in one write"""
+        frames = []
+        for msgid, payload in messages:
+            frames.append(encode_frame(msgid, payload, self.seq, self.sysid, self.compid))
+            self.seq = (self.seq + 1) & 0xFF
+        self.sock.sendall(b''.join(frames))
+    
+    def receive(self, wait):
+        """Autopilot frames received within `wait` seconds, as (header, frame) pairs"""
+        self.sock.settimeout(max(wait, 0.001))
+        try:
+            data = self.sock.recv(65536)
+        except socket.timeout:
+            return []
+        if not data:
+            raise ConnectionError("vehicle link closed")
+        
+        frames = []
+        for frame in self.splitter.feed(data):
+            header = frame_header(frame)
+            if header[2] != AUTOPILOT_COMPONENT_ID:
+                continue
+            if self.target_system is None:
+                self.target_system = header[1]
+            if header[1] == self.target_system:
+                self.observe(header, frame)
+                frames.append((header, frame))
+        return frames
+    
+    def observe(self, header, frame):
+        """Called for every autopilot frame received; subclasses track vehicle state here"""
+        pass
+    
+    def messages(self, wait, formats):
+        """Decoded messages received within `wait` seconds, as (msgid, fields) for msgids in `formats`"""
+        decoded = []
+        for header, frame in self.receive(wait):
+            fmt = formats.get(header[3])
+            if fmt is not None:
+                decoded.append((header[3], fmt.unpack(padded_payload(frame, fmt.size))))
+        return decoded
+    
+    def wait_for_target(self):
+        """Learn the autopilot's system id from its first message"""
+        deadline = time.monotonic() + self.timeout
+        while self.target_system is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError("no message from the autopilot")
+            self.receive(deadline - time.monotonic())
+    
+    def command(self, command, params=(), timeout=3.0):
+        """Send a COMMAND_LONG and return the MAV_RESULT of its ack (None on timeout)"""
+        self.wait_for_target()
+        values = (list(params) + [0.0] * 7)[:7]
+        self.send(MSG_ID_COMMAND_LONG, COMMAND_LONG_FORMAT.pack(
+            *values, command, self.target_system, AUTOPILOT_COMPONENT_ID, 0))
+        
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for _, (acked_command, result) in self.messages(deadline - time.monotonic(),
+                                                             {MSG_ID_COMMAND_ACK: COMMAND_ACK_FORMAT}):
+                if acked_command == command and result != MAV_RESULT_IN_PROGRESS:
+                    return result
+        return None
+    
+    def shell_write(self, data):
+        """Send bytes to the vehicle's NSH shell (empty data just polls for output)"""
+        flags = SERIAL_CONTROL_FLAG_RESPOND | SERIAL_CONTROL_FLAG_EXCLUSIVE
+        chunks = [data[i:i + 70] for i in range(0, len(data), 70)] or [b'']
+        self.send_many((MSG_ID_SERIAL_CONTROL,
+                        SERIAL_CONTROL_FORMAT.pack(0, 0, SERIAL_CONTROL_DEV_SHELL, flags, len(chunk), chunk,
+                                                   self.target_system, AUTOPILOT_COMPONENT_ID))
+                       for chunk in chunks)
+    
+    def shell(self, commands, timeout=5.0):
+        """Run NSH commands (one per line) and return their output once every prompt came back"""
+        self.wait_for_target()
+        lines = [line for line in commands.splitlines() if line.strip()]
+        self.shell_write(''.join(f"{line}\n" for line in lines).encode())
+        
+        output = b''
+        deadline = time.monotonic() + timeout
+        last_poll = time.monotonic()
+        while output.count(SHELL_PROMPT) < len(lines):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"shell command timed out: {lines[output.count(SHELL_PROMPT)]}")
+            if time.monotonic() - last_poll > 0.2:
+                self.shell_write(b'')
+                last_poll = time.monotonic()
+            for _, fields in self.messages(0.1, {MSG_ID_SERIAL_CONTROL: SERIAL_CONTROL_FORMAT}):
+                if fields[2] == SERIAL_CONTROL_DEV_SHELL:
+                    output += fields[5][:fields[4]]
+        return output.decode(errors='replace')
+
+
+class MissionItem:
+    """One mission item in MISSION_ITEM_INT terms"""
+    
+    def __init__(self, command, frame, params, autocontinue=True):
+        self.command = command
+        self.frame = frame
+        self.params = [0.0 if value is None else float(value) for value in (list(params) + [0.0] * 7)[:7]]
+        self.autocontinue = autocontinue
+    
+    def encode(self, seq, target_system, target_component):
+        """MISSION_ITEM_INT payload; x/y are degrees * 1e7 except in MAV_FRAME_MISSION"""
+        scale = 1 if self.frame == MAV_FRAME_MISSION else 1e7
+        x, y = (int(round(value * scale)) for value in self.params[4:6])
+        return MISSION_ITEM_INT_FORMAT.pack(*self.params[:4], x, y, self.params[6], seq, self.command,
+                                            target_system, target_component, self.frame, 0,
+                                            1 if self.autocontinue else 0, 0)
+
+
+class MissionClient(MAVLinkClient):
+    """Mission upload, arming and flight monitoring over an instance's GCS port"""
+    
+    FORMATS = {
+        MSG_ID_HEARTBEAT: HEARTBEAT_FORMAT,
+        MSG_ID_GLOBAL_POSITION_INT: GLOBAL_POSITION_INT_FORMAT,
+        MSG_ID_MISSION_REQUEST: MISSION_REQUEST_FORMAT,
+        MSG_ID_MISSION_REQUEST_INT: MISSION_REQUEST_FORMAT,
+        MSG_ID_MISSION_ITEM_REACHED: MISSION_ITEM_REACHED_FORMAT,
+        MSG_ID_MISSION_ACK: MISSION_ACK_FORMAT,
+        MSG_ID_EXTENDED_SYS_STATE: EXTENDED_SYS_STATE_FORMAT,
+        MSG_ID_STATUSTEXT: STATUSTEXT_FORMAT
+    }
+    
+    def __init__(self, tcp_port, **kwargs):
+        super().__init__(tcp_port, **kwargs)
+        self.armed = False
+        self.landed = None
+        self.position = None  # (lat, lon, relative_alt_m)
+        self.reached = set()
+        self.statustext = []
+    
+    def observe(self, header, frame):
+        """Track armed/landed state, position, reached items and status text"""
+        msgid = header[3]
+        fmt = self.FORMATS.get(msgid)
+        if fmt is not None:
+            fields = fmt.unpack(padded_payload(frame, fmt.size))
+            if msgid == MSG_ID_HEARTBEAT:
+                self.armed = bool(fields[3] & MAV_MODE_FLAG_SAFETY_ARMED)
+            elif msgid == MSG_ID_GLOBAL_POSITION_INT:
+                self.position = (fields[1] / 1e7, fields[2] / 1e7, fields[4] / 1000.0)
+            elif msgid == MSG_ID_MISSION_ITEM_REACHED:
+                self.reached.add(fields[0])
+            elif msgid == MSG_ID_EXTENDED_SYS_STATE:
+                self.landed = fields[1] == MAV_LANDED_STATE_ON_GROUND
+            elif msgid == MSG_ID_STATUSTEXT:
+                self.statustext.append(fields[1].rstrip(b'\x00').decode(errors='replace'))
+    
+    def poll(self, wait):
+        """Receive for up to `wait` seconds; returns the decoded messages"""
+        return self.messages(wait, self.FORMATS)
+    
+    def wait_ready(self, timeout):
+        """Wait for a position fix (the estimator is up)"""
+        deadline = time.monotonic() + timeout
+        while self.position is None or (self.position[0] == 0 and self.position[1] == 0):
+            if time.monotonic() > deadline:
+                raise TimeoutError("vehicle has no position estimate")
+            self.poll(0.5)
+    
+    def upload(self, items, timeout=10.0):
+        """Upload a mission with the MISSION_COUNT / MISSION_REQUEST_INT handshake"""
+        self.wait_for_target()
+        count = MISSION_COUNT_FORMAT.pack(len(items), self.target_system, AUTOPILOT_COMPONENT_ID, 0)
+        self.send(MSG_ID_MISSION_COUNT, count)
+        
+        deadline = time.monotonic() + timeout
+        last_request = time.monotonic()
+        while time.monotonic() < deadline:
+            if time.monotonic() - last_request > 1.5:
+                # No request yet or a lost item: start the handshake over
+                self.send(MSG_ID_MISSION_COUNT, count)
+                last_request = time.monotonic()
+            
+            for msgid, fields in self.poll(0.2):
+                if msgid in (MSG_ID_MISSION_REQUEST, MSG_ID_MISSION_REQUEST_INT) and fields[0] < len(items):
+                    self.send(MSG_ID_MISSION_ITEM_INT,
+                              items[fields[0]].encode(fields[0], self.target_system, AUTOPILOT_COMPONENT_ID))
+                    last_request = time.monotonic()
+                elif msgid == MSG_ID_MISSION_ACK:
+                    if fields[2] != MAV_MISSION_ACCEPTED:
+                        raise Exception(f"mission rejected (MAV_MISSION_RESULT {fields[2]})")
+                    return
+        raise TimeoutError("mission upload timed out")
+    
+    def arm(self, timeout):
+        """Arm, retrying while the vehicle still refuses (e.g. preflight checks pending)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.command(MAV_CMD_COMPONENT_ARM_DISARM, [1]) == MAV_RESULT_ACCEPTED:
+                return
+            self.poll(1.0)
+        raise TimeoutError("vehicle refused to arm")
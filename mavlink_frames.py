@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+MAVLink Frame Helpers
+Splits raw byte streams into MAVLink v1/v2 frames and reads their headers,
+without decoding payloads (no pymavlink needed)
+"""
+
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+STX_V1 = 0xFE
+STX_V2 = 0xFD
+HEADER_LEN_V1 = 6
+HEADER_LEN_V2 = 10
+CHECKSUM_LEN = 2
+SIGNATURE_LEN = 13
+INCOMPAT_FLAG_SIGNED = 0x01
+MAX_FRAME_LEN = HEADER_LEN_V2 + 255 + CHECKSUM_LEN + SIGNATURE_LEN
+
+# CRC_EXTRA seeds (from the message definitions) of the messages this package sends
+CRC_EXTRA = {
+    0: 50,     # HEARTBEAT
+    20: 214,   # PARAM_REQUEST_READ
+    21: 159,   # PARAM_REQUEST_LIST
+    22: 220,   # PARAM_VALUE
+    23: 168,   # PARAM_SET
+    30: 39,    # ATTITUDE
+    33: 104,   # GLOBAL_POSITION_INT
+    40: 230,   # MISSION_REQUEST
+    44: 221,   # MISSION_COUNT
+    45: 232,   # MISSION_CLEAR_ALL
+    46: 11,    # MISSION_ITEM_REACHED
+    47: 153,   # MISSION_ACK
+    51: 196,   # MISSION_REQUEST_INT
+    73: 38,    # MISSION_ITEM_INT
+    76: 152,   # COMMAND_LONG
+    77: 143,   # COMMAND_ACK
+    111: 34,   # TIMESYNC
+    126: 220,  # SERIAL_CONTROL
+    245: 130,  # EXTENDED_SYS_STATE
+    253: 83,   # STATUSTEXT
+}
+
+# Request/response and state messages that must never be thinned out,
+# otherwise parameter, mission and command protocols stall
+ESSENTIAL_MSG_IDS = frozenset([
+    0,    # HEARTBEAT
+    22,   # PARAM_VALUE
+    39,   # MISSION_ITEM
+    40,   # MISSION_REQUEST
+    44,   # MISSION_COUNT
+    45,   # MISSION_CLEAR_ALL
+    46,   # MISSION_ITEM_REACHED
+    47,   # MISSION_ACK
+    51,   # MISSION_REQUEST_INT
+    73,   # MISSION_ITEM_INT
+    77,   # COMMAND_ACK
+    110,  # FILE_TRANSFER_PROTOCOL
+    111,  # TIMESYNC
+    118,  # LOG_ENTRY
+    120,  # LOG_DATA
+    126,  # SERIAL_CONTROL
+    148,  # AUTOPILOT_VERSION
+    253,  # STATUSTEXT
+    300,  # PROTOCOL_VERSION
+    322,  # PARAM_EXT_VALUE
+    324,  # PARAM_EXT_ACK
+])
+
+# Payload offset of target_system in the targeted messages a GCS commonly sends
+TARGET_SYSTEM_OFFSETS = {
+    11: 4,     # SET_MODE
+    20: 2,     # PARAM_REQUEST_READ
+    21: 0,     # PARAM_REQUEST_LIST
+    23: 4,     # PARAM_SET
+    40: 2,     # MISSION_REQUEST
+    41: 2,     # MISSION_SET_CURRENT
+    43: 0,     # MISSION_REQUEST_LIST
+    44: 2,     # MISSION_COUNT
+    45: 0,     # MISSION_CLEAR_ALL
+    47: 0,     # MISSION_ACK
+    51: 2,     # MISSION_REQUEST_INT
+    69: 8,     # MANUAL_CONTROL
+    73: 32,    # MISSION_ITEM_INT
+    75: 30,    # COMMAND_INT
+    76: 30,    # COMMAND_LONG
+    84: 50,    # SET_POSITION_TARGET_LOCAL_NED
+    110: 1,    # FILE_TRANSFER_PROTOCOL
+    111: 16,   # TIMESYNC (extension field, answers to a vehicle's request)
+    117: 4,    # LOG_REQUEST_LIST
+    119: 10,   # LOG_REQUEST_DATA
+    126: 79,   # SERIAL_CONTROL
+}
+
+
+def frame_length(buffer, offset=0):
+    """Total length of the frame starting at offset, or None if the header is incomplete"""
+    available = len(buffer) - offset
+    if available < 2:
+        return None
+    
+    stx = buffer[offset]
+    payload_len = buffer[offset + 1]
+    if stx == STX_V1:
+        return HEADER_LEN_V1 + payload_len + CHECKSUM_LEN
+    if stx == STX_V2:
+        if available < 3:
+            return None
+        signed = buffer[offset + 2] & INCOMPAT_FLAG_SIGNED
+        return HEADER_LEN_V2 + payload_len + CHECKSUM_LEN + (SIGNATURE_LEN if signed else 0)
+    raise ValueError(f"No MAVLink start byte at offset {offset}")
+
+
+def frame_header(frame):
+    """Return (seq, sysid, compid, msgid) of a complete frame"""
+    if frame[0] == STX_V2:
+        return frame[4], frame[5], frame[6], frame[7] | (frame[8] << 8) | (frame[9] << 16)
+    return frame[2], frame[3], frame[4], frame[5]
+
+
+def frame_msgid(frame):
+    """Message id of a complete frame"""
+    return frame_header(frame)[3]
+
+
+def frame_payload(frame):
+    """Payload bytes of a complete frame (MAVLink 2 payloads may be truncated)"""
+    header_len = HEADER_LEN_V2 if frame[0] == STX_V2 else HEADER_LEN_V1
+    return frame[header_len:header_len + frame[1]]
+
+
+def frame_target_system(frame):
+    """target_system of a targeted message, 0 for broadcast or messages without a target"""
+    offset = TARGET_SYSTEM_OFFSETS.get(frame_msgid(frame))
+    payload = frame_payload(frame)
+    # MAVLink 2 strips trailing zero bytes, so a missing target byte means 0
+    return payload[offset] if offset is not None and offset < len(payload) else 0
+
+
+def x25_crc(data, crc=0xFFFF):
+    """MAVLink's CRC-16/MCRF4XX checksum"""
+    for byte in data:
+        tmp = (byte ^ crc) & 0xFF
+        tmp = (tmp ^ (tmp << 4)) & 0xFF
+        crc = ((crc >> 8) ^ (tmp << 8) ^ (tmp << 3) ^ (tmp >> 4)) & 0xFFFF
+    return crc
+
+
+def encode_frame(msgid, payload, seq=0, sysid=255, compid=190, crc_extra=None):
+    """Build a MAVLink 2 frame with a valid checksum (unsigned, payload not truncated)"""
+    if crc_extra is None:
+        crc_extra = CRC_EXTRA[msgid]
+    header = bytes([STX_V2, len(payload), 0, 0, seq & 0xFF, sysid, compid,
+                    msgid & 0xFF, (msgid >> 8) & 0xFF, msgid >> 16])
+    crc = x25_crc(bytes([crc_extra]), x25_crc(header[1:] + payload))
+    return header + payload + struct.pack('<H', crc)
+
+
+def padded_payload(frame, length):
+    """First `length` payload bytes, zero-padded (MAVLink 2 strips trailing zero bytes) and cut short
+    of extension fields the caller's format doesn't cover"""
+    payload = frame_payload(frame)
+    return payload + b'\x00' * (length - len(payload)) if len(payload) < length else payload[:length]
+
+
+class FrameSplitter:
+    """Reassembles MAVLink frames from an arbitrary chunked byte stream"""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self.discarded_bytes = 0
+    
+    def feed(self, data):
+        """Add received bytes and return the list of complete frames"""
+        self.buffer.extend(data)
+        frames = []
+        buffer = self.buffer
+        position = 0
+        
+        while position < len(buffer):
+            stx = buffer[position]
+            if stx != STX_V1 and stx != STX_V2:
+                # Resynchronise on the next start byte
+                next_v1 = buffer.find(bytes([STX_V1]), position + 1)
+                next_v2 = buffer.find(bytes([STX_V2]), position + 1)
+                candidates = [index for index in (next_v1, next_v2) if index != -1]
+                skip_to = min(candidates) if candidates else len(buffer)
+                self.discarded_bytes += skip_to - position
+                position = skip_to
+                continue
+            
+            length = frame_length(buffer, position)
+            if length is None or position + length > len(buffer):
+                break
+            
+            frames.append(bytes(buffer[position:position + length]))
+            position += length
+        
+        del buffer[:position]
+        return frames
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+MAVLink-over-WebSocket Gateway
+Carries an instance's MAVLink stream over a WebSocket so GCS users behind
+firewalls don't need the raw TCP ports. Small frames are batched into one
+WebSocket message within a latency budget, and slow clients are thinned to
+lower telemetry rates instead of being buffered without limit.
+"""
+
+import time
+import uuid
+import socket
+import logging
+import threading
+from collections import deque
+
+from mavlink_frames import FrameSplitter, frame_msgid, ESSENTIAL_MSG_IDS
+
+logger = logging.getLogger(__name__)
+
+# Max rate (Hz) per non-essential message id at each backpressure tier; None = unthrottled
+THROTTLE_TIERS = [None, 10.0, 2.0]
+
+
+class FrameBatcher:
+    """Bounded frame queue that releases batches within a latency budget"""
+    
+    def __init__(self, latency_budget=0.02, max_batch_bytes=8192, max_queue_bytes=256 * 1024):
+        self.latency_budget = latency_budget
+        self.max_batch_bytes = max_batch_bytes
+        self.max_queue_bytes = max_queue_bytes
+        self.high_watermark = max_queue_bytes // 2
+        self.low_watermark = max_queue_bytes // 8
+        self.escalation_interval = 1.0  # seconds between successive throttle steps
+        self.recovery_interval = 5.0  # seconds below the low watermark before raising rates again
+        
+        self.cond = threading.Condition()
+        self.queue = deque()  # (enqueued_at, frame)
+        self.queued_bytes = 0
+        self.tier = 0
+        self.tier_changed = time.monotonic()
+        self.last_accepted = {}  # msgid -> time of last accepted frame
+        self.closed = False
+        self.overflowed = False
+        self.stats = {"frames_in": 0, "frames_out": 0, "batches": 0, "bytes_out": 0,
+                      "thinned": 0, "dropped": 0}
+    
+    def put(self, frame):
+        """Queue a frame for the client, thinning or dropping it under backpressure"""
+        msgid = frame_msgid(frame)
+        essential = msgid in ESSENTIAL_MSG_IDS
+        now = time.monotonic()
+        
+        with self.cond:
+            self.stats["frames_in"] += 1
+            
+            limit = THROTTLE_TIERS[self.tier]
+            if limit and not essential:
+                last = self.last_accepted.get(msgid)
+                if last is not None and now - last < 1.0 / limit:
+                    self.stats["thinned"] += 1
+                    return
+            
+            if self.queued_bytes + len(frame) > self.max_queue_bytes:
+                if not essential:
+                    self.stats["dropped"] += 1
+                    return
+                if self.queued_bytes + len(frame) > 2 * self.max_queue_bytes:
+                    # Not even essential traffic gets through: give up on this client
+                    self.overflowed = True
+                    self.closed = True
+                    self.cond.notify_all()
+                    return
+            
+            self.last_accepted[msgid] = now
+            self.queue.append((now, frame))
+            self.queued_bytes += len(frame)
+            self.adjust_tier(now)
+            self.cond.notify()
+    
+    def adjust_tier(self, now):
+        """Step throttling up when the queue backs up and down once it has drained"""
+        if (self.queued_bytes > self.high_watermark and self.tier < len(THROTTLE_TIERS) - 1
+                and (self.tier == 0 or now - self.tier_changed > self.escalation_interval)):
+            self.tier += 1
+            self.tier_changed = now
+            logger.info(f"WebSocket client falling behind, throttling to {THROTTLE_TIERS[self.tier]} Hz")
+        elif (self.queued_bytes < self.low_watermark and self.tier > 0
+              and now - self.tier_changed > self.recovery_interval):
+            self.tier -= 1
+            self.tier_changed = now
+            logger.info(f"WebSocket client caught up, throttle now {THROTTLE_TIERS[self.tier]}")
+    
+    def next_batch(self, timeout=1.0):
+        """Wait for the next batch; returns bytes, b'' on idle timeout, or None once closed"""
+        with self.cond:
+            idle_deadline = time.monotonic() + timeout
+            while True:
+                if self.closed:
+                    return None
+                
+                now = time.monotonic()
+                if self.queue:
+                    due = self.queue[0][0] + self.latency_budget
+                    if self.queued_bytes >= self.max_batch_bytes or now >= due:
+                        break
+                    self.cond.wait(due - now)
+                else:
+                    if now >= idle_deadline:
+                        self.adjust_tier(now)
+                        return b''
+                    self.cond.wait(idle_deadline - now)
+            
+            frames = []
+            size = 0
+            while self.queue and (not frames or size + len(self.queue[0][1]) <= self.max_batch_bytes):
+                frame = self.queue.popleft()[1]
+                frames.append(frame)
+                size += len(frame)
+            
+            self.queued_bytes -= size
+            self.adjust_tier(time.monotonic())
+            self.stats["frames_out"] += len(frames)
+            self.stats["batches"] += 1
+            self.stats["bytes_out"] += size
+            return b''.join(frames)
+    
+    def close(self):
+        """Wake the sender and stop accepting frames"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+    
+    def get_stats(self):
+        """Counters plus current queue depth and throttle tier"""
+        with self.cond:
+            stats = dict(self.stats)
+            stats["queued_bytes"] = self.queued_bytes
+            stats["throttle_hz"] = THROTTLE_TIERS[self.tier]
+            stats["frames_per_batch"] = round(stats["frames_out"] / stats["batches"], 2) if stats["batches"] else 0
+            return stats
+
+
+class GatewaySession:
+    """One WebSocket client bridged to an instance's MAVLink TCP port"""
+    
+    def __init__(self, ws, instance_id, upstream_address, client_address, batcher):
+        self.session_id = uuid.uuid4().hex[:8]
+        self.ws = ws
+        self.instance_id = instance_id
+        self.upstream_address = upstream_address
+        self.client_address = client_address
+        self.batcher = batcher
+        self.upstream = None
+        self.connected_at = time.time()
+        self.frames_to_vehicle = 0
+        self.close_reason = None
+    
+    def read_upstream(self):
+        """Vehicle -> client: split the TCP stream into frames and queue them"""
+        splitter = FrameSplitter()
+        try:
+            while True:
+                data = self.upstream.recv(65536)
+                if not data:
+                    self.close_reason = self.close_reason or "vehicle link closed"
+                    break
+                for frame in splitter.feed(data):
+                    self.batcher.put(frame)
+        except OSError as e:
+            self.close_reason = self.close_reason or f"vehicle link error: {e}"
+        finally:
+            self.batcher.close()
+    
+    def read_client(self):
+        """Client -> vehicle: forward whole frames from WebSocket messages"""
+        splitter = FrameSplitter()
+        try:
+            while not self.batcher.closed:
+                message = self.ws.receive(timeout=1.0)
+                if message is None:
+                    continue
+                if isinstance(message, str):
+                    message = message.encode('latin-1')
+                for frame in splitter.feed(message):
+                    self.upstream.sendall(frame)
+                    self.frames_to_vehicle += 1
+        except Exception as e:
+            self.close_reason = self.close_reason or f"client closed: {e}"
+        finally:
+            self.batcher.close()
+    
+    def run(self):
+        """Bridge until either side goes away"""
+        try:
+            self.upstream = socket.create_connection(self.upstream_address, timeout=5)
+            self.upstream.settimeout(None)
+            self.upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logger.error(f"WebSocket gateway could not reach {self.upstream_address}: {e}")
+            self.close_reason = f"vehicle unreachable: {e}"
+            return
+        
+        logger.info(f"WebSocket client {self.client_address} attached to {self.instance_id} "
+                    f"(session {self.session_id})")
+        
+        threading.Thread(target=self.read_upstream, daemon=True).start()
+        threading.Thread(target=self.read_client, daemon=True).start()
+        
+        try:
+            while True:
+                batch = self.batcher.next_batch()
+                if batch is None:
+                    break
+                if batch:
+                    self.ws.send(batch)
+        except Exception as e:
+            self.close_reason = self.close_reason or f"send failed: {e}"
+        finally:
+            self.batcher.close()
+            try:
+                self.upstream.close()
+            except OSError:
+                pass
+        
+        if self.batcher.overflowed:
+            self.close_reason = "client too slow, queue overflowed"
+        logger.info(f"WebSocket session {self.session_id} for {self.instance_id} closed: {self.close_reason}")
+    
+    def get_status(self):
+        """Session details and batching/backpressure counters"""
+        return {
+            "session_id": self.session_id,
+            "instance_id": self.instance_id,
+            "client": self.client_address,
+            "connected_at": self.connected_at,
+            "frames_to_vehicle": self.frames_to_vehicle,
+            "batching": self.batcher.get_stats()
+        }
+
+
+class MAVLinkWebSocketGateway:
+    """Keeps track of WebSocket sessions and their batching settings"""
+    
+    def __init__(self, latency_budget_ms=20, max_batch_bytes=8192, max_queue_bytes=256 * 1024):
+        self.latency_budget_ms = latency_budget_ms
+        self.max_latency_budget_ms = 500
+        self.max_batch_bytes = max_batch_bytes
+        self.max_queue_bytes = max_queue_bytes
+        self.sessions = {}
+        self.lock = threading.Lock()
+    
+    def serve(self, ws, instance_id, tcp_port, client_address=None, latency_budget_ms=None):
+        """Run a session for one WebSocket connection (blocks until it ends)"""
+        if latency_budget_ms is None:
+            latency_budget_ms = self.latency_budget_ms
+        latency_budget_ms = min(max(latency_budget_ms, 0), self.max_latency_budget_ms)
+        
+        batcher = FrameBatcher(latency_budget=latency_budget_ms / 1000.0,
+                               max_batch_bytes=self.max_batch_bytes,
+                               max_queue_bytes=self.max_queue_bytes)
+        session = GatewaySession(ws, instance_id, ('127.0.0.1', tcp_port), client_address, batcher)
+        
+        with self.lock:
+            self.sessions[session.session_id] = session
+        try:
+            session.run()
+        finally:
+            with self.lock:
+                self.sessions.pop(session.session_id, None)
+        return session
+    
+    def get_sessions(self, instance_id=None):
+        """Status of active sessions, optionally for one instance"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return [session.get_status() for session in sessions
+                if instance_id is None or session.instance_id == instance_id]
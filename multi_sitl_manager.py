@@ -10,21 +10,123 @@ import os
 import signal
 import logging
 import uuid
+import threading
 from datetime import datetime
 
+from process_stats import group_usage, CpuSampler
+from airframe_registry import AirframeRegistry
+from bandwidth_monitor import BandwidthMonitor
+from health_watchdog import HealthWatchdog
+from idle_suspend import IdleSuspender
+from rootfs_store import RootfsStore
+from router_shards import HashRing, RouterShard
+from cgroup_limits import CgroupManager, LIMIT_KEYS, DEFAULT_CGROUP_ROOT
+from idempotency import OperationCoalescer
+from ulog_index import UlogIndex
+from gcs_mux import GcsMux
+from sim_backends import get_backend
+from process_supervisor import get_supervisor, stop_process, SupervisedProcess, PX4_READY_PATTERN, PX4_BOOT_TIMEOUT
+from lite_world import LiteWorldBuilder, SIM_PROFILES
+from gz_resource_cache import GzResourceCache, RESOURCE_WARMUP_WAIT
+from fair_share import QuotaPolicy, FairShareQueue, ANONYMOUS_USER
+from param_sync import ParamClient, ParamSnapshot
+from mavlink_client import MissionClient, MAV_RESULT_ACCEPTED, MSG_ID_MISSION_CLEAR_ALL
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# Simulated vehicles rarely use a full core each, so allow some CPU overcommit
+CPU_OVERCOMMIT = 2.0
+
+# Router shards when not configured. One router keeps every vehicle on the single public
+# GCS port 14550; with more shards, shard n serves only its own vehicles on 14550 + n
+DEFAULT_ROUTER_SHARDS = 1
+
+# Default cgroup memory limit, relative to the airframe's expected memory use
+MEMORY_LIMIT_HEADROOM = 2.0
+
+# MAVLink system ids handed to vehicles; 251-255 stay free for GCS and companion software
+MAX_SYS_ID = 250
+
+
+def host_memory_mb():
+    """Total host memory in MB (from /proc/meminfo)"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 4096.0
+
+
+# MAVLink stream-rate profiles. "rate" is the link's data-rate cap in bytes/s
+# (fixed when the link starts); "streams" are per-stream rates in Hz that can
+# be changed at runtime. Every profile lists the same streams so switching
+# between them always leaves the link in a known state.
+MAVLINK_RATE_PROFILES = {
+    "full": {
+        "rate": 4000000,
+        "streams": {
+            "ATTITUDE": 50, "ATTITUDE_QUATERNION": 50, "GLOBAL_POSITION_INT": 50,
+            "LOCAL_POSITION_NED": 30, "GPS_RAW_INT": 10, "SYS_STATUS": 5, "VFR_HUD": 10,
+            "EXTENDED_SYS_STATE": 5, "ALTITUDE": 10, "RC_CHANNELS": 10,
+            "SERVO_OUTPUT_RAW_0": 10, "BATTERY_STATUS": 1, "ESTIMATOR_STATUS": 1, "VIBRATION": 1
+        }
+    },
+    "normal": {
+        "rate": 200000,
+        "streams": {
+            "ATTITUDE": 15, "ATTITUDE_QUATERNION": 10, "GLOBAL_POSITION_INT": 5,
+            "LOCAL_POSITION_NED": 1, "GPS_RAW_INT": 1, "SYS_STATUS": 1, "VFR_HUD": 4,
+            "EXTENDED_SYS_STATE": 1, "ALTITUDE": 1, "RC_CHANNELS": 5,
+            "SERVO_OUTPUT_RAW_0": 1, "BATTERY_STATUS": 0.5, "ESTIMATOR_STATUS": 0.5, "VIBRATION": 0.1
+        }
+    },
+    "low_bandwidth": {
+        "rate": 12000,
+        "streams": {
+            "ATTITUDE": 2, "ATTITUDE_QUATERNION": 0, "GLOBAL_POSITION_INT": 2,
+            "LOCAL_POSITION_NED": 0, "GPS_RAW_INT": 0.5, "SYS_STATUS": 0.5, "VFR_HUD": 1,
+            "EXTENDED_SYS_STATE": 0.5, "ALTITUDE": 0, "RC_CHANNELS": 0,
+            "SERVO_OUTPUT_RAW_0": 0, "BATTERY_STATUS": 0.2, "ESTIMATOR_STATUS": 0, "VIBRATION": 0
+        }
+    }
+}
+DEFAULT_RATE_PROFILE = "full"
+
+
+# Statuses in which an instance's processes are (supposed to be) up
+ACTIVE_STATES = ("running", "degraded")
+
+# Faster-than-realtime lockstep is bounded by what one core can simulate
+MAX_SPEED_FACTOR = 20.0
+
+# MAVLink commands used by the in-place reset
+MAV_CMD_COMPONENT_ARM_DISARM = 400
+MAV_CMD_DO_SET_HOME = 179
+MAV_CMD_DO_SET_MODE = 176
+FORCE_DISARM_MAGIC = 21196
+PX4_MAIN_MODE_AUTO = 4
+PX4_AUTO_MODE_LOITER = 3
+
+
+def scoped_key(user, idempotency_key):
+    """Idempotency keys are per user, so two users can't collide on the same key"""
+    return f"{user}/{idempotency_key}"
+
+
 class PortPool:
     """Manages port allocation for multiple SITL instances"""
     
-    def __init__(self):
+    def __init__(self, max_instances=10):
         self.udp_base = 14550
         self.tcp_base = 5760
         self.increment = 1
         self.used_ports = set()
-        self.max_instances = 10  # Limit to prevent resource exhaustion
+        self.max_instances = max_instances  # Limit to prevent resource exhaustion
     
     def allocate_ports(self):
         """Allocate a pair of ports for a new instance"""
@@ -53,123 +155,308 @@ class PortPool:
 
 
 class MAVLinkRouterManager:
-    """Manages a single MAVLink router for all instances"""
+    """Spreads instances over sharded MAVLink routers by consistent hashing"""
     
-    def __init__(self):
-        self.config_file = "/tmp/mavlink-router.conf"
-        self.router_process = None
+    def __init__(self, shards=None, config_dir="/tmp/mavlink-router", server_port_base=14550,
+                 binary="mavlink-routerd", startup_wait=2.0):
+        self.config_dir = config_dir
+        self.server_port_base = server_port_base
+        self.binary = binary
+        self.startup_wait = startup_wait
         self.active_instances = {}  # instance_id -> (udp_port, tcp_port)
+        self.shards = []
+        self.ring = HashRing()
+        self.resize(shards or DEFAULT_ROUTER_SHARDS)
+    
+    def make_shard(self, index):
+        """Router shard with its own config and server port"""
+        return RouterShard(index, self.server_port_base + index, self.config_dir, binary=self.binary,
+                           startup_wait=self.startup_wait)
+    
+    def assign_cpus(self):
+        """Give each shard its own core from the ones this process may use; a single router isn't pinned"""
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        for shard in self.shards:
+            shard.set_cpu(cpus[shard.index % len(cpus)] if len(self.shards) > 1 and cpus else None)
+    
+    def shard_for(self, instance_id):
+        """Router shard an instance is assigned to"""
+        return self.shards[self.ring.lookup(instance_id)]
+    
+    def resize(self, count):
+        """Change the number of shards, restarting only the shards whose instances changed"""
+        if count < 1:
+            raise Exception("At least one router shard is required")
         
-    def generate_config(self):
-        """Generate MAVLink router config file for all active instances"""
-        config_content = """[General]
-TcpServerPort=14550
-ReportStats=false
-MavlinkDialect=auto
-Log=/tmp/mavlink-router.log
-
-"""
+        while len(self.shards) < count:
+            self.ring.add(len(self.shards))
+            self.shards.append(self.make_shard(len(self.shards)))
+        while len(self.shards) > count:
+            self.ring.remove(len(self.shards) - 1)
+            self.shards.pop().stop()
+        self.assign_cpus()
         
-        # Add endpoint for each active instance
+        # Reassign instances; a shard only restarts if its endpoint set changed
+        assignment = {shard.index: {} for shard in self.shards}
         for instance_id, (udp_port, tcp_port) in self.active_instances.items():
-            config_content += f"""[UartEndpoint sitl_{tcp_port}]
-Device = tcp:127.0.0.1:{tcp_port}
-
-"""
+            assignment[self.ring.lookup(instance_id)][instance_id] = tcp_port
         
-        # Write config file
-        with open(self.config_file, 'w') as f:
-            f.write(config_content)
+        moved = 0
+        for shard in self.shards:
+            if shard.endpoints != assignment[shard.index]:
+                moved += len(set(assignment[shard.index]) - set(shard.endpoints))
+                shard.endpoints = assignment[shard.index]
+                shard.start()
         
-        logger.info(f"Generated MAVLink router config for {len(self.active_instances)} instances")
+        logger.info(f"MAVLink routing on {count} shards ({moved} instances moved)")
+        return moved
     
     def start_router(self):
-        """Start the MAVLink router with current config"""
-        if not self.active_instances:
-            logger.info("No instances active, skipping MAVLink router start")
-            return True
-        
-        # Stop existing router if running
-        self.stop_router()
-        
-        # Generate config
-        self.generate_config()
-        
-        # Start router
-        cmd = [
-            'mavlink-routerd',
-            '-c', self.config_file,
-            '-v'
-        ]
-        
-        logger.info(f"Starting MAVLink router with config: {self.config_file}")
-        
-        self.router_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        time.sleep(2)
-        
-        if self.router_process.poll() is None:
-            logger.info("✅ MAVLink router started successfully")
-            return True
-        else:
-            logger.error("❌ MAVLink router failed to start")
-            return False
+        """Start every shard that has instances"""
+        return all([shard.start() for shard in self.shards])
     
     def stop_router(self):
-        """Stop the MAVLink router"""
-        if self.router_process:
-            try:
-                self.router_process.terminate()
-                self.router_process.wait(timeout=5)
-            except:
-                try:
-                    self.router_process.kill()
-                except:
-                    pass
-            self.router_process = None
-            logger.info("MAVLink router stopped")
+        """Stop all router shards"""
+        for shard in self.shards:
+            shard.stop()
+    
+    def restart_dead_shards(self):
+        """Restart shards whose router exited while serving instances"""
+        for shard in self.shards:
+            if shard.endpoints and shard.process is not None and not shard.alive():
+                logger.warning(f"⚠️ MAVLink router shard {shard.index} exited, restarting "
+                               f"({len(shard.endpoints)} instances)")
+                shard.restarts += 1
+                shard.start()
     
     def add_instance(self, instance_id, udp_port, tcp_port):
-        """Add an instance to the router"""
+        """Add an instance to its router shard"""
         self.active_instances[instance_id] = (udp_port, tcp_port)
-        logger.info(f"Added instance {instance_id} to router: UDP {udp_port} -> TCP {tcp_port}")
+        shard = self.shard_for(instance_id)
+        shard.endpoints[instance_id] = tcp_port
+        logger.info(f"Added instance {instance_id} to router shard {shard.index}: "
+                    f"UDP {udp_port} -> TCP {tcp_port}")
         
-        # Restart router with new config
-        if self.active_instances:
-            return self.start_router()
-        return True
+        # Only this shard's vehicles see the restart
+        return shard.start()
+    
+    def add_instances(self, instances):
+        """Add many instances ({instance_id: (udp_port, tcp_port)}), starting each affected shard once"""
+        changed = set()
+        for instance_id, ports in instances.items():
+            self.active_instances[instance_id] = ports
+            shard = self.shard_for(instance_id)
+            shard.endpoints[instance_id] = ports[1]
+            changed.add(shard.index)
+        
+        logger.info(f"Added {len(instances)} instances to {len(changed)} router shards")
+        return all([self.shards[index].start() for index in sorted(changed)])
     
     def remove_instance(self, instance_id):
-        """Remove an instance from the router"""
+        """Remove an instance from its router shard"""
         if instance_id in self.active_instances:
             udp_port, tcp_port = self.active_instances.pop(instance_id)
-            logger.info(f"Removed instance {instance_id} from router: UDP {udp_port} -> TCP {tcp_port}")
+            shard = self.shard_for(instance_id)
+            shard.endpoints.pop(instance_id, None)
+            logger.info(f"Removed instance {instance_id} from router shard {shard.index}: "
+                        f"UDP {udp_port} -> TCP {tcp_port}")
             
-            # Restart router with updated config
-            if self.active_instances:
-                return self.start_router()
-            else:
-                self.stop_router()
+            # Restart the shard with its remaining endpoints (stops it if none are left)
+            return shard.start()
         return True
+    
+    def local_addresses(self):
+        """Local "ip:port" of every shard's connections, to tell them apart from real GCS clients"""
+        addresses = set()
+        for shard in self.shards:
+            addresses |= shard.local_addresses()
+        return addresses
+    
+    def get_status(self):
+        """Status of every router shard"""
+        return [shard.get_status() for shard in self.shards]
+
+
+class GazeboWorldManager:
+    """Runs one shared Gazebo server per world for vehicles in world-sharing mode"""
+    
+    def __init__(self, px4_path, supervisor=None, resource_cache=None):
+        self.px4_path = px4_path
+        self.supervisor = supervisor or get_supervisor()
+        self.resource_cache = resource_cache  # GzResourceCache, resolved ahead of the PX4 tree
+        self.worlds = {}  # world name -> {"process": SupervisedProcess, "vehicles": {instance_id: slot}}
+        self.spawn_spacing = 2.0  # metres between vehicles
+        self.grid_columns = 5
+    
+    def world_file(self, world):
+        """Path of the SDF file for a world in the PX4 tree"""
+        return os.path.join(self.px4_path, "Tools", "simulation", "gz", "worlds", f"{world}.sdf")
+    
+    def resource_env(self):
+        """Environment that lets Gazebo resolve PX4 models and worlds"""
+        gz_dir = os.path.join(self.px4_path, "Tools", "simulation", "gz")
+        env = os.environ.copy()
+        env['GZ_SIM_RESOURCE_PATH'] = os.pathsep.join([
+            os.path.join(gz_dir, "models"),
+            os.path.join(gz_dir, "worlds")
+        ])
+        if self.resource_cache:
+            self.resource_cache.apply(env)
+        return env
+    
+    def wait_for_resources(self, timeout=RESOURCE_WARMUP_WAIT):
+        """Let a running resource cache warm-up finish before a Gazebo start"""
+        if self.resource_cache and not self.resource_cache.wait(timeout):
+            logger.warning(f"⚠️ Gazebo resource warm-up still running after {timeout}s, starting without it")
+    
+    def slot_pose(self, slot):
+        """Spawn pose ("x,y") for a grid slot, so vehicles never overlap"""
+        x = (slot % self.grid_columns) * self.spawn_spacing
+        y = (slot // self.grid_columns) * self.spawn_spacing
+        return f"{x:g},{y:g}"
+    
+    def start_world(self, world):
+        """Start the headless Gazebo server for a world"""
+        world_file = self.world_file(world)
+        if not os.path.exists(world_file):
+            logger.error(f"World file not found: {world_file}")
+            return False
+        
+        logger.info(f"Starting shared Gazebo server for world '{world}'")
+        self.wait_for_resources()
+        
+        try:
+            process = self.supervisor.spawn(
+                f"Gazebo world {world}",
+                ['gz', 'sim', '-s', '-r', world_file],
+                env=self.resource_env(),
+                preexec_fn=os.setsid
+            )
+        except OSError as e:
+            logger.error(f"❌ Shared Gazebo server failed to start for world '{world}': {e}")
+            return False
+        
+        # Up if it is still running after 5 seconds
+        if process.wait_exit(5) is None:
+            self.worlds[world] = {"process": process, "vehicles": {}}
+            logger.info(f"✅ Shared Gazebo server running for world '{world}'")
+            return True
+        else:
+            logger.error(f"❌ Shared Gazebo server failed to start for world '{world}'")
+            return False
+    
+    def stop_world(self, world):
+        """Stop the Gazebo server of a world"""
+        entry = self.worlds.pop(world, None)
+        if entry is None:
+            return
+        
+        stop_process(entry["process"], timeout=10)
+        logger.info(f"Shared Gazebo server for world '{world}' stopped")
+    
+    def attach(self, world, instance_id):
+        """Reserve a spawn slot in a world, starting its server if needed; returns the pose"""
+        entry = self.worlds.get(world)
+        if entry is not None and entry["process"].poll() is not None:
+            logger.warning(f"Shared Gazebo server for world '{world}' exited, restarting it")
+            self.worlds.pop(world)
+            entry = None
+        
+        if entry is None:
+            if not self.start_world(world):
+                return None
+            entry = self.worlds[world]
+        
+        vehicles = entry["vehicles"]
+        if instance_id not in vehicles:
+            used = set(vehicles.values())
+            vehicles[instance_id] = next(slot for slot in range(len(used) + 1) if slot not in used)
+        
+        pose = self.slot_pose(vehicles[instance_id])
+        logger.info(f"Instance {instance_id} will spawn in world '{world}' at {pose}")
+        return pose
+    
+    def detach(self, world, instance_id):
+        """Release a vehicle's slot; the server is stopped with its last vehicle"""
+        entry = self.worlds.get(world)
+        if entry is None:
+            return
+        
+        entry["vehicles"].pop(instance_id, None)
+        if not entry["vehicles"]:
+            self.stop_world(world)
+    
+    def stop_all(self):
+        """Stop every shared Gazebo server"""
+        for world in list(self.worlds):
+            self.stop_world(world)
+    
+    def get_world_usage(self, world):
+        """Memory/CPU used by a world's Gazebo server"""
+        entry = self.worlds.get(world)
+        if entry is None or entry["process"].poll() is not None:
+            return None
+        return group_usage(entry["process"].pid)
+    
+    def get_status(self):
+        """Get status of all shared worlds"""
+        status = {}
+        for world, entry in self.worlds.items():
+            status[world] = {
+                "running": entry["process"].poll() is None,
+                "vehicles": sorted(entry["vehicles"]),
+                "resources": self.get_world_usage(world)
+            }
+        return status
 
 
 class SITLInstance:
     """Represents a single SITL instance"""
     
-    def __init__(self, instance_id, airframe, udp_port, tcp_port):
+    def __init__(self, instance_id, airframe, udp_port, tcp_port, px4_instance=0, world=None, profile=None,
+                 rate_profile=DEFAULT_RATE_PROFILE, speed_factor=1.0, mav_sys_id=None, sim_profile="default",
+                 backend=None, supervisor=None):
         self.instance_id = instance_id
         self.airframe = airframe
+        self.profile = profile  # AirframeProfile from the registry
+        self.backend = get_backend(backend or (profile.backend if profile else "gz"))  # Simulator: Gazebo or SIH
+        self.rate_profile = rate_profile  # Key of MAVLINK_RATE_PROFILES
+        self.speed_factor = speed_factor  # Simulation speed relative to wall clock (lockstep)
+        self.sim_profile = sim_profile  # "default", or "lite" for a world without rendering sensors
         self.udp_port = udp_port
         self.tcp_port = tcp_port
-        self.px4_process = None
+        self.px4_instance = px4_instance  # PX4 "-i" index, unique per live instance
+        self.mav_sys_id = mav_sys_id or px4_instance + 1  # MAVLink system id, unique per live instance
+        self.world = world  # Shared Gazebo world name, None for a dedicated Gazebo
+        self.model_pose = None
+        self.px4_process = None  # SupervisedProcess of PX4 (and its simulator)
         self.mavlink_process = None
+        self.supervisor = supervisor or get_supervisor()
         self.status = "stopped"
         self.start_time = None
         self.px4_path = os.path.expanduser("~/PX4-Autopilot")
+        self.world_manager = None  # Set by MultiSITLManager for shared-world instances
+        self.lite_worlds = None  # LiteWorldBuilder, set by MultiSITLManager
+        self.worlds_dir = None  # Directory of the lite world files PX4 loads (PX4_GZ_WORLDS)
+        self.rootfs_dir = None  # Private PX4 working directory cloned from the airframe template
+        self.gz_model = None  # Model name PX4 spawned in Gazebo, set at launch
+        self.cgroup = None  # InstanceCgroup with this vehicle's CPU/memory limits, if available
+        self.oom_kills_seen = 0
+        self.owner = ANONYMOUS_USER  # User who created the instance, for quotas and fair sharing
+        
+        # Pause bookkeeping: how the instance is frozen, since when, and the CPU it would be using
+        self.freeze_method = None  # "cgroup" or "sigstop" while paused
+        self.pause_reason = None
+        self.paused_at = None
+        self.paused_cpu_cores = 0.0
+        self.paused_seconds = 0.0
+        self.cpu_core_seconds_reclaimed = 0.0
+        
+        # Health history, maintained by the HealthWatchdog
+        self.restart_count = 0
+        self.last_failure_reason = None
+        self.last_failure_time = None
+        self.crash_loop = False
         
     def cleanup_existing_processes(self):
         """Clean up any existing processes that might conflict for this specific instance"""
@@ -178,11 +465,17 @@ class SITLInstance:
         # Only kill processes that might conflict with this specific instance
         # Don't kill all MAVLink routers - that breaks other instances!
         
-        # Kill any existing PX4 processes (this is instance-specific)
-        subprocess.run(['pkill', '-9', '-f', 'px4.*sitl'], stderr=subprocess.DEVNULL)
-        
-        # Kill any existing Gazebo processes (this is instance-specific)  
-        subprocess.run(['pkill', '-9', 'gz'], stderr=subprocess.DEVNULL)
+        if self.world or not self.backend.uses_gazebo:
+            # Shared world or SIH: other vehicles (and the world server) must survive,
+            # so only a stale PX4 with our own instance index is a conflict
+            subprocess.run(['pkill', '-9', '-f', f'bin/px4 -i {self.px4_instance} '],
+                           stderr=subprocess.DEVNULL)
+        else:
+            # Kill any existing PX4 processes (this is instance-specific)
+            subprocess.run(['pkill', '-9', '-f', 'px4.*sitl'], stderr=subprocess.DEVNULL)
+            
+            # Kill any existing Gazebo processes (this is instance-specific)  
+            subprocess.run(['pkill', '-9', 'gz'], stderr=subprocess.DEVNULL)
         
         # For MAVLink router, we should check if the port is already in use
         # and only kill the specific process using that port
@@ -213,28 +506,149 @@ class SITLInstance:
         logger.info(f"Instance {self.instance_id} will send MAVLink to UDP {self.udp_port}")
         return True
     
+    def build_dir(self):
+        """PX4 SITL build output directory"""
+        return os.path.join(self.px4_path, "build", "px4_sitl_default")
+    
+    def px4_binary(self):
+        """Path of the built PX4 SITL binary"""
+        return os.path.join(self.build_dir(), "bin", "px4")
+    
+    def working_dir(self):
+        """PX4 working directory: the private rootfs, or the shared build rootfs without one"""
+        return self.rootfs_dir or os.path.join(self.build_dir(), "rootfs", str(self.px4_instance))
+    
+    def log_dir(self):
+        """Where PX4 writes this instance's ULog files"""
+        return os.path.join(self.working_dir(), "log")
+    
+    def px4_command(self):
+        """Command, environment and working dir to run the PX4 binary in this instance's own rootfs"""
+        autostart = self.profile.autostart if self.profile else None
+        if autostart is None:
+            raise Exception(f"No SYS_AUTOSTART id known for airframe {self.airframe}")
+        
+        working_dir = self.working_dir()
+        os.makedirs(working_dir, exist_ok=True)
+        
+        env = self.world_manager.resource_env() if self.world_manager else os.environ.copy()
+        env.update(self.launch_env())
+        env.update({
+            'HEADLESS': '1',
+            'PX4_SIM_MODEL': self.airframe,
+            'PX4_SYS_AUTOSTART': str(autostart)
+        })
+        if self.world:
+            env.update({
+                'PX4_GZ_STANDALONE': '1',
+                'PX4_GZ_WORLD': self.world,
+                'PX4_GZ_MODEL_POSE': self.model_pose or "0,0"
+            })
+        
+        cmd = [
+            self.px4_binary(),
+            '-i', str(self.px4_instance),
+            '-d',
+            '-w', working_dir,
+            os.path.join(self.build_dir(), "etc")
+        ]
+        return cmd, env, working_dir
+    
+    def launch_env(self):
+        """Extra environment from the airframe profile, the system id, the simulation speed and the simulator"""
+        env = dict(self.profile.env) if self.profile else {}
+        # PX4's rcS applies PX4_PARAM_* variables at boot; 'make' would otherwise give every vehicle id 1
+        env['PX4_PARAM_MAV_SYS_ID'] = str(self.mav_sys_id)
+        if self.speed_factor != 1.0:
+            env['PX4_SIM_SPEED_FACTOR'] = str(self.speed_factor)
+        if self.worlds_dir:
+            env['PX4_GZ_WORLDS'] = self.worlds_dir
+        env.update(self.backend.launch_env(self))
+        return env
+    
+    def prepare_world(self):
+        """Point PX4 at the lite copy of its world when the instance uses the lite profile"""
+        self.worlds_dir = None
+        if self.sim_profile != "lite" or not self.world_manager:
+            return
+        
+        max_step_size = self.profile.physics.get("lite_max_step_size") if self.profile else None
+        try:
+            self.worlds_dir = self.lite_worlds.build(self.world_manager.world_file(self.gz_world()), max_step_size)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ No lite world for instance {self.instance_id}, using the default world: {e}")
+    
+    def preexec(self):
+        """Runs in the child before exec: own process group, and own cgroup if there is one"""
+        os.setsid()
+        if self.cgroup:
+            self.cgroup.add_self()
+    
+    def exit_reason(self):
+        """Why PX4 exited, telling OOM kills apart from crashes"""
+        code = self.px4_process.returncode if self.px4_process else None
+        if self.cgroup and self.cgroup.oom_kills() > self.oom_kills_seen:
+            self.oom_kills_seen = self.cgroup.oom_kills()
+            return f"killed by the OOM killer (memory limit {self.cgroup.limits.get('memory_max_mb')} MB)"
+        output = self.px4_process.tail(1) if isinstance(self.px4_process, SupervisedProcess) else []
+        return f"PX4 exited with code {code}" + (f": {output[0]}" if output else "")
+    
     def start_px4(self):
         """Start PX4 SITL for this instance"""
-        logger.info(f"Starting PX4 SITL for instance {self.instance_id} ({self.airframe}, headless)")
+        # The binary can run in the instance's own rootfs; 'make' only knows the shared build rootfs
+        use_binary = self.world or (self.rootfs_dir and self.profile and self.profile.autostart is not None
+                                    and os.path.exists(self.px4_binary()))
         
-        cmd = f"cd {self.px4_path} && HEADLESS=1 make px4_sitl {self.airframe}"
+        # PX4 names its Gazebo model after the airframe and its "-i" index ('make' always uses 0)
+        self.gz_model = self.backend.model_name(self, self.px4_instance if use_binary else 0)
+        self.prepare_world()
+        if self.backend.uses_gazebo and self.world_manager:
+            self.world_manager.wait_for_resources()
         
-        self.px4_process = subprocess.Popen(
-            cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            preexec_fn=os.setsid
-        )
+        if use_binary:
+            if self.world:
+                logger.info(f"Starting PX4 SITL for instance {self.instance_id} ({self.airframe}) "
+                            f"in shared world '{self.world}' at {self.model_pose}")
+            else:
+                logger.info(f"Starting PX4 SITL for instance {self.instance_id} ({self.airframe}, headless) "
+                            f"in {self.rootfs_dir}")
+            
+            cmd, env, working_dir = self.px4_command()
+            
+            self.px4_process = self.supervisor.spawn(
+                f"PX4 {self.instance_id}",
+                cmd,
+                ready_pattern=PX4_READY_PATTERN,
+                cwd=working_dir,
+                env=env,
+                preexec_fn=self.preexec
+            )
+        else:
+            logger.info(f"Starting PX4 SITL for instance {self.instance_id} ({self.airframe}, headless)")
+            
+            cmd = f"cd {self.px4_path} && HEADLESS=1 make px4_sitl {self.airframe}"
+            env = self.world_manager.resource_env() if self.world_manager else os.environ.copy()
+            env.update(self.launch_env())
+            
+            self.px4_process = self.supervisor.spawn(
+                f"PX4 {self.instance_id}",
+                cmd,
+                ready_pattern=PX4_READY_PATTERN,
+                shell=True,
+                env=env,
+                preexec_fn=self.preexec
+            )
         
-        logger.info(f"Waiting for PX4 to boot for instance {self.instance_id} (20 seconds)...")
-        time.sleep(20)
+        # Done as soon as the startup script has finished (at most 20 seconds, as before)
+        logger.info(f"Waiting for PX4 to boot for instance {self.instance_id}...")
+        ready = self.px4_process.wait_ready(PX4_BOOT_TIMEOUT)
         
         if self.px4_process.poll() is None:
-            logger.info(f"✅ PX4 SITL started for instance {self.instance_id}")
+            logger.info(f"✅ PX4 SITL started for instance {self.instance_id}"
+                        f"{'' if ready else ' (no startup message yet)'}")
             return True
         else:
-            logger.error(f"❌ PX4 SITL failed to start for instance {self.instance_id}")
+            logger.error(f"❌ PX4 SITL failed to start for instance {self.instance_id}: {self.exit_reason()}")
             return False
     
     def configure_mavlink(self):
@@ -274,7 +688,7 @@ class SITLInstance:
                     # Now configure MAVLink to send to UDP port (router will handle TCP forwarding)
                     result = subprocess.run(
                         ['python3', mavlink_shell, f'udp:127.0.0.1:{self.udp_port}'],
-                        input=f"mavlink start -x -u {self.udp_port} -r 4000000\n",
+                        input=f"mavlink start -x -u {self.udp_port} -r {self.link_data_rate()}\n",
                         text=True,
                         capture_output=True,
                         timeout=20
@@ -295,6 +709,7 @@ class SITLInstance:
                         
                         if verify_result.returncode == 0:
                             logger.info(f"✅ MAVLink status verified for instance {self.instance_id}")
+                            self.apply_stream_rates()
                             return True
                         else:
                             logger.warning(f"⚠️ MAVLink status verification failed for instance {self.instance_id}")
@@ -316,7 +731,7 @@ class SITLInstance:
                 # Try without stopping existing connections
                 result = subprocess.run(
                     ['python3', mavlink_shell, f'udp:127.0.0.1:{self.udp_port}'],
-                    input=f"mavlink start -u {self.udp_port} -r 4000000\n",
+                    input=f"mavlink start -u {self.udp_port} -r {self.link_data_rate()}\n",
                     text=True,
                     capture_output=True,
                     timeout=15
@@ -324,6 +739,7 @@ class SITLInstance:
                 
                 if result.returncode == 0:
                     logger.info(f"✅ Alternative MAVLink configuration successful for instance {self.instance_id}")
+                    self.apply_stream_rates()
                     return True
                     
             except Exception as e:
@@ -336,6 +752,102 @@ class SITLInstance:
             logger.error(f"Error in MAVLink setup for instance {self.instance_id}: {e}")
             return True
     
+    def link_data_rate(self):
+        """Data-rate cap (bytes/s) of the current rate profile"""
+        return MAVLINK_RATE_PROFILES[self.rate_profile]["rate"]
+    
+    def apply_stream_rates(self):
+        """Push the current rate profile's per-stream rates to PX4"""
+        mavlink_shell = os.path.join(self.px4_path, "Tools", "mavlink_shell.py")
+        if not os.path.exists(mavlink_shell):
+            logger.warning(f"MAVLink shell not found at {mavlink_shell}, cannot apply stream rates")
+            return False
+        
+        streams = MAVLINK_RATE_PROFILES[self.rate_profile]["streams"]
+        commands = "".join(f"mavlink stream -u {self.udp_port} -s {stream} -r {rate}\n"
+                           for stream, rate in streams.items())
+        
+        try:
+            result = subprocess.run(
+                ['python3', mavlink_shell, f'udp:127.0.0.1:{self.udp_port}'],
+                input=commands,
+                text=True,
+                capture_output=True,
+                timeout=20
+            )
+        except Exception as e:
+            logger.warning(f"Applying stream rates failed for instance {self.instance_id}: {e}")
+            return False
+        
+        if result.returncode == 0:
+            logger.info(f"✅ Applied '{self.rate_profile}' stream rates for instance {self.instance_id}")
+            return True
+        
+        logger.warning(f"⚠️ Applying stream rates failed for instance {self.instance_id}: {result.stderr}")
+        return False
+    
+    def set_rate_profile(self, rate_profile):
+        """Switch to another rate profile, applying it right away if running"""
+        if rate_profile not in MAVLINK_RATE_PROFILES:
+            raise ValueError(f"Unknown rate profile: {rate_profile}")
+        
+        previous = self.rate_profile
+        self.rate_profile = rate_profile
+        logger.info(f"Instance {self.instance_id} rate profile: {previous} -> {rate_profile}")
+        
+        if self.status != "running":
+            return True
+        
+        # The link's data-rate cap is fixed at 'mavlink start'; only stream rates change live
+        return self.apply_stream_rates()
+    
+    def gz_world(self):
+        """Gazebo world this vehicle lives in"""
+        return self.world or self.launch_env().get('PX4_GZ_WORLD', 'default')
+    
+    def reset_pose(self):
+        """Move the vehicle back to its spawn point, the way its simulator backend can"""
+        return self.backend.reset_pose(self)
+    
+    def reset(self):
+        """Reset the vehicle in place: disarm, back to its spawn pose, fresh estimator and
+        commander state. PX4, the simulator, ports and router endpoints stay up. Returns step timings (ms)."""
+        timings = {}
+        started = time.monotonic()
+        step = started
+        
+        def lap(name):
+            nonlocal step
+            now = time.monotonic()
+            timings[f"{name}_ms"] = round((now - step) * 1000, 1)
+            step = now
+        
+        with MissionClient(self.tcp_port, timeout=10) as client:
+            # Commander: force disarm (works in the air too) and drop the old mission
+            if client.command(MAV_CMD_COMPONENT_ARM_DISARM, [0, FORCE_DISARM_MAGIC]) != MAV_RESULT_ACCEPTED:
+                raise Exception("vehicle refused to disarm")
+            client.send(MSG_ID_MISSION_CLEAR_ALL, bytes([client.target_system, 1, 0]))
+            lap("disarm")
+            
+            if not self.reset_pose():
+                raise Exception(f"{self.backend.label} did not accept the new pose for {self.gz_model or self.airframe}")
+            lap("pose")
+            
+            # Estimator: restart EKF2 so it re-initialises at the new pose, then wait for a fix
+            client.shell("ekf2 stop\nekf2 start")
+            client.position = None
+            client.wait_ready(30)
+            lap("estimator")
+            
+            # Home at the spawn point, and a neutral hold mode
+            client.command(MAV_CMD_DO_SET_HOME, [1])
+            client.command(MAV_CMD_DO_SET_MODE, [1, PX4_MAIN_MODE_AUTO, PX4_AUTO_MODE_LOITER])
+            lap("commander")
+        
+        timings["total_ms"] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"✅ Instance {self.instance_id} reset in {timings['total_ms']} ms")
+        return timings
+    
     def start(self):
         """Start this SITL instance"""
         logger.info(f"Starting SITL instance {self.instance_id} ({self.airframe})")
@@ -363,15 +875,62 @@ class SITLInstance:
             self.stop()
             return False
     
+    def freeze(self, cpu_cores, reason):
+        """Suspend PX4 and its simulator in place (cgroup freezer, else SIGSTOP to the process group)"""
+        if self.cgroup and self.cgroup.freeze(True):
+            self.freeze_method = "cgroup"
+        else:
+            os.killpg(os.getpgid(self.px4_process.pid), signal.SIGSTOP)
+            self.freeze_method = "sigstop"
+        
+        self.status = "paused"
+        self.pause_reason = reason
+        self.paused_at = time.monotonic()
+        self.paused_cpu_cores = cpu_cores
+        logger.info(f"SITL instance {self.instance_id} paused ({reason}, {self.freeze_method})")
+    
+    def thaw(self):
+        """Let a paused instance run again"""
+        if self.freeze_method == "cgroup":
+            self.cgroup.freeze(False)
+        elif self.freeze_method == "sigstop":
+            try:
+                os.killpg(os.getpgid(self.px4_process.pid), signal.SIGCONT)
+            except OSError:
+                pass
+        
+        paused_for = time.monotonic() - self.paused_at if self.paused_at else 0.0
+        self.paused_seconds += paused_for
+        self.cpu_core_seconds_reclaimed += paused_for * self.paused_cpu_cores
+        self.freeze_method = None
+        self.pause_reason = None
+        self.paused_at = None
+        self.status = "running"
+        logger.info(f"SITL instance {self.instance_id} resumed after {paused_for:.0f}s")
+    
+    def pause_status(self):
+        """Pause state and the CPU time it has saved so far"""
+        current = time.monotonic() - self.paused_at if self.paused_at else 0.0
+        return {
+            "paused": self.freeze_method is not None,
+            "reason": self.pause_reason,
+            "paused_for_s": round(current, 1),
+            "cpu_cores_reclaimed": round(self.paused_cpu_cores, 2) if self.paused_at else 0.0,
+            "total_paused_s": round(self.paused_seconds + current, 1),
+            "cpu_core_seconds_reclaimed": round(self.cpu_core_seconds_reclaimed + current * self.paused_cpu_cores, 1)
+        }
+    
     def stop(self):
         """Stop this SITL instance"""
         logger.info(f"Stopping SITL instance {self.instance_id}...")
         
+        # Frozen processes can't act on SIGTERM
+        if self.freeze_method:
+            self.thaw()
+        
+        # The whole process group (PX4, and a dedicated Gazebo) goes, and is reaped
         if self.px4_process:
-            try:
-                os.killpg(os.getpgid(self.px4_process.pid), signal.SIGTERM)
-            except:
-                pass
+            stop_process(self.px4_process, timeout=10)
         
         if self.mavlink_process:
             try:
@@ -383,14 +942,50 @@ class SITLInstance:
         self.start_time = None
         logger.info(f"✅ SITL instance {self.instance_id} stopped")
     
+    def get_resource_usage(self):
+        """Memory/CPU used by this vehicle, including its share of a shared Gazebo server"""
+        if not self.px4_process or self.px4_process.poll() is not None:
+            return None
+        
+        usage = group_usage(self.px4_process.pid)
+        usage["mode"] = "shared" if self.world else "dedicated" if self.backend.uses_gazebo else self.backend.name
+        usage["per_vehicle_mb"] = usage["rss_mb"]
+        if self.cgroup:
+            usage["cgroup"] = self.cgroup.stats()
+        
+        if self.world and self.world_manager:
+            world_usage = self.world_manager.get_world_usage(self.world)
+            vehicles = len(self.world_manager.worlds.get(self.world, {}).get("vehicles", {}))
+            if world_usage and vehicles:
+                usage["shared_world_rss_mb"] = world_usage["rss_mb"]
+                usage["per_vehicle_mb"] = round(usage["rss_mb"] + world_usage["rss_mb"] / vehicles, 1)
+        
+        return usage
+    
     def get_status(self):
         """Get status of this instance"""
         return {
             "instance_id": self.instance_id,
             "airframe": self.airframe,
+            "owner": self.owner,
             "status": self.status,
             "udp_port": self.udp_port,
             "tcp_port": self.tcp_port,
+            "mav_sys_id": self.mav_sys_id,
+            "world": self.world,
+            "model_pose": self.model_pose,
+            "rootfs_dir": self.rootfs_dir,
+            "rate_profile": self.rate_profile,
+            "speed_factor": self.speed_factor,
+            "sim_profile": self.sim_profile,
+            "simulator": self.backend.name,
+            "limits": self.cgroup.limits if self.cgroup else None,
+            "pause": self.pause_status(),
+            "restart_count": self.restart_count,
+            "last_failure_reason": self.last_failure_reason,
+            "last_failure_time": self.last_failure_time.isoformat() if self.last_failure_time else None,
+            "crash_loop": self.crash_loop,
+            "resources": self.get_resource_usage(),
             "start_time": self.start_time.isoformat() if self.start_time else None
         }
 
@@ -398,30 +993,314 @@ class SITLInstance:
 class MultiSITLManager:
     """Manages multiple SITL instances"""
     
-    def __init__(self):
+    def __init__(self, world_sharing=False, default_world="default", registry=None,
+                 cpu_budget=None, memory_budget_mb=None, metrics_interval=15,
+                 watchdog_interval=2.0, auto_restart=False, rootfs_store=None, router_shards=None,
+                 cgroups=None, quotas=None, idle_suspend_after=None, gcs_mux_port=None, resource_warmup=False):
         self.instances = {}
-        self.port_pool = PortPool()
-        self.router_manager = MAVLinkRouterManager()
+        # SIH vehicles are light enough for dozens per host, so the cap can be raised
+        self.port_pool = PortPool(int(os.environ.get('SITL_MAX_INSTANCES', 10)))
+        self.router_manager = MAVLinkRouterManager(shards=router_shards)
+        self.world_manager = GazeboWorldManager(os.path.expanduser("~/PX4-Autopilot"))
+        self.registry = registry or AirframeRegistry()
+        self.rootfs_store = rootfs_store or RootfsStore(
+            os.path.join(os.path.expanduser("~/PX4-Autopilot"), "build", "px4_sitl_default"),
+            root=os.path.join(self.registry.cache_dir, "rootfs"))
+        self.cgroups = cgroups or CgroupManager(os.environ.get('SITL_CGROUP_ROOT', DEFAULT_CGROUP_ROOT))
+        self.world_sharing = world_sharing
+        self.default_world = default_world
         self.next_instance_id = 1
+        self.param_snapshots = {}  # instance_id -> ParamSnapshot
+        self.reset_stats = {}  # instance_id -> in-place reset counters and timings
+        self.scenario_runs = {}  # run_id -> ScenarioRunner
+        self.operations = OperationCoalescer()  # coalesces duplicate create/start/stop requests
+        self.ulog_index = UlogIndex()
+        self.lite_worlds = LiteWorldBuilder(os.path.join(self.registry.cache_dir, "lite_worlds"))
+        
+        # Every Gazebo start resolves models and worlds from one pre-warmed local cache
+        self.world_manager.resource_cache = GzResourceCache(os.path.join(self.registry.cache_dir, "gz_resources"),
+                                                            self.world_manager.px4_path)
+        if resource_warmup:
+            self.world_manager.resource_cache.start_warm_up(*self.gz_resources())
+        self.lock = threading.RLock()  # guards port/id allocation across concurrent requests
+        self.capacity_changed = threading.Condition(self.lock)  # signalled when queued creates may fit
+        
+        # Per-user quotas; creates that don't fit wait in a fair-share queue
+        if quotas is None and os.environ.get('SITL_QUOTAS_FILE'):
+            quotas = QuotaPolicy.load(os.environ['SITL_QUOTAS_FILE'])
+        self.quotas = quotas or QuotaPolicy()
+        self.create_queue = FairShareQueue()
+        
+        # Admission budget, in the same units as the airframe cost model
+        self.cpu_budget = cpu_budget if cpu_budget is not None else (os.cpu_count() or 1) * CPU_OVERCOMMIT
+        self.memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else host_memory_mb() * 0.9
+        
+        # Live metrics sampling feeds the airframe cost model
+        self.cpu_sampler = CpuSampler()
+        self.bandwidth_monitor = BandwidthMonitor()
+        self.instance_metrics = {}
+        self.metrics_interval = metrics_interval
+        self.metrics_warmup = 60  # seconds after start before a vehicle's cost is trusted
+        if metrics_interval:
+            threading.Thread(target=self.metrics_loop, daemon=True).start()
+        
+        # Process/heartbeat supervision, optionally restarting failed instances
+        self.watchdog = HealthWatchdog(self, interval=watchdog_interval, auto_restart=auto_restart)
+        if watchdog_interval:
+            self.watchdog.start()
+        
+        # Optionally pause vehicles nobody is using, and wake them when a GCS connects
+        if idle_suspend_after is None:
+            idle_suspend_after = float(os.environ.get('SITL_IDLE_SUSPEND_MINUTES', 0)) * 60
+        self.idle_suspender = IdleSuspender(self, idle_timeout=idle_suspend_after) if idle_suspend_after else None
+        if self.idle_suspender:
+            self.idle_suspender.start()
+        
+        # Optionally serve every vehicle on one public GCS port, told apart by system id
+        if gcs_mux_port is None:
+            gcs_mux_port = int(os.environ.get('SITL_GCS_MUX_PORT', 0))
+        self.gcs_mux = GcsMux(gcs_mux_port) if gcs_mux_port else None
+        if self.gcs_mux and not self.gcs_mux.start():
+            self.gcs_mux = None
+    
+    def gz_resources(self):
+        """(models, worlds) the configured Gazebo airframes need"""
+        backend = get_backend("gz")
+        models, worlds = set(), {"default", self.default_world}
+        for profile in self.registry.profiles.values():
+            if profile.backend != backend.name:
+                continue
+            models.add(backend.base_model(profile.name))
+            if 'PX4_GZ_WORLD' in profile.env:
+                worlds.add(profile.env['PX4_GZ_WORLD'])
+        return sorted(models), sorted(worlds)
+    
+    def reserved_capacity(self):
+        """(cpu_cores, memory_mb) reserved by all existing instances"""
+        cpu = memory = 0.0
+        for instance in self.instances.values():
+            instance_cpu, instance_memory = self.registry.cost(instance.airframe, instance.sim_profile)
+            cpu += instance_cpu
+            memory += instance_memory
+        return cpu, memory
+    
+    def user_usage(self):
+        """Instances, CPU cores and memory reserved per user"""
+        usage = {}
+        for instance in list(self.instances.values()):
+            cpu, memory = self.registry.cost(instance.airframe, instance.sim_profile)
+            totals = usage.setdefault(instance.owner, {"instances": 0, "cpu": 0.0, "memory_mb": 0.0})
+            totals["instances"] += 1
+            totals["cpu"] += cpu
+            totals["memory_mb"] += memory
+        return usage
+    
+    def check_quota(self, airframe, user=ANONYMOUS_USER, idempotency_key=None, sim_profile="default"):
+        """Return None if the user may add this vehicle, otherwise the quota it would exceed"""
+        if idempotency_key and self.operations.known(scoped_key(user, idempotency_key)):
+            return None
+        
+        quota = self.quotas.quota(user)
+        usage = self.user_usage().get(user, {"instances": 0, "cpu": 0.0})
+        cpu, _ = self.registry.cost(airframe, sim_profile)
+        
+        if quota["max_instances"] is not None and usage["instances"] + 1 > quota["max_instances"]:
+            return f"Instance quota of {user} reached: {usage['instances']} of {quota['max_instances']} in use"
+        if quota["max_cpu"] is not None and usage["cpu"] + cpu > quota["max_cpu"]:
+            return (f"CPU quota of {user} exceeded: {airframe} needs {cpu:.1f} cores, "
+                    f"{quota['max_cpu'] - usage['cpu']:.1f} of {quota['max_cpu']:.1f} left")
+        return None
+    
+    def check_admission(self, airframe, idempotency_key=None, user=ANONYMOUS_USER, sim_profile="default"):
+        """Return None if a new vehicle fits the host budget, otherwise the reason it doesn't"""
+        # A retried create is already admitted (and counted in the reserved capacity)
+        if idempotency_key and self.operations.known(scoped_key(user, idempotency_key)):
+            return None
+        
+        if len(self.port_pool.used_ports) >= self.port_pool.max_instances:
+            return f"Maximum number of instances ({self.port_pool.max_instances}) reached"
+        
+        cpu, memory = self.registry.cost(airframe, sim_profile)
+        reserved_cpu, reserved_memory = self.reserved_capacity()
+        
+        if reserved_cpu + cpu > self.cpu_budget:
+            return (f"CPU budget exceeded: {airframe} needs {cpu:.1f} cores, "
+                    f"{self.cpu_budget - reserved_cpu:.1f} of {self.cpu_budget:.1f} free")
+        if reserved_memory + memory > self.memory_budget_mb:
+            return (f"Memory budget exceeded: {airframe} needs {memory:.0f} MB, "
+                    f"{self.memory_budget_mb - reserved_memory:.0f} of {self.memory_budget_mb:.0f} MB free")
+        return None
     
-    def create_instance(self, airframe="gz_x500"):
-        """Create a new SITL instance"""
+    def allocate_sys_id(self):
+        """Lowest MAVLink system id no instance uses (caller holds the lock)"""
+        used = {instance.mav_sys_id for instance in self.instances.values()}
+        for sysid in range(1, MAX_SYS_ID + 1):
+            if sysid not in used:
+                return sysid
+        raise Exception("No free MAVLink system id")
+    
+    def instance_limits(self, airframe, speed_factor=1.0, overrides=None, sim_profile="default"):
+        """cgroup limits for a new instance: defaults from the airframe cost, then its 'limits', then overrides"""
+        profile = self.registry.get(airframe)
+        cpu, memory = profile.cost(sim_profile)
+        limits = {
+            "cpu_weight": max(1, min(10000, round(100 * cpu))),  # relative share; 100 is one typical core
+            "cpu_max_cores": None,
+            "memory_max_mb": round(memory * MEMORY_LIMIT_HEADROOM)
+        }
+        limits.update(profile.limits)
+        
+        for key, value in (overrides or {}).items():
+            if key not in LIMIT_KEYS:
+                raise Exception(f"Unknown limit: {key}")
+            if value is not None and float(value) <= 0:
+                raise Exception(f"Limit {key} must be positive")
+            limits[key] = value
+        
+        # Lockstep at N x real time needs N x the CPU time
+        if limits["cpu_max_cores"]:
+            limits["cpu_max_cores"] = float(limits["cpu_max_cores"]) * speed_factor
+        return limits
+    
+    def wait_for_capacity(self, airframe, user, queue_timeout=0, sim_profile="default"):
+        """Return once a new vehicle may be admitted, queueing behind other users' creates (caller holds the lock)"""
+        ticket = None
+        deadline = time.monotonic() + queue_timeout
         try:
-            # Allocate ports
-            udp_port, tcp_port = self.port_pool.allocate_ports()
+            while True:
+                reason = self.check_quota(airframe, user, sim_profile=sim_profile)
+                if reason:
+                    raise Exception(reason)
+                
+                reason = self.check_admission(airframe, user=user, sim_profile=sim_profile)
+                usage = {name: totals["cpu"] for name, totals in self.user_usage().items()}
+                if reason is None and self.create_queue.is_next(ticket, usage, self.quotas):
+                    break
+                
+                reason = reason or f"{len(self.create_queue.tickets)} queued creates are ahead"
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(reason)
+                if ticket is None:
+                    ticket = self.create_queue.enqueue(user, airframe)
+                    logger.info(f"Queued create of {airframe} for {user}: {reason}")
+                self.capacity_changed.wait(remaining)
+        except Exception:
+            if ticket is not None:
+                self.create_queue.leave(ticket, served=False)
+                self.capacity_changed.notify_all()
+            raise
+        
+        if ticket is not None:
+            self.create_queue.leave(ticket, served=True)
+            self.capacity_changed.notify_all()
+            logger.info(f"Admitted queued create of {airframe} for {user}")
+    
+    def create_instance(self, airframe="gz_x500", world=None, rate_profile=DEFAULT_RATE_PROFILE, speed_factor=1.0,
+                        limits=None, idempotency_key=None, user=ANONYMOUS_USER, queue_timeout=0,
+                        sim_profile="default"):
+        """Create a new SITL instance; a repeat with the same idempotency key returns the same instance"""
+        if not idempotency_key:
+            return self.new_instance(airframe, world, rate_profile, speed_factor, limits, user, queue_timeout,
+                                     sim_profile)
+        
+        fingerprint = ("create", airframe, world, rate_profile, speed_factor, sorted((limits or {}).items()),
+                       sim_profile)
+        return self.operations.run_idempotent(
+            scoped_key(user, idempotency_key), fingerprint,
+            lambda: self.new_instance(airframe, world, rate_profile, speed_factor, limits, user, queue_timeout,
+                                      sim_profile))
+    
+    def launch_instance(self, airframe="gz_x500", world=None, rate_profile=DEFAULT_RATE_PROFILE, speed_factor=1.0,
+                        limits=None, idempotency_key=None, user=ANONYMOUS_USER, queue_timeout=0,
+                        sim_profile="default"):
+        """Create and start an instance in one step (removed again if it fails to start)"""
+        def launch():
+            instance_id = self.new_instance(airframe, world, rate_profile, speed_factor, limits, user, queue_timeout,
+                                            sim_profile)
+            if instance_id and not self.start_instance(instance_id):
+                self.remove_instance(instance_id)
+                return None
+            return instance_id
+        
+        if not idempotency_key:
+            return launch()
+        
+        fingerprint = ("launch", airframe, world, rate_profile, speed_factor, sorted((limits or {}).items()),
+                       sim_profile)
+        return self.operations.run_idempotent(scoped_key(user, idempotency_key), fingerprint, launch)
+    
+    def new_instance(self, airframe, world, rate_profile, speed_factor, limits, user=ANONYMOUS_USER, queue_timeout=0,
+                     sim_profile="default"):
+        """Validate, allocate and register a new instance (returns its id, None on failure)"""
+        try:
+            if not self.registry.is_valid(airframe):
+                raise Exception(f"Invalid airframe: {airframe}")
+            
+            if rate_profile not in MAVLINK_RATE_PROFILES:
+                raise Exception(f"Unknown rate profile: {rate_profile}")
             
-            # Create instance
-            instance_id = f"instance_{self.next_instance_id}"
-            instance = SITLInstance(instance_id, airframe, udp_port, tcp_port)
+            if not 0 < speed_factor <= MAX_SPEED_FACTOR:
+                raise Exception(f"Speed factor must be between 0 and {MAX_SPEED_FACTOR}")
             
-            # Store instance
-            self.instances[instance_id] = instance
-            self.next_instance_id += 1
+            if sim_profile not in SIM_PROFILES:
+                raise Exception(f"Unknown simulation profile: {sim_profile}")
+            profile = self.registry.get(airframe)
+            uses_gazebo = get_backend(profile.backend).uses_gazebo if profile else True
+            if sim_profile == "lite" and not uses_gazebo:
+                raise Exception(f"The lite profile only applies to Gazebo airframes, not {airframe}")
+            if sim_profile == "lite" and self.world_sharing:
+                raise Exception("The lite profile needs a dedicated Gazebo, not available in world-sharing mode")
             
-            # Add to router manager
-            self.router_manager.add_instance(instance_id, udp_port, tcp_port)
+            limits = self.instance_limits(airframe, speed_factor, limits, sim_profile)
             
-            logger.info(f"Created SITL instance {instance_id} with airframe {airframe}")
+            with self.lock:
+                # Admission and allocation together, so concurrent creates can't overbook the host
+                self.wait_for_capacity(airframe, user, queue_timeout, sim_profile)
+                
+                # Allocate ports
+                udp_port, tcp_port = self.port_pool.allocate_ports()
+                
+                # In world-sharing mode every Gazebo vehicle joins one Gazebo server per world
+                if self.world_sharing and uses_gazebo:
+                    world = world or self.default_world
+                else:
+                    world = None
+                
+                # Create instance; ids whose rootfs another running manager on this host holds are skipped
+                while self.rootfs_store.owned_elsewhere(f"instance_{self.next_instance_id}"):
+                    self.next_instance_id += 1
+                instance_id = f"instance_{self.next_instance_id}"
+                px4_instance = udp_port - self.port_pool.udp_base
+                instance = SITLInstance(instance_id, airframe, udp_port, tcp_port,
+                                        px4_instance=px4_instance, world=world,
+                                        profile=profile,
+                                        rate_profile=rate_profile, speed_factor=speed_factor,
+                                        mav_sys_id=self.allocate_sys_id(), sim_profile=sim_profile)
+                instance.world_manager = self.world_manager
+                instance.lite_worlds = self.lite_worlds
+                instance.owner = user
+                
+                # Private params/dataman/logs, so instances never share PX4 storage
+                try:
+                    instance.rootfs_dir = self.rootfs_store.clone(airframe, instance_id)
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not clone rootfs for {instance_id}, using the build rootfs: {e}")
+                
+                # CPU share/quota and memory limit for PX4 and its simulator
+                instance.cgroup = self.cgroups.create(instance_id, limits)
+                
+                # Store instance
+                self.instances[instance_id] = instance
+                self.next_instance_id += 1
+                
+                # Add to router manager
+                self.router_manager.add_instance(instance_id, udp_port, tcp_port)
+                if self.gcs_mux:
+                    self.gcs_mux.add_vehicle(instance.mav_sys_id, instance_id, tcp_port)
+            
+            logger.info(f"Created SITL instance {instance_id} (system id {instance.mav_sys_id}) "
+                        f"with airframe {airframe} for {user}")
             return instance_id
             
         except Exception as e:
@@ -429,22 +1308,137 @@ class MultiSITLManager:
             return None
     
     def start_instance(self, instance_id):
-        """Start a specific instance"""
+        """Start a specific instance; a start already in progress is joined, not repeated"""
+        return self.operations.run(("start", instance_id), lambda: self.boot_instance(instance_id))
+    
+    def boot_instance(self, instance_id):
+        """Boot PX4 (and its simulator) for an instance"""
+        if instance_id not in self.instances:
+            logger.error(f"Instance {instance_id} not found")
+            return False
+        
+        instance = self.instances[instance_id]
+        
+        if instance.status in ACTIVE_STATES:
+            logger.info(f"Instance {instance_id} is already running")
+            return True
+        
+        if instance.status == "paused":
+            return self.resume_instance(instance_id)
+        
+        if instance.world:
+            instance.model_pose = self.world_manager.attach(instance.world, instance_id)
+            if instance.model_pose is None:
+                logger.error(f"Could not attach instance {instance_id} to world '{instance.world}'")
+                return False
+        
+        success = instance.start()
+        
+        if success:
+            self.watchdog.instance_started(instance)
+        elif instance.world:
+            self.world_manager.detach(instance.world, instance_id)
+        
+        return success
+    
+    def restart_instance(self, instance_id):
+        """Stop and start an instance again on the same ports (used by the watchdog)"""
         if instance_id not in self.instances:
             logger.error(f"Instance {instance_id} not found")
             return False
         
         instance = self.instances[instance_id]
-        return instance.start()
+        logger.info(f"Restarting SITL instance {instance_id}...")
+        
+        # Keep the ports and world slot; attach() brings a dead world server back
+        instance.stop()
+        instance.status = "restarting"
+        return self.start_instance(instance_id)
+    
+    def pause_instance(self, instance_id, reason="manual"):
+        """Freeze a running instance's processes; sim time stands still until it is resumed"""
+        with self.lock:
+            instance = self.instances.get(instance_id)
+            if instance is None:
+                logger.error(f"Instance {instance_id} not found")
+                return False
+            if instance.status == "paused":
+                return True
+            if instance.status not in ACTIVE_STATES:
+                logger.error(f"Cannot pause instance {instance_id} in state {instance.status}")
+                return False
+            if instance.world:
+                # The shared Gazebo server keeps simulating the model without its controller
+                logger.error(f"Cannot pause instance {instance_id}: it shares Gazebo world '{instance.world}'")
+                return False
+            
+            # The CPU the vehicle was measured using, or its airframe's typical cost
+            metrics = self.instance_metrics.get(instance_id) or {}
+            if metrics.get("cpu_percent") is not None:
+                cpu_cores = metrics["cpu_percent"] / 100.0
+            else:
+                cpu_cores = self.registry.cost(instance.airframe, instance.sim_profile)[0]
+            
+            try:
+                instance.freeze(cpu_cores, reason)
+            except OSError as e:
+                logger.error(f"❌ Could not pause instance {instance_id}: {e}")
+                return False
+            self.watchdog.instance_paused(instance_id)
+            return True
+    
+    def resume_instance(self, instance_id):
+        """Thaw a paused instance"""
+        with self.lock:
+            instance = self.instances.get(instance_id)
+            if instance is None:
+                logger.error(f"Instance {instance_id} not found")
+                return False
+            if instance.status in ACTIVE_STATES:
+                return True
+            if instance.status != "paused":
+                logger.error(f"Cannot resume instance {instance_id} in state {instance.status}")
+                return False
+            
+            instance.thaw()
+            self.watchdog.instance_resumed(instance)
+            if self.idle_suspender:
+                self.idle_suspender.activity(instance_id, time.monotonic())
+            return True
+    
+    def get_pause_metrics(self):
+        """Paused instances and the CPU pausing has reclaimed"""
+        paused = [instance for instance in self.instances.values() if instance.status == "paused"]
+        statuses = [instance.pause_status() for instance in self.instances.values()]
+        return {
+            "paused": len(paused),
+            "paused_idle": len([instance for instance in paused if instance.pause_reason == "idle"]),
+            "cpu_cores_reclaimed": round(sum(status["cpu_cores_reclaimed"] for status in statuses), 2),
+            "cpu_core_seconds_reclaimed": round(sum(status["cpu_core_seconds_reclaimed"] for status in statuses), 1),
+            "idle_policy": self.idle_suspender.get_stats() if self.idle_suspender else None
+        }
     
     def stop_instance(self, instance_id):
-        """Stop a specific instance"""
+        """Stop a specific instance; a stop already in progress is joined, not repeated"""
+        return self.operations.run(("stop", instance_id), lambda: self.halt_instance(instance_id))
+    
+    def halt_instance(self, instance_id):
+        """Stop an instance's processes and release its world slot and ports"""
         if instance_id not in self.instances:
             logger.error(f"Instance {instance_id} not found")
             return False
         
         instance = self.instances[instance_id]
+        if instance.status == "stopped":
+            logger.info(f"Instance {instance_id} is already stopped")
+            return True
+        
+        self.watchdog.instance_stopped(instance_id)
         instance.stop()
+        instance.crash_loop = False
+        
+        if instance.world:
+            self.world_manager.detach(instance.world, instance_id)
         
         # Release ports
         self.port_pool.release_ports(instance.udp_port, instance.tcp_port)
@@ -459,18 +1453,43 @@ class MultiSITLManager:
         
         instance = self.instances[instance_id]
         
-        if instance.status == "running":
+        if instance.status in ACTIVE_STATES or instance.status == "paused":
             logger.error(f"Cannot remove running instance {instance_id}")
             return False
         
-        # Remove from router manager
-        self.router_manager.remove_instance(instance_id)
+        if self.operations.in_progress(("start", instance_id)):
+            logger.error(f"Cannot remove instance {instance_id} while it is starting")
+            return False
         
-        # Release ports
-        self.port_pool.release_ports(instance.udp_port, instance.tcp_port)
+        if instance.status == "failed":
+            # Clean up whatever survived the crash
+            instance.stop()
+            if instance.world:
+                self.world_manager.detach(instance.world, instance_id)
+        
+        self.watchdog.instance_removed(instance_id)
         
-        # Remove instance
-        del self.instances[instance_id]
+        with self.lock:
+            # Remove from router manager
+            self.router_manager.remove_instance(instance_id)
+            if self.gcs_mux:
+                self.gcs_mux.remove_vehicle(instance.mav_sys_id)
+            
+            # Release ports
+            self.port_pool.release_ports(instance.udp_port, instance.tcp_port)
+            
+            # Remove instance
+            del self.instances[instance_id]
+            self.capacity_changed.notify_all()
+        self.cpu_sampler.forget(instance_id)
+        self.instance_metrics.pop(instance_id, None)
+        self.bandwidth_monitor.forget(instance.tcp_port)
+        self.param_snapshots.pop(instance_id, None)
+        self.reset_stats.pop(instance_id, None)
+        self.rootfs_store.remove(instance_id)
+        self.cgroups.remove(instance.cgroup)
+        # An Idempotency-Key retry for this instance now creates (and is admitted as) a new one
+        self.operations.forget(instance_id)
         logger.info(f"Removed SITL instance {instance_id}")
         return True
     
@@ -479,30 +1498,349 @@ class MultiSITLManager:
         logger.info("Stopping all SITL instances...")
         
         for instance_id, instance in self.instances.items():
-            if instance.status == "running":
+            if instance.status in ACTIVE_STATES or instance.status == "failed":
+                self.watchdog.instance_stopped(instance_id)
                 instance.stop()
                 self.port_pool.release_ports(instance.udp_port, instance.tcp_port)
         
-        # Stop the router
+        # Stop the router and any shared Gazebo servers
         self.router_manager.stop_router()
+        self.world_manager.stop_all()
         
         logger.info("All SITL instances stopped")
     
+    def health_status(self, instance):
+        """Instance status plus the watchdog's view of its heartbeat"""
+        status = instance.get_status()
+        age = self.watchdog.heartbeats.heartbeat_age(instance.instance_id)
+        status["heartbeat_age"] = round(age, 1) if age is not None else None
+        if instance.instance_id in self.router_manager.active_instances:
+            shard = self.router_manager.shard_for(instance.instance_id)
+            status["router_shard"] = shard.index
+            status["router_port"] = shard.server_port
+        return status
+    
     def get_all_status(self):
         """Get status of all instances"""
         return {
-            "instances": {instance_id: instance.get_status() 
+            "instances": {instance_id: self.health_status(instance)
                          for instance_id, instance in self.instances.items()},
             "total_instances": len(self.instances),
-            "running_instances": len([i for i in self.instances.values() if i.status == "running"])
+            "running_instances": len([i for i in self.instances.values() if i.status in ACTIVE_STATES]),
+            "failed_instances": len([i for i in self.instances.values() if i.status == "failed"]),
+            "world_sharing": self.world_sharing,
+            "worlds": self.world_manager.get_status(),
+            "gz_resources": self.world_manager.resource_cache.get_status(),
+            "routers": self.router_manager.get_status(),
+            "gcs_mux": self.get_gcs_mux(),
+            "processes": get_supervisor().get_status()
+        }
+    
+    def get_memory_report(self):
+        """Per-vehicle memory of running instances, grouped by dedicated/shared mode"""
+        report = {}
+        for instance in self.instances.values():
+            usage = instance.get_resource_usage()
+            if usage is None:
+                continue
+            mode = report.setdefault(usage["mode"], {"vehicles": 0, "total_mb": 0.0})
+            mode["vehicles"] += 1
+            mode["total_mb"] += usage["per_vehicle_mb"]
+        
+        for mode in report.values():
+            mode["total_mb"] = round(mode["total_mb"], 1)
+            mode["per_vehicle_mb"] = round(mode["total_mb"] / mode["vehicles"], 1)
+        
+        return report
+    
+    def set_rate_profile(self, instance_id, rate_profile):
+        """Change an instance's MAVLink rate profile at runtime"""
+        if instance_id not in self.instances:
+            logger.error(f"Instance {instance_id} not found")
+            return False
+        
+        return self.instances[instance_id].set_rate_profile(rate_profile)
+    
+    def snapshot_file(self, instance):
+        """Where an instance's parameter snapshot is kept on disk (None without a private rootfs)"""
+        return os.path.join(instance.rootfs_dir, "params.snapshot") if instance.rootfs_dir else None
+    
+    def snapshot_params(self, instance_id):
+        """Download a running instance's full parameter set and keep it as its snapshot"""
+        instance = self.instances.get(instance_id)
+        if instance is None or instance.status not in ACTIVE_STATES:
+            return None
+        
+        started = time.monotonic()
+        with ParamClient(instance.tcp_port) as client:
+            snapshot = client.fetch_all()
+        
+        self.param_snapshots[instance_id] = snapshot
+        path = self.snapshot_file(instance)
+        if path:
+            with open(path, 'wb') as f:
+                f.write(snapshot.to_bytes())
+        
+        summary = snapshot.get_summary()
+        summary["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"Snapshot of {instance_id}: {summary['param_count']} parameters "
+                    f"in {summary['elapsed_ms']} ms")
+        return summary
+    
+    def get_param_snapshot(self, instance_id):
+        """The instance's snapshot, loading it from its rootfs after an app restart"""
+        snapshot = self.param_snapshots.get(instance_id)
+        instance = self.instances.get(instance_id)
+        if snapshot is None and instance is not None:
+            path = self.snapshot_file(instance)
+            if path and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    snapshot = ParamSnapshot.from_bytes(f.read(), taken_at=os.path.getmtime(path))
+                self.param_snapshots[instance_id] = snapshot
+        return snapshot
+    
+    def restore_params(self, instance_id):
+        """Push back only the parameters that changed since the snapshot"""
+        instance = self.instances.get(instance_id)
+        snapshot = self.get_param_snapshot(instance_id)
+        if instance is None or snapshot is None or instance.status not in ACTIVE_STATES:
+            return None
+        
+        started = time.monotonic()
+        with ParamClient(instance.tcp_port) as client:
+            changed = snapshot.diff(client.fetch_all())
+            restored, failed = client.set_many(changed) if changed else ([], [])
+        
+        result = {
+            "changed": len(changed),
+            "restored": len(restored),
+            "failed": failed,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+        logger.info(f"Restored {len(restored)}/{len(changed)} parameters of {instance_id} "
+                    f"in {result['elapsed_ms']} ms")
+        return result
+    
+    def reset_instance(self, instance_id):
+        """Reset a running vehicle in place instead of stop + start; returns step timings"""
+        instance = self.instances.get(instance_id)
+        if instance is None or instance.status not in ACTIVE_STATES:
+            return None
+        
+        stats = self.reset_stats.setdefault(instance_id, {"resets": 0, "failures": 0, "last": None,
+                                                          "total_ms": 0.0, "max_ms": 0.0})
+        try:
+            timings = instance.reset()
+        except Exception:
+            stats["failures"] += 1
+            raise
+        
+        stats["resets"] += 1
+        stats["last"] = timings
+        stats["total_ms"] += timings["total_ms"]
+        stats["max_ms"] = max(stats["max_ms"], timings["total_ms"])
+        return timings
+    
+    def get_reset_metrics(self):
+        """Per-instance reset counts with average/max/last duration"""
+        metrics = {}
+        for instance_id, stats in self.reset_stats.items():
+            metrics[instance_id] = {
+                "resets": stats["resets"],
+                "failures": stats["failures"],
+                "avg_ms": round(stats["total_ms"] / stats["resets"], 1) if stats["resets"] else None,
+                "max_ms": stats["max_ms"],
+                "last": stats["last"]
+            }
+        return metrics
+    
+    def get_bandwidth(self, instance_id):
+        """Measured GCS bandwidth (bytes/s and totals) for an instance and each of its clients"""
+        if instance_id not in self.instances:
+            return None
+        
+        instance = self.instances[instance_id]
+        # The watchdog's own heartbeat connection is not a GCS client
+        report = self.bandwidth_monitor.sample(instance.tcp_port,
+                                               exclude=self.watchdog.heartbeats.local_addresses())
+        report["rate_profile"] = instance.rate_profile
+        report["link_data_rate"] = instance.link_data_rate()
+        return report
+    
+    def collect_metrics(self):
+        """Sample every running instance and refresh the airframe cost model"""
+        for instance_id, instance in list(self.instances.items()):
+            usage = instance.get_resource_usage() if instance.status in ACTIVE_STATES else None
+            if usage is None:
+                self.cpu_sampler.forget(instance_id)
+                self.instance_metrics.pop(instance_id, None)
+                continue
+            
+            usage["cpu_percent"] = self.cpu_sampler.sample(instance_id, usage["cpu_seconds"])
+            usage["bandwidth"] = self.get_bandwidth(instance_id)
+            usage["gcs_clients"] = self.gcs_mux.get_clients(instance.mav_sys_id) if self.gcs_mux else []
+            self.instance_metrics[instance_id] = usage
+            
+            uptime = (datetime.now() - instance.start_time).total_seconds() if instance.start_time else 0
+            if usage["cpu_percent"] is not None and uptime >= self.metrics_warmup:
+                self.registry.record_usage(instance.airframe, usage["cpu_percent"] / 100.0,
+                                           usage["per_vehicle_mb"], instance.sim_profile)
+    
+    def metrics_loop(self):
+        """Background sampling of instance resource usage"""
+        while True:
+            time.sleep(self.metrics_interval)
+            try:
+                self.collect_metrics()
+            except Exception as e:
+                logger.warning(f"Metrics collection failed: {e}")
+    
+    def get_metrics(self):
+        """Resource metrics per instance plus host budget and airframe costs"""
+        reserved_cpu, reserved_memory = self.reserved_capacity()
+        return {
+            "instances": {instance_id: dict(metrics, airframe=self.instances[instance_id].airframe)
+                          for instance_id, metrics in self.instance_metrics.items()
+                          if instance_id in self.instances},
+            "capacity": {
+                "cpu_budget": round(self.cpu_budget, 2),
+                "cpu_reserved": round(reserved_cpu, 2),
+                "memory_budget_mb": round(self.memory_budget_mb, 1),
+                "memory_reserved_mb": round(reserved_memory, 1)
+            },
+            "airframes": {profile["name"]: profile["cost"] for profile in self.registry.list_profiles()},
+            "resets": self.get_reset_metrics(),
+            "operations": self.operations.get_stats(),
+            "queue": self.create_queue.get_stats(),
+            "pauses": self.get_pause_metrics()
+        }
+    
+    def get_user_usage(self):
+        """Per-user usage against quota, and queued creates"""
+        with self.lock:
+            usage = self.user_usage()
+            waiting = self.create_queue.waiting()
+        users = set(usage) | set(waiting) | set(self.quotas.users)
+        return {user: {
+            "instances": usage.get(user, {}).get("instances", 0),
+            "cpu": round(usage.get(user, {}).get("cpu", 0.0), 2),
+            "memory_mb": round(usage.get(user, {}).get("memory_mb", 0.0), 1),
+            "queued": waiting.get(user, 0),
+            "quota": self.quotas.quota(user)
+        } for user in sorted(users)}
+    
+    def set_user_quota(self, user, **settings):
+        """Change a user's quota at runtime (user None changes the default)"""
+        with self.lock:
+            self.quotas.set_quota(user, **settings)
+            self.capacity_changed.notify_all()
+        return self.quotas.quota(user)
+    
+    def identify_user(self, token=None, claimed_user=None):
+        """User name for a request's API token or claimed name"""
+        return self.quotas.identify(token, claimed_user)
+    
+    def get_gcs_mux(self):
+        """Single-port GCS mux status, or None when it is disabled"""
+        return self.gcs_mux.get_status() if self.gcs_mux else None
+    
+    def get_gcs_clients(self, instance_id):
+        """GCS clients of an instance: mux clients subscribed to it (their traffic with this vehicle,
+        connection rates, drops, TIMESYNC round trip) and clients connected straight to its TCP port
+        (bytes/s and TCP round trip); the router's and the mux's own connections are left out"""
+        if instance_id not in self.instances:
+            return None
+        
+        instance = self.instances[instance_id]
+        relays = self.router_manager.local_addresses()
+        if self.gcs_mux:
+            relays |= self.gcs_mux.local_addresses()
+        return {
+            "instance_id": instance_id,
+            "mav_sys_id": instance.mav_sys_id,
+            "mux": self.gcs_mux.get_clients(instance.mav_sys_id) if self.gcs_mux else None,
+            "direct": {peer: client for peer, client in self.get_bandwidth(instance_id)["clients"].items()
+                       if peer not in relays}
         }
     
+    def set_gcs_subscription(self, client_host, systems=None):
+        """Limit a GCS address to some vehicles (system or instance ids; None = all); returns the system ids"""
+        if not self.gcs_mux:
+            raise Exception("GCS mux is not enabled (set SITL_GCS_MUX_PORT)")
+        resolved = self.gcs_mux.set_subscription(client_host, systems)
+        return sorted(resolved) if resolved is not None else None
+    
+    def set_router_shards(self, count):
+        """Change the number of MAVLink router shards; returns how many instances moved"""
+        return self.router_manager.resize(int(count))
+    
+    def get_airframes(self):
+        """Airframe profiles (reloading the config if it changed) and the default airframe"""
+        self.registry.refresh()
+        return {"default": self.registry.default, "airframes": self.registry.list_profiles()}
+    
+    def default_airframe(self):
+        """Airframe used when a request doesn't name one"""
+        return self.registry.default
+    
+    def is_valid_airframe(self, airframe):
+        """True if the airframe is configured and available in the PX4 tree"""
+        self.registry.refresh()
+        return self.registry.is_valid(airframe)
+    
+    def get_memory_summary(self):
+        """Memory report plus the world-sharing mode it was measured in"""
+        return {"world_sharing": self.world_sharing, "modes": self.get_memory_report()}
+    
+    def has_param_snapshot(self, instance_id):
+        """True if the instance has a parameter snapshot to restore"""
+        return self.get_param_snapshot(instance_id) is not None
+    
+    def start_scenario_run(self, directory, airframe=None, instances=1, speed_factor=1.0, report_dir=None,
+                           user=ANONYMOUS_USER):
+        """Fly a directory of missions in the background on the user's vehicles; returns the run id"""
+        from scenario_runner import ScenarioRunner  # the runner drives this manager, so import it late
+        
+        run_id = uuid.uuid4().hex[:8]
+        report_root = os.environ.get('SITL_SCENARIO_REPORT_DIR', 'scenario_reports')
+        runner = ScenarioRunner(self, airframe=airframe or self.registry.default, instances=instances,
+                                speed_factor=speed_factor, report_dir=report_dir or os.path.join(report_root, run_id),
+                                user=user)
+        self.scenario_runs[run_id] = runner
+        threading.Thread(target=runner.run_safely, args=(directory,), daemon=True).start()
+        return {"run_id": run_id, "report_dir": runner.report_dir}
+    
+    def get_scenario_run(self, run_id):
+        """Progress or summary of a scenario run (None if unknown)"""
+        runner = self.scenario_runs.get(run_id)
+        return runner.get_status() if runner else None
+    
+    def list_ulogs(self, instance_id):
+        """PX4 flight logs (ULog) of an instance, newest first (None if the instance is unknown)"""
+        instance = self.instances.get(instance_id)
+        if instance is None:
+            return None
+        
+        logs = self.ulog_index.list(instance.log_dir())
+        return {
+            "instance_id": instance_id,
+            "logs": logs,
+            "total_size": sum(log["size"] for log in logs)
+        }
+    
+    def ulog_path(self, instance_id, name):
+        """Path on disk of one of an instance's flight logs (None if unknown)"""
+        instance = self.instances.get(instance_id)
+        if instance is None:
+            return None
+        return self.ulog_index.resolve(instance.log_dir(), name)
+    
     def get_instance_status(self, instance_id):
         """Get status of a specific instance"""
         if instance_id not in self.instances:
             return None
         
-        return self.instances[instance_id].get_status()
+        return self.health_status(self.instances[instance_id])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Parameter Snapshot and Restore for SITL Instances
+Pulls a vehicle's full parameter set over MAVLink into a compact snapshot and
+later pushes back only the parameters that changed, as a pipelined batch of
+PARAM_SET with ack tracking. Resets a vehicle between test runs without
+rebooting it.
+"""
+
+import time
+import struct
+import logging
+
+from mavlink_client import MAVLinkClient, AUTOPILOT_COMPONENT_ID
+
+logger = logging.getLogger(__name__)
+
+MSG_ID_PARAM_REQUEST_READ = 20
+MSG_ID_PARAM_REQUEST_LIST = 21
+MSG_ID_PARAM_VALUE = 22
+MSG_ID_PARAM_SET = 23
+
+PARAM_VALUE_FORMAT = struct.Struct('<4sHH16sB')  # value bytes, count, index, id, type
+PARAM_SET_FORMAT = struct.Struct('<4sBB16sB')  # value bytes, target system/component, id, type
+PARAM_REQUEST_READ_FORMAT = struct.Struct('<hBB16s')
+
+# One snapshot entry: id, type, raw value bytes. PX4 encodes integer parameters
+# bytewise in the float field, so the raw bytes round-trip exactly for every type.
+SNAPSHOT_ENTRY = struct.Struct('<16sB4s')
+
+
+class ParamSnapshot:
+    """Full parameter set of a vehicle: name -> (param_type, raw 4 value bytes)"""
+    
+    def __init__(self, params=None, taken_at=None):
+        self.params = params or {}
+        self.taken_at = taken_at or time.time()
+    
+    def to_bytes(self):
+        """Packed form, 21 bytes per parameter"""
+        return b''.join(SNAPSHOT_ENTRY.pack(name.encode(), param_type, raw)
+                        for name, (param_type, raw) in sorted(self.params.items()))
+    
+    @classmethod
+    def from_bytes(cls, data, taken_at=None):
+        """Inverse of to_bytes()"""
+        params = {}
+        for name, param_type, raw in SNAPSHOT_ENTRY.iter_unpack(data):
+            params[name.rstrip(b'\x00').decode()] = (param_type, raw)
+        return cls(params, taken_at)
+    
+    def diff(self, current):
+        """Parameters whose value in `current` differs from this snapshot"""
+        return {name: value for name, value in self.params.items()
+                if name in current.params and current.params[name][1] != value[1]}
+    
+    def get_summary(self):
+        """Size and age, for the API"""
+        return {
+            "param_count": len(self.params),
+            "stored_bytes": len(self.params) * SNAPSHOT_ENTRY.size,
+            "taken_at": self.taken_at
+        }
+
+
+class ParamClient(MAVLinkClient):
+    """Parameter protocol over a short-lived connection to an instance's GCS port"""
+    
+    def param_values(self, wait):
+        """Decoded PARAM_VALUE messages received within `wait` seconds"""
+        values = []
+        for _, (raw, count, index, name, param_type) in self.messages(
+                wait, {MSG_ID_PARAM_VALUE: PARAM_VALUE_FORMAT}):
+            values.append((name.rstrip(b'\x00').decode(errors='replace'), param_type, raw, count, index))
+        return values
+    
+    def fetch_all(self, stall_timeout=0.5, max_rounds=10):
+        """Read the full parameter set; missing indices are re-requested individually"""
+        self.wait_for_target()
+        self.send(MSG_ID_PARAM_REQUEST_LIST, bytes([self.target_system, AUTOPILOT_COMPONENT_ID]))
+        
+        by_index = {}
+        count = None
+        rounds = 0
+        deadline = time.monotonic() + self.timeout
+        last_progress = time.monotonic()
+        
+        while count is None or len(by_index) < count:
+            now = time.monotonic()
+            if now > deadline:
+                raise TimeoutError(f"parameter download incomplete ({len(by_index)}/{count})")
+            
+            if now - last_progress > stall_timeout:
+                if count is None or rounds >= max_rounds:
+                    raise TimeoutError(f"parameter download stalled ({len(by_index)}/{count})")
+                rounds += 1
+                missing = [index for index in range(count) if index not in by_index]
+                logger.info(f"Re-requesting {len(missing)} missing parameters (round {rounds})")
+                self.send_many((MSG_ID_PARAM_REQUEST_READ,
+                                PARAM_REQUEST_READ_FORMAT.pack(index, self.target_system,
+                                                               AUTOPILOT_COMPONENT_ID, b''))
+                               for index in missing)
+                last_progress = now
+            
+            for name, param_type, raw, param_count, index in self.param_values(0.1):
+                count = param_count
+                if index < param_count and index not in by_index:
+                    by_index[index] = (name, param_type, raw)
+                    last_progress = time.monotonic()
+        
+        return ParamSnapshot({name: (param_type, raw) for name, param_type, raw in by_index.values()})
+    
+    def set_many(self, params, window=64, ack_timeout=0.5, max_attempts=3):
+        """Pipelined PARAM_SET; returns (acked names, failed names)"""
+        self.wait_for_target()
+        pending = dict(params)  # name -> (type, raw) not yet acked
+        attempts = {}
+        sent_at = {}
+        acked = []
+        
+        deadline = time.monotonic() + self.timeout
+        while pending and time.monotonic() < deadline:
+            now = time.monotonic()
+            
+            # Keep up to `window` sets in flight; resend those whose ack is overdue
+            batch = []
+            in_flight = sum(1 for name in sent_at if now - sent_at[name] < ack_timeout)
+            for name, (param_type, raw) in pending.items():
+                if len(batch) + in_flight >= window:
+                    break
+                if name in sent_at and now - sent_at[name] < ack_timeout:
+                    continue
+                if attempts.get(name, 0) >= max_attempts:
+                    continue
+                attempts[name] = attempts.get(name, 0) + 1
+                sent_at[name] = now
+                batch.append((MSG_ID_PARAM_SET,
+                              PARAM_SET_FORMAT.pack(raw, self.target_system, AUTOPILOT_COMPONENT_ID,
+                                                    name.encode(), param_type)))
+            if batch:
+                self.send_many(batch)
+            elif all(attempts.get(name, 0) >= max_attempts and now - sent_at[name] >= ack_timeout
+                     for name in pending):
+                break
+            
+            # The vehicle acks a PARAM_SET by echoing the parameter's new value
+            for name, param_type, raw, _, _ in self.param_values(0.05):
+                if name in pending and pending[name][1] == raw:
+                    del pending[name]
+                    sent_at.pop(name, None)
+                    acked.append(name)
+        
+        return acked, sorted(pending)
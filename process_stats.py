@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Process Resource Sampling for SITL Instances
+Reads memory and CPU usage of process groups straight from /proc. Finding a
+group's members takes a walk over every process on the host, so one walk is
+shared by all instances for PROC_SCAN_INTERVAL seconds.
+"""
+
+import os
+import time
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PROC_SCAN_INTERVAL = 1.0  # seconds a /proc walk is reused for
+
+
+def read_proc_stat(pid):
+    """Return (ppid, pgid, cpu_seconds) for a process, or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            data = f.read()
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    
+    # The command name may contain spaces and parentheses, so split after the last ')'
+    fields = data.rsplit(')', 1)[1].split()
+    ppid = int(fields[1])
+    pgid = int(fields[2])
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return ppid, pgid, cpu_seconds
+
+
+def read_rss_bytes(pid):
+    """Return the resident set size of a process in bytes (0 if it is gone)"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (FileNotFoundError, ProcessLookupError, PermissionError, IndexError):
+        return 0
+
+
+def scan_process_groups():
+    """Walk /proc once: process group id -> pids of its live members"""
+    groups = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        stat = read_proc_stat(entry)
+        if stat:
+            groups.setdefault(stat[1], []).append(int(entry))
+    return groups
+
+
+class ProcessGroups:
+    """Process group membership from a /proc walk shared by every caller for max_age seconds"""
+    
+    def __init__(self, max_age=PROC_SCAN_INTERVAL, scan=scan_process_groups):
+        self.max_age = max_age
+        self.scan = scan
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.scanned_at = None
+        self.scans = 0
+    
+    def members(self, pgid):
+        """pids of a group; the leader is checked directly, so a group started since the walk is found"""
+        with self.lock:
+            now = time.monotonic()
+            if self.scanned_at is None or now - self.scanned_at >= self.max_age:
+                self.groups = self.scan()
+                self.scanned_at = now
+                self.scans += 1
+            pids = list(self.groups.get(pgid, []))
+        if pgid not in pids:
+            leader = read_proc_stat(pgid)
+            if leader and leader[1] == pgid:
+                pids.append(pgid)
+        return pids
+
+
+process_groups = ProcessGroups()
+
+
+def group_pids(pgid):
+    """List all live processes that belong to a process group"""
+    return process_groups.members(pgid)
+
+
+def group_usage(pgid):
+    """Summarise memory and CPU time used by a whole process group"""
+    processes = 0
+    rss = 0
+    cpu_seconds = 0.0
+    for pid in group_pids(pgid):
+        stat = read_proc_stat(pid)
+        if stat is None or stat[1] != pgid:
+            continue  # exited (or its pid was reused) since the /proc walk
+        processes += 1
+        rss += read_rss_bytes(pid)
+        cpu_seconds += stat[2]
+    
+    return {
+        "processes": processes,
+        "rss_mb": round(rss / (1024 * 1024), 1),
+        "cpu_seconds": round(cpu_seconds, 2)
+    }
+
+
+def tcp_local_addresses(pid):
+    """Local "ip:port" of every IPv4 TCP socket a process holds"""
+    inodes = set()
+    try:
+        for fd in os.listdir(f"/proc/{pid}/fd"):
+            try:
+                target = os.readlink(f"/proc/{pid}/fd/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inodes.add(target[len("socket:["):-1])
+    except OSError:
+        return set()
+    
+    addresses = set()
+    try:
+        with open(f"/proc/{pid}/net/tcp") as f:
+            next(f)  # header
+            for line in f:
+                fields = line.split()
+                if len(fields) > 9 and fields[9] in inodes:
+                    # Address in host byte order, port big-endian: 0100007F:1F90 = 127.0.0.1:8080
+                    host, port = fields[1].split(":")
+                    addresses.add(f"{socket.inet_ntoa(bytes.fromhex(host)[::-1])}:{int(port, 16)}")
+    except (OSError, ValueError, StopIteration):
+        pass
+    return addresses
+
+
+class CpuSampler:
+    """Turns cumulative CPU seconds into a utilisation percentage between samples"""
+    
+    def __init__(self):
+        self.samples = {}  # key -> (cpu_seconds, wall time)
+    
+    def sample(self, key, cpu_seconds):
+        """Record a new reading and return CPU percent since the previous one"""
+        now = time.monotonic()
+        previous = self.samples.get(key)
+        self.samples[key] = (cpu_seconds, now)
+        
+        if previous is None or now <= previous[1]:
+            return None
+        
+        return round(100.0 * (cpu_seconds - previous[0]) / (now - previous[1]), 1)
+    
+    def forget(self, key):
+        """Drop the history for a key"""
+        self.samples.pop(key, None)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Process Supervisor
+One asyncio loop, on one thread, owns every child process the simulator
+starts (PX4, Gazebo, mavlink-routerd): it spawns them, drains their output,
+notices exits, reaps them and signals them. Request threads no longer sleep
+and poll a Popen. They get a SupervisedProcess, a Popen-compatible handle, and
+wait on its lifecycle events instead:
+  - ready   an output line matched the process's ready pattern
+  - exited  the process ended and has been reaped
+
+Exits are detected with a pidfd per child (poll fallback without pidfd
+support). Output is read as it arrives, so a chatty child can never block on a
+full pipe. The last lines are kept for diagnostics and can be appended to a log
+file. Coroutines (wait_ready, wait_exit, stop) serve asyncio callers; the
+handle's blocking methods serve threads.
+"""
+
+import os
+import re
+import signal
+import asyncio
+import logging
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_LINES = 200  # recent output lines kept per process
+POLL_INTERVAL = 0.5  # exit polling period where pidfds are not available
+
+# PX4 prints this once rcS has finished (simulator connected, modules started)
+PX4_READY_PATTERN = r"Startup script returned successfully"
+PX4_BOOT_TIMEOUT = 20
+
+
+def stop_process(process, timeout=10.0, group=True):
+    """SIGTERM a child (its whole process group by default), SIGKILL it if it outlives the timeout,
+    and reap it. Works for supervised processes and plain Popen objects; returns the exit code."""
+    if isinstance(process, SupervisedProcess):
+        return process.stop(timeout, group)
+    
+    def send(sig):
+        try:
+            if group:
+                os.killpg(os.getpgid(process.pid), sig)
+            else:
+                process.send_signal(sig)
+        except OSError:
+            pass
+    
+    if process.poll() is None:
+        send(signal.SIGTERM)
+        try:
+            return process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            send(signal.SIGKILL)
+    try:
+        return process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None
+
+
+class SupervisedProcess:
+    """Popen-compatible handle of a child owned by the ProcessSupervisor"""
+    
+    def __init__(self, supervisor, name, popen, ready_pattern=None, log_file=None):
+        self.supervisor = supervisor
+        self.name = name
+        self.popen = popen
+        self.pid = popen.pid
+        self.args = popen.args
+        self.returncode = None
+        self.started_at = datetime.now()
+        self.exited_at = None
+        self.output = deque(maxlen=OUTPUT_LINES)
+        self.partial = b''
+        self.ready_pattern = re.compile(ready_pattern) if ready_pattern else None
+        self.log = open(log_file, 'ab') if log_file else None
+        self.pidfd = None
+        
+        # Lifecycle events, as futures for coroutines and threading events for blocking callers
+        self.ready = supervisor.loop.create_future()
+        self.exited = supervisor.loop.create_future()
+        self.ready_event = threading.Event()
+        self.exit_event = threading.Event()
+    
+    def feed(self, data):
+        """Take a chunk of output: log it, keep its lines and look for the ready pattern"""
+        if self.log:
+            self.log.write(data)
+            self.log.flush()
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()[-4096:]
+        for line in lines:
+            text = line.decode(errors='replace').rstrip()
+            self.output.append(text)
+            if self.ready_pattern and not self.ready.done() and self.ready_pattern.search(text):
+                self.ready.set_result(True)
+                self.ready_event.set()
+    
+    def tail(self, lines=20):
+        """Last output lines"""
+        return list(self.output)[-lines:]
+    
+    def poll(self):
+        """Exit code, or None while running (Popen API)"""
+        return self.returncode
+    
+    def wait(self, timeout=None):
+        """Block until the process has exited and been reaped (Popen API)"""
+        if not self.exit_event.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+    
+    def wait_exit(self, timeout=None):
+        """Block until exit; the exit code, or None if still running after the timeout"""
+        self.exit_event.wait(timeout)
+        return self.returncode
+    
+    def wait_ready(self, timeout=None):
+        """Block until the ready pattern was printed; False if the process exited first or on timeout"""
+        return self.supervisor.call(self.supervisor.wait_ready(self, timeout))
+    
+    def send_signal(self, sig):
+        """Signal the process itself, unless it is already gone (Popen API)"""
+        if self.returncode is None:
+            self.popen.send_signal(sig)
+    
+    def terminate(self):
+        """SIGTERM the process (Popen API)"""
+        self.send_signal(signal.SIGTERM)
+    
+    def kill(self):
+        """SIGKILL the process (Popen API)"""
+        self.send_signal(signal.SIGKILL)
+    
+    def signal_group(self, sig):
+        """Signal the process group the child leads (children started with setsid)"""
+        if self.returncode is None:
+            os.killpg(os.getpgid(self.pid), sig)
+    
+    def stop(self, timeout=10.0, group=True):
+        """SIGTERM, then SIGKILL after the timeout; blocks until reaped and returns the exit code"""
+        return self.supervisor.call(self.supervisor.stop(self, timeout, group))
+    
+    def get_status(self):
+        """Process summary for the API"""
+        return {
+            "name": self.name,
+            "pid": self.pid,
+            "running": self.returncode is None,
+            "returncode": self.returncode,
+            "ready": self.ready_event.is_set(),
+            "started_at": self.started_at.isoformat(),
+            "exited_at": self.exited_at.isoformat() if self.exited_at else None,
+            "last_output": self.tail(5)
+        }
+
+
+class ProcessSupervisor:
+    """Spawns, drains, reaps and signals child processes from a single asyncio thread"""
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.processes = {}  # pid -> SupervisedProcess, while running
+        self.polled = set()  # processes without a pidfd, checked every POLL_INTERVAL
+        self.exit_callbacks = {}  # pid -> [callback(process)]
+        self.spawned = 0
+        self.reaped = 0
+        self.thread = threading.Thread(target=self.run, name="process-supervisor", daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        """Supervisor thread: run the event loop forever"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.create_task(self.poll_loop())
+        self.loop.run_forever()
+    
+    def call(self, coroutine, timeout=None):
+        """Run a coroutine on the supervisor loop from another thread and return its result"""
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("Blocking supervisor call from the supervisor thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+    
+    def spawn(self, name, cmd, ready_pattern=None, log_file=None, capture_output=True, **popen_kwargs):
+        """Start a child from any thread. stdout and stderr are drained by the supervisor (or
+        discarded with capture_output=False); popen_kwargs go to subprocess.Popen."""
+        return self.call(self.start(name, cmd, ready_pattern, log_file, capture_output, popen_kwargs))
+    
+    async def start(self, name, cmd, ready_pattern=None, log_file=None, capture_output=True, popen_kwargs=None):
+        """Start and register a child; raises OSError if it cannot be executed"""
+        output = subprocess.PIPE if capture_output else subprocess.DEVNULL
+        popen = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT,
+                                 **(popen_kwargs or {}))
+        process = SupervisedProcess(self, name, popen, ready_pattern, log_file)
+        self.processes[process.pid] = process
+        self.spawned += 1
+        
+        if popen.stdout:
+            os.set_blocking(popen.stdout.fileno(), False)
+            self.loop.add_reader(popen.stdout.fileno(), self.drain, process)
+        
+        try:
+            process.pidfd = os.pidfd_open(process.pid)
+            self.loop.add_reader(process.pidfd, self.reap, process)
+        except (AttributeError, OSError):
+            self.polled.add(process)
+        
+        logger.info(f"Started {name} (pid {process.pid})")
+        return process
+    
+    def drain(self, process):
+        """Read one chunk of available output; close the pipe at EOF. True if there may be more."""
+        stdout = process.popen.stdout
+        if stdout is None or stdout.closed:
+            return False
+        try:
+            data = os.read(stdout.fileno(), 65536)
+        except BlockingIOError:
+            return False
+        except OSError:
+            data = b''
+        
+        if data:
+            process.feed(data)
+            return True
+        
+        self.loop.remove_reader(stdout.fileno())
+        stdout.close()
+        if process.partial:
+            process.feed(b'\n')
+        if process.log:
+            process.log.close()
+            process.log = None
+        return False
+    
+    def reap(self, process):
+        """Collect an exited child and fire its exit event"""
+        returncode = process.popen.poll()
+        if returncode is None:
+            return
+        
+        # Output written just before the exit still counts (a ready line, the last error)
+        while self.drain(process):
+            pass
+        
+        if process.pidfd is not None:
+            self.loop.remove_reader(process.pidfd)
+            os.close(process.pidfd)
+            process.pidfd = None
+        self.polled.discard(process)
+        self.processes.pop(process.pid, None)
+        self.reaped += 1
+        
+        process.returncode = returncode
+        process.exited_at = datetime.now()
+        process.exit_event.set()
+        process.exited.set_result(returncode)
+        if not process.ready.done():
+            process.ready.set_result(False)
+            process.ready_event.set()
+        logger.info(f"{process.name} (pid {process.pid}) exited with code {returncode}")
+        
+        for callback in self.exit_callbacks.pop(process.pid, []):
+            try:
+                callback(process)
+            except Exception as e:
+                logger.warning(f"⚠️ Exit callback for {process.name} failed: {e}")
+    
+    async def poll_loop(self):
+        """Exit detection for children without a pidfd"""
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            for process in list(self.polled):
+                self.reap(process)
+    
+    def on_exit(self, process, callback):
+        """Call callback(process) on the supervisor thread when the process exits"""
+        def register():
+            if process.exited.done():
+                callback(process)
+            else:
+                self.exit_callbacks.setdefault(process.pid, []).append(callback)
+        self.loop.call_soon_threadsafe(register)
+    
+    async def wait_exit(self, process, timeout=None):
+        """Exit code once the process has exited, None if it is still running after the timeout"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(process.exited), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    async def wait_ready(self, process, timeout=None):
+        """True once the process printed its ready pattern; False if it exited first or on timeout"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(process.ready), timeout)
+        except asyncio.TimeoutError:
+            return False
+    
+    async def stop(self, process, timeout=10.0, group=True):
+        """SIGTERM the process (group), SIGKILL it if it outlives the timeout; returns the exit code"""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            if process.exited.done():
+                break
+            try:
+                if group:
+                    process.signal_group(sig)
+                else:
+                    process.send_signal(sig)
+            except OSError:
+                pass
+            if await self.wait_exit(process, timeout) is not None:
+                break
+            if sig == signal.SIGTERM:
+                logger.warning(f"⚠️ {process.name} (pid {process.pid}) ignored SIGTERM for {timeout}s, killing it")
+        return process.returncode
+    
+    def get_status(self):
+        """Running children and lifetime counts"""
+        return {
+            "running": [process.get_status() for process in list(self.processes.values())],
+            "spawned": self.spawned,
+            "reaped": self.reaped,
+            "exit_detection": "poll" if self.polled else "pidfd"
+        }
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    """The process-wide supervisor, started on first use"""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ProcessSupervisor()
+        return _supervisor
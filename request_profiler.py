@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Request Profiling for the Web App
+Opt-in, runtime-switchable timing of API requests:
+
+- per-request wall time, per-endpoint totals and a Server-Timing header
+- the manager calls ("phases") each request made, and how long each took
+- a ring buffer of slow requests with their phases
+- sampled stack profiles of a fraction of requests, kept in memory and
+  downloadable in the collapsed-stack format that flamegraph.pl, speedscope
+  and most flamegraph tools read
+
+Stacks are sampled from a helper thread rather than traced, so a profiled
+request pays a fixed cost per sample, and only a few requests are profiled at
+once.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def frame_label(code):
+    """One stack frame as shown in a flamegraph"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded-stack counts"""
+    
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    def start(self):
+        """Start sampling"""
+        self.thread.start()
+    
+    def stop(self):
+        """Stop sampling and wait for the sampler thread"""
+        self.stopped.set()
+        self.thread.join()
+    
+    def run(self):
+        """Sampler thread: walk the target thread's frames every interval"""
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None and len(frames) < self.max_depth:
+                frames.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+                self.samples += 1
+
+
+class PhaseTimer:
+    """Manager proxy that records each method call as a phase of the current request"""
+    
+    def __init__(self, target, profiler):
+        self.target = target
+        self.profiler = profiler
+    
+    def __getattr__(self, name):
+        attribute = getattr(self.target, name)
+        if not callable(attribute):
+            return attribute
+        
+        def timed(*args, **kwargs):
+            with self.profiler.phase(name):
+                return attribute(*args, **kwargs)
+        return timed
+
+
+class RequestProfiler:
+    """Request timing, slow-request log and sampled profiles for a Flask app"""
+    
+    def __init__(self, enabled=False, sample_rate=0.0, slow_ms=1000.0, ring_size=200,
+                 sample_interval=0.005, max_profiles=50, max_concurrent_profiles=2):
+        self.enabled = enabled
+        self.sample_rate = sample_rate  # fraction of requests that get a stack profile
+        self.slow_ms = slow_ms
+        self.sample_interval = sample_interval
+        self.max_profiles = max_profiles
+        self.max_concurrent_profiles = max_concurrent_profiles
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.slow_requests = deque(maxlen=ring_size)
+        self.profiles = OrderedDict()  # profile id -> profile
+        self.endpoints = {}  # "METHOD rule" -> totals
+        self.active_profiles = 0
+        self.next_profile_id = 1
+    
+    def configure(self, enabled=None, sample_rate=None, slow_ms=None):
+        """Change settings at runtime; returns the new settings"""
+        with self.lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if sample_rate is not None:
+                if not 0.0 <= float(sample_rate) <= 1.0:
+                    raise ValueError("sample_rate must be between 0 and 1")
+                self.sample_rate = float(sample_rate)
+            if slow_ms is not None:
+                if float(slow_ms) < 0:
+                    raise ValueError("slow_ms must not be negative")
+                self.slow_ms = float(slow_ms)
+        logger.info(f"Request profiling: enabled={self.enabled} sample_rate={self.sample_rate} "
+                    f"slow_ms={self.slow_ms}")
+        return self.get_settings()
+    
+    def get_settings(self):
+        """Current settings"""
+        return {"enabled": self.enabled, "sample_rate": self.sample_rate, "slow_ms": self.slow_ms}
+    
+    def wrap(self, manager):
+        """Manager proxy whose calls show up as request phases"""
+        return PhaseTimer(manager, self)
+    
+    @contextmanager
+    def phase(self, name):
+        """Time a named step of the current request"""
+        phases = getattr(self.local, "phases", None)
+        if not self.enabled or phases is None:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases.append((name, round((time.perf_counter() - started) * 1000, 2)))
+    
+    def begin(self):
+        """Start timing the current request (and maybe profiling it)"""
+        self.local.phases = [] if self.enabled else None
+        self.local.started = time.perf_counter()
+        self.local.sampler = None
+        if not self.enabled or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        with self.lock:
+            if self.active_profiles >= self.max_concurrent_profiles:
+                return
+            self.active_profiles += 1
+        self.local.sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        self.local.sampler.start()
+    
+    def finish(self, method, path, endpoint, status_code):
+        """Record the current request; returns the Server-Timing header value (None if disabled)"""
+        started = getattr(self.local, "started", None)
+        phases = getattr(self.local, "phases", None)
+        sampler = getattr(self.local, "sampler", None)
+        self.local.phases = None
+        self.local.sampler = None
+        if sampler is not None:
+            sampler.stop()
+            with self.lock:
+                self.active_profiles -= 1
+        if started is None or phases is None:
+            return None
+        
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        record = {
+            "time": time.time(),
+            "method": method,
+            "path": path,
+            "endpoint": endpoint,
+            "status": status_code,
+            "duration_ms": duration_ms,
+            "phases": phases
+        }
+        
+        with self.lock:
+            totals = self.endpoints.setdefault(f"{method} {endpoint}",
+                                               {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow": 0})
+            totals["count"] += 1
+            totals["total_ms"] += duration_ms
+            totals["max_ms"] = max(totals["max_ms"], duration_ms)
+            
+            if duration_ms >= self.slow_ms:
+                totals["slow"] += 1
+                self.slow_requests.append(record)
+            
+            if sampler is not None and sampler.samples:
+                record["profile_id"] = self.next_profile_id
+                self.profiles[self.next_profile_id] = dict(record, samples=sampler.samples,
+                                                           interval_ms=self.sample_interval * 1000,
+                                                           stacks=sampler.stacks)
+                self.next_profile_id += 1
+                while len(self.profiles) > self.max_profiles:
+                    self.profiles.popitem(last=False)
+        
+        if duration_ms >= self.slow_ms:
+            logger.warning(f"⚠️ Slow request {method} {path}: {duration_ms:.0f} ms "
+                           f"({', '.join(f'{name} {ms:.0f} ms' for name, ms in phases) or 'no manager calls'})")
+        
+        timings = [f"app;dur={duration_ms}"]
+        timings += [f"{name};dur={ms}" for name, ms in phases]
+        return ", ".join(timings)
+    
+    def init_app(self, app):
+        """Hook request timing into a Flask app"""
+        from flask import request
+        
+        @app.before_request
+        def profiler_begin():
+            self.begin()
+        
+        @app.after_request
+        def profiler_finish(response):
+            header = self.finish(request.method, request.path, request.url_rule.rule if request.url_rule else None,
+                                 response.status_code)
+            if header:
+                response.headers["Server-Timing"] = header
+            return response
+    
+    def get_status(self):
+        """Settings, per-endpoint totals and the profiles held"""
+        with self.lock:
+            endpoints = {name: {
+                "count": totals["count"],
+                "avg_ms": round(totals["total_ms"] / totals["count"], 2),
+                "max_ms": totals["max_ms"],
+                "slow": totals["slow"]
+            } for name, totals in self.endpoints.items()}
+            profiles = [{key: value for key, value in profile.items() if key != "stacks"}
+                        for profile in self.profiles.values()]
+        return dict(self.get_settings(), endpoints=endpoints, profiles=profiles,
+                    slow_requests=len(self.slow_requests))
+    
+    def get_slow_requests(self):
+        """The slow-request ring buffer, newest first"""
+        with self.lock:
+            return list(reversed(self.slow_requests))
+    
+    def folded(self, profile_id=None):
+        """Collapsed stacks ("frame;frame;frame count" per line) of one profile, or of all of them merged"""
+        with self.lock:
+            if profile_id is None:
+                stacks = Counter()
+                for profile in self.profiles.values():
+                    stacks.update(profile["stacks"])
+            elif profile_id in self.profiles:
+                stacks = self.profiles[profile_id]["stacks"]
+            else:
+                return None
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Per-Instance PX4 Rootfs Store
+Keeps one pristine PX4 working directory (rootfs) template per airframe and
+clones it for each instance, so instances never share parameter, dataman or
+log storage. Clones use reflinks where the filesystem supports them and
+hardlinks otherwise; files PX4 writes to are always given private copies.
+"""
+
+import os
+import time
+import uuid
+import errno
+import fcntl
+import shutil
+import logging
+import weakref
+import threading
+from airframe_registry import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.path.join(DEFAULT_CACHE_DIR, "rootfs")
+
+# Marks which store (process id and store token) an instance directory belongs to
+OWNER_FILE = ".cloudsim_owner"
+
+# Stores alive in this process, by token; another process's stores are alive while it runs
+live_stores = weakref.WeakValueDictionary()
+
+# ioctl to share a file's extents with another file (btrfs, xfs, bcachefs)
+FICLONE = 0x40049409
+
+# Files PX4 modifies in place; a hardlink would leak writes back into the template
+MUTABLE_FILES = ("parameters.bson", "parameters_backup.bson", "dataman", "mavlink_shell_history")
+MUTABLE_DIRS = ("eeprom",)
+
+# Empty directories PX4 expects in its working directory
+SKELETON_DIRS = ("log", "eeprom")
+
+
+class RootfsInUse(OSError):
+    """An instance directory belongs to another running manager"""
+
+
+def owner_alive(owner):
+    """Whether the store that wrote an owner marker ("<pid> <token>") still exists"""
+    try:
+        pid, token = owner.split()
+        pid = int(pid)
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return token in live_stores
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class RootfsStore:
+    """Airframe rootfs templates and their per-instance clones"""
+    
+    def __init__(self, build_dir, root=DEFAULT_ROOT):
+        self.build_dir = build_dir
+        self.templates_dir = os.path.join(root, "templates")
+        self.instances_dir = os.path.join(root, "instances")
+        self.seeds_dir = os.path.join(root, "seeds")  # Optional per-airframe files, e.g. a tuned parameters.bson
+        self.lock = threading.Lock()
+        self.reflink_supported = None  # Probed on the first clone
+        self.token = uuid.uuid4().hex
+        live_stores[self.token] = self
+    
+    def template_path(self, airframe):
+        """Directory of an airframe's pristine template"""
+        return os.path.join(self.templates_dir, airframe)
+    
+    def instance_path(self, instance_id):
+        """Working directory of one instance"""
+        return os.path.join(self.instances_dir, instance_id)
+    
+    def owned_elsewhere(self, instance_id):
+        """True if the instance directory belongs to another store that is still running"""
+        try:
+            with open(os.path.join(self.instance_path(instance_id), OWNER_FILE)) as f:
+                owner = f.read().strip()
+        except OSError:
+            return False
+        return owner != f"{os.getpid()} {self.token}" and owner_alive(owner)
+    
+    def ensure_template(self, airframe):
+        """Create the airframe's template if missing or older than its seed files"""
+        template = self.template_path(airframe)
+        seed = os.path.join(self.seeds_dir, airframe)
+        seed_mtime = 0
+        for directory, _, filenames in os.walk(seed):
+            for name in filenames + ['.']:
+                seed_mtime = max(seed_mtime, os.path.getmtime(os.path.join(directory, name)))
+        
+        if os.path.isdir(template) and os.path.getmtime(template) >= seed_mtime:
+            return template
+        
+        # Build next to the final path and rename, so a half-built template is never cloned
+        staging = f"{template}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        
+        for name in SKELETON_DIRS:
+            os.makedirs(os.path.join(staging, name), exist_ok=True)
+        os.symlink(os.path.join(self.build_dir, "etc"), os.path.join(staging, "etc"))
+        
+        if seed_mtime:
+            shutil.copytree(seed, staging, symlinks=True, dirs_exist_ok=True)
+            os.utime(staging)  # copytree copied the seed's mtime; stamp the build time instead
+        
+        shutil.rmtree(template, ignore_errors=True)
+        os.rename(staging, template)
+        logger.info(f"Created rootfs template for {airframe}")
+        return template
+    
+    def reflink(self, source, destination):
+        """Clone a file's data with FICLONE; returns False if the filesystem can't"""
+        if self.reflink_supported is False:
+            return False
+        
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL):
+                    raise
+                self.reflink_supported = False
+                return False
+        
+        shutil.copystat(source, destination)
+        self.reflink_supported = True
+        return True
+    
+    def clone_file(self, source, destination, mutable):
+        """Reflink, hardlink or copy a single template file"""
+        if self.reflink(source, destination):
+            return
+        
+        if not mutable:
+            try:
+                if os.path.exists(destination):
+                    os.unlink(destination)
+                os.link(source, destination)
+                return
+            except OSError:
+                pass
+        shutil.copy2(source, destination)
+    
+    def clone(self, airframe, instance_id):
+        """Give an instance a fresh working directory cloned from its airframe template"""
+        started = time.monotonic()
+        
+        with self.lock:
+            template = self.ensure_template(airframe)
+        
+        destination = self.instance_path(instance_id)
+        if self.owned_elsewhere(instance_id):
+            raise RootfsInUse(errno.EBUSY, "Rootfs belongs to another running manager", destination)
+        shutil.rmtree(destination, ignore_errors=True)
+        
+        for directory, dirnames, filenames in os.walk(template):
+            relative = os.path.relpath(directory, template)
+            target_dir = os.path.normpath(os.path.join(destination, relative))
+            os.makedirs(target_dir, exist_ok=True)
+            in_mutable_dir = relative.split(os.sep)[0] in MUTABLE_DIRS
+            
+            for name in dirnames + filenames:
+                source = os.path.join(directory, name)
+                target = os.path.join(target_dir, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), target)
+                elif name in filenames:
+                    self.clone_file(source, target, in_mutable_dir or name in MUTABLE_FILES)
+        
+        with open(os.path.join(destination, OWNER_FILE), 'w') as f:
+            f.write(f"{os.getpid()} {self.token}\n")
+        
+        elapsed_ms = (time.monotonic() - started) * 1000
+        logger.info(f"Cloned {airframe} rootfs for {instance_id} in {elapsed_ms:.1f} ms "
+                    f"({'reflink' if self.reflink_supported else 'hardlink'})")
+        return destination
+    
+    def remove(self, instance_id):
+        """Delete an instance's working directory"""
+        path = self.instance_path(instance_id)
+        if os.path.isdir(path) and not self.owned_elsewhere(instance_id):
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed rootfs for {instance_id}")
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+MAVLink Routing Load Generator
+Measures how much vehicle telemetry the data plane can route, without booting
+PX4. Synthetic vehicles listen on instance TCP ports where PX4 would, so the
+routers connect to them as they would to real vehicles. Each vehicle streams
+HEARTBEAT, ATTITUDE and GLOBAL_POSITION_INT at PX4-like rates. Emulated GCS
+consumers connect on the GCS side and measure delivered throughput, loss (from
+MAVLink sequence gaps) and end-to-end latency.
+
+Routes under test:
+  router  sharded mavlink-routerd (MAVLinkRouterManager), consumers on every shard port
+  mux     the single-port GCS mux (GcsMux), at most 250 vehicles (one per system id)
+  direct  consumers straight on the vehicle ports: the generator's own ceiling
+
+    python router_loadgen.py --vehicles 200 --shards 4 --duration 30
+    python router_loadgen.py --route mux --sweep 50,100,200 --rate attitude=50 --report capacity.json
+
+Vehicle ids, ports and send phases are laid out deterministically, so runs with
+the same arguments offer exactly the same load.
+"""
+
+import json
+import math
+import time
+import heapq
+import shutil
+import socket
+import struct
+import logging
+import argparse
+import selectors
+import tempfile
+import threading
+
+from mavlink_frames import FrameSplitter, encode_frame, frame_header
+from gcs_mux import GcsMux
+from multi_sitl_manager import MAVLinkRouterManager
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FORMAT = struct.Struct('<IBBBBB')  # custom_mode, type, autopilot, base_mode, system_status, version
+ATTITUDE_FORMAT = struct.Struct('<I6f')  # time, roll, pitch, yaw, rollspeed, pitchspeed, yawspeed
+GLOBAL_POSITION_INT_FORMAT = struct.Struct('<IiiiihhhH')  # time, lat, lon, alt, relative_alt, vx, vy, vz, hdg
+
+# Telemetry streams and their default rates (Hz), as on PX4's normal GCS link
+STREAMS = {"heartbeat": 0, "attitude": 30, "global_position_int": 33}
+DEFAULT_RATES = {"heartbeat": 1.0, "attitude": 20.0, "global_position_int": 5.0}
+ROUTES = ("router", "mux", "direct")
+MAX_SYS_ID = 250
+
+
+def latency_summary(latencies):
+    """Sample count and p50/p90/p99/max (ms) of latencies given in seconds"""
+    if not latencies:
+        return None
+    ordered = sorted(latencies)
+    
+    def at(quantile):
+        return round(ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] * 1000, 3)
+    
+    return {"samples": len(ordered), "p50": at(0.5), "p90": at(0.9), "p99": at(0.99),
+            "max": round(ordered[-1] * 1000, 3)}
+
+
+class SyntheticVehicle:
+    """One emulated PX4 serving telemetry on an instance TCP port"""
+    
+    def __init__(self, index, port=0, host="127.0.0.1", max_backlog=64 * 1024):
+        self.index = index
+        # Past 250 vehicles the component id tells them apart, so loss and latency stay per vehicle
+        self.sysid = index % MAX_SYS_ID + 1
+        self.compid = index // MAX_SYS_ID + 1
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.port = self.listener.getsockname()[1]
+        self.max_backlog = max_backlog  # bytes queued per link before frames are dropped, like PX4's tx buffer
+        self.links = {}  # socket -> bytearray of unsent bytes
+        self.seq = 0
+        self.sent_at = [0.0] * 256  # perf_counter() when each sequence number was last sent
+        self.sent = 0
+        self.dropped = 0
+        self.received_bytes = 0  # traffic routed to this vehicle from others
+    
+    def payload(self, msgid, now):
+        """Plausible payload: an armed quadrotor circling its spawn point"""
+        time_ms = int(now * 1000) & 0xFFFFFFFF
+        angle = now * 0.2 + self.index
+        if msgid == 0:
+            return HEARTBEAT_FORMAT.pack(0, 2, 12, 81, 4, 3)
+        if msgid == 30:
+            return ATTITUDE_FORMAT.pack(time_ms, 0.1 * math.sin(angle), 0.05 * math.cos(angle),
+                                        angle % (2 * math.pi) - math.pi, 0.01, 0.02, 0.2)
+        return GLOBAL_POSITION_INT_FORMAT.pack(time_ms, int((47.397742 + 0.0005 * math.sin(angle)) * 1e7),
+                                               int((8.545594 + 0.0005 * math.cos(angle)) * 1e7), 498000, 10000,
+                                               int(500 * math.cos(angle)), int(-500 * math.sin(angle)), 0,
+                                               int(math.degrees(angle) * 100) % 36000)
+    
+    def send(self, msgid, now):
+        """Queue one frame on every link; a link that is too far behind drops it"""
+        frame = encode_frame(msgid, self.payload(msgid, now), seq=self.seq, sysid=self.sysid, compid=self.compid)
+        self.sent_at[self.seq] = time.perf_counter()
+        self.seq = (self.seq + 1) & 0xFF
+        self.sent += 1
+        for sock, outbox in list(self.links.items()):
+            if len(outbox) > self.max_backlog:
+                self.dropped += 1
+                continue
+            outbox += frame
+            self.flush(sock)
+    
+    def flush(self, sock):
+        """Write as much of a link's backlog as the socket takes"""
+        outbox = self.links.get(sock)
+        if not outbox:
+            return
+        try:
+            written = sock.send(outbox)
+        except BlockingIOError:
+            return
+        except OSError:
+            # The read side sees the broken link and closes it
+            outbox.clear()
+            return
+        del outbox[:written]
+    
+    def backlogged(self):
+        """Links with unsent bytes"""
+        return [sock for sock, outbox in self.links.items() if outbox]
+    
+    def accept(self, selector):
+        """Accept a router (or consumer) connection"""
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        self.links[sock] = bytearray()
+        selector.register(sock, selectors.EVENT_READ, self)
+    
+    def read(self, sock, selector):
+        """Discard what the route sends us, counting it"""
+        try:
+            data = sock.recv(262144)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            selector.unregister(sock)
+            self.close_link(sock)
+            return
+        self.received_bytes += len(data)
+    
+    def close_link(self, sock):
+        """Forget a link"""
+        self.links.pop(sock, None)
+        sock.close()
+    
+    def close(self):
+        """Close the listener and every link"""
+        for sock in list(self.links):
+            self.close_link(sock)
+        self.listener.close()
+
+
+class LoadGenerator:
+    """Streams the telemetry of many synthetic vehicles from one thread"""
+    
+    def __init__(self, vehicles, rates):
+        self.vehicles = vehicles
+        self.rates = rates  # stream name -> Hz
+        self.selector = selectors.DefaultSelector()
+        self.schedule = []  # heap of (due, vehicle index, msgid, period)
+        self.late = 0  # frames sent more than a period after they were due
+        self.pending = set()  # vehicles with unsent bytes on some link
+        self.running = False
+        self.thread = None
+        for vehicle in vehicles:
+            self.selector.register(vehicle.listener, selectors.EVENT_READ, vehicle)
+    
+    def start(self):
+        """Schedule every stream and start sending"""
+        now = time.perf_counter()
+        for vehicle in self.vehicles:
+            for name, rate in sorted(self.rates.items()):
+                if rate > 0:
+                    # Spread vehicles evenly over each period instead of sending in lockstep bursts
+                    period = 1.0 / rate
+                    offset = period * vehicle.index / len(self.vehicles)
+                    self.schedule.append((now + offset, vehicle.index, STREAMS[name], period))
+        heapq.heapify(self.schedule)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        """Send due frames, accept links and drain what the route sends back"""
+        while self.running:
+            timeout = max(0.0, self.schedule[0][0] - time.perf_counter()) if self.schedule else 0.1
+            for key, _ in self.selector.select(timeout=min(timeout, 0.1)):
+                vehicle = key.data
+                if key.fileobj is vehicle.listener:
+                    vehicle.accept(self.selector)
+                else:
+                    vehicle.read(key.fileobj, self.selector)
+            
+            now = time.perf_counter()
+            while self.schedule and self.schedule[0][0] <= now:
+                due, index, msgid, period = heapq.heappop(self.schedule)
+                if now - due > period:
+                    self.late += 1
+                vehicle = self.vehicles[index]
+                vehicle.send(msgid, now)
+                if vehicle.backlogged():
+                    self.pending.add(vehicle)
+                heapq.heappush(self.schedule, (due + period, index, msgid, period))
+            
+            # Retry links the socket buffer could not take in full
+            for vehicle in list(self.pending):
+                for sock in vehicle.backlogged():
+                    vehicle.flush(sock)
+                if not vehicle.backlogged():
+                    self.pending.discard(vehicle)
+    
+    def counters(self):
+        """(sent, dropped, late, received_bytes) totals so far"""
+        return (sum(vehicle.sent for vehicle in self.vehicles), sum(vehicle.dropped for vehicle in self.vehicles),
+                self.late, sum(vehicle.received_bytes for vehicle in self.vehicles))
+    
+    def stop(self):
+        """Stop sending and close every vehicle"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        for vehicle in self.vehicles:
+            vehicle.close()
+        self.selector.close()
+
+
+class GcsConsumer:
+    """Emulated ground station receiving all telemetry from the route and measuring it"""
+    
+    def __init__(self, name, vehicles):
+        self.name = name
+        self.vehicles = {(vehicle.sysid, vehicle.compid): vehicle for vehicle in vehicles}
+        self.sockets = {}  # socket -> FrameSplitter
+        self.last_seq = {}  # (sysid, compid) -> last sequence number seen
+        self.disconnects = 0
+        self.reset()
+    
+    def reset(self):
+        """Start a new measurement window (sequence tracking carries over)"""
+        self.frames = 0
+        self.bytes = 0
+        self.lost = 0
+        self.latencies = []
+        self.seen = set()
+    
+    def connect(self, ports, selector, host="127.0.0.1"):
+        """Connect to every GCS-side port of the route"""
+        for port in ports:
+            sock = socket.create_connection((host, port), timeout=5)
+            sock.setblocking(False)
+            self.sockets[sock] = FrameSplitter()
+            selector.register(sock, selectors.EVENT_READ, self)
+    
+    def read(self, sock, selector):
+        """Account for every frame received on one socket"""
+        try:
+            data = sock.recv(262144)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.disconnects += 1
+            selector.unregister(sock)
+            self.sockets.pop(sock, None)
+            sock.close()
+            return
+        
+        now = time.perf_counter()
+        self.bytes += len(data)
+        for frame in self.sockets[sock].feed(data):
+            seq, sysid, compid, _ = frame_header(frame)
+            vehicle = self.vehicles.get((sysid, compid))
+            if vehicle is None:
+                continue
+            last = self.last_seq.get((sysid, compid))
+            if last is not None:
+                self.lost += (seq - last - 1) & 0xFF
+            self.last_seq[(sysid, compid)] = seq
+            self.frames += 1
+            self.seen.add((sysid, compid))
+            # Valid while latency stays under 256 frames of one vehicle (about 10 s at default rates)
+            self.latencies.append(now - vehicle.sent_at[seq])
+    
+    def get_status(self, elapsed):
+        """Measurements of this consumer over a window of `elapsed` seconds"""
+        return {
+            "name": self.name,
+            "frames": self.frames,
+            "frames_per_s": round(self.frames / elapsed, 1),
+            "mbit_per_s": round(self.bytes * 8 / elapsed / 1e6, 3),
+            "lost": self.lost,
+            "loss_ratio": round(self.lost / (self.frames + self.lost), 5) if self.frames + self.lost else None,
+            "vehicles_seen": len(self.seen),
+            "disconnects": self.disconnects,
+            "latency_ms": latency_summary(self.latencies)
+        }
+    
+    def close(self):
+        """Close every socket"""
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = {}
+
+
+class RouterLoadTest:
+    """Synthetic vehicles, the route under test and GCS consumers, producing one capacity report"""
+    
+    def __init__(self, vehicles=50, rates=None, consumers=1, route="router", shards=None, tcp_base=25760,
+                 server_port_base=24550, router_binary="mavlink-routerd", host="127.0.0.1"):
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route: {route}")
+        if route == "mux" and vehicles > MAX_SYS_ID:
+            raise ValueError(f"The GCS mux tells vehicles apart by system id, so at most {MAX_SYS_ID} vehicles")
+        unknown = set(rates or {}) - set(STREAMS)
+        if unknown:
+            raise ValueError(f"Unknown streams: {', '.join(sorted(unknown))}")
+        
+        self.vehicle_count = vehicles
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.consumer_count = consumers
+        self.route = route
+        self.shards = shards
+        self.tcp_base = tcp_base  # vehicles listen on tcp_base + index, 0 for any free port
+        self.server_port_base = server_port_base
+        self.router_binary = router_binary
+        self.host = host
+        self.vehicles = []
+        self.generator = None
+        self.consumers = []
+        self.selector = None
+        self.router = None
+        self.router_dir = None
+        self.mux = None
+        self.running = False
+    
+    def setup_route(self):
+        """Start vehicles and the route; returns the GCS-side ports"""
+        self.vehicles = [SyntheticVehicle(index, self.tcp_base + index if self.tcp_base else 0, self.host)
+                         for index in range(self.vehicle_count)]
+        self.generator = LoadGenerator(self.vehicles, self.rates)
+        
+        if self.route == "router":
+            self.router_dir = tempfile.mkdtemp(prefix="loadgen-router-")
+            self.router = MAVLinkRouterManager(shards=self.shards, config_dir=self.router_dir,
+                                               server_port_base=self.server_port_base, binary=self.router_binary)
+            if not self.router.add_instances({f"load_{vehicle.index}": (0, vehicle.port)
+                                              for vehicle in self.vehicles}):
+                raise Exception("MAVLink router shards failed to start")
+            return [shard.server_port for shard in self.router.shards if shard.endpoints]
+        
+        if self.route == "mux":
+            self.mux = GcsMux(0, host=self.host, reconnect_interval=0.2)
+            if not self.mux.start():
+                raise Exception("GCS mux failed to start")
+            for vehicle in self.vehicles:
+                self.mux.add_vehicle(vehicle.sysid, f"load_{vehicle.index}", vehicle.port)
+            return [self.mux.port]
+        
+        return [vehicle.port for vehicle in self.vehicles]
+    
+    def consume(self):
+        """Consumer thread: receive on every consumer socket"""
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.1):
+                key.data.read(key.fileobj, self.selector)
+    
+    def run(self, duration=30.0, warmup=3.0):
+        """Offer the load for warmup + duration seconds and report on the last `duration` seconds"""
+        try:
+            ports = self.setup_route()
+            self.generator.start()
+            
+            self.selector = selectors.DefaultSelector()
+            self.consumers = [GcsConsumer(f"gcs_{index}", self.vehicles) for index in range(self.consumer_count)]
+            for consumer in self.consumers:
+                consumer.connect(ports, self.selector, self.host)
+            self.running = True
+            thread = threading.Thread(target=self.consume, daemon=True)
+            thread.start()
+            
+            # Links come up and queues settle during the warmup, which is not measured
+            time.sleep(warmup)
+            for consumer in self.consumers:
+                consumer.reset()
+            before = self.generator.counters()
+            started = time.perf_counter()
+            time.sleep(duration)
+            after = self.generator.counters()
+            elapsed = time.perf_counter() - started
+            self.running = False
+            thread.join(timeout=5)
+            
+            return self.report(elapsed, [end - start for start, end in zip(before, after)])
+        finally:
+            self.stop()
+    
+    def report(self, elapsed, counters):
+        """Capacity report for one measurement window"""
+        sent, dropped, late, cross_bytes = counters
+        offered = self.vehicle_count * sum(self.rates.values())
+        frames = sum(consumer.frames for consumer in self.consumers)
+        lost = sum(consumer.lost for consumer in self.consumers)
+        consumers = len(self.consumers) or 1
+        
+        report = {
+            "route": self.route,
+            "vehicles": self.vehicle_count,
+            "shards": len([shard for shard in self.router.shards if shard.endpoints]) if self.router else None,
+            "consumers": len(self.consumers),
+            "rates_hz": dict(self.rates),
+            "duration_s": round(elapsed, 2),
+            "offered_fps": round(offered, 1),
+            "sent_fps": round(sent / elapsed, 1),
+            "late_frames": late,
+            "vehicle_drops": dropped,
+            "delivered_fps": round(frames / elapsed / consumers, 1),  # per consumer
+            "delivered_mbit_per_s": round(sum(consumer.bytes for consumer in self.consumers) * 8
+                                          / elapsed / 1e6 / consumers, 3),
+            "loss_ratio": round(lost / (frames + lost), 5) if frames + lost else None,
+            "vehicles_seen": min((len(consumer.seen) for consumer in self.consumers), default=0),
+            "cross_traffic_mbit_per_s": round(cross_bytes * 8 / elapsed / 1e6, 3),  # routed back to vehicles
+            "latency_ms": latency_summary([latency for consumer in self.consumers for latency in consumer.latencies]),
+            "per_consumer": [consumer.get_status(elapsed) for consumer in self.consumers]
+        }
+        logger.info(f"{self.route} with {self.vehicle_count} vehicles: {report['delivered_fps']} of "
+                    f"{report['offered_fps']} frames/s delivered, loss {report['loss_ratio']}")
+        return report
+    
+    def stop(self):
+        """Tear down consumers, the route and the vehicles"""
+        self.running = False
+        for consumer in self.consumers:
+            consumer.close()
+        if self.selector:
+            self.selector.close()
+        if self.generator:
+            self.generator.stop()
+        if self.router:
+            self.router.stop_router()
+        if self.router_dir:
+            shutil.rmtree(self.router_dir, ignore_errors=True)
+        if self.mux:
+            # The mux has no shutdown; forgetting the vehicles closes its links
+            for vehicle in self.vehicles:
+                self.mux.remove_vehicle(vehicle.sysid)
+
+
+def capacity(results, max_loss=0.001, max_p99_ms=50.0):
+    """Largest vehicle count whose run kept up with the offered load within the loss and latency limits"""
+    passing = [result["vehicles"] for result in results
+               if result["loss_ratio"] is not None and result["loss_ratio"] <= max_loss
+               and result["latency_ms"] and result["latency_ms"]["p99"] <= max_p99_ms
+               and result["vehicles_seen"] == result["vehicles"]
+               and result["delivered_fps"] >= 0.95 * result["offered_fps"]]
+    return max(passing, default=0)
+
+
+def parse_rates(values):
+    """["attitude=50", ...] -> {"attitude": 50.0}"""
+    rates = {}
+    for value in values or []:
+        name, _, rate = value.partition("=")
+        rates[name] = float(rate)
+    return rates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure MAVLink routing capacity with synthetic vehicles")
+    parser.add_argument("--route", choices=ROUTES, default="router")
+    parser.add_argument("--vehicles", type=int, default=50)
+    parser.add_argument("--sweep", help="comma-separated vehicle counts to run one after another")
+    parser.add_argument("--rate", action="append", metavar="STREAM=HZ",
+                        help=f"stream rate, streams: {', '.join(STREAMS)} (repeatable)")
+    parser.add_argument("--consumers", type=int, default=1, help="emulated GCS connections")
+    parser.add_argument("--shards", type=int, help="router shards (default: as the manager picks)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--tcp-base", type=int, default=25760, help="first vehicle port, away from live instances")
+    parser.add_argument("--server-port-base", type=int, default=24550, help="first router shard GCS port")
+    parser.add_argument("--max-loss", type=float, default=0.001, help="loss ratio a run may have to count")
+    parser.add_argument("--max-p99-ms", type=float, default=50.0, help="p99 latency a run may have to count")
+    parser.add_argument("--report", help="write the JSON report here")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    counts = [int(count) for count in args.sweep.split(",")] if args.sweep else [args.vehicles]
+    rates = parse_rates(args.rate)
+    
+    results = []
+    for count in counts:
+        test = RouterLoadTest(vehicles=count, rates=rates, consumers=args.consumers, route=args.route,
+                              shards=args.shards, tcp_base=args.tcp_base, server_port_base=args.server_port_base)
+        result = test.run(duration=args.duration, warmup=args.warmup)
+        results.append(result)
+        latency = result["latency_ms"] or {}
+        print(f"{count:>5} vehicles: offered {result['offered_fps']:>9} fps, delivered {result['delivered_fps']:>9} fps, "
+              f"loss {result['loss_ratio']}, p50 {latency.get('p50')} ms, p99 {latency.get('p99')} ms, "
+              f"late {result['late_frames']}")
+    
+    summary = {"route": args.route, "capacity_vehicles": capacity(results, args.max_loss, args.max_p99_ms),
+               "limits": {"max_loss": args.max_loss, "max_p99_ms": args.max_p99_ms}, "runs": results}
+    print(f"Routing capacity ({args.route}): {summary['capacity_vehicles']} vehicles")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Report written to {args.report}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Sharded MAVLink Routing
+Splits the router layer into several mavlink-routerd processes, each with its
+own config file, TCP server port and CPU core. Instances are placed on shards by
+consistent hashing, so changing the shard count only moves the instances whose
+ring segment changed, and a router crash or restart only drops the GCS links of
+the vehicles on that shard.
+"""
+
+import os
+import bisect
+import hashlib
+import logging
+
+from process_supervisor import get_supervisor, stop_process
+from process_stats import tcp_local_addresses
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to shard numbers, with virtual nodes"""
+    
+    def __init__(self, shards=(), replicas=64):
+        self.replicas = replicas
+        self.points = []  # sorted ring positions
+        self.owners = {}  # ring position -> shard
+        for shard in shards:
+            self.add(shard)
+    
+    @staticmethod
+    def position(key):
+        """Stable 64-bit ring position of a key"""
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+    
+    def add(self, shard):
+        """Place a shard's virtual nodes on the ring"""
+        for replica in range(self.replicas):
+            point = self.position(f"shard-{shard}#{replica}")
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+                self.owners[point] = shard
+    
+    def remove(self, shard):
+        """Take a shard's virtual nodes off the ring"""
+        self.points = [point for point in self.points if self.owners[point] != shard]
+        self.owners = {point: owner for point, owner in self.owners.items() if owner != shard}
+    
+    def lookup(self, key):
+        """Shard owning a key: the first virtual node clockwise from its position"""
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, self.position(key)) % len(self.points)
+        return self.owners[self.points[index]]
+
+
+class RouterShard:
+    """One mavlink-routerd process serving a subset of the instances"""
+    
+    def __init__(self, index, server_port, config_dir, binary="mavlink-routerd", cpu=None, startup_wait=2.0,
+                 supervisor=None):
+        self.index = index
+        self.server_port = server_port
+        self.config_file = os.path.join(config_dir, f"shard-{index}.conf")
+        self.log_file = os.path.join(config_dir, f"shard-{index}.log")  # router output
+        self.tlog_dir = os.path.join(config_dir, "tlogs", f"shard-{index}")  # telemetry logs (Log=)
+        self.binary = binary
+        self.cpu = cpu
+        self.startup_wait = startup_wait
+        self.endpoints = {}  # instance_id -> PX4 TCP port
+        self.process = None  # SupervisedProcess of mavlink-routerd
+        self.supervisor = supervisor or get_supervisor()
+        self.restarts = 0
+    
+    def generate_config(self):
+        """Write this shard's config with one endpoint per assigned instance"""
+        config_content = f"""[General]
+TcpServerPort={self.server_port}
+Log={self.tlog_dir}
+ReportStats=false
+MavlinkDialect=auto
+
+"""
+        for instance_id, tcp_port in sorted(self.endpoints.items()):
+            config_content += f"""[UartEndpoint sitl_{tcp_port}]
+Device = tcp:127.0.0.1:{tcp_port}
+
+"""
+        
+        os.makedirs(self.tlog_dir, exist_ok=True)
+        with open(self.config_file, 'w') as f:
+            f.write(config_content)
+    
+    def pin_to_cpu(self):
+        """Child-side hook: keep this router on its own core"""
+        if self.cpu is not None and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, {self.cpu})
+            except OSError:
+                pass
+    
+    def set_cpu(self, cpu):
+        """Pin the router to a core, or let it use any allowed core (None); applies to a running router too"""
+        if cpu == self.cpu:
+            return
+        self.cpu = cpu
+        if self.alive() and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(self.process.pid, {cpu} if cpu is not None else os.sched_getaffinity(0))
+            except OSError:
+                pass
+    
+    def start(self):
+        """(Re)start the router with the current endpoints; stops it if there are none"""
+        self.stop()
+        if not self.endpoints:
+            return True
+        
+        self.generate_config()
+        logger.info(f"Starting MAVLink router shard {self.index} on TCP {self.server_port} "
+                    f"with {len(self.endpoints)} instances")
+        
+        try:
+            self.process = self.supervisor.spawn(
+                f"MAVLink router shard {self.index}",
+                [self.binary, '-c', self.config_file, '-v'],
+                log_file=self.log_file,
+                preexec_fn=self.pin_to_cpu
+            )
+        except OSError as e:
+            logger.error(f"❌ MAVLink router shard {self.index} failed to start: {e}")
+            return False
+        
+        # Up if it is still running after the startup wait
+        self.process.wait_exit(self.startup_wait)
+        
+        if self.alive():
+            logger.info(f"✅ MAVLink router shard {self.index} started")
+            return True
+        else:
+            logger.error(f"❌ MAVLink router shard {self.index} exited during startup")
+            return False
+    
+    def alive(self):
+        """True if the router process is running"""
+        return self.process is not None and self.process.poll() is None
+    
+    def local_addresses(self):
+        """Local "ip:port" of the router's connections, e.g. to the PX4 TCP ports"""
+        return tcp_local_addresses(self.process.pid) if self.alive() else set()
+    
+    def stop(self):
+        """Stop the router process"""
+        if self.process:
+            stop_process(self.process, timeout=5, group=False)
+            self.process = None
+            logger.info(f"MAVLink router shard {self.index} stopped")
+    
+    def get_status(self):
+        """Shard summary for the API"""
+        return {
+            "shard": self.index,
+            "server_port": self.server_port,
+            "cpu": self.cpu,
+            "running": self.alive(),
+            "pid": self.process.pid if self.alive() else None,
+            "instances": sorted(self.endpoints),
+            "restarts": self.restarts,
+            "config_file": self.config_file,
+            "tlog_dir": self.tlog_dir
+        }
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Headless Mission Scenario Runner
+Flies a directory of mission files across several SITL instances in parallel
+(reusing vehicles that are already running), checks each flight against its
+pass/fail assertions and writes JUnit and JSON reports.
+
+A scenario is a QGC `.plan` file (simple items only) or a QGC WPL `.waypoints`
+file. Assertions come from the plan's "assertions" key or a sidecar
+`<name>.assert.json`:
+
+    {
+        "timeout_s": 900,            # simulated seconds until the flight is abandoned
+        "items_reached": "all",      # or a minimum number of items
+        "land": true,                # must end landed and disarmed
+        "max_altitude_m": 120,       # relative altitude ceiling
+        "end_position": {"lat": 47.39, "lon": 8.54, "tolerance_m": 5},
+        "forbidden_text": ["failsafe"]
+    }
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import logging
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from mavlink_client import MissionClient, MissionItem, MAV_CMD_MISSION_START, MAV_RESULT_ACCEPTED
+from fair_share import ANONYMOUS_USER
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ASSERTIONS = {
+    "timeout_s": 900,
+    "items_reached": "all",
+    "land": True,
+    "max_altitude_m": None,
+    "end_position": None,
+    "forbidden_text": []
+}
+
+
+class Scenario:
+    """A mission file and the assertions its flight must satisfy"""
+    
+    def __init__(self, name, path, items, assertions):
+        self.name = name
+        self.path = path
+        self.items = items
+        self.assertions = dict(DEFAULT_ASSERTIONS, **assertions)
+
+
+def load_plan(path):
+    """Items and embedded assertions of a QGC .plan file"""
+    with open(path) as f:
+        plan = json.load(f)
+    
+    items = []
+    for item in plan.get("mission", {}).get("items", []):
+        if item.get("type") != "SimpleItem":
+            raise ValueError(f"{os.path.basename(path)}: {item.get('complexItemType', 'complex')} items are "
+                             f"not supported, export the mission as simple waypoints")
+        items.append(MissionItem(item["command"], item.get("frame", 3), item.get("params", []),
+                                 item.get("autoContinue", True)))
+    return items, plan.get("assertions", {})
+
+
+def load_waypoints(path):
+    """Items of a QGC WPL 110 file (row 0, the home position, is skipped)"""
+    with open(path) as f:
+        lines = [line.split() for line in f if line.strip()]
+    if not lines or not lines[0][:2] == ["QGC", "WPL"]:
+        raise ValueError(f"{os.path.basename(path)}: not a QGC WPL file")
+    
+    items = []
+    for fields in lines[2:]:
+        _, _, frame, command = (int(value) for value in fields[:4])
+        params = [float(value) for value in fields[4:11]]
+        items.append(MissionItem(command, frame, params, fields[11] != "0"))
+    return items, {}
+
+
+def load_scenarios(directory):
+    """All scenarios in a directory, sorted by name"""
+    scenarios = []
+    for filename in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(filename)
+        path = os.path.join(directory, filename)
+        if extension == ".plan":
+            items, assertions = load_plan(path)
+        elif extension == ".waypoints":
+            items, assertions = load_waypoints(path)
+        else:
+            continue
+        
+        sidecar = os.path.join(directory, f"{stem}.assert.json")
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                assertions = dict(assertions, **json.load(f))
+        
+        if not items:
+            raise ValueError(f"{filename}: mission has no items")
+        scenarios.append(Scenario(stem, path, items, assertions))
+    return scenarios
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in metres"""
+    lat1, lon1, lat2, lon2 = (math.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(a))
+
+
+def fly_scenario(tcp_port, scenario, speed_factor=1.0, ready_timeout=120.0):
+    """Upload, arm and fly one scenario on the vehicle at tcp_port; returns its result dict"""
+    assertions = scenario.assertions
+    wall_timeout = assertions["timeout_s"] / speed_factor
+    started = time.monotonic()
+    failures = []
+    max_altitude = None
+    
+    with MissionClient(tcp_port, timeout=ready_timeout) as client:
+        client.wait_ready(ready_timeout)
+        client.upload(scenario.items)
+        client.arm(ready_timeout)
+        if client.command(MAV_CMD_MISSION_START, [0, 0]) != MAV_RESULT_ACCEPTED:
+            raise Exception("mission start rejected")
+        flight_started = time.monotonic()
+        
+        seen_armed = False
+        last_seq = len(scenario.items) - 1
+        while True:
+            if time.monotonic() - flight_started > wall_timeout:
+                failures.append(f"timed out after {assertions['timeout_s']} s simulated")
+                break
+            client.poll(0.2)
+            if client.position:
+                max_altitude = client.position[2] if max_altitude is None else max(max_altitude, client.position[2])
+            seen_armed = seen_armed or client.armed
+            if seen_armed and not client.armed and client.landed is not False:
+                break  # landed and auto-disarmed
+            if not assertions["land"] and last_seq in client.reached:
+                break
+    
+    reached = len(client.reached)
+    required = len(scenario.items) if assertions["items_reached"] == "all" else int(assertions["items_reached"])
+    if reached < required:
+        failures.append(f"reached {reached} of {required} required mission items")
+    if assertions["land"] and client.armed:
+        failures.append("vehicle did not land and disarm")
+    if assertions["max_altitude_m"] is not None and max_altitude is not None \
+            and max_altitude > assertions["max_altitude_m"]:
+        failures.append(f"altitude {max_altitude:.1f} m exceeded {assertions['max_altitude_m']} m")
+    if assertions["end_position"] and client.position:
+        target = assertions["end_position"]
+        error = distance_m(client.position[0], client.position[1], target["lat"], target["lon"])
+        if error > target.get("tolerance_m", 5.0):
+            failures.append(f"ended {error:.1f} m from the expected position")
+    for text in client.statustext:
+        for forbidden in assertions["forbidden_text"]:
+            if forbidden.lower() in text.lower():
+                failures.append(f"vehicle reported: {text}")
+    
+    duration = time.monotonic() - started
+    return {
+        "scenario": scenario.name,
+        "passed": not failures,
+        "failures": failures,
+        "duration_s": round(duration, 1),
+        "sim_duration_s": round(duration * speed_factor, 1),
+        "items_reached": reached,
+        "max_altitude_m": round(max_altitude, 1) if max_altitude is not None else None,
+        "final_position": client.position,
+        "statustext": client.statustext
+    }
+
+
+class ScenarioRunner:
+    """Spreads scenarios across SITL instances managed by a MultiSITLManager"""
+    
+    def __init__(self, manager, airframe="gz_x500", instances=1, speed_factor=1.0,
+                 report_dir="scenario_reports", user=ANONYMOUS_USER):
+        self.manager = manager
+        self.user = user  # Vehicles are created under, and only reused from, this user's quota
+        self.airframe = airframe
+        self.instances = instances
+        self.speed_factor = speed_factor
+        self.report_dir = report_dir
+        self.created = []  # Instances this runner created and will remove again
+        self.results = []
+        self.lock = threading.Lock()
+        self.state = "pending"
+        self.total = 0
+        self.summary = None
+        self.error = None
+    
+    def acquire_vehicles(self):
+        """The user's running instances of the airframe and speed factor, creating and starting more if needed"""
+        vehicles = [instance_id for instance_id, instance in self.manager.instances.items()
+                    if instance.status == "running" and instance.owner == self.user
+                    and instance.airframe == self.airframe
+                    and instance.speed_factor == self.speed_factor][:self.instances]
+        if vehicles:
+            logger.info(f"Reusing running instances: {', '.join(vehicles)}")
+        
+        starting = []
+        for _ in range(self.instances - len(vehicles)):
+            instance_id = self.manager.create_instance(self.airframe, speed_factor=self.speed_factor, user=self.user)
+            if instance_id is None:
+                logger.warning(f"⚠️ Could not create more instances, running on {len(vehicles) + len(starting)}")
+                break
+            self.created.append(instance_id)
+            starting.append(instance_id)
+        
+        # Boots are mostly waiting, so start the new vehicles in parallel
+        threads = [threading.Thread(target=self.manager.start_instance, args=(instance_id,))
+                   for instance_id in starting]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        vehicles += [instance_id for instance_id in starting
+                     if self.manager.instances[instance_id].status == "running"]
+        if not vehicles:
+            raise Exception("No vehicles available to run scenarios")
+        return vehicles
+    
+    def release_vehicles(self):
+        """Stop and remove the instances this runner created"""
+        for instance_id in self.created:
+            self.manager.stop_instance(instance_id)
+            self.manager.remove_instance(instance_id)
+        self.created = []
+    
+    def worker(self, instance_id, pending):
+        """Fly scenarios on one vehicle until the queue is empty"""
+        while True:
+            try:
+                scenario = pending.get_nowait()
+            except queue.Empty:
+                return
+            
+            instance = self.manager.instances.get(instance_id)
+            logger.info(f"Flying {scenario.name} on {instance_id}")
+            try:
+                result = fly_scenario(instance.tcp_port, scenario, self.speed_factor)
+            except Exception as e:
+                result = {"scenario": scenario.name, "passed": False, "error": str(e), "failures": [str(e)],
+                          "duration_s": 0, "sim_duration_s": 0}
+            result["instance_id"] = instance_id
+            
+            level = logging.INFO if result["passed"] else logging.WARNING
+            logger.log(level, f"{'✅' if result['passed'] else '❌'} {scenario.name} on {instance_id}: "
+                              f"{'passed' if result['passed'] else '; '.join(result['failures'])}")
+            with self.lock:
+                self.results.append(result)
+            
+            if "error" in result and (instance is None or instance.status != "running"):
+                return  # The vehicle is gone; leave the rest of the queue to the others
+    
+    def run(self, directory, keep_vehicles=False):
+        """Fly every scenario in a directory and write the reports; returns the summary"""
+        scenarios = load_scenarios(directory)
+        started_at = datetime.now()
+        started = time.monotonic()
+        self.state = "running"
+        self.total = len(scenarios)
+        
+        vehicles = self.acquire_vehicles()
+        logger.info(f"Running {len(scenarios)} scenarios on {len(vehicles)} vehicles "
+                    f"at {self.speed_factor}x speed")
+        
+        pending = queue.Queue()
+        for scenario in scenarios:
+            pending.put(scenario)
+        
+        threads = [threading.Thread(target=self.worker, args=(instance_id, pending), daemon=True)
+                   for instance_id in vehicles]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        while not pending.empty():
+            scenario = pending.get()
+            self.results.append({"scenario": scenario.name, "passed": False, "skipped": True,
+                                 "failures": ["no vehicle left to fly it"], "duration_s": 0, "sim_duration_s": 0})
+        
+        if not keep_vehicles:
+            self.release_vehicles()
+        
+        duration = time.monotonic() - started
+        passed = len([r for r in self.results if r["passed"]])
+        summary = {
+            "started_at": started_at.isoformat(),
+            "duration_s": round(duration, 1),
+            "airframe": self.airframe,
+            "user": self.user,
+            "vehicles": vehicles,
+            "speed_factor": self.speed_factor,
+            "missions": len(self.results),
+            "passed": passed,
+            "failed": len(self.results) - passed,
+            "missions_per_hour": round(len(self.results) * 3600 / duration, 1) if duration else None,
+            "results": sorted(self.results, key=lambda r: r["scenario"])
+        }
+        self.write_reports(summary)
+        self.summary = summary
+        self.state = "finished"
+        return summary
+    
+    def run_safely(self, directory):
+        """run() for a background thread: errors end up in the status instead of the log only"""
+        try:
+            self.run(directory)
+        except Exception as e:
+            logger.error(f"Scenario run failed: {e}")
+            self.error = str(e)
+            self.state = "error"
+            self.release_vehicles()
+    
+    def get_status(self):
+        """Progress while running, the summary once finished"""
+        if self.summary:
+            return dict(self.summary, state=self.state)
+        with self.lock:
+            done = len(self.results)
+            passed = len([r for r in self.results if r["passed"]])
+        return {"state": self.state, "error": self.error, "missions": self.total,
+                "completed": done, "passed": passed, "report_dir": self.report_dir}
+    
+    def write_reports(self, summary):
+        """report.json and junit.xml in the report directory"""
+        os.makedirs(self.report_dir, exist_ok=True)
+        with open(os.path.join(self.report_dir, "report.json"), 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        suite = ET.Element("testsuite", name="sitl-scenarios", tests=str(summary["missions"]),
+                           failures=str(summary["failed"]), time=str(summary["duration_s"]),
+                           timestamp=summary["started_at"])
+        for result in summary["results"]:
+            case = ET.SubElement(suite, "testcase", classname=f"scenarios.{self.airframe}",
+                                 name=result["scenario"], time=str(result["duration_s"]))
+            if result.get("skipped"):
+                ET.SubElement(case, "skipped", message=result["failures"][0])
+            elif "error" in result:
+                ET.SubElement(case, "error", message=result["error"])
+            elif not result["passed"]:
+                failure = ET.SubElement(case, "failure", message=result["failures"][0])
+                failure.text = "\n".join(result["failures"])
+            if result.get("statustext"):
+                ET.SubElement(case, "system-out").text = "\n".join(result["statustext"])
+        ET.ElementTree(suite).write(os.path.join(self.report_dir, "junit.xml"),
+                                    encoding="utf-8", xml_declaration=True)
+        logger.info(f"Reports written to {self.report_dir}")
+
+
+if __name__ == "__main__":
+    from multi_sitl_manager import MultiSITLManager
+    
+    parser = argparse.ArgumentParser(description="Fly a directory of missions on parallel SITL instances")
+    parser.add_argument("directory", help="directory of .plan / .waypoints files")
+    parser.add_argument("--instances", type=int, default=1, help="vehicles to fly on in parallel")
+    parser.add_argument("--airframe", default="gz_x500")
+    parser.add_argument("--speed-factor", type=float, default=1.0, help="simulation speed (lockstep)")
+    parser.add_argument("--report-dir", default="scenario_reports")
+    args = parser.parse_args()
+    
+    runner = ScenarioRunner(MultiSITLManager(), airframe=args.airframe, instances=args.instances,
+                            speed_factor=args.speed_factor, report_dir=args.report_dir)
+    summary = runner.run(args.directory)
+    
+    print(f"{summary['passed']}/{summary['missions']} scenarios passed "
+          f"({summary['missions_per_hour']} missions/hour)")
+    raise SystemExit(0 if summary["failed"] == 0 else 1)
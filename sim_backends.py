@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Simulator Backends
+How an instance's vehicle dynamics are simulated. The instance lifecycle, ports,
+routing and status are the same for every backend; a backend only decides the
+extra launch environment, whether a Gazebo server is involved (and so whether
+world sharing, lite worlds and Gazebo liveness checks apply), and how a vehicle
+is moved back to its spawn point on reset.
+
+  gz   Gazebo, as a dedicated server per vehicle or one shared server per world
+  sih  PX4's built-in simulation-in-hardware: rigid-body dynamics run inside the
+       px4 process (sihsim_quadx, sihsim_airplane), no Gazebo at all
+"""
+
+import os
+import logging
+import subprocess
+
+from mavlink_client import MAVLinkClient
+
+logger = logging.getLogger(__name__)
+
+SPAWN_HEIGHT = 0.3  # metres above the spawn point, so the model settles instead of intersecting the ground
+
+
+class GazeboBackend:
+    """Vehicle dynamics in a Gazebo server"""
+    
+    name = "gz"
+    label = "Gazebo"
+    uses_gazebo = True
+    
+    def launch_env(self, instance):
+        """Extra PX4 environment (gz airframes select the Gazebo bridge themselves)"""
+        return {}
+    
+    def base_model(self, airframe):
+        """Gazebo model (in PX4's models directory) an airframe spawns"""
+        return airframe[3:] if airframe.startswith("gz_") else airframe
+    
+    def model_name(self, instance, px4_index):
+        """Name PX4 gives its Gazebo model: the airframe and its "-i" index"""
+        return f"{self.base_model(instance.airframe)}_{px4_index}"
+    
+    def reset_pose(self, instance):
+        """Move the Gazebo model back to its spawn point through the world's set_pose service"""
+        x, y = ((instance.model_pose or "0,0").split(",") + ["0"])[:2]
+        request = (f'name: "{instance.gz_model}", position: {{x: {x}, y: {y}, z: {SPAWN_HEIGHT}}}, '
+                   f'orientation: {{w: 1}}')
+        env = instance.world_manager.resource_env() if instance.world_manager else os.environ.copy()
+        
+        try:
+            result = subprocess.run(
+                ['gz', 'service', '-s', f'/world/{instance.gz_world()}/set_pose',
+                 '--reqtype', 'gz.msgs.Pose', '--reptype', 'gz.msgs.Boolean',
+                 '--timeout', '3000', '--req', request],
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        except Exception as e:
+            logger.warning(f"set_pose failed for instance {instance.instance_id}: {e}")
+            return False
+        
+        return result.returncode == 0 and 'true' in result.stdout
+
+
+class SihBackend:
+    """Vehicle dynamics simulated inside the px4 process by simulator_sih"""
+    
+    name = "sih"
+    label = "SIH"
+    uses_gazebo = False
+    
+    def launch_env(self, instance):
+        """Tell PX4's startup script to run simulator_sih instead of a Gazebo bridge"""
+        return {'PX4_SIMULATOR': 'sihsim'}
+    
+    def model_name(self, instance, px4_index):
+        """SIH has no simulator-side model"""
+        return None
+    
+    def reset_pose(self, instance):
+        """Restart simulator_sih, which starts the vehicle again at rest at its home position (SIH_LOC_*)"""
+        try:
+            with MAVLinkClient(instance.tcp_port, timeout=10) as client:
+                client.shell("simulator_sih stop\nsimulator_sih start")
+            return True
+        except Exception as e:
+            logger.warning(f"Restarting SIH failed for instance {instance.instance_id}: {e}")
+            return False
+
+
+BACKENDS = {backend.name: backend for backend in (GazeboBackend(), SihBackend())}
+
+
+def get_backend(name):
+    """Backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown simulator backend: {name}")
+    return BACKENDS[name]
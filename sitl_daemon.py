@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+SITL Control-Plane Daemon
+Runs the MultiSITLManager as a standalone process and serves a compact RPC on
+a Unix domain socket. The web app (any number of workers) and the sitlctl CLI
+are thin clients of it, so there is exactly one owner of the SITL processes.
+
+Wire format: every message is a 4-byte big-endian length followed by a JSON
+object. Requests are {"id", "method", "args", "kwargs"}; replies are
+{"id", "result"} or {"id", "error", "type"}. Connections are persistent, so a
+call costs one round trip on a local socket.
+"""
+
+import os
+import json
+import stat
+import signal
+import socket
+import struct
+import logging
+import argparse
+import itertools
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTROL_SOCKET = "/tmp/sitl-control.sock"
+LENGTH_PREFIX = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# Manager methods a client may call; everything else stays private to the daemon
+RPC_METHODS = (
+    "check_admission", "create_instance", "launch_instance", "start_instance", "stop_instance", "restart_instance",
+    "remove_instance", "stop_all_instances", "get_instance_status", "get_all_status",
+    "get_memory_report", "get_memory_summary", "get_metrics", "get_bandwidth", "set_rate_profile",
+    "get_airframes", "default_airframe", "is_valid_airframe", "snapshot_params", "has_param_snapshot",
+    "restore_params", "reset_instance", "get_reset_metrics", "start_scenario_run", "get_scenario_run",
+    "set_router_shards", "list_ulogs", "ulog_path", "check_quota", "get_user_usage", "set_user_quota",
+    "identify_user", "pause_instance", "resume_instance", "get_pause_metrics", "get_gcs_mux", "get_gcs_clients",
+    "set_gcs_subscription",
+)
+
+
+class RPCError(Exception):
+    """Error raised by the daemon while handling a call"""
+    
+    def __init__(self, message, error_type="Exception"):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def send_message(sock, message):
+    """Send one length-prefixed JSON message"""
+    data = json.dumps(message, default=str).encode()
+    sock.sendall(LENGTH_PREFIX.pack(len(data)) + data)
+
+
+def receive_exactly(sock, size):
+    """Read exactly `size` bytes (None if the peer closed first)"""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def receive_message(sock):
+    """Read one length-prefixed JSON message (None on a clean close)"""
+    header = receive_exactly(sock, LENGTH_PREFIX.size)
+    if header is None:
+        return None
+    size = LENGTH_PREFIX.unpack(header)[0]
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"message too large ({size} bytes)")
+    data = receive_exactly(sock, size)
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+class SITLDaemon:
+    """Serves a manager's RPC methods on a Unix domain socket"""
+    
+    def __init__(self, manager, socket_path=DEFAULT_CONTROL_SOCKET, socket_mode=0o660):
+        self.manager = manager
+        self.socket_path = socket_path
+        self.socket_mode = socket_mode
+        self.server = None
+        self.running = False
+        self.calls = 0
+    
+    def bind(self):
+        """Create the listening socket, replacing a stale one left by a dead daemon"""
+        if os.path.exists(self.socket_path):
+            if not stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                raise RuntimeError(f"{self.socket_path} exists and is not a socket")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"another daemon is listening on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+        
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        os.chmod(self.socket_path, self.socket_mode)
+        self.server.listen(64)
+        self.running = True
+        logger.info(f"✅ Control socket listening on {self.socket_path}")
+    
+    def serve_forever(self):
+        """Accept clients until shutdown(); each connection gets its own thread"""
+        if self.server is None:
+            self.bind()
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+    
+    def start(self):
+        """Serve in a background thread"""
+        self.bind()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+    
+    def shutdown(self):
+        """Stop accepting clients and remove the socket file"""
+        self.running = False
+        if self.server:
+            try:
+                self.server.close()
+            except OSError:
+                pass
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+    
+    def dispatch(self, request):
+        """Run one request against the manager and build its reply"""
+        request_id = request.get("id")
+        method = request.get("method")
+        if method == "ping":
+            return {"id": request_id, "result": "pong"}
+        if method not in RPC_METHODS:
+            return {"id": request_id, "error": f"Unknown method: {method}", "type": "AttributeError"}
+        try:
+            result = getattr(self.manager, method)(*request.get("args", []), **request.get("kwargs", {}))
+            return {"id": request_id, "result": result}
+        except Exception as e:
+            logger.error(f"❌ RPC {method} failed: {e}")
+            return {"id": request_id, "error": str(e), "type": type(e).__name__}
+    
+    def handle(self, conn):
+        """Answer requests from one client until it disconnects"""
+        try:
+            while self.running:
+                request = receive_message(conn)
+                if request is None:
+                    break
+                self.calls += 1
+                send_message(conn, self.dispatch(request))
+        except Exception as e:
+            logger.warning(f"⚠️ Control client dropped: {e}")
+        finally:
+            conn.close()
+
+
+class SITLControlClient:
+    """Manager proxy that forwards method calls to the daemon"""
+    
+    def __init__(self, socket_path=DEFAULT_CONTROL_SOCKET, timeout=60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.local = threading.local()  # one persistent connection per thread
+        self.ids = itertools.count(1)  # next() on a count is atomic, so ids stay unique across threads
+    
+    def connection(self):
+        """This thread's connection to the daemon, opened on first use"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self.local.conn = conn
+        return conn
+    
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+    
+    def call(self, method, *args, **kwargs):
+        """Call a manager method in the daemon and return its result"""
+        request = {"id": next(self.ids), "method": method, "args": args, "kwargs": kwargs}
+        
+        # A daemon restart leaves us with a dead connection; reconnect once
+        for attempt in (1, 2):
+            try:
+                conn = self.connection()
+                send_message(conn, request)
+                reply = receive_message(conn)
+                if reply is None:
+                    raise ConnectionError("control daemon closed the connection")
+                break
+            except (ConnectionError, BrokenPipeError):
+                self.close()
+                if attempt == 2:
+                    raise
+            except Exception:
+                # A timeout leaves the late reply queued on the connection; never reuse it
+                self.close()
+                raise
+        
+        if reply.get("id") != request["id"]:
+            self.close()
+            raise ConnectionError(f"control daemon answered request {reply.get('id')}, expected {request['id']}")
+        if "error" in reply:
+            raise RPCError(reply["error"], reply.get("type", "Exception"))
+        return reply["result"]
+    
+    def __getattr__(self, name):
+        if name not in RPC_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+if __name__ == "__main__":
+    from multi_sitl_manager import MultiSITLManager
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description="Run the SITL manager as a control-plane daemon")
+    parser.add_argument("--socket", default=os.environ.get("SITL_CONTROL_SOCKET", DEFAULT_CONTROL_SOCKET))
+    parser.add_argument("--mode", default="660", help="permissions of the socket file (octal)")
+    args = parser.parse_args()
+    
+    manager = MultiSITLManager(
+        world_sharing=os.environ.get('SITL_WORLD_SHARING') == '1',
+        default_world=os.environ.get('SITL_DEFAULT_WORLD', 'default'),
+        auto_restart=os.environ.get('SITL_AUTO_RESTART') == '1',
+        router_shards=int(os.environ.get('SITL_ROUTER_SHARDS', 0)) or None,
+        resource_warmup=os.environ.get('SITL_GZ_RESOURCE_WARMUP', '1') != '0'
+    )
+    daemon = SITLDaemon(manager, args.socket, socket_mode=int(args.mode, 8))
+    
+    def stop(signum, frame):
+        logger.info("Shutting down, stopping all instances")
+        daemon.shutdown()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    try:
+        daemon.serve_forever()
+    finally:
+        daemon.shutdown()
+        manager.stop_all_instances()
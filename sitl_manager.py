@@ -7,9 +7,10 @@ Runs PX4 SITL and MAVLink router for QGroundControl connection
 import subprocess
 import time
 import os
-import signal
 import logging
 
+from process_supervisor import get_supervisor, stop_process, PX4_READY_PATTERN
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,7 @@ class SITLManager:
         self.px4_path = os.path.expanduser("~/PX4-Autopilot")
         self.mavlink_process = None
         self.px4_process = None
+        self.supervisor = get_supervisor()
         self.status = "stopped"
         self.udp_port = 14550
         self.tcp_port = 5760
@@ -43,13 +45,14 @@ class SITLManager:
             '-v'
         ]
         
-        self.mavlink_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        try:
+            self.mavlink_process = self.supervisor.spawn("MAVLink router", cmd)
+        except OSError as e:
+            logger.error(f"❌ MAVLink router failed to start: {e}")
+            return False
         
-        time.sleep(2)
+        # Up if it is still running after 2 seconds
+        self.mavlink_process.wait_exit(2)
         
         if self.mavlink_process.poll() is None:
             logger.info("✅ MAVLink router started")
@@ -64,16 +67,17 @@ class SITLManager:
         
         cmd = f"cd {self.px4_path} && HEADLESS=1 make px4_sitl {airframe}"
         
-        self.px4_process = subprocess.Popen(
+        self.px4_process = self.supervisor.spawn(
+            "PX4",
             cmd,
+            ready_pattern=PX4_READY_PATTERN,
             shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
             preexec_fn=os.setsid
         )
         
-        logger.info("Waiting for PX4 to boot (20 seconds)...")
-        time.sleep(20)
+        # Done as soon as the startup script has finished (at most 20 seconds)
+        logger.info("Waiting for PX4 to boot...")
+        self.px4_process.wait_ready(20)
         
         if self.px4_process.poll() is None:
             logger.info("✅ PX4 SITL started")
@@ -162,16 +166,10 @@ class SITLManager:
         logger.info("Stopping SITL system...")
         
         if self.px4_process:
-            try:
-                os.killpg(os.getpgid(self.px4_process.pid), signal.SIGTERM)
-            except:
-                pass
+            stop_process(self.px4_process, timeout=10)
         
         if self.mavlink_process:
-            try:
-                self.mavlink_process.terminate()
-            except:
-                pass
+            stop_process(self.mavlink_process, timeout=5, group=False)
         
         self.cleanup()
         self.status = "stopped"
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+sitlctl - command-line client for the SITL control daemon
+Talks to sitl_daemon.py over its Unix socket and prints results as JSON.
+
+    sitlctl create gz_x500 --start
+    sitlctl status
+    sitlctl reset instance_1a2b3c4d
+    sitlctl call get_bandwidth instance_1a2b3c4d
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from sitl_daemon import SITLControlClient, RPCError, DEFAULT_CONTROL_SOCKET
+from lite_world import SIM_PROFILES
+
+
+def parse_value(text):
+    """JSON values where possible (numbers, true/false, objects), plain strings otherwise"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def run(args):
+    """Execute one subcommand and return what to print"""
+    client = SITLControlClient(args.socket)
+    
+    if args.command == "status":
+        if args.instance_id:
+            return client.get_instance_status(args.instance_id)
+        return client.get_all_status()
+    if args.command == "create":
+        instance_id = client.create_instance(args.airframe, world=args.world, speed_factor=args.speed_factor,
+                                             sim_profile=args.sim_profile)
+        if instance_id and args.start and not client.start_instance(instance_id):
+            client.remove_instance(instance_id)
+            raise RPCError(f"Failed to start {instance_id}")
+        return {"instance_id": instance_id}
+    if args.command in ("start", "stop", "remove"):
+        method = {"start": "start_instance", "stop": "stop_instance", "remove": "remove_instance"}
+        return {"success": client.call(method[args.command], args.instance_id)}
+    if args.command == "stop-all":
+        client.stop_all_instances()
+        return {"success": True}
+    if args.command == "reset":
+        return client.reset_instance(args.instance_id)
+    if args.command == "metrics":
+        return client.get_metrics()
+    if args.command == "airframes":
+        return client.get_airframes()
+    if args.command == "call":
+        return client.call(args.method, *[parse_value(value) for value in args.args])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sitlctl", description="Control SITL instances through the daemon")
+    parser.add_argument("--socket", default=os.environ.get("SITL_CONTROL_SOCKET", DEFAULT_CONTROL_SOCKET))
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    status = commands.add_parser("status", help="status of one or all instances")
+    status.add_argument("instance_id", nargs="?")
+    
+    create = commands.add_parser("create", help="create an instance")
+    create.add_argument("airframe", nargs="?", default="gz_x500")
+    create.add_argument("--world")
+    create.add_argument("--speed-factor", type=float, default=1.0)
+    create.add_argument("--sim-profile", choices=SIM_PROFILES, default="default")
+    create.add_argument("--start", action="store_true", help="also start it")
+    
+    for name in ("start", "stop", "remove", "reset"):
+        commands.add_parser(name, help=f"{name} an instance").add_argument("instance_id")
+    commands.add_parser("stop-all", help="stop every instance")
+    commands.add_parser("metrics", help="host and per-instance metrics")
+    commands.add_parser("airframes", help="configured airframes")
+    
+    call = commands.add_parser("call", help="call any daemon method")
+    call.add_argument("method")
+    call.add_argument("args", nargs="*", help="positional arguments (parsed as JSON where possible)")
+    
+    args = parser.parse_args(argv)
+    try:
+        result = run(args)
+    except (OSError, RPCError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
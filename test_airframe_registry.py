@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for the airframe profile registry
+Uses a throwaway PX4 tree and cache directory, so no PX4 install is needed
+"""
+
+import os
+import json
+import tempfile
+from airframe_registry import AirframeRegistry, DEFAULT_CONFIG
+from multi_sitl_manager import MultiSITLManager
+
+
+def make_px4_tree(root, airframes):
+    """Create a fake PX4 tree containing the given airframe startup files"""
+    airframes_dir = os.path.join(root, "ROMFS", "px4fmu_common", "init.d-posix", "airframes")
+    os.makedirs(airframes_dir, exist_ok=True)
+    for name in airframes:
+        open(os.path.join(airframes_dir, name), 'w').close()
+    return airframes_dir
+
+
+def test_registry_cross_check():
+    """Profiles missing from the PX4 tree are marked unavailable"""
+    print("=" * 60)
+    print("Testing airframe registry cross-check")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        px4_path = os.path.join(tmp, "PX4-Autopilot")
+        make_px4_tree(px4_path, ["4001_gz_x500", "4004_gz_standard_vtol", "9999_gz_unused"])
+        
+        registry = AirframeRegistry(px4_path=px4_path, cache_dir=os.path.join(tmp, "cache"))
+        
+        print(f"Launchable airframes: {registry.names()}")
+        assert registry.names() == ["gz_x500", "gz_standard_vtol"]
+        assert registry.is_valid("gz_x500")
+        assert not registry.is_valid("gz_rc_cessna")
+        assert not registry.is_valid("gz_not_an_airframe")
+        
+        # The discovery result is cached by the airframes directory mtime
+        with open(registry.targets_cache) as f:
+            cached = json.load(f)
+        assert cached["targets"]["gz_x500"] == 4001
+    
+    print("✅ Registry cross-check test completed successfully!")
+
+
+def test_registry_without_px4_tree():
+    """Without a PX4 tree every configured airframe stays usable"""
+    print("\n" + "=" * 60)
+    print("Testing airframe registry without a PX4 tree")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"),
+                                    cache_dir=os.path.join(tmp, "cache"))
+        
+        with open(DEFAULT_CONFIG) as f:
+            configured = list(json.load(f)["airframes"])
+        
+        print(f"Configured airframes: {len(configured)}, launchable: {len(registry.names())}")
+        assert registry.names() == configured
+        assert registry.default == "gz_x500"
+    
+    print("✅ Registry fallback test completed successfully!")
+
+
+def test_cost_model():
+    """Live measurements replace the configured cost and drive admission"""
+    print("\n" + "=" * 60)
+    print("Testing airframe cost model")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"),
+                                    cache_dir=os.path.join(tmp, "cache"))
+        
+        configured_cpu, configured_memory = registry.cost("gz_standard_vtol")
+        print(f"Configured VTOL cost: {configured_cpu} cores, {configured_memory} MB")
+        
+        registry.record_usage("gz_standard_vtol", 2.0, 900)
+        registry.record_usage("gz_standard_vtol", 1.0, 800)
+        cpu, memory = registry.cost("gz_standard_vtol")
+        print(f"Measured VTOL cost: {cpu:.2f} cores, {memory:.0f} MB")
+        assert abs(cpu - 1.8) < 1e-6
+        assert abs(memory - 880) < 1e-6
+        
+        manager = MultiSITLManager(registry=registry, cpu_budget=2.0,
+                                   memory_budget_mb=4000, metrics_interval=0)
+        print(f"Admission for VTOL: {manager.check_admission('gz_standard_vtol')}")
+        assert manager.check_admission("gz_standard_vtol") is None
+        
+        registry.record_usage("gz_standard_vtol", 5.0, 900)
+        reason = manager.check_admission("gz_standard_vtol")
+        print(f"Admission after a heavier sample: {reason}")
+        assert reason is not None
+    
+    print("✅ Cost model test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Airframe Registry Tests")
+    print("=" * 60)
+    
+    try:
+        test_registry_cross_check()
+        test_registry_without_px4_tree()
+        test_cost_model()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
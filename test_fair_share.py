@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test script for per-user quotas and fair-share queueing of creates
+No PX4 is started: instances are only created and removed, which is all the
+quota and queue logic looks at
+"""
+
+import os
+import time
+import tempfile
+import threading
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+from multi_sitl_manager import MultiSITLManager
+from airframe_registry import AirframeRegistry
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+from fair_share import QuotaPolicy
+
+
+def make_manager(tmp, quotas, max_instances=10):
+    manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100, memory_budget_mb=100000,
+                               registry=AirframeRegistry(px4_path=os.path.join(tmp, "missing"),
+                                                         cache_dir=os.path.join(tmp, "cache")),
+                               rootfs_store=RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs")),
+                               cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")), quotas=quotas)
+    manager.port_pool.max_instances = max_instances
+    return manager
+
+
+def remove_all(manager):
+    """Remove every instance the test created, rootfs clones included"""
+    for instance_id in list(manager.instances):
+        assert manager.remove_instance(instance_id)
+    assert os.listdir(manager.rootfs_store.instances_dir) == []
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.01)
+
+
+def test_quotas_and_identity():
+    """Users are held to their instance/CPU quotas, and identified by token when tokens exist"""
+    print("=" * 60)
+    print("Testing per-user quotas")
+    print("=" * 60)
+    
+    quotas = QuotaPolicy(default={"max_instances": 2},
+                         users={"alice": {"max_instances": 5, "max_cpu": 1.0}, "ci": {"token": "s3cret"}})
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, quotas)
+        assert manager.create_instance("gz_x500", user="bob")
+        assert manager.create_instance("gz_x500", user="bob")
+        reason = manager.check_quota("gz_x500", user="bob")
+        print(f"Quota reason: {reason}")
+        assert "Instance quota of bob" in reason
+        assert manager.create_instance("gz_x500", user="bob") is None
+        assert manager.create_instance("gz_x500", user="carol")
+        
+        assert manager.check_quota("gz_standard_vtol", user="alice").startswith("CPU quota of alice")
+        manager.set_user_quota("alice", max_cpu=None)
+        assert manager.create_instance("gz_standard_vtol", user="alice")
+        
+        # Idempotency keys are per user
+        first = manager.create_instance("gz_x500", user="alice", idempotency_key="k")
+        assert manager.create_instance("gz_x500", user="alice", idempotency_key="k") == first
+        assert manager.create_instance("gz_x500", user="carol", idempotency_key="k") not in (None, first)
+        
+        usage = manager.get_user_usage()
+        print(f"Usage: {usage}")
+        assert usage["bob"]["instances"] == 2 and usage["bob"]["quota"]["max_instances"] == 2
+        assert usage["alice"]["instances"] == 2 and usage["ci"]["instances"] == 0
+        
+        # Through the API: the token decides who you are, the quota is enforced with 429
+        app_multi.multi_sitl = manager
+        client = app_multi.app.test_client()
+        assert client.get('/api/users', headers={"Authorization": "Bearer s3cret"}).get_json()["you"] == "ci"
+        assert client.get('/api/users', headers={"X-SITL-User": "alice"}).get_json()["you"] == "anonymous"
+        for _ in range(2):
+            response = client.post('/api/instances', json={"airframe": "gz_x500"},
+                                   headers={"Authorization": "Bearer s3cret"})
+            assert response.status_code == 200 and response.get_json()["owner"] == "ci"
+        response = client.post('/api/instances', json={"airframe": "gz_x500"},
+                               headers={"Authorization": "Bearer s3cret"})
+        assert response.status_code == 429
+        
+        # Quota changes need a configured admin token, and the request must carry it
+        saved_token = os.environ.pop('SITL_ADMIN_TOKEN', None)
+        try:
+            assert client.put('/api/users/ci/quota', json={"max_instances": 50}).status_code == 403
+            os.environ['SITL_ADMIN_TOKEN'] = "admin"
+            assert client.put('/api/users/ci/quota', json={"max_instances": 50}).status_code == 403
+            admin = {"X-Admin-Token": "admin"}
+            response = client.put('/api/users/ci/quota', json={"max_instances": 3}, headers=admin)
+            assert response.get_json()["quota"]["max_instances"] == 3
+            assert client.put('/api/users/ci/quota', json={"max_gpus": 1}, headers=admin).status_code == 400
+        finally:
+            os.environ.pop('SITL_ADMIN_TOKEN', None)
+            if saved_token is not None:
+                os.environ['SITL_ADMIN_TOKEN'] = saved_token
+        remove_all(manager)
+    
+    print("✅ Quota test completed successfully!")
+
+
+def test_fair_share_queue():
+    """When the host is full, freed capacity goes to the user with the lowest weighted usage"""
+    print("\n" + "=" * 60)
+    print("Testing fair-share queueing")
+    print("=" * 60)
+    
+    quotas = QuotaPolicy(users={"ci": {"weight": 0.5}})
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, quotas, max_instances=3)
+        ci_instances = [manager.create_instance("gz_x500", user="ci") for _ in range(2)]
+        alice_instance = manager.create_instance("gz_x500", user="alice")
+        assert manager.create_instance("gz_x500", user="bob") is None  # full, and bob won't wait
+        
+        results = {}
+        def create(name, user, timeout):
+            results[name] = manager.create_instance("gz_x500", user=user, queue_timeout=timeout)
+        
+        threads = []
+        for name, user, timeout in [("ci-1", "ci", 5), ("ci-2", "ci", 1.0), ("alice", "alice", 5)]:
+            thread = threading.Thread(target=create, args=(name, user, timeout))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: len(manager.create_queue.tickets) == len(threads))
+        print(f"Queued per user: {manager.create_queue.waiting()}")
+        
+        # ci holds 2 at weight 0.5, alice 1 at weight 1: alice goes first although she asked last
+        manager.remove_instance(ci_instances[0])
+        threads[2].join(timeout=5)
+        assert results.get("alice") and manager.instances[results["alice"]].owner == "alice"
+        assert "ci-1" not in results
+        
+        threads[1].join(timeout=5)
+        assert results["ci-2"] is None  # gave up after its queue timeout
+        
+        manager.remove_instance(alice_instance)
+        threads[0].join(timeout=5)
+        assert results["ci-1"] and manager.instances[results["ci-1"]].owner == "ci"
+        
+        stats = manager.get_metrics()["queue"]
+        print(f"Queue stats: {stats}")
+        assert stats["served"] == 2 and stats["abandoned"] == 1 and stats["waiting"] == 0
+        remove_all(manager)
+    
+    print("✅ Fair-share queue test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Fair-Share Tests")
+    print("=" * 60)
+    
+    try:
+        test_quotas_and_identity()
+        test_fair_share_queue()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
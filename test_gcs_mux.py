@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-port GCS mux
+Local TCP servers stand in for the vehicles' GCS ports; each one sends
+heartbeats under its system id and records what reaches it
+"""
+
+import os
+import time
+import socket
+import struct
+import tempfile
+import threading
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+from mavlink_frames import FrameSplitter, encode_frame, frame_header, frame_payload, frame_target_system
+from gcs_mux import GcsMux, MuxClient, TIMESYNC_FORMAT
+from multi_sitl_manager import MultiSITLManager
+from airframe_registry import AirframeRegistry
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+from bandwidth_monitor import BandwidthMonitor
+from process_stats import tcp_local_addresses
+
+COMMAND_LONG_FORMAT = struct.Struct('<7fHBBB')
+
+
+def command_long(target_system):
+    return encode_frame(76, COMMAND_LONG_FORMAT.pack(0, 0, 0, 0, 0, 0, 0, 400, target_system, 1, 0))
+
+
+class FakeVehicle:
+    """TCP server sending heartbeats as one system id (reading=False: never reads what it is sent)"""
+    
+    def __init__(self, sysid, reading=True):
+        self.sysid = sysid
+        self.reading = reading
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.received = []
+        self.connections = 0
+        threading.Thread(target=self.serve, daemon=True).start()
+    
+    def serve(self):
+        while True:
+            conn, _ = self.server.accept()
+            self.connections += 1
+            threading.Thread(target=self.talk, args=(conn,), daemon=True).start()
+    
+    def talk(self, conn):
+        conn.settimeout(0.05)
+        splitter = FrameSplitter()
+        seq = 0
+        try:
+            while True:
+                conn.sendall(encode_frame(0, bytes(9), seq=seq, sysid=self.sysid, compid=1))
+                seq += 1
+                if not self.reading:
+                    time.sleep(0.05)
+                    continue
+                try:
+                    data = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                self.received.extend(splitter.feed(data))
+        except OSError:
+            pass
+
+
+def gcs(port, subscription=None):
+    sock = socket.create_connection(('127.0.0.1', port), timeout=2)
+    if subscription:
+        sock.sendall(subscription)
+    return sock
+
+
+def systems_seen(sock, duration=0.5):
+    """System ids of the frames a client receives within `duration` seconds"""
+    splitter = FrameSplitter()
+    seen = set()
+    deadline = time.monotonic() + duration
+    sock.settimeout(0.05)
+    while time.monotonic() < deadline:
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        seen |= {frame_header(frame)[1] for frame in splitter.feed(data)}
+    return seen
+
+
+def test_target_system():
+    """Targeted messages are recognised, broadcasts and truncated targets read as 0"""
+    print("=" * 60)
+    print("Testing target system extraction")
+    print("=" * 60)
+    
+    assert frame_target_system(command_long(3)) == 3
+    assert frame_target_system(encode_frame(0, bytes(9))) == 0
+    assert frame_target_system(encode_frame(21, bytes([2]))) == 2  # PARAM_REQUEST_LIST, component stripped
+    assert frame_target_system(encode_frame(21, b'')) == 0
+    
+    print("✅ Target system test completed successfully!")
+
+
+def test_subscriptions_and_routing():
+    """Clients only see subscribed vehicles; targeted messages reach one vehicle, broadcasts all subscribed"""
+    print("=" * 60)
+    print("Testing subscriptions and routing")
+    print("=" * 60)
+    
+    vehicles = {sysid: FakeVehicle(sysid) for sysid in (1, 2)}
+    mux = GcsMux(0, host='127.0.0.1', reconnect_interval=0.2)
+    assert mux.start()
+    for sysid, vehicle in vehicles.items():
+        mux.add_vehicle(sysid, f"instance_{sysid}", vehicle.port)
+    
+    # Vehicle links are only opened once a client wants them
+    time.sleep(0.3)
+    assert all(vehicle.connections == 0 for vehicle in vehicles.values())
+    
+    only_one = gcs(mux.port, b"SUB instance_1\n")
+    everything = gcs(mux.port)
+    time.sleep(0.5)
+    seen_one, seen_all = systems_seen(only_one), systems_seen(everything)
+    print(f"Subscribed to instance_1: {seen_one}, unsubscribed client: {seen_all}")
+    assert seen_one == {1} and seen_all == {1, 2}
+    
+    only_one.sendall(command_long(1) + command_long(2))
+    everything.sendall(encode_frame(0, bytes(9)))
+    time.sleep(0.3)
+    received = {sysid: [frame_header(frame)[3] for frame in vehicle.received] for sysid, vehicle in vehicles.items()}
+    print(f"Frames at the vehicles: {received}")
+    assert received[1].count(76) == 1 and 76 not in received[2]
+    assert received[1].count(0) == 1 and received[2].count(0) == 1
+    
+    # Per-vehicle traffic, next to the totals of the whole connection
+    by_vehicle = {sysid: {client["client"]: client for client in mux.get_clients(sysid)} for sysid in (1, 2)}
+    one, both = "%s:%s" % only_one.getsockname(), "%s:%s" % everything.getsockname()
+    print(f"Traffic of {both}: {by_vehicle[1][both]['vehicle']} / {by_vehicle[2][both]['vehicle']}")
+    assert by_vehicle[1][one]["vehicle"]["frames_to_vehicle"] == 1 and one not in by_vehicle[2]
+    assert [by_vehicle[sysid][both]["vehicle"]["frames_to_vehicle"] for sysid in (1, 2)] == [1, 1]
+    assert by_vehicle[1][both]["frames_to_vehicles"] == 1  # one broadcast, forwarded to two vehicles
+    for sysid in (1, 2):
+        traffic = by_vehicle[sysid][both]["vehicle"]
+        assert 0 < traffic["frames_to_client"] < by_vehicle[sysid][both]["frames_to_client"]
+    assert sum(by_vehicle[sysid][both]["vehicle"]["tx_bytes"] for sysid in (1, 2)) <= by_vehicle[2][both]["tx_bytes"]
+    
+    # Narrowing a connected client by address, then dropping a vehicle
+    mux.set_subscription('127.0.0.1', [2])
+    systems_seen(everything, 0.3)  # drain telemetry queued before the change
+    assert systems_seen(everything) == {2}
+    mux.remove_vehicle(2)
+    status = mux.get_status()
+    print(f"Mux status: {status}")
+    assert list(status["vehicles"]) == [1] and len(status["clients"]) == 2
+    assert status["unrouted_frames"] == 1
+    
+    only_one.close()
+    everything.close()
+    print("✅ Subscription and routing test completed successfully!")
+
+
+def test_stalled_vehicle():
+    """A vehicle that stops reading loses its link instead of blocking the mux"""
+    print("=" * 60)
+    print("Testing a stalled vehicle")
+    print("=" * 60)
+    
+    vehicles = {1: FakeVehicle(1), 2: FakeVehicle(2, reading=False)}
+    mux = GcsMux(0, host='127.0.0.1', reconnect_interval=0.2, max_backlog=64 * 1024)
+    assert mux.start()
+    for sysid, vehicle in vehicles.items():
+        mux.add_vehicle(sysid, f"instance_{sysid}", vehicle.port)
+    
+    flooding = gcs(mux.port, b"SUB 2\n")
+    watching = gcs(mux.port, b"SUB 1\n")
+    systems_seen(watching)  # drain anything sent before the SUB line was read
+    burst = command_long(2) * 20000
+    
+    def flood():
+        try:
+            for _ in range(20):
+                flooding.sendall(burst)
+        except OSError:
+            pass
+    
+    # Vehicle 1's heartbeats (every 50 ms) keep reaching the other client while vehicle 2 backs up
+    flooder = threading.Thread(target=flood, daemon=True)
+    flooder.start()
+    splitter = FrameSplitter()
+    arrivals = [time.monotonic()]
+    watching.settimeout(0.05)
+    while flooder.is_alive() and time.monotonic() - arrivals[0] < 10:
+        try:
+            data = watching.recv(65536)
+        except socket.timeout:
+            continue
+        frames = splitter.feed(data)
+        assert all(frame_header(frame)[1] != 2 for frame in frames)
+        if any(frame_header(frame)[1] == 1 for frame in frames):
+            arrivals.append(time.monotonic())
+    assert not flooder.is_alive(), "the mux stopped reading its clients"
+    longest_gap = max(later - earlier for earlier, later in zip(arrivals, arrivals[1:]))
+    print(f"Longest telemetry gap: {longest_gap * 1000:.0f} ms, vehicle 2 connections: {vehicles[2].connections}")
+    assert longest_gap < 0.3
+    assert vehicles[2].connections >= 2  # dropped on overflow, then linked again
+    
+    flooding.close()
+    watching.close()
+    print("✅ Stalled vehicle test completed successfully!")
+
+
+def answer_timesyncs(sock, duration):
+    """Act as a GCS that answers TIMESYNC requests for `duration` seconds; returns how many it answered"""
+    splitter = FrameSplitter()
+    answered = 0
+    deadline = time.monotonic() + duration
+    sock.settimeout(0.05)
+    while time.monotonic() < deadline:
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        for frame in splitter.feed(data):
+            if frame_header(frame)[3] != 111:
+                continue
+            payload = frame_payload(frame)
+            tc1, ts1, _, _ = TIMESYNC_FORMAT.unpack(payload + bytes(TIMESYNC_FORMAT.size - len(payload)))
+            if tc1 == 0:
+                sock.sendall(encode_frame(111, TIMESYNC_FORMAT.pack(time.time_ns(), ts1, frame_header(frame)[1], 0)))
+                answered += 1
+    return answered
+
+
+def test_client_tracking():
+    """Per-client counters, rates and TIMESYNC round trips; probe answers never reach a vehicle"""
+    print("=" * 60)
+    print("Testing GCS client tracking")
+    print("=" * 60)
+    
+    vehicle = FakeVehicle(1)
+    mux = GcsMux(0, host='127.0.0.1', reconnect_interval=0.2, timesync_interval=0.2, stats_interval=0.2)
+    assert mux.start()
+    mux.add_vehicle(1, "instance_1", vehicle.port)
+    
+    responsive = gcs(mux.port)
+    silent = gcs(mux.port, b"SUB 1\n")
+    silent.sendall(encode_frame(0, bytes(9), sysid=254))
+    answered = answer_timesyncs(responsive, 1.5)
+    clients = {client["client"]: client for client in mux.get_clients(1)}
+    print(f"Answered {answered} probes, clients: {clients}")
+    assert answered >= 3 and len(clients) == 2
+    
+    tracked = clients["%s:%s" % responsive.getsockname()]
+    assert tracked["rtt_ms"]["samples"] >= 3 and 0 <= tracked["rtt_ms"]["min"] <= tracked["rtt_ms"]["max"] < 500
+    assert tracked["gcs_system_id"] == 255 and tracked["systems"] == "all"
+    assert tracked["frames_to_client"] > 0 and tracked["tx_bytes"] > tracked["frames_to_client"]
+    assert tracked["tx_frames_per_s"] > 0 and tracked["connected_for_s"] >= 1
+    assert 111 not in [frame_header(frame)[3] for frame in vehicle.received]
+    
+    quiet = clients["%s:%s" % silent.getsockname()]
+    assert quiet["rtt_ms"] is None and quiet["gcs_system_id"] == 254 and quiet["systems"] == [1]
+    assert [client["client"] for client in mux.get_clients(2)] == [tracked["client"]]
+    
+    # Answers to a vehicle's own timesync request are timed too, and routed back to that vehicle
+    client = MuxClient(None, "10.0.0.5:1234")
+    client.expect_timesync(42, False)
+    assert client.answer_timesync(42) is False and client.answer_timesync(42) is None
+    assert client.get_latency()["samples"] == 1
+    client.expect_timesync(43, True)
+    client.expire_timesync(time.monotonic() + 60)
+    assert client.timesync_lost == 1 and not client.timesync_pending
+    assert frame_target_system(encode_frame(111, TIMESYNC_FORMAT.pack(1, 42, 7, 1))) == 7
+    
+    responsive.close()
+    silent.close()
+    print("✅ Client tracking test completed successfully!")
+
+
+def test_manager_system_ids():
+    """Each instance gets its own system id, passed to PX4 and reused after removal"""
+    print("=" * 60)
+    print("Testing system id assignment")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        store = RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs"))
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100,
+                                   memory_budget_mb=100000, gcs_mux_port=0, registry=registry, rootfs_store=store,
+                                   cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+        first = manager.create_instance("gz_x500")
+        second = manager.create_instance("gz_x500")
+        ids = [manager.instances[instance_id].mav_sys_id for instance_id in (first, second)]
+        assert ids == [1, 2]
+        assert manager.instances[second].launch_env()['PX4_PARAM_MAV_SYS_ID'] == "2"
+        assert manager.get_instance_status(second)["mav_sys_id"] == 2
+        
+        assert manager.remove_instance(first)
+        third = manager.create_instance("gz_x500")
+        assert manager.instances[third].mav_sys_id == 1
+        
+        # No mux configured: the API reports it disabled and refuses subscriptions
+        app_multi.multi_sitl = manager
+        client = app_multi.app.test_client()
+        assert client.get('/api/gcs').get_json() == {"enabled": False, "mux": None}
+        response = client.put('/api/gcs/subscriptions/10.0.0.5', json={"systems": [1]})
+        assert response.status_code == 500
+        
+        manager.gcs_mux = GcsMux(0, host='127.0.0.1')
+        manager.gcs_mux.add_vehicle(1, third, manager.instances[third].tcp_port)
+        response = client.put('/api/gcs/subscriptions/10.0.0.5', json={"systems": [third]})
+        print(f"Subscription: {response.get_json()}")
+        assert response.get_json()["systems"] == [1]
+        assert client.put('/api/gcs/subscriptions/10.0.0.5', json={"systems": ["nope"]}).status_code == 400
+        assert client.get('/api/gcs').get_json()["mux"]["subscriptions"] == {"10.0.0.5": [1]}
+        
+        clients = client.get(f'/api/instances/{third}/gcs-clients').get_json()
+        print(f"GCS clients: {clients}")
+        assert clients["mav_sys_id"] == 1 and clients["mux"] == [] and isinstance(clients["direct"], dict)
+        assert client.get('/api/instances/nope/gcs-clients').status_code == 404
+        
+        # Connections on the vehicle's port from the router and the mux are not GCS clients
+        server = socket.create_server(('127.0.0.1', 0))
+        own = socket.create_connection(server.getsockname())
+        assert "%s:%s" % own.getsockname() in tcp_local_addresses(os.getpid())
+        own.close()
+        server.close()
+        counters = {"bytes_sent": 100, "bytes_received": 10, "rtt_ms": 0.1}
+        peers = ("127.0.0.1:40001", "127.0.0.1:40002", "203.0.113.7:51000")
+        manager.bandwidth_monitor = BandwidthMonitor(reader=lambda port: {peer: counters for peer in peers})
+        manager.router_manager.local_addresses = lambda: {"127.0.0.1:40001"}
+        manager.gcs_mux.local_addresses = lambda: {"127.0.0.1:40002"}
+        direct = client.get(f'/api/instances/{third}/gcs-clients').get_json()["direct"]
+        assert list(direct) == ["203.0.113.7:51000"]
+        
+        assert manager.remove_instance(second) and manager.remove_instance(third)
+        assert os.listdir(store.instances_dir) == []
+    
+    print("✅ System id test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting GCS Mux Tests")
+    print("=" * 60)
+    
+    try:
+        test_target_system()
+        test_subscriptions_and_routing()
+        test_stalled_vehicle()
+        test_client_tracking()
+        test_manager_system_ids()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the Gazebo resource cache
+Warms a cache from a stand-in PX4 tree and checks the links, the index and the
+environment Gazebo and PX4 get
+"""
+
+import os
+import json
+import tempfile
+from gz_resource_cache import GzResourceCache, sdf_references
+from airframe_registry import AirframeRegistry
+from multi_sitl_manager import MultiSITLManager
+from cgroup_limits import CgroupManager
+
+GROUND_PLANE = "https://fuel.gazebosim.org/1.0/OpenRobotics/models/Ground Plane"
+MISSING_FUEL = "https://fuel.gazebosim.org/1.0/OpenRobotics/models/Nowhere"
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def fake_px4_tree(root):
+    """Models and worlds laid out like PX4's Tools/simulation/gz"""
+    gz_dir = os.path.join(root, "Tools", "simulation", "gz")
+    write(os.path.join(gz_dir, "models", "x500", "model.sdf"),
+          "<sdf><model name='x500'><include><uri>model://x500_base</uri></include></model></sdf>")
+    write(os.path.join(gz_dir, "models", "x500_base", "model.sdf"),
+          "<sdf><model name='x500_base'><visual><geometry><mesh>"
+          "<uri>model://x500_base/meshes/base.dae</uri></mesh></geometry></visual></model></sdf>")
+    write(os.path.join(gz_dir, "worlds", "default.sdf"),
+          f"<sdf><world name='default'><include><uri>{GROUND_PLANE}</uri></include>"
+          f"<include><uri>model://sun_lamp</uri></include></world></sdf>")
+    write(os.path.join(gz_dir, "models", "sun_lamp", "model.sdf"), "<sdf><model name='sun_lamp'/></sdf>")
+    return gz_dir
+
+
+def test_warm_up():
+    """Referenced models are followed, linked and indexed; cached Fuel models need no download"""
+    print("=" * 60)
+    print("Testing resource cache warm-up")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        gz_dir = fake_px4_tree(os.path.join(tmp, "PX4-Autopilot"))
+        cache = GzResourceCache(os.path.join(tmp, "cache"), os.path.join(tmp, "PX4-Autopilot"))
+        assert sdf_references(os.path.join(gz_dir, "worlds", "default.sdf")) == ({"sun_lamp"}, {GROUND_PLANE})
+        
+        # A Fuel model already in the cache is not downloaded again
+        os.makedirs(os.path.join(cache.fuel_dir, "fuel.gazebosim.org", "openrobotics", "models", "ground plane", "1"))
+        env = cache.apply({'GZ_SIM_RESOURCE_PATH': "/px4/models"})
+        assert env == {'GZ_SIM_RESOURCE_PATH': "/px4/models"}  # untouched until warmed
+        
+        index = cache.warm_up(["x500", "rover"], ["default", "baylands"])
+        print(f"Index: {index}")
+        assert sorted(index["models"]) == ["sun_lamp", "x500", "x500_base"]
+        assert list(index["worlds"]) == ["default"] and index["fuel"] == {GROUND_PLANE: True}
+        assert sorted(index["missing"]) == ["model rover", "world baylands"]
+        linked = os.path.realpath(os.path.join(cache.models_dir, "x500_base"))
+        assert linked == os.path.join(gz_dir, "models", "x500_base")
+        assert os.path.isfile(os.path.join(cache.worlds_dir, "default.sdf"))
+        with open(cache.index_file) as f:
+            assert json.load(f)["models"] == index["models"]
+        
+        env = cache.apply({'GZ_SIM_RESOURCE_PATH': "/px4/models"})
+        assert env['GZ_SIM_RESOURCE_PATH'].split(os.pathsep) == [cache.models_dir, cache.worlds_dir, "/px4/models"]
+        assert env['GZ_FUEL_CACHE_PATH'] == cache.fuel_dir
+        
+        # A Fuel model that cannot be fetched is reported, and a second pass keeps the links
+        write(os.path.join(gz_dir, "models", "sun_lamp", "model.sdf"), f"<sdf><uri>{MISSING_FUEL}</uri></sdf>")
+        index = cache.warm_up(["x500"], ["default"])
+        assert index["fuel"][MISSING_FUEL] is False and f"fuel {MISSING_FUEL}" in index["missing"]
+        assert cache.get_status()["models"] == 3 and cache.get_status()["fuel_models"] == 1
+    
+    print("✅ Warm-up test completed successfully!")
+
+
+def test_manager_warm_up():
+    """The manager warms the cache for its Gazebo airframes and points Gazebo at it"""
+    print("=" * 60)
+    print("Testing manager warm-up")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, registry=registry,
+                                   cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+        models, worlds = manager.gz_resources()
+        print(f"Models: {models}, worlds: {worlds}")
+        assert "x500" in models and "standard_vtol" in models
+        assert not any(model.startswith("sihsim") for model in models)
+        assert worlds == ["default"]
+        
+        cache = manager.world_manager.resource_cache
+        assert cache.cache_dir == os.path.join(tmp, "cache", "gz_resources") and not cache.get_status()["warmed"]
+        # Without a warm-up nothing waits for one
+        assert cache.wait(0)
+        
+        gz_dir = fake_px4_tree(os.path.join(tmp, "PX4-Autopilot"))
+        manager.world_manager.px4_path = cache.px4_path = os.path.join(tmp, "PX4-Autopilot")
+        cache.start_warm_up(models, worlds)
+        assert cache.wait(10)
+        manager.world_manager.wait_for_resources()
+        paths = manager.world_manager.resource_env()['GZ_SIM_RESOURCE_PATH'].split(os.pathsep)
+        assert paths == [cache.models_dir, cache.worlds_dir, os.path.join(gz_dir, "models"),
+                         os.path.join(gz_dir, "worlds")]
+        assert manager.get_all_status()["gz_resources"]["models"] == 3
+    
+    print("✅ Manager warm-up test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Gazebo Resource Cache Tests")
+    print("=" * 60)
+    
+    try:
+        test_warm_up()
+        test_manager_warm_up()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the instance health watchdog
+Fakes a running instance with a `sleep` process and a local TCP server that
+sends MAVLink heartbeats, then breaks them one at a time
+"""
+
+import os
+import time
+import signal
+import socket
+import threading
+import subprocess
+from datetime import datetime
+from multi_sitl_manager import MultiSITLManager, SITLInstance
+
+HEARTBEAT = bytes([0xFD, 9, 0, 0, 0, 1, 1, 0, 0, 0]) + b'\x00' * 9 + b'\x00\x00'
+
+
+def start_heartbeat_server(sending):
+    """TCP server that sends heartbeats while sending.is_set(); returns its port"""
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', 0))
+    server.listen(4)
+    
+    def serve():
+        conn, _ = server.accept()
+        try:
+            while True:
+                if sending.is_set():
+                    conn.sendall(HEARTBEAT)
+                time.sleep(0.1)
+        except OSError:
+            pass
+    
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() is true or the timeout expires"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_watchdog_lifecycle():
+    """running -> degraded -> failed -> restarted -> crash loop"""
+    print("=" * 60)
+    print("Testing health watchdog")
+    print("=" * 60)
+    
+    manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, auto_restart=True)
+    watchdog = manager.watchdog
+    watchdog.heartbeat_timeout = 0.5
+    watchdog.boot_grace = 0.3
+    watchdog.degraded_timeout = 30
+    watchdog.backoff_base = 0.1
+    watchdog.max_restarts = 1
+    
+    sending = threading.Event()
+    sending.set()
+    tcp_port = start_heartbeat_server(sending)
+    
+    gazebo = subprocess.Popen(['sleep', '60'], preexec_fn=os.setsid)
+    px4 = subprocess.Popen(['sleep', '60'], preexec_fn=os.setsid)
+    
+    instance = SITLInstance("instance_wd", "gz_x500", 14599, tcp_port, world="watchdog_test")
+    instance.px4_process = px4
+    instance.status = "running"
+    instance.start_time = datetime.now()
+    manager.instances[instance.instance_id] = instance
+    manager.world_manager.worlds["watchdog_test"] = {"process": gazebo, "vehicles": {instance.instance_id: 0}}
+    
+    restarts = []
+    
+    def fake_restart(instance_id):
+        restarts.append(instance_id)
+        instance.status = "running"
+        return True
+    
+    manager.restart_instance = fake_restart
+    
+    try:
+        # 1. Healthy
+        watchdog.instance_started(instance)
+        assert wait_for(lambda: watchdog.heartbeats.heartbeat_age(instance.instance_id) is not None)
+        watchdog.check_all()
+        print(f"1. Status with heartbeats: {instance.status}")
+        assert instance.status == "running"
+        
+        # 2. Heartbeats stop
+        sending.clear()
+        time.sleep(0.8)
+        watchdog.check_all()
+        print(f"2. Status without heartbeats: {instance.status} ({instance.last_failure_reason})")
+        assert instance.status == "degraded"
+        
+        # 3. PX4 dies
+        os.killpg(px4.pid, signal.SIGKILL)
+        px4.wait()
+        watchdog.check_all()
+        print(f"3. Status after PX4 crash: {instance.status} ({instance.last_failure_reason})")
+        assert instance.status == "failed"
+        assert "PX4 exited" in instance.last_failure_reason
+        assert instance.instance_id in watchdog.pending_restarts
+        
+        # 4. Restart after backoff
+        time.sleep(0.2)
+        watchdog.check_all()
+        assert wait_for(lambda: restarts)
+        print(f"4. Restarts: {restarts}, restart_count: {instance.restart_count}")
+        assert instance.restart_count == 1
+        
+        # 5. Second failure inside the window hits the crash-loop limit
+        watchdog.mark_failed(instance, "PX4 exited with code -9")
+        status = manager.get_instance_status(instance.instance_id)
+        print(f"5. Crash loop: {status['crash_loop']}, pending restart: "
+              f"{instance.instance_id in watchdog.pending_restarts}")
+        assert status["crash_loop"] is True
+        assert instance.instance_id not in watchdog.pending_restarts
+    finally:
+        for process in (px4, gazebo):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            process.wait()
+        watchdog.instance_removed(instance.instance_id)
+    
+    print("✅ Health watchdog test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Health Watchdog Tests")
+    print("=" * 60)
+    
+    try:
+        test_watchdog_lifecycle()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
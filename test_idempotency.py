@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for idempotent, coalesced lifecycle requests
+Replaces the PX4 boot with a slow stand-in so overlapping requests are easy to produce
+"""
+
+import os
+import time
+import tempfile
+import threading
+from multi_sitl_manager import MultiSITLManager, SITLInstance
+from airframe_registry import AirframeRegistry
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+from idempotency import IdempotencyConflict
+
+
+def make_manager(tmp):
+    return MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100, memory_budget_mb=100000,
+                            registry=AirframeRegistry(px4_path=os.path.join(tmp, "missing"),
+                                                      cache_dir=os.path.join(tmp, "cache")),
+                            rootfs_store=RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs")),
+                            cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+
+
+def remove_all(manager):
+    """Remove every instance the test created, rootfs clones included"""
+    for instance_id in list(manager.instances):
+        if manager.instances[instance_id].status == "running":
+            assert manager.stop_instance(instance_id)
+        assert manager.remove_instance(instance_id)
+    assert os.listdir(manager.rootfs_store.instances_dir) == []
+
+
+def fake_boot(calls):
+    """Stand-in for SITLInstance.start(): takes a while and counts how often it ran"""
+    def start(instance):
+        calls.append(instance.instance_id)
+        time.sleep(0.3)
+        instance.status = "running"
+        return True
+    return start
+
+
+def in_parallel(fn, count=5):
+    """Call fn from several threads at once and collect the results"""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_coalesced_start_and_stop():
+    """Overlapping starts boot PX4 once; repeats on a running/stopped instance are no-ops"""
+    print("=" * 60)
+    print("Testing coalesced start/stop")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp)
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        
+        boots = []
+        instance.start = lambda: fake_boot(boots)(instance)
+        results = in_parallel(lambda: manager.start_instance(instance_id))
+        print(f"Start results: {results}, boots: {len(boots)}")
+        assert results == [True] * 5 and len(boots) == 1
+        assert manager.get_metrics()["operations"]["coalesced"] == 4
+        
+        assert manager.start_instance(instance_id) and len(boots) == 1
+        
+        stops = []
+        def fake_stop():
+            stops.append(instance_id)
+            time.sleep(0.2)
+            instance.status = "stopped"
+        instance.stop = fake_stop
+        assert in_parallel(lambda: manager.stop_instance(instance_id)) == [True] * 5
+        assert manager.stop_instance(instance_id)
+        print(f"Stops: {len(stops)}")
+        assert len(stops) == 1
+        remove_all(manager)
+    
+    print("✅ Coalesced start/stop test completed successfully!")
+
+
+def test_idempotency_keys():
+    """A retried create returns the first instance; a reused key for another request is refused"""
+    print("\n" + "=" * 60)
+    print("Testing Idempotency-Key handling")
+    print("=" * 60)
+    
+    original_start = SITLInstance.start
+    boots = []
+    SITLInstance.start = fake_boot(boots)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = make_manager(tmp)
+            
+            created = in_parallel(lambda: manager.create_instance("gz_x500", idempotency_key="click-1"))
+            assert len(set(created)) == 1 and len(manager.instances) == 1
+            assert manager.create_instance("gz_x500", idempotency_key="click-1") == created[0]
+            assert manager.create_instance("gz_x500", idempotency_key="click-2") != created[0]
+            
+            try:
+                manager.create_instance("gz_standard_vtol", idempotency_key="click-1")
+                assert False, "reused key accepted for a different request"
+            except IdempotencyConflict as e:
+                print(f"Expected conflict: {e}")
+            
+            # A retry is admitted even once the host is full, since it creates nothing new
+            manager.cpu_budget = 0
+            assert manager.check_admission("gz_x500") is not None
+            assert manager.check_admission("gz_x500", idempotency_key="click-1") is None
+            manager.cpu_budget = 100
+            
+            # Legacy create-and-start: retries attach to the first launch
+            launched = in_parallel(lambda: manager.launch_instance("gz_x500", idempotency_key="legacy-1"), count=3)
+            launched.append(manager.launch_instance("gz_x500", idempotency_key="legacy-1"))
+            print(f"Launches: {launched}, boots: {len(boots)}")
+            assert len(set(launched)) == 1 and len(boots) == 1
+            assert len(manager.instances) == 3
+            
+            stats = manager.get_metrics()["operations"]
+            print(f"Operation stats: {stats}")
+            assert stats["replayed"] >= 2 and stats["in_flight"] == []
+            
+            # Once the instance is gone, a retry of its key is a new request: checked and created again
+            manager.cpu_budget = 0
+            assert manager.remove_instance(created[0])
+            assert manager.check_admission("gz_x500", idempotency_key="click-1") is not None
+            manager.cpu_budget = 100
+            recreated = manager.create_instance("gz_x500", idempotency_key="click-1")
+            assert recreated and recreated != created[0] and recreated in manager.instances
+            assert manager.create_instance("gz_x500", idempotency_key="click-1") == recreated
+            remove_all(manager)
+    finally:
+        SITLInstance.start = original_start
+    
+    print("✅ Idempotency-Key test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Idempotency Tests")
+    print("=" * 60)
+    
+    try:
+        test_coalesced_start_and_stop()
+        test_idempotency_keys()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
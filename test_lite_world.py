@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for the lite simulation profile
+Builds lite worlds from a small PX4-style world file and checks that lite
+instances are launched with them and costed separately
+"""
+
+import os
+import time
+import tempfile
+import xml.etree.ElementTree as ET
+from lite_world import LiteWorldBuilder
+from airframe_registry import AirframeRegistry
+from multi_sitl_manager import MultiSITLManager, GazeboWorldManager
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+
+WORLD_SDF = """<?xml version="1.0" ?>
+<sdf version="1.9">
+  <world name="default">
+    <physics type="ode">
+      <max_step_size>0.004</max_step_size>
+      <real_time_factor>1.0</real_time_factor>
+      <real_time_update_rate>250</real_time_update_rate>
+    </physics>
+    <plugin name="gz::sim::systems::Physics" filename="gz-sim-physics-system"/>
+    <plugin name="gz::sim::systems::UserCommands" filename="gz-sim-user-commands-system"/>
+    <plugin name="gz::sim::systems::SceneBroadcaster" filename="gz-sim-scene-broadcaster-system"/>
+    <plugin name="gz::sim::systems::Sensors" filename="gz-sim-sensors-system">
+      <render_engine>ogre2</render_engine>
+    </plugin>
+    <plugin name="gz::sim::systems::Imu" filename="gz-sim-imu-system"/>
+    <gui fullscreen="false"/>
+  </world>
+</sdf>
+"""
+
+
+def write_world(px4_path):
+    worlds_dir = os.path.join(px4_path, "Tools", "simulation", "gz", "worlds")
+    os.makedirs(worlds_dir, exist_ok=True)
+    path = os.path.join(worlds_dir, "default.sdf")
+    with open(path, 'w') as f:
+        f.write(WORLD_SDF)
+    return path
+
+
+def test_lite_world_build():
+    """Rendering systems and the GUI are dropped, physics step applied, copies cached"""
+    print("=" * 60)
+    print("Testing lite world generation")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        world_file = write_world(os.path.join(tmp, "PX4-Autopilot"))
+        builder = LiteWorldBuilder(os.path.join(tmp, "lite"))
+        
+        worlds_dir = builder.build(world_file)
+        world = ET.parse(os.path.join(worlds_dir, "default.sdf")).getroot().find("world")
+        plugins = [plugin.get("name") for plugin in world.findall("plugin")]
+        print(f"Lite world systems: {plugins}")
+        assert world.get("name") == "default"
+        assert plugins == ["gz::sim::systems::Physics", "gz::sim::systems::UserCommands", "gz::sim::systems::Imu"]
+        assert world.find("gui") is None
+        assert world.find("physics/max_step_size").text == "0.004"
+        
+        # A coarser physics step gets its own directory and a matching update rate
+        rover_dir = builder.build(world_file, 0.008)
+        assert rover_dir != worlds_dir
+        physics = ET.parse(os.path.join(rover_dir, "default.sdf")).getroot().find("world/physics")
+        assert physics.find("max_step_size").text == "0.008"
+        assert physics.find("real_time_update_rate").text == "125"
+        
+        # Reused until the source world changes
+        lite_file = os.path.join(worlds_dir, "default.sdf")
+        built = os.stat(lite_file).st_mtime_ns
+        builder.build(world_file)
+        assert os.stat(lite_file).st_mtime_ns == built
+        future = time.time() + 10
+        os.utime(world_file, (future, future))
+        builder.build(world_file)
+        assert os.stat(lite_file).st_mtime_ns != built
+    
+    print("✅ Lite world test completed successfully!")
+
+
+def test_lite_instances():
+    """Lite instances launch with the lite world and are costed and measured apart from default ones"""
+    print("=" * 60)
+    print("Testing lite instances")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        px4_path = os.path.join(tmp, "PX4-Autopilot")
+        write_world(px4_path)
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        store = RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs"))
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=1.0,
+                                   memory_budget_mb=100000, registry=registry, rootfs_store=store,
+                                   cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+        manager.world_manager = GazeboWorldManager(px4_path)
+        
+        # 0.8 cores by default don't fit twice in one core, lite vehicles do
+        assert manager.check_admission("gz_x500") is None
+        lite_cpu = registry.cost("gz_x500", "lite")[0]
+        print(f"gz_x500 CPU: default {registry.cost('gz_x500')[0]}, lite {lite_cpu}")
+        assert lite_cpu < registry.cost("gz_x500")[0]
+        
+        first = manager.create_instance("gz_rover_differential", sim_profile="lite")
+        assert manager.check_admission("gz_x500") is not None
+        assert manager.check_admission("gz_x500", sim_profile="lite") is None
+        assert manager.create_instance("gz_x500", sim_profile="bogus") is None
+        
+        instance = manager.instances[first]
+        instance.prepare_world()
+        env = instance.launch_env()
+        print(f"PX4_GZ_WORLDS: {env['PX4_GZ_WORLDS']}")
+        assert env['PX4_GZ_WORLDS'].endswith("step-0.008")
+        assert os.path.exists(os.path.join(env['PX4_GZ_WORLDS'], "default.sdf"))
+        assert manager.get_instance_status(first)["sim_profile"] == "lite"
+        
+        # Measurements of lite vehicles don't move the default profile's cost
+        registry.record_usage("gz_x500", 0.3, 400, "lite")
+        cost = next(profile for profile in registry.list_profiles() if profile["name"] == "gz_x500")["cost"]
+        print(f"gz_x500 cost: {cost}")
+        assert not cost["measured"] and cost["lite"]["measured"]
+        assert cost["lite"]["cpu_cores"] == 0.3 and cost["lite"]["cpu_vs_default"] == round(0.3 / 0.8, 2)
+        registry.save_costs()
+        reloaded = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        assert reloaded.cost("gz_x500", "lite") == (0.3, 400)
+        
+        shared = MultiSITLManager(world_sharing=True, metrics_interval=0, watchdog_interval=0, registry=registry,
+                                  rootfs_store=store,
+                                  cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+        assert shared.create_instance("gz_x500", sim_profile="lite") is None
+        
+        assert manager.remove_instance(first)
+        assert os.listdir(store.instances_dir) == []
+    
+    print("✅ Lite instance test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Lite Profile Tests")
+    print("=" * 60)
+    
+    try:
+        test_lite_world_build()
+        test_lite_instances()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for parameter snapshot and restore
+Runs the parameter protocol against a fake vehicle on a local TCP port
+"""
+
+import time
+import socket
+import struct
+import threading
+from mavlink_frames import FrameSplitter, frame_header, padded_payload, encode_frame, x25_crc
+from param_sync import (ParamClient, ParamSnapshot, PARAM_VALUE_FORMAT, PARAM_SET_FORMAT,
+                        PARAM_REQUEST_READ_FORMAT)
+
+
+class FakeVehicle:
+    """Answers PARAM_REQUEST_LIST/READ and PARAM_SET like PX4, dropping some list replies"""
+    
+    def __init__(self, param_count=600, drop_every=50):
+        self.params = [(f"PARAM_{i:04d}", 9, struct.pack('<f', float(i))) for i in range(param_count)]
+        self.drop_every = drop_every
+        self.sets_received = 0
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(4)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+    
+    def value_frame(self, index):
+        name, param_type, raw = self.params[index]
+        payload = PARAM_VALUE_FORMAT.pack(raw, len(self.params), index, name.encode(), param_type)
+        return encode_frame(22, payload.rstrip(b'\x00'), sysid=1, compid=1)
+    
+    def serve(self):
+        while True:
+            conn, _ = self.server.accept()
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+    
+    def handle(self, conn):
+        conn.sendall(encode_frame(0, b'\x00' * 9, sysid=1, compid=1))
+        splitter = FrameSplitter()
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                return
+            out = []
+            for frame in splitter.feed(data):
+                msgid = frame_header(frame)[3]
+                if msgid == 21:
+                    out += [self.value_frame(i) for i in range(len(self.params)) if i % self.drop_every != 7]
+                elif msgid == 20:
+                    index = PARAM_REQUEST_READ_FORMAT.unpack(padded_payload(frame, 20))[0]
+                    out.append(self.value_frame(index))
+                elif msgid == 23:
+                    raw, _, _, name, param_type = PARAM_SET_FORMAT.unpack(padded_payload(frame, 23))
+                    name = name.rstrip(b'\x00').decode()
+                    index = next(i for i, p in enumerate(self.params) if p[0] == name)
+                    self.params[index] = (name, param_type, raw)
+                    self.sets_received += 1
+                    out.append(self.value_frame(index))
+            if out:
+                conn.sendall(b''.join(out))
+
+
+def test_frame_checksum():
+    """x25 CRC matches the CRC-16/MCRF4XX check value and frames round-trip"""
+    print("=" * 60)
+    print("Testing MAVLink checksum")
+    print("=" * 60)
+    
+    assert x25_crc(b'123456789') == 0x6F91
+    frame = encode_frame(23, b'\x01' * 23, seq=5)
+    assert FrameSplitter().feed(frame) == [frame]
+    assert frame_header(frame) == (5, 255, 190, 23)
+    
+    print("✅ Checksum test completed successfully!")
+
+
+def test_snapshot_and_restore():
+    """Snapshot survives packing; restore only pushes what changed"""
+    print("\n" + "=" * 60)
+    print("Testing parameter snapshot and restore")
+    print("=" * 60)
+    
+    vehicle = FakeVehicle()
+    
+    with ParamClient(vehicle.port) as client:
+        snapshot = client.fetch_all()
+    print(f"Snapshot: {snapshot.get_summary()}")
+    assert len(snapshot.params) == 600
+    
+    packed = snapshot.to_bytes()
+    assert ParamSnapshot.from_bytes(packed).params == snapshot.params
+    
+    # A test run changes a few parameters
+    for index in (3, 100, 599):
+        name, param_type, _ = vehicle.params[index]
+        vehicle.params[index] = (name, param_type, struct.pack('<f', -1.0))
+    
+    started = time.monotonic()
+    with ParamClient(vehicle.port) as client:
+        changed = snapshot.diff(client.fetch_all())
+        restored, failed = client.set_many(changed)
+    elapsed = time.monotonic() - started
+    
+    print(f"Changed: {sorted(changed)}, restored {len(restored)}, failed {failed}, "
+          f"sets sent {vehicle.sets_received}, {elapsed * 1000:.0f} ms")
+    assert sorted(changed) == ["PARAM_0003", "PARAM_0100", "PARAM_0599"]
+    assert sorted(restored) == sorted(changed) and failed == []
+    assert vehicle.sets_received == 3
+    assert vehicle.params[100][2] == struct.pack('<f', 100.0)
+    assert elapsed < 1.0
+    
+    print("✅ Snapshot and restore test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Parameter Sync Tests")
+    print("=" * 60)
+    
+    try:
+        test_frame_checksum()
+        test_snapshot_and_restore()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
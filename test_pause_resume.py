@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Test script for pause/resume and idle auto-suspend
+A `sleep` process stands in for PX4; a fake bandwidth report stands in for GCS
+clients
+"""
+
+import os
+import time
+import tempfile
+import subprocess
+from datetime import datetime
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+from multi_sitl_manager import MultiSITLManager
+from airframe_registry import AirframeRegistry
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+from idle_suspend import IdleSuspender
+
+
+def make_manager(tmp, cgroup_root):
+    return MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100, memory_budget_mb=100000,
+                            registry=AirframeRegistry(px4_path=os.path.join(tmp, "missing"),
+                                                      cache_dir=os.path.join(tmp, "cache")),
+                            rootfs_store=RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs")),
+                            cgroups=CgroupManager(cgroup_root))
+
+
+def remove_all(manager):
+    """Stop and remove every instance the test created, rootfs clones included"""
+    for instance_id in list(manager.instances):
+        if manager.instances[instance_id].status != "stopped":
+            assert manager.stop_instance(instance_id)
+        assert manager.remove_instance(instance_id)
+    assert os.listdir(manager.rootfs_store.instances_dir) == []
+
+
+def fake_start(instance):
+    """Run a stand-in PX4 process group for the instance"""
+    instance.px4_process = subprocess.Popen(["sleep", "30"], preexec_fn=instance.preexec)
+    instance.status = "running"
+    instance.start_time = datetime.now()
+    return instance.px4_process
+
+
+def process_state(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(")", 1)[1].split()[0]
+
+
+def test_pause_and_resume():
+    """Pausing stops the process group in place, resuming continues it, stopping works while paused"""
+    print("=" * 60)
+    print("Testing pause/resume")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, os.path.join(tmp, "no-cgroups", "cloudsim"))
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        process = fake_start(instance)
+        
+        assert manager.pause_instance(instance_id)
+        time.sleep(0.1)
+        assert process_state(process.pid) == "T" and instance.status == "paused"
+        assert instance.freeze_method == "sigstop"
+        manager.watchdog.check_all()
+        assert instance.status == "paused"
+        assert not manager.remove_instance(instance_id)
+        
+        time.sleep(0.3)
+        pause = manager.get_instance_status(instance_id)["pause"]
+        print(f"While paused: {pause}")
+        assert pause["paused"] and pause["cpu_cores_reclaimed"] > 0 and pause["cpu_core_seconds_reclaimed"] > 0
+        
+        # Starting a paused instance just resumes it
+        assert manager.start_instance(instance_id)
+        time.sleep(0.1)
+        assert process_state(process.pid) == "S" and instance.status == "running"
+        assert manager.get_pause_metrics()["cpu_core_seconds_reclaimed"] > 0
+        
+        # A paused instance can still be stopped
+        assert manager.pause_instance(instance_id)
+        assert manager.stop_instance(instance_id)
+        process.wait(timeout=5)
+        assert instance.status == "stopped" and not manager.resume_instance(instance_id)
+        
+        # Through the API
+        app_multi.multi_sitl = manager
+        client = app_multi.app.test_client()
+        assert client.post(f'/api/instances/{instance_id}/pause').status_code == 409
+        assert client.post('/api/instances/instance_x/pause').status_code == 404
+        process = fake_start(instance)
+        response = client.post(f'/api/instances/{instance_id}/pause').get_json()
+        assert response["success"] and response["pause"]["reason"] == "manual"
+        assert client.post(f'/api/instances/{instance_id}/resume').get_json()["success"]
+        manager.stop_instance(instance_id)
+        process.wait(timeout=5)
+        remove_all(manager)
+    
+    # With cgroup v2 the whole group is frozen through cgroup.freeze instead
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "cgroup.controllers"), 'w') as f:
+            f.write("cpu memory\n")
+        manager = make_manager(tmp, os.path.join(tmp, "cloudsim"))
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        freeze_file = os.path.join(instance.cgroup.path, "cgroup.freeze")
+        with open(freeze_file, 'w') as f:
+            f.write("0")
+        process = fake_start(instance)
+        
+        assert manager.pause_instance(instance_id) and instance.freeze_method == "cgroup"
+        with open(freeze_file) as f:
+            assert f.read() == "1"
+        assert manager.resume_instance(instance_id)
+        with open(freeze_file) as f:
+            assert f.read() == "0"
+        process.kill()
+        process.wait()
+        remove_all(manager)
+    
+    # A vehicle in a shared Gazebo world can't be frozen on its own: the world keeps simulating it
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, os.path.join(tmp, "no-cgroups", "cloudsim"))
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        instance.world = "default"
+        process = fake_start(instance)
+        
+        assert not manager.pause_instance(instance_id)
+        assert instance.status == "running" and process_state(process.pid) != "T"
+        app_multi.multi_sitl = manager
+        response = app_multi.app.test_client().post(f'/api/instances/{instance_id}/pause')
+        assert response.status_code == 409 and "world" in response.get_json()["error"]
+        process.kill()
+        process.wait()
+        remove_all(manager)
+    
+    print("✅ Pause/resume test completed successfully!")
+
+
+def test_idle_auto_suspend():
+    """An instance without GCS traffic is paused, and resumed when a client shows up"""
+    print("\n" + "=" * 60)
+    print("Testing idle auto-suspend")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = make_manager(tmp, os.path.join(tmp, "no-cgroups", "cloudsim"))
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        process = fake_start(instance)
+        
+        report = {"total_rx_bytes": 500, "clients": {}}
+        manager.get_bandwidth = lambda _: dict(report)
+        suspender = IdleSuspender(manager, idle_timeout=0.3, sample_interval=0)
+        manager.idle_suspender = suspender
+        
+        suspender.check_all()
+        report["total_rx_bytes"] = 900  # a client still talking
+        time.sleep(0.2)
+        suspender.check_all()
+        time.sleep(0.2)
+        suspender.check_all()
+        assert instance.status == "running"
+        
+        time.sleep(0.2)
+        suspender.check_all()
+        print(f"After idling: {instance.status} ({instance.pause_reason})")
+        assert instance.status == "paused" and instance.pause_reason == "idle"
+        
+        suspender.check_all()
+        assert instance.status == "paused"
+        
+        report["clients"] = {"203.0.113.7:50123": {}}
+        suspender.check_all()
+        print(f"After a GCS connected: {instance.status}")
+        assert instance.status == "running"
+        
+        # Freshly woken, so not paused again straight away
+        suspender.check_all()
+        assert instance.status == "running"
+        
+        stats = manager.get_metrics()["pauses"]
+        print(f"Pause metrics: {stats}")
+        assert stats["idle_policy"]["suspended"] == 1 and stats["idle_policy"]["woken"] == 1
+        assert stats["paused"] == 0 and stats["cpu_core_seconds_reclaimed"] >= 0
+        
+        # A WebSocket GCS wakes an idle instance and is served; a manually paused one stays paused
+        app_multi.multi_sitl = manager
+        served, closed = [], []
+        saved_serve = app_multi.ws_gateway.serve
+        app_multi.ws_gateway.serve = lambda ws, instance_id, tcp_port, **kwargs: served.append((instance_id, tcp_port))
+        ws = type("FakeWebSocket", (), {"close": lambda self, reason=None, message=None: closed.append(message)})()
+        ws_route = app_multi.app.view_functions['ws_instance_mavlink'].__wrapped__
+        try:
+            assert manager.pause_instance(instance_id, reason="idle")
+            with app_multi.app.test_request_context(f'/ws/instances/{instance_id}/mavlink'):
+                ws_route(ws, instance_id)
+            print(f"WebSocket client on an idle instance: {instance.status}, served {served}")
+            assert instance.status == "running" and process_state(process.pid) != "T"
+            assert served == [(instance_id, instance.tcp_port)] and closed == []
+            
+            assert manager.pause_instance(instance_id)
+            with app_multi.app.test_request_context(f'/ws/instances/{instance_id}/mavlink'):
+                ws_route(ws, instance_id)
+            assert instance.status == "paused" and len(served) == 1 and "not running" in closed[0]
+        finally:
+            app_multi.ws_gateway.serve = saved_serve
+        
+        manager.stop_instance(instance_id)
+        process.wait(timeout=5)
+        remove_all(manager)
+    
+    print("✅ Idle auto-suspend test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Pause/Resume Tests")
+    print("=" * 60)
+    
+    try:
+        test_pause_and_resume()
+        test_idle_auto_suspend()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
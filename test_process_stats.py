@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for process group sampling and shared-world spawn slots
+Starts real process groups (sleep) in place of PX4 and Gazebo
+"""
+
+import os
+import time
+import signal
+import subprocess
+from process_stats import ProcessGroups, group_usage, scan_process_groups, process_groups
+from multi_sitl_manager import GazeboWorldManager
+
+
+def start_group(children=2):
+    """A shell leading its own process group, with `children` sleeping children"""
+    script = " ".join(["sleep 30 &"] * children) + " wait"
+    process = subprocess.Popen(["sh", "-c", script], start_new_session=True)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and len(scan_process_groups().get(process.pid, [])) < children + 1:
+        time.sleep(0.05)
+    return process
+
+
+def stop_group(process):
+    os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+
+def test_group_usage():
+    """A group's members are summed, and one /proc walk serves every lookup within its max age"""
+    print("=" * 60)
+    print("Testing process group usage")
+    print("=" * 60)
+    
+    process = start_group()
+    process_groups.scanned_at = None  # the shared walk may be older than this group
+    try:
+        usage = group_usage(process.pid)
+        print(f"Group usage: {usage}")
+        assert usage["processes"] == 3
+        assert usage["rss_mb"] > 0 and usage["cpu_seconds"] >= 0
+        
+        scans = []
+        groups = ProcessGroups(max_age=60, scan=lambda: scans.append(1) or scan_process_groups())
+        for _ in range(5):
+            assert len(groups.members(process.pid)) == 3
+        assert groups.scans == len(scans) == 1
+        
+        # A group started after the walk is still found through its leader until the next walk
+        late = start_group(children=1)
+        try:
+            assert groups.members(late.pid) == [late.pid] and groups.scans == 1
+            groups.max_age = 0
+            assert len(groups.members(late.pid)) == 2 and groups.scans == 2
+        finally:
+            stop_group(late)
+    finally:
+        stop_group(process)
+    
+    print("✅ Group usage test completed successfully!")
+
+
+def test_world_slots():
+    """Vehicles in a shared world get distinct grid slots; freed slots are reused"""
+    print("=" * 60)
+    print("Testing shared-world spawn slots")
+    print("=" * 60)
+    
+    worlds = GazeboWorldManager("/nonexistent/PX4-Autopilot")
+    servers = []
+    
+    def start_world(world):
+        servers.append(subprocess.Popen(["sleep", "30"], start_new_session=True))
+        worlds.worlds[world] = {"process": servers[-1], "vehicles": {}}
+        return True
+    
+    worlds.start_world = start_world
+    worlds.grid_columns = 2
+    poses = [worlds.attach("default", f"instance_{number}") for number in range(3)]
+    print(f"Poses: {poses}")
+    assert poses == ["0,0", "2,0", "0,2"] and len(servers) == 1
+    assert worlds.attach("default", "instance_1") == "2,0"  # attaching again keeps the slot
+    
+    process_groups.scanned_at = None
+    usage = worlds.get_world_usage("default")
+    print(f"World usage: {usage}")
+    assert usage["processes"] == 1
+    
+    worlds.detach("default", "instance_1")
+    assert worlds.attach("default", "instance_3") == "2,0"
+    assert worlds.attach("other", "instance_4") == "0,0" and len(servers) == 2
+    
+    for instance_id in ("instance_0", "instance_2", "instance_3"):
+        worlds.detach("default", instance_id)
+    assert "default" not in worlds.worlds and servers[0].poll() is not None
+    worlds.stop_all()
+    assert worlds.worlds == {} and servers[1].poll() is not None
+    
+    print("✅ World slot test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Process Stats Tests")
+    print("=" * 60)
+    
+    try:
+        test_group_usage()
+        test_world_slots()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
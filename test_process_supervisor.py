@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test script for the process supervisor
+Runs small shell scripts as stand-ins for PX4, Gazebo and routers
+"""
+
+import os
+import time
+import signal
+import tempfile
+import threading
+from process_supervisor import get_supervisor, stop_process
+
+
+def reaped(pid):
+    """True once the pid is gone, so not even a zombie is left"""
+    return not os.path.exists(f"/proc/{pid}")
+
+
+def live_group_members(group):
+    """Pids in a process group that are still running (zombies of reparented grandchildren don't count)"""
+    members = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == group and fields[0] != "Z":
+            members.append(int(pid))
+    return members
+
+
+def test_ready_exit_and_reaping():
+    """Ready and exit events fire, output is kept and logged, exited children are reaped"""
+    print("=" * 60)
+    print("Testing ready/exit events and reaping")
+    print("=" * 60)
+    
+    supervisor = get_supervisor()
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, "child.log")
+        process = supervisor.spawn("fake px4", "echo booting; sleep 0.2; echo 'INFO  [init] Startup script returned "
+                                   "successfully'; sleep 0.3; echo bye; exit 3", ready_pattern=r"Startup script returned",
+                                   log_file=log_file, shell=True, preexec_fn=os.setsid)
+        assert process.poll() is None
+        started = time.monotonic()
+        assert process.wait_ready(5)
+        print(f"Ready after {time.monotonic() - started:.2f}s")
+        assert time.monotonic() - started < 1
+        
+        exits = []
+        supervisor.on_exit(process, lambda p: exits.append((p.returncode, threading.current_thread().name)))
+        assert process.wait(5) == 3 and process.poll() == 3
+        time.sleep(0.1)
+        print(f"Exit callback: {exits}, output: {process.tail()}")
+        assert exits == [(3, "process-supervisor")]
+        assert process.tail(1) == ["bye"] and reaped(process.pid)
+        with open(log_file) as f:
+            assert f.read().startswith("booting\n")
+        
+        # A child that dies before its ready line reports not ready, without waiting for the timeout
+        crashed = supervisor.spawn("crasher", ["sh", "-c", "exit 1"], ready_pattern="never")
+        started = time.monotonic()
+        assert not crashed.wait_ready(10) and time.monotonic() - started < 2
+        assert crashed.wait_exit(5) == 1
+    
+    print("✅ Ready/exit test completed successfully!")
+
+
+def test_output_draining_and_stop():
+    """A chatty child never blocks on its pipe; stop escalates to SIGKILL for the whole group"""
+    print("=" * 60)
+    print("Testing output draining and stop")
+    print("=" * 60)
+    
+    supervisor = get_supervisor()
+    chatty = supervisor.spawn("chatty", ["sh", "-c", "yes telemetry | head -n 200000; echo done"], ready_pattern="^done$")
+    assert chatty.wait_ready(10), "child blocked on an undrained pipe"
+    assert chatty.wait_exit(5) == 0
+    
+    # Ignores SIGTERM, and has a grandchild in its process group
+    stubborn = supervisor.spawn("stubborn", "trap '' TERM; sleep 60 & echo up; wait", ready_pattern="up",
+                                shell=True, preexec_fn=os.setsid)
+    assert stubborn.wait_ready(5)
+    group = os.getpgid(stubborn.pid)
+    started = time.monotonic()
+    code = stop_process(stubborn, timeout=0.5)
+    print(f"Stopped with {code} after {time.monotonic() - started:.2f}s")
+    assert code == -signal.SIGKILL and reaped(stubborn.pid)
+    time.sleep(0.1)
+    assert not live_group_members(group), "grandchild survived"
+    
+    # Coroutines for asyncio callers
+    async def run_and_wait():
+        process = await supervisor.start("async child", ["sh", "-c", "exit 7"])
+        return await supervisor.wait_exit(process, 5)
+    assert supervisor.call(run_and_wait()) == 7
+    
+    status = supervisor.get_status()
+    print(f"Supervisor: spawned {status['spawned']}, reaped {status['reaped']}, {status['exit_detection']}")
+    assert status["reaped"] >= 5 and all(p["name"] != "stubborn" for p in status["running"])
+    
+    print("✅ Draining and stop test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Process Supervisor Tests")
+    print("=" * 60)
+    
+    try:
+        test_ready_exit_and_reaping()
+        test_output_draining_and_stop()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
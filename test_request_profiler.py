@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for request profiling
+Runs a small Flask app with the profiler hooked in, using Flask's test client
+"""
+
+import os
+import time
+from flask import Flask, jsonify
+from request_profiler import RequestProfiler
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+
+
+class FakeManager:
+    """Two manager calls, one of them slow"""
+    
+    def get_instance_status(self, instance_id):
+        return {"instance_id": instance_id}
+    
+    def start_instance(self, instance_id):
+        busy_until = time.perf_counter() + 0.08
+        while time.perf_counter() < busy_until:
+            pass
+        return True
+
+
+def make_app(profiler):
+    app = Flask(__name__)
+    profiler.init_app(app)
+    manager = profiler.wrap(FakeManager())
+    
+    @app.route('/status/<instance_id>')
+    def status(instance_id):
+        return jsonify(manager.get_instance_status(instance_id))
+    
+    @app.route('/start/<instance_id>', methods=['POST'])
+    def start(instance_id):
+        manager.get_instance_status(instance_id)
+        return jsonify({"success": manager.start_instance(instance_id)})
+    
+    return app
+
+
+def test_profiling_toggle_and_capture():
+    """Nothing is recorded until enabled; then timings, slow requests and profiles are"""
+    print("=" * 60)
+    print("Testing request profiler")
+    print("=" * 60)
+    
+    profiler = RequestProfiler(slow_ms=50, sample_interval=0.002)
+    client = make_app(profiler).test_client()
+    
+    response = client.get('/status/instance_1')
+    assert response.status_code == 200 and "Server-Timing" not in response.headers
+    assert profiler.get_status()["endpoints"] == {}
+    
+    profiler.configure(enabled=True, sample_rate=1.0)
+    assert client.get('/status/instance_1').headers["Server-Timing"].startswith("app;dur=")
+    response = client.post('/start/instance_1')
+    print(f"Server-Timing: {response.headers['Server-Timing']}")
+    assert "start_instance;dur=" in response.headers["Server-Timing"]
+    
+    slow = profiler.get_slow_requests()
+    assert len(slow) == 1 and slow[0]["path"] == "/start/instance_1"
+    phases = dict(slow[0]["phases"])
+    print(f"Slow request phases: {phases}")
+    assert phases["start_instance"] >= 75 and phases["get_instance_status"] < 10
+    
+    status = profiler.get_status()
+    assert status["endpoints"]["POST /start/<instance_id>"]["count"] == 1
+    assert any(profile["path"] == "/start/instance_1" for profile in status["profiles"])
+    
+    folded = profiler.folded(slow[0]["profile_id"])
+    hottest = max(folded.splitlines(), key=lambda line: int(line.rsplit(" ", 1)[1]))
+    print(f"Hottest stack: ...{hottest[-90:]}")
+    assert "start_instance (test_request_profiler.py" in hottest
+    assert profiler.folded(999) is None
+    
+    profiler.configure(enabled=False)
+    assert "Server-Timing" not in client.post('/start/instance_1').headers
+    assert len(profiler.get_slow_requests()) == 1
+    
+    try:
+        profiler.configure(sample_rate=2)
+        assert False, "invalid sample rate accepted"
+    except ValueError:
+        pass
+    
+    print("✅ Request profiler test completed successfully!")
+
+
+def test_admin_endpoints():
+    """Profiling can't be switched on or read without a configured admin token"""
+    print("\n" + "=" * 60)
+    print("Testing profiling admin token")
+    print("=" * 60)
+    
+    client = app_multi.app.test_client()
+    urls = ['/api/admin/profiling', '/api/admin/profiling/slow', '/api/admin/profiling/profiles.folded']
+    saved_token = os.environ.pop('SITL_ADMIN_TOKEN', None)
+    try:
+        response = client.put('/api/admin/profiling', json={"enabled": True})
+        print(f"Without a token: {response.status_code} {response.get_json()['error']}")
+        assert response.status_code == 403 and not app_multi.profiler.enabled
+        assert all(client.get(url).status_code == 403 for url in urls)
+        
+        os.environ['SITL_ADMIN_TOKEN'] = "admin"
+        assert client.put('/api/admin/profiling', json={"enabled": True}).status_code == 403
+        assert all(client.get(url).status_code == 403 for url in urls)
+        admin = {"X-Admin-Token": "admin"}
+        assert client.put('/api/admin/profiling', json={"enabled": True}, headers=admin).get_json()["success"]
+        assert app_multi.profiler.enabled
+        assert all(client.get(url, headers=admin).status_code == 200 for url in urls)
+        client.put('/api/admin/profiling', json={"enabled": False}, headers=admin)
+    finally:
+        os.environ.pop('SITL_ADMIN_TOKEN', None)
+        if saved_token is not None:
+            os.environ['SITL_ADMIN_TOKEN'] = saved_token
+    
+    print("✅ Profiling admin token test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Request Profiler Tests")
+    print("=" * 60)
+    
+    try:
+        test_profiling_toggle_and_capture()
+        test_admin_endpoints()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
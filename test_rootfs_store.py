@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for per-instance rootfs cloning
+"""
+
+import os
+import gc
+import time
+import tempfile
+from rootfs_store import RootfsStore, RootfsInUse, OWNER_FILE
+from airframe_registry import AirframeRegistry
+from multi_sitl_manager import MultiSITLManager
+
+
+def test_clone_isolation():
+    """Clones share immutable files but never the template's mutable state"""
+    print("=" * 60)
+    print("Testing rootfs clone isolation")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        build_dir = os.path.join(tmp, "build")
+        os.makedirs(os.path.join(build_dir, "etc"))
+        store = RootfsStore(build_dir, root=os.path.join(tmp, "rootfs"))
+        
+        seed = os.path.join(store.seeds_dir, "gz_x500")
+        os.makedirs(seed)
+        with open(os.path.join(seed, "parameters.bson"), 'wb') as f:
+            f.write(b'pristine')
+        with open(os.path.join(seed, "mixer.txt"), 'w') as f:
+            f.write("readonly")
+        
+        first = store.clone("gz_x500", "instance_1")
+        second = store.clone("gz_x500", "instance_2")
+        print(f"Clones: {os.listdir(first)} (reflink: {store.reflink_supported})")
+        
+        assert os.path.islink(os.path.join(first, "etc"))
+        assert os.path.isdir(os.path.join(first, "log"))
+        
+        with open(os.path.join(first, "parameters.bson"), 'wb') as f:
+            f.write(b'changed')
+        with open(os.path.join(second, "parameters.bson"), 'rb') as f:
+            assert f.read() == b'pristine'
+        with open(os.path.join(store.template_path("gz_x500"), "parameters.bson"), 'rb') as f:
+            assert f.read() == b'pristine'
+        
+        if not store.reflink_supported:
+            template_stat = os.stat(os.path.join(store.template_path("gz_x500"), "mixer.txt"))
+            assert os.stat(os.path.join(first, "mixer.txt")).st_ino == template_stat.st_ino
+        
+        store.remove("instance_1")
+        assert not os.path.exists(first)
+        assert os.path.exists(second)
+    
+    print("✅ Rootfs clone isolation test completed successfully!")
+
+
+def test_clone_cost_is_flat():
+    """Cloning the 50th instance costs about the same as the first"""
+    print("\n" + "=" * 60)
+    print("Testing rootfs clone cost")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        build_dir = os.path.join(tmp, "build")
+        os.makedirs(os.path.join(build_dir, "etc"))
+        store = RootfsStore(build_dir, root=os.path.join(tmp, "rootfs"))
+        store.clone("gz_x500", "warmup")
+        
+        timings = []
+        for i in range(50):
+            started = time.monotonic()
+            store.clone("gz_x500", f"instance_{i}")
+            timings.append((time.monotonic() - started) * 1000)
+        
+        first, last = sum(timings[:10]) / 10, sum(timings[-10:]) / 10
+        print(f"First 10: {first:.2f} ms/clone, last 10: {last:.2f} ms/clone")
+        assert last < 50
+    
+    print("✅ Rootfs clone cost test completed successfully!")
+
+
+def test_clone_ownership():
+    """A second manager never clones over or removes an instance directory a running manager owns"""
+    print("\n" + "=" * 60)
+    print("Testing rootfs ownership")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        build_dir = os.path.join(tmp, "build")
+        os.makedirs(os.path.join(build_dir, "etc"))
+        root = os.path.join(tmp, "rootfs")
+        first, second = RootfsStore(build_dir, root=root), RootfsStore(build_dir, root=root)
+        
+        path = first.clone("gz_x500", "instance_1")
+        with open(os.path.join(path, "parameters.bson"), 'wb') as f:
+            f.write(b'live')
+        assert first.clone("gz_x500", "instance_1") == path  # the owner may re-clone
+        with open(os.path.join(path, "parameters.bson"), 'wb') as f:
+            f.write(b'live')
+        try:
+            second.clone("gz_x500", "instance_1")
+            assert False, "cloned over another manager's instance"
+        except RootfsInUse as e:
+            print(f"Expected error: {e}")
+        second.remove("instance_1")
+        with open(os.path.join(path, "parameters.bson"), 'rb') as f:
+            assert f.read() == b'live'
+        
+        # A manager started with the same store skips the ids another manager holds
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100, memory_budget_mb=100000,
+                                   registry=registry, rootfs_store=second)
+        instance_id = manager.create_instance("gz_x500")
+        assert instance_id == "instance_2"
+        manager.remove_instance(instance_id)
+        
+        # Directories of stores that are gone, in this process or a dead one, are taken over
+        del first
+        gc.collect()
+        assert second.clone("gz_x500", "instance_1") == path
+        with open(os.path.join(path, OWNER_FILE), 'w') as f:
+            f.write("999999999 stale\n")
+        assert not second.owned_elsewhere("instance_1")
+        second.remove("instance_1")
+        assert not os.path.exists(path)
+    
+    print("✅ Rootfs ownership test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Rootfs Store Tests")
+    print("=" * 60)
+    
+    try:
+        test_clone_isolation()
+        test_clone_cost_is_flat()
+        test_clone_ownership()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for the routing load generator
+Runs short loads straight to the consumers and through the GCS mux (mavlink-routerd
+is not needed), and checks the report arithmetic
+"""
+
+import tempfile
+from router_loadgen import RouterLoadTest, latency_summary, capacity, parse_rates
+from test_router_shards import fake_router
+
+
+def test_report_helpers():
+    """Percentiles, rate parsing and the capacity verdict"""
+    print("=" * 60)
+    print("Testing report helpers")
+    print("=" * 60)
+    
+    summary = latency_summary([i / 1000 for i in range(1, 101)])
+    print(f"Latency summary: {summary}")
+    assert summary["samples"] == 100 and summary["p50"] == 51 and summary["p99"] == 100 and summary["max"] == 100
+    assert latency_summary([]) is None
+    assert parse_rates(["attitude=50", "heartbeat=2"]) == {"attitude": 50.0, "heartbeat": 2.0}
+    
+    def run(vehicles, loss, p99, delivered):
+        return {"vehicles": vehicles, "loss_ratio": loss, "latency_ms": {"p99": p99}, "vehicles_seen": vehicles,
+                "offered_fps": vehicles * 26.0, "delivered_fps": delivered * vehicles * 26.0}
+    
+    results = [run(50, 0.0, 2.0, 1.0), run(100, 0.0005, 20.0, 0.99), run(200, 0.02, 80.0, 0.7)]
+    assert capacity(results) == 100
+    assert capacity(results, max_p99_ms=10.0) == 50
+    
+    for kwargs in ({"route": "bogus"}, {"route": "mux", "vehicles": 300}, {"rates": {"vfr_hud": 4}}):
+        try:
+            RouterLoadTest(**kwargs)
+            assert False, f"accepted {kwargs}"
+        except ValueError:
+            pass
+    
+    print("✅ Report helper test completed successfully!")
+
+
+def test_direct_and_mux_routes():
+    """Every vehicle's frames arrive at every consumer, without loss at a light load"""
+    print("=" * 60)
+    print("Testing direct and mux routes")
+    print("=" * 60)
+    
+    for route in ("direct", "mux"):
+        report = RouterLoadTest(vehicles=12, consumers=2, route=route, tcp_base=0,
+                                rates={"attitude": 10}).run(duration=1.0, warmup=1.0)
+        print(f"{route}: {report['delivered_fps']} of {report['offered_fps']} frames/s, "
+              f"loss {report['loss_ratio']}, latency {report['latency_ms']}")
+        assert report["offered_fps"] == 12 * 16.0
+        assert report["vehicles_seen"] == 12 and len(report["per_consumer"]) == 2
+        assert report["loss_ratio"] == 0
+        assert 0.8 * report["offered_fps"] <= report["delivered_fps"] <= 1.2 * report["offered_fps"]
+        assert report["latency_ms"]["p50"] < 100
+    
+    print("✅ Route test completed successfully!")
+
+
+def test_router_route_setup():
+    """The router route spreads the vehicles over the shards and starts each shard once"""
+    print("=" * 60)
+    print("Testing router route setup")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        test = RouterLoadTest(vehicles=8, route="router", shards=2, tcp_base=0, server_port_base=24550,
+                              router_binary=fake_router(tmp))
+        try:
+            ports = test.setup_route()
+            shards = test.router.get_status()
+            print(f"GCS ports: {ports}, vehicles per shard: {[len(shard['instances']) for shard in shards]}")
+            assert ports == [shard["server_port"] for shard in shards if shard["instances"]]
+            assert sum(len(shard["instances"]) for shard in shards) == 8
+            assert all(shard["running"] and shard["restarts"] == 0 for shard in shards if shard["instances"])
+            with open(test.router.shard_for("load_0").config_file) as f:
+                assert f"tcp:127.0.0.1:{test.vehicles[0].port}" in f.read()
+        finally:
+            test.stop()
+        assert not any(shard.alive() for shard in test.router.shards)
+    
+    print("✅ Router route test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Routing Load Generator Tests")
+    print("=" * 60)
+    
+    try:
+        test_report_helpers()
+        test_direct_and_mux_routes()
+        test_router_route_setup()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
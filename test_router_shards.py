@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test script for sharded MAVLink routing
+Uses a stand-in router binary (a sleeping shell script) so shards are real processes
+"""
+
+import os
+import stat
+import tempfile
+from multi_sitl_manager import MAVLinkRouterManager
+from router_shards import HashRing
+
+
+def fake_router(directory):
+    """Executable that accepts mavlink-routerd's arguments and just stays up"""
+    path = os.path.join(directory, "fake-routerd")
+    with open(path, 'w') as f:
+        f.write("#!/bin/sh\nexec sleep 60\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+def test_hash_ring():
+    """Keys spread over shards and adding a shard only moves keys onto it"""
+    print("=" * 60)
+    print("Testing consistent-hash ring")
+    print("=" * 60)
+    
+    keys = [f"instance_{i}" for i in range(1000)]
+    ring = HashRing(range(4))
+    before = {key: ring.lookup(key) for key in keys}
+    counts = [list(before.values()).count(shard) for shard in range(4)]
+    print(f"Keys per shard: {counts}")
+    assert min(counts) > 150
+    
+    ring.add(4)
+    after = {key: ring.lookup(key) for key in keys}
+    moved = [key for key in keys if before[key] != after[key]]
+    print(f"Moved after adding a shard: {len(moved)}")
+    assert all(after[key] == 4 for key in moved)
+    assert 100 < len(moved) < 320
+    
+    ring.remove(4)
+    assert {key: ring.lookup(key) for key in keys} == before
+    
+    print("✅ Hash ring test completed successfully!")
+
+
+def test_shard_isolation():
+    """Each shard has its own config and process; one dying leaves the others alone"""
+    print("\n" + "=" * 60)
+    print("Testing router shard isolation")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        routers = MAVLinkRouterManager(shards=3, config_dir=os.path.join(tmp, "routers"),
+                                       binary=fake_router(tmp), startup_wait=0.05)
+        try:
+            for number in range(12):
+                assert routers.add_instance(f"instance_{number}", 14550 + number, 5760 + number)
+            
+            shards = routers.get_status()
+            print(f"Instances per shard: {[len(shard['instances']) for shard in shards]}")
+            assert sum(len(shard["instances"]) for shard in shards) == 12
+            assert len({shard["config_file"] for shard in shards}) == 3
+            assert [shard["server_port"] for shard in shards] == [14550, 14551, 14552]
+            
+            busy = [shard for shard in routers.shards if shard.endpoints]
+            victim = busy[0]
+            with open(victim.config_file) as f:
+                config = f.read()
+            assert f"TcpServerPort={victim.server_port}" in config
+            assert f"Log={victim.tlog_dir}" in config and os.path.isdir(victim.tlog_dir)
+            assert config.count("[UartEndpoint") == len(victim.endpoints)
+            
+            # Adding an instance restarts only its own shard
+            pids = {shard.index: shard.process.pid for shard in busy}
+            routers.add_instance("instance_extra", 14570, 5780)
+            restarted = routers.shard_for("instance_extra").index
+            for shard in busy:
+                assert (shard.process.pid != pids[shard.index]) == (shard.index == restarted)
+            
+            # A crashed shard is restarted without touching the others
+            pids = {shard.index: shard.process.pid for shard in busy}
+            victim.process.kill()
+            victim.process.wait()
+            routers.restart_dead_shards()
+            assert victim.alive() and victim.restarts == 1
+            for shard in busy:
+                if shard is not victim:
+                    assert shard.process.pid == pids[shard.index]
+            
+            # Resizing keeps every instance routed exactly once
+            moved = routers.resize(4)
+            print(f"Moved when going to 4 shards: {moved}")
+            assigned = [i for shard in routers.get_status() for i in shard["instances"]]
+            assert sorted(assigned) == sorted(routers.active_instances)
+            assert moved < 13
+            
+            # Each shard runs on its own core out of the ones the service may use
+            allowed = os.sched_getaffinity(0)
+            for shard in routers.shards:
+                assert shard.cpu in allowed
+                if shard.alive():
+                    assert os.sched_getaffinity(shard.process.pid) == {shard.cpu}
+            
+            # Back to one router: it may run on any allowed core again
+            routers.resize(1)
+            assert routers.shards[0].cpu is None and routers.shards[0].alive()
+            assert os.sched_getaffinity(routers.shards[0].process.pid) == allowed
+            
+            for instance_id in list(routers.active_instances):
+                routers.remove_instance(instance_id)
+            assert not any(shard.alive() for shard in routers.shards)
+        finally:
+            routers.stop_router()
+    
+    # Unless configured, one router serves every vehicle on the public GCS port
+    with tempfile.TemporaryDirectory() as tmp:
+        routers = MAVLinkRouterManager(config_dir=os.path.join(tmp, "routers"))
+        assert [shard.server_port for shard in routers.shards] == [14550]
+        assert routers.shards[0].cpu is None  # a single router is never pinned
+    
+    print("✅ Router shard test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Router Shard Tests")
+    print("=" * 60)
+    
+    try:
+        test_hash_ring()
+        test_shard_isolation()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
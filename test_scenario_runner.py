@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Test script for the mission scenario runner
+Flies missions on fake vehicles that speak just enough of the mission and
+command protocols, on two "running" instances in parallel
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+from mavlink_frames import FrameSplitter, frame_header, padded_payload, encode_frame
+from mavlink_client import (COMMAND_LONG_FORMAT, COMMAND_ACK_FORMAT, MISSION_COUNT_FORMAT, MISSION_ITEM_INT_FORMAT,
+                            MISSION_REQUEST_FORMAT, MISSION_ACK_FORMAT, GLOBAL_POSITION_INT_FORMAT, HEARTBEAT_FORMAT)
+from multi_sitl_manager import MultiSITLManager, SITLInstance
+from scenario_runner import ScenarioRunner, load_scenarios
+
+COMMAND_ACK_EXT_FORMAT = struct.Struct('<HBBiBB')  # + progress, result_param2, target system/component
+MISSION_ACK_EXT_FORMAT = struct.Struct('<BBBBI')  # + mission_type, opaque_id
+
+HOME = (47.3977, 8.5456)
+
+
+class FakeVehicle:
+    """Accepts a mission upload, arms, 'flies' each item in 50 ms and disarms after a LAND item"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.armed = False
+        self.position = (HOME[0], HOME[1], 0.0)
+        self.items = []
+        self.commands = []
+        self.conn = None
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(4)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+    
+    def send(self, msgid, payload):
+        with self.lock:
+            if self.conn:
+                try:
+                    self.conn.sendall(encode_frame(msgid, payload, sysid=1, compid=1))
+                except OSError:
+                    pass
+    
+    def telemetry(self, conn):
+        while self.conn is conn:
+            lat, lon, alt = self.position
+            self.send(0, HEARTBEAT_FORMAT.pack(0, 2, 12, 0x80 if self.armed else 0, 4, 3))
+            self.send(33, GLOBAL_POSITION_INT_FORMAT.pack(0, int(lat * 1e7), int(lon * 1e7), 0,
+                                                          int(alt * 1000), 0, 0, 0, 0))
+            time.sleep(0.02)
+    
+    def fly(self):
+        for seq, item in enumerate(self.items):
+            time.sleep(0.05)
+            if item[0] == 21:  # NAV_LAND
+                self.position = (item[1], item[2], 0.0)
+            else:
+                self.position = item[1:]
+            self.send(46, struct.pack('<H', seq))
+        if self.items and self.items[-1][0] == 21:
+            self.armed = False
+    
+    def serve(self):
+        while True:
+            conn, _ = self.server.accept()
+            self.conn = conn
+            threading.Thread(target=self.telemetry, args=(conn,), daemon=True).start()
+            self.handle(conn)
+    
+    def handle(self, conn):
+        splitter = FrameSplitter()
+        expected = 0
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                self.conn = None
+                return
+            for frame in splitter.feed(data):
+                msgid = frame_header(frame)[3]
+                if msgid == 44:
+                    expected = MISSION_COUNT_FORMAT.unpack(padded_payload(frame, 5))[0]
+                    self.items = []
+                    self.send(51, MISSION_REQUEST_FORMAT.pack(0, 255, 190))
+                elif msgid == 73:
+                    fields = MISSION_ITEM_INT_FORMAT.unpack(padded_payload(frame, MISSION_ITEM_INT_FORMAT.size))
+                    self.items.append((fields[8], fields[4] / 1e7, fields[5] / 1e7, fields[6]))
+                    if len(self.items) < expected:
+                        self.send(51, MISSION_REQUEST_FORMAT.pack(len(self.items), 255, 190))
+                    else:
+                        # Full payloads, with the MAVLink 2 extensions PX4 fills in
+                        self.send(47, MISSION_ACK_EXT_FORMAT.pack(255, 190, 0, 0, 7))
+                elif msgid == 76:
+                    fields = COMMAND_LONG_FORMAT.unpack(padded_payload(frame, COMMAND_LONG_FORMAT.size))
+                    command = fields[7]
+                    self.commands.append((command, fields[:2]))
+                    if command == 400:
+                        self.armed = fields[0] == 1
+                    elif command == 300:
+                        threading.Thread(target=self.fly, daemon=True).start()
+                    self.send(77, COMMAND_ACK_EXT_FORMAT.pack(command, 0, 100, 0, 255, 190))
+                else:
+                    self.on_message(msgid, frame)
+    
+    def on_message(self, msgid, frame):
+        """Hook for messages this fake doesn't handle itself"""
+        pass
+
+
+def write_plan(path, waypoints, land=True, assertions=None):
+    """QGC .plan with a takeoff, the given waypoints and optionally a landing"""
+    items = [{"type": "SimpleItem", "command": 22, "frame": 3, "autoContinue": True,
+              "params": [0, 0, 0, None, HOME[0], HOME[1], 10]}]
+    for lat, lon, alt in waypoints:
+        items.append({"type": "SimpleItem", "command": 16, "frame": 3, "autoContinue": True,
+                      "params": [0, 0, 0, None, lat, lon, alt]})
+    if land:
+        lat, lon, _ = waypoints[-1]
+        items.append({"type": "SimpleItem", "command": 21, "frame": 3, "autoContinue": True,
+                      "params": [0, 0, 0, None, lat, lon, 0]})
+    plan = {"fileType": "Plan", "mission": {"items": items}}
+    if assertions:
+        plan["assertions"] = assertions
+    with open(path, 'w') as f:
+        json.dump(plan, f)
+
+
+def test_extended_acks():
+    """Acks carrying their MAVLink 2 extensions decode with the base formats"""
+    print("=" * 60)
+    print("Testing extended acks")
+    print("=" * 60)
+    
+    ack = encode_frame(77, COMMAND_ACK_EXT_FORMAT.pack(400, 0, 100, 0, 255, 190), sysid=1, compid=1)
+    assert COMMAND_ACK_FORMAT.unpack(padded_payload(ack, COMMAND_ACK_FORMAT.size)) == (400, 0)
+    ack = encode_frame(47, MISSION_ACK_EXT_FORMAT.pack(255, 190, 0, 0, 7), sysid=1, compid=1)
+    assert MISSION_ACK_FORMAT.unpack(padded_payload(ack, MISSION_ACK_FORMAT.size)) == (255, 190, 0)
+    # and MAVLink 2's stripped trailing zeros still read as zeros
+    assert COMMAND_ACK_FORMAT.unpack(padded_payload(encode_frame(77, b'\x90\x01'), 3)) == (400, 0)
+    
+    print("✅ Extended ack test completed successfully!")
+
+
+def test_scenarios_in_parallel():
+    """Four missions on two vehicles; one breaks its altitude ceiling"""
+    print("=" * 60)
+    print("Testing scenario runner")
+    print("=" * 60)
+    
+    manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0)
+    # Another user's vehicle of the same airframe is never borrowed
+    other = SITLInstance("instance_alice", "gz_x500", 14589, 1)
+    other.status, other.owner = "running", "alice"
+    manager.instances[other.instance_id] = other
+    for number in (1, 2):
+        vehicle = FakeVehicle()
+        instance = SITLInstance(f"instance_fake{number}", "gz_x500", 14590 + number, vehicle.port)
+        instance.status = "running"
+        instance.start_time = datetime.now()
+        manager.instances[instance.instance_id] = instance
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        missions = os.path.join(tmp, "missions")
+        os.makedirs(missions)
+        for number in range(3):
+            write_plan(os.path.join(missions, f"survey_{number}.plan"),
+                       [(HOME[0] + 0.001 * number, HOME[1], 20), (HOME[0], HOME[1] + 0.001, 20)])
+        write_plan(os.path.join(missions, "too_high.plan"), [(HOME[0], HOME[1], 150)],
+                   assertions={"max_altitude_m": 120})
+        with open(os.path.join(missions, "README.txt"), 'w') as f:
+            f.write("not a mission")
+        
+        assert len(load_scenarios(missions)) == 4
+        
+        runner = ScenarioRunner(manager, instances=2, report_dir=os.path.join(tmp, "reports"))
+        summary = runner.run(missions)
+        
+        print(f"{summary['passed']}/{summary['missions']} passed on {summary['vehicles']}, "
+              f"{summary['missions_per_hour']} missions/hour")
+        assert summary["missions"] == 4
+        assert summary["passed"] == 3
+        assert sorted(summary["vehicles"]) == ["instance_fake1", "instance_fake2"]
+        assert len({r["instance_id"] for r in summary["results"]}) == 2
+        
+        failed = next(r for r in summary["results"] if not r["passed"])
+        print(f"Failed scenario: {failed['scenario']}: {failed['failures']}")
+        assert failed["scenario"] == "too_high"
+        assert "exceeded" in failed["failures"][0]
+        
+        suite = ET.parse(os.path.join(tmp, "reports", "junit.xml")).getroot()
+        assert suite.get("tests") == "4" and suite.get("failures") == "1"
+        assert len(suite.findall("testcase/failure")) == 1
+        with open(os.path.join(tmp, "reports", "report.json")) as f:
+            assert json.load(f)["passed"] == 3
+    
+    print("✅ Scenario runner test completed successfully!")
+
+
+def test_api_paths():
+    """The API only runs missions from, and writes reports to, the configured directories"""
+    print("=" * 60)
+    print("Testing scenario API paths")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "missions", "smoke"))
+        app_multi.SCENARIO_DIR = os.path.join(tmp, "missions")
+        app_multi.SCENARIO_REPORT_DIR = os.path.join(tmp, "reports")
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0)
+        runs = []
+        manager.start_scenario_run = lambda directory, **kwargs: runs.append((directory, kwargs)) or {
+            "run_id": "run1", "report_dir": kwargs["report_dir"]}
+        app_multi.multi_sitl = manager
+        client = app_multi.app.test_client()
+        
+        for body in ({"directory": "/etc"}, {"directory": "../.."}, {"directory": "smoke/../../.."},
+                     {"directory": "smoke", "report_dir": "/tmp/elsewhere"},
+                     {"directory": "smoke", "report_dir": "../missions"}, {"directory": "missing"}):
+            response = client.post('/api/scenarios', json=body)
+            print(f"{body}: {response.status_code} {response.get_json()['error']}")
+            assert response.status_code == 400
+        assert runs == []
+        
+        response = client.post('/api/scenarios', json={"directory": "smoke", "report_dir": "nightly/1"},
+                               headers={"X-SITL-User": "ci"})
+        assert response.status_code == 200 and runs[0][1]["user"] == "ci"
+        assert runs[0][0] == os.path.realpath(os.path.join(tmp, "missions", "smoke"))
+        assert runs[0][1]["report_dir"] == os.path.realpath(os.path.join(tmp, "reports", "nightly", "1"))
+    
+    print("✅ Scenario API path test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Scenario Runner Tests")
+    print("=" * 60)
+    
+    try:
+        test_extended_acks()
+        test_scenarios_in_parallel()
+        test_api_paths()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the control-plane daemon
+Serves a real manager (background loops off) on a temporary Unix socket and
+drives it through the RPC client and sitlctl
+"""
+
+import os
+import io
+import json
+import time
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from multi_sitl_manager import MultiSITLManager, SITLInstance
+from sitl_daemon import SITLDaemon, SITLControlClient, RPCError
+import sitlctl
+
+
+def test_rpc_round_trip():
+    """Status calls through the socket match the manager and stay sub-millisecond"""
+    print("=" * 60)
+    print("Testing control daemon RPC")
+    print("=" * 60)
+    
+    manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0)
+    instance = SITLInstance("instance_fake1", "gz_x500", 14591, 5761)
+    instance.status = "running"
+    instance.start_time = datetime.now()
+    manager.instances[instance.instance_id] = instance
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, "control.sock")
+        daemon = SITLDaemon(manager, socket_path)
+        daemon.start()
+        try:
+            client = SITLControlClient(socket_path)
+            status = client.get_instance_status("instance_fake1")
+            assert status["tcp_port"] == 5761 and status["airframe"] == "gz_x500"
+            assert client.get_all_status()["total_instances"] == 1
+            assert client.get_instance_status("instance_missing") is None
+            
+            # Errors come back as RPCError; private methods aren't reachable
+            try:
+                client.call("collect_metrics")
+                assert False, "private method was dispatched"
+            except RPCError as e:
+                assert e.error_type == "AttributeError"
+            assert client.create_instance("gz_x500", speed_factor=1000) is None
+            try:
+                client.call("get_instance_status")
+                assert False, "missing argument accepted"
+            except RPCError as e:
+                print(f"Expected error: {e}")
+                assert e.error_type == "TypeError"
+            
+            calls = 500
+            started = time.perf_counter()
+            for _ in range(calls):
+                client.get_instance_status("instance_fake1")
+            latency_ms = (time.perf_counter() - started) / calls * 1000
+            print(f"Status call latency: {latency_ms:.3f} ms")
+            assert latency_ms < 5
+            
+            # Several threads share the daemon, each on its own connection
+            results = []
+            workers = [threading.Thread(target=lambda: results.append(client.get_all_status()["total_instances"]))
+                       for _ in range(8)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            assert results == [1] * 8
+            
+            # A call that outlives the timeout must not leave its late reply for the next call
+            get_status = manager.get_instance_status
+            manager.get_instance_status = lambda instance_id: (time.sleep(0.5) if instance_id == "slow" else None,
+                                                               get_status(instance_id))[1]
+            impatient = SITLControlClient(socket_path, timeout=0.2)
+            try:
+                impatient.get_instance_status("slow")
+                assert False, "slow call did not time out"
+            except OSError:
+                pass
+            time.sleep(0.5)
+            assert impatient.get_instance_status("instance_fake1")["instance_id"] == "instance_fake1"
+            manager.get_instance_status = get_status
+            
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                assert sitlctl.main(["--socket", socket_path, "status", "instance_fake1"]) == 0
+            assert json.loads(output.getvalue())["instance_id"] == "instance_fake1"
+        finally:
+            daemon.shutdown()
+    
+    assert not os.path.exists(socket_path)
+    print("✅ Control daemon test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting Control Daemon Tests")
+    print("=" * 60)
+    
+    try:
+        test_rpc_round_trip()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
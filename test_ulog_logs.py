@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for flight log listing and download
+Drives the Flask routes with the test client against a manager whose instance
+rootfs is a temporary directory holding some fake ULog files
+"""
+
+import os
+import time
+import tempfile
+os.environ.setdefault('SITL_GZ_RESOURCE_WARMUP', '0')  # app_multi builds its manager on import
+import app_multi
+from multi_sitl_manager import MultiSITLManager
+from airframe_registry import AirframeRegistry
+from rootfs_store import RootfsStore
+from cgroup_limits import CgroupManager
+
+
+def write_log(path, size, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+
+
+def test_list_and_download():
+    """Logs are listed from the cache, downloaded whole or by range, and nothing outside log/ is served"""
+    print("=" * 60)
+    print("Testing ULog listing and download")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = AirframeRegistry(px4_path=os.path.join(tmp, "missing"), cache_dir=os.path.join(tmp, "cache"))
+        store = RootfsStore(os.path.join(tmp, "build"), root=os.path.join(tmp, "rootfs"))
+        manager = MultiSITLManager(metrics_interval=0, watchdog_interval=0, cpu_budget=100, memory_budget_mb=100000,
+                                   registry=registry, rootfs_store=store,
+                                   cgroups=CgroupManager(os.path.join(tmp, "no-cgroups", "cloudsim")))
+        instance_id = manager.create_instance("gz_x500")
+        instance = manager.instances[instance_id]
+        assert instance.rootfs_dir == store.instance_path(instance_id)
+        log_dir = os.path.join(instance.rootfs_dir, "log")
+        write_log(os.path.join(log_dir, "2026-10-18", "09_15_00.ulg"), 4096, age=86400)
+        write_log(os.path.join(log_dir, "2026-10-19", "10_00_00.ulg"), 300000)
+        write_log(os.path.join(log_dir, "2026-10-19", "notes.txt"), 10)
+        write_log(os.path.join(instance.rootfs_dir, "secret.ulg"), 10)
+        
+        app_multi.multi_sitl = manager
+        client = app_multi.app.test_client()
+        
+        listing = client.get(f'/api/instances/{instance_id}/logs/ulog').get_json()
+        print(f"Listing: {listing}")
+        assert [log["name"] for log in listing["logs"]] == ["2026-10-19/10_00_00.ulg", "2026-10-18/09_15_00.ulg"]
+        assert listing["total_size"] == 304096
+        assert client.get('/api/instances/instance_x/logs/ulog').status_code == 404
+        
+        # Unchanged directories are served from the cache; a file still being written is re-stat'ed
+        scans = manager.ulog_index.get_stats()["scans"]
+        with open(os.path.join(log_dir, "2026-10-19", "10_00_00.ulg"), 'ab') as f:
+            f.write(b"\x00" * 1000)
+        listing = client.get(f'/api/instances/{instance_id}/logs/ulog').get_json()
+        assert manager.ulog_index.get_stats()["scans"] == scans
+        assert listing["logs"][0]["size"] == 301000
+        
+        write_log(os.path.join(log_dir, "2026-10-19", "11_30_00.ulg"), 100)
+        listing = client.get(f'/api/instances/{instance_id}/logs/ulog').get_json()
+        assert listing["logs"][0]["name"] == "2026-10-19/11_30_00.ulg"
+        stats = manager.ulog_index.get_stats()
+        print(f"Cache stats: {stats}")
+        assert stats["scans"] == scans + 1
+        
+        # Whole-file and ranged downloads
+        url = f'/api/instances/{instance_id}/logs/ulog/2026-10-19/10_00_00.ulg'
+        with open(os.path.join(log_dir, "2026-10-19", "10_00_00.ulg"), 'rb') as f:
+            content = f.read()
+        response = client.get(url)
+        assert response.status_code == 200 and response.data == content
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert "attachment" in response.headers["Content-Disposition"]
+        response.close()
+        
+        response = client.get(url, headers={"Range": "bytes=1000-1999"})
+        print(f"Range response: {response.status_code} {response.headers['Content-Range']}")
+        assert response.status_code == 206 and response.data == content[1000:2000]
+        assert response.headers["Content-Range"] == "bytes 1000-1999/301000"
+        response.close()
+        
+        response = client.get(url, headers={"Range": "bytes=-500"})
+        assert response.status_code == 206 and response.data == content[-500:]
+        response.close()
+        assert client.get(url, headers={"Range": "bytes=400000-"}).status_code == 416
+        
+        for bad in ["../secret.ulg", "2026-10-19/notes.txt", "2026-10-19/missing.ulg", "%2e%2e/secret.ulg"]:
+            assert client.get(f'/api/instances/{instance_id}/logs/ulog/{bad}').status_code == 404, bad
+        
+        assert manager.remove_instance(instance_id)
+        assert os.listdir(store.instances_dir) == []
+    
+    print("✅ ULog listing and download test completed successfully!")
+
+
+if __name__ == "__main__":
+    print("Starting ULog Log Tests")
+    print("=" * 60)
+    
+    try:
+        test_list_and_download()
+        
+        print("\n" + "=" * 60)
+        print("🎉 ALL TESTS COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+    
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Batch MAVLink Telemetry Log Decoder
+Reads .tlog files (each record is an 8-byte big-endian microsecond timestamp
+followed by one MAVLink frame) for offline analysis.
+
+The log is memory-mapped and scanned once to build an index of record offsets
+and message ids. Selected message types are then pulled out as whole columns
+(time, lat, lon, alt, roll, pitch, yaw, ...): with NumPy the payload bytes of
+every matching record are gathered at once and reinterpreted as a structured
+array, without a Python call per message. Without NumPy the same columns are
+decoded with struct, one record at a time, as plain lists.
+
+    python tlog_decoder.py flight.tlog GLOBAL_POSITION_INT ATTITUDE
+"""
+
+import os
+import mmap
+import struct
+import logging
+import argparse
+from array import array
+from collections import Counter
+
+from mavlink_frames import STX_V1, STX_V2, HEADER_LEN_V1, HEADER_LEN_V2, CHECKSUM_LEN, SIGNATURE_LEN, \
+    INCOMPAT_FLAG_SIGNED
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TLOG_TIMESTAMP = struct.Struct('>Q')
+TIMESTAMP_LEN = TLOG_TIMESTAMP.size
+GATHER_CHUNK = 1 << 20  # records gathered per NumPy pass, bounds the temporary index arrays
+
+# Payload layouts (wire order) of the messages that can be extracted as columns
+MESSAGE_LAYOUTS = {
+    30: ("ATTITUDE", '<Iffffff',
+         ("time_boot_ms", "roll", "pitch", "yaw", "rollspeed", "pitchspeed", "yawspeed")),
+    33: ("GLOBAL_POSITION_INT", '<IiiiihhhH',
+         ("time_boot_ms", "lat", "lon", "alt", "relative_alt", "vx", "vy", "vz", "hdg")),
+}
+MESSAGE_IDS = {name: msgid for msgid, (name, _, _) in MESSAGE_LAYOUTS.items()}
+
+# Integer fields converted to SI units: degrees, metres, metres/second
+COLUMN_SCALES = {
+    "lat": 1e-7,
+    "lon": 1e-7,
+    "alt": 1e-3,
+    "relative_alt": 1e-3,
+    "vx": 1e-2,
+    "vy": 1e-2,
+    "vz": 1e-2,
+    "hdg": 1e-2,
+}
+
+NUMPY_TYPES = {'B': 'u1', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'f': 'f4'}
+
+
+def message_id(message):
+    """Message id for a message name or id"""
+    if isinstance(message, str):
+        if message.upper() not in MESSAGE_IDS:
+            raise ValueError(f"No column layout for message {message}")
+        return MESSAGE_IDS[message.upper()]
+    if message not in MESSAGE_LAYOUTS:
+        raise ValueError(f"No column layout for message id {message}")
+    return message
+
+
+def numpy_dtype(msgid):
+    """Structured little-endian dtype matching a message's payload"""
+    _, layout, names = MESSAGE_LAYOUTS[msgid]
+    return np.dtype([(name, '<' + NUMPY_TYPES[code]) for name, code in zip(names, layout[1:])])
+
+
+class TlogDecoder:
+    """Memory-mapped tlog with a record index and column extraction"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.offsets = array('Q')  # record start (timestamp) offsets
+        self.msgids = array('I')
+        self.discarded_bytes = 0
+        self.truncated_bytes = 0
+        self.indexed = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Unmap and close the log"""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+    
+    def build_index(self):
+        """Scan the log once, recording where each frame starts and its message id"""
+        if self.indexed:
+            return len(self.offsets)
+        
+        buffer = self.buffer
+        size = len(buffer)
+        offsets = self.offsets
+        msgids = self.msgids
+        position = 0
+        
+        while position + TIMESTAMP_LEN + 3 <= size:
+            frame = position + TIMESTAMP_LEN
+            stx = buffer[frame]
+            if stx == STX_V2:
+                length = HEADER_LEN_V2 + buffer[frame + 1] + CHECKSUM_LEN
+                if buffer[frame + 2] & INCOMPAT_FLAG_SIGNED:
+                    length += SIGNATURE_LEN
+                if frame + length > size:
+                    break
+                msgid = buffer[frame + 7] | (buffer[frame + 8] << 8) | (buffer[frame + 9] << 16)
+            elif stx == STX_V1:
+                length = HEADER_LEN_V1 + buffer[frame + 1] + CHECKSUM_LEN
+                if frame + length > size:
+                    break
+                msgid = buffer[frame + 5]
+            else:
+                # Not a record boundary; slide forward until the next one lines up
+                position += 1
+                self.discarded_bytes += 1
+                continue
+            
+            offsets.append(position)
+            msgids.append(msgid)
+            position = frame + length
+        
+        self.truncated_bytes = size - position
+        self.indexed = True
+        
+        if self.discarded_bytes or self.truncated_bytes:
+            logger.warning(f"⚠️ {self.path}: skipped {self.discarded_bytes} unparseable bytes, "
+                           f"{self.truncated_bytes} bytes of incomplete trailing record")
+        logger.info(f"Indexed {len(offsets)} records in {self.path}")
+        return len(offsets)
+    
+    def message_counts(self):
+        """Number of records per message id"""
+        self.build_index()
+        return dict(Counter(self.msgids))
+    
+    def columns(self, message, fields=None):
+        """Columns of one message type: "time" (log time, seconds) plus the requested payload fields"""
+        msgid = message_id(message)
+        names = MESSAGE_LAYOUTS[msgid][2]
+        fields = list(fields) if fields else list(names)
+        unknown = [field for field in fields if field not in names]
+        if unknown:
+            raise ValueError(f"{MESSAGE_LAYOUTS[msgid][0]} has no field(s) {', '.join(unknown)}")
+        
+        self.build_index()
+        if np is not None:
+            return self.numpy_columns(msgid, fields)
+        return self.struct_columns(msgid, fields)
+    
+    def numpy_columns(self, msgid, fields):
+        """Vectorized extraction: gather every matching payload from the mapped log at once"""
+        dtype = numpy_dtype(msgid)
+        width = dtype.itemsize
+        records = np.frombuffer(self.offsets, dtype=np.uint64).astype(np.int64)
+        records = records[np.frombuffer(self.msgids, dtype=np.uint32) == msgid]
+        
+        data = np.frombuffer(self.buffer, dtype=np.uint8) if len(self.buffer) else np.zeros(1, np.uint8)
+        last = len(data) - 1
+        byte_positions = np.arange(width)
+        stamp_positions = np.arange(TIMESTAMP_LEN)
+        times = []
+        payloads = []
+        
+        for start in range(0, len(records), GATHER_CHUNK):
+            chunk = records[start:start + GATHER_CHUNK]
+            frames = chunk + TIMESTAMP_LEN
+            header_lens = np.where(data[frames] == STX_V2, HEADER_LEN_V2, HEADER_LEN_V1)
+            payload_lens = data[frames + 1]
+            
+            # MAVLink 2 strips trailing zero bytes, so bytes past a payload's length read as zero
+            gather = np.minimum((frames + header_lens)[:, None] + byte_positions, last)
+            rows = np.where(byte_positions < payload_lens[:, None], data[gather], 0).astype(np.uint8)
+            payloads.append(rows.view(dtype)[:, 0])
+            
+            stamps = data[chunk[:, None] + stamp_positions].view('>u8')[:, 0]
+            times.append(stamps / 1e6)
+        
+        del data
+        values = np.concatenate(payloads) if payloads else np.zeros(0, dtype)
+        result = {"time": np.concatenate(times) if times else np.zeros(0)}
+        for field in fields:
+            column = values[field]
+            result[field] = column * COLUMN_SCALES[field] if field in COLUMN_SCALES else column.copy()
+        return result
+    
+    def struct_columns(self, msgid, fields):
+        """Per-record extraction with struct, for when NumPy isn't installed"""
+        _, layout, names = MESSAGE_LAYOUTS[msgid]
+        payload_format = struct.Struct(layout)
+        width = payload_format.size
+        wanted = [(names.index(field), field, COLUMN_SCALES.get(field)) for field in fields]
+        result = {"time": []}
+        result.update((field, []) for field in fields)
+        buffer = self.buffer
+        times = result["time"]
+        
+        for offset, record_msgid in zip(self.offsets, self.msgids):
+            if record_msgid != msgid:
+                continue
+            frame = offset + TIMESTAMP_LEN
+            payload_start = frame + (HEADER_LEN_V2 if buffer[frame] == STX_V2 else HEADER_LEN_V1)
+            payload = bytes(buffer[payload_start:payload_start + buffer[frame + 1]])
+            if len(payload) < width:
+                payload += b'\x00' * (width - len(payload))
+            values = payload_format.unpack_from(payload)
+            
+            times.append(TLOG_TIMESTAMP.unpack_from(buffer, offset)[0] / 1e6)
+            for index, field, scale in wanted:
+                result[field].append(values[index] * scale if scale else values[index])
+        return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    parser = argparse.ArgumentParser(description="Summarise a MAVLink telemetry log")
+    parser.add_argument("path")
+    parser.add_argument("messages", nargs="*", default=["GLOBAL_POSITION_INT", "ATTITUDE"],
+                        help=f"messages to extract ({', '.join(MESSAGE_IDS)})")
+    args = parser.parse_args()
+    
+    with TlogDecoder(args.path) as decoder:
+        decoder.build_index()
+        print(f"{len(decoder.offsets)} records, message counts: {decoder.message_counts()}")
+        for message in args.messages:
+            columns = decoder.columns(message)
+            if not len(columns["time"]):
+                print(f"{message}: no records")
+                continue
+            print(f"{message}: {len(columns['time'])} records, "
+                  f"{columns['time'][0]:.3f}s - {columns['time'][-1]:.3f}s")
+            for field, column in columns.items():
+                if field != "time":
+                    print(f"  {field}: min {min(column):.6g} max {max(column):.6g}")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+ULog Flight Log Index
+Lists the .ulg files PX4 writes below an instance's log directory
+(log/<date>/<time>.ulg) and resolves download requests to files on disk.
+
+Directory listings are cached against the directory's mtime: a directory is
+only rescanned after a file was added, removed or renamed in it, so listing an
+instance with thousands of logs costs one stat() per directory. Files modified
+recently (PX4 may still be writing them) are re-stat'ed on every listing so
+their size stays current.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ULOG_SUFFIX = ".ulg"
+RECENT_WRITE_WINDOW = 60  # seconds during which a log may still be growing
+MAX_DEPTH = 3  # PX4 uses log/<date>/, leave room for log/sess<n>/ layouts
+
+
+class UlogIndex:
+    """mtime-keyed cache of ULog directory listings"""
+    
+    def __init__(self, max_dirs=4096):
+        self.lock = threading.Lock()
+        self.listings = OrderedDict()  # directory -> (mtime_ns, subdirectories, {file name: (size, mtime)})
+        self.max_dirs = max_dirs
+        self.scans = 0
+        self.hits = 0
+    
+    def scan_dir(self, directory):
+        """Subdirectories and ULog files of one directory, rescanned only when its mtime changed"""
+        try:
+            # stat before scanning: a change made during the scan leaves a stale mtime, forcing a rescan next time
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], {}
+        
+        with self.lock:
+            cached = self.listings.get(directory)
+            if cached is not None and cached[0] == mtime:
+                self.listings.move_to_end(directory)
+                self.hits += 1
+                return cached[1], cached[2]
+        
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.name.endswith(ULOG_SUFFIX) and entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        files[entry.name] = (stat.st_size, stat.st_mtime)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not list {directory}: {e}")
+            return [], {}
+        
+        with self.lock:
+            self.listings[directory] = (mtime, subdirs, files)
+            self.listings.move_to_end(directory)
+            while len(self.listings) > self.max_dirs:
+                self.listings.popitem(last=False)
+            self.scans += 1
+        return subdirs, files
+    
+    def list(self, log_dir):
+        """All ULog files below log_dir, newest first"""
+        logs = []
+        now = time.time()
+        pending = [("", 0)]
+        while pending:
+            relative, depth = pending.pop()
+            directory = os.path.join(log_dir, relative) if relative else log_dir
+            subdirs, files = self.scan_dir(directory)
+            for name, (size, mtime) in files.items():
+                if now - mtime < RECENT_WRITE_WINDOW:
+                    try:
+                        stat = os.stat(os.path.join(directory, name))
+                        size, mtime = stat.st_size, stat.st_mtime
+                    except OSError:
+                        continue
+                logs.append({"name": os.path.join(relative, name), "size": size, "mtime": mtime})
+            if depth < MAX_DEPTH:
+                pending.extend((os.path.join(relative, subdir), depth + 1) for subdir in subdirs)
+        
+        logs.sort(key=lambda log: log["mtime"], reverse=True)
+        return logs
+    
+    def resolve(self, log_dir, name):
+        """Absolute path of a listed log, or None if name is not a ULog file inside log_dir"""
+        if not name.endswith(ULOG_SUFFIX):
+            return None
+        root = os.path.realpath(log_dir)
+        path = os.path.realpath(os.path.join(root, name))
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            return None
+        return path
+    
+    def get_stats(self):
+        """Cache counters"""
+        with self.lock:
+            return {"cached_dirs": len(self.listings), "scans": self.scans, "hits": self.hits}